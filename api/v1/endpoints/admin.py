@@ -0,0 +1,358 @@
+import logging
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal
+from mongoengine.errors import ValidationError
+from models.job import JobResponse
+from core.admission import admission
+from core.ai import ai_router
+from core.coalesce import single_flight
+from core.cascade import CASCADE_MODES, DEPENDENTS, cascade_remove
+from core.database import index_report, pool_metrics
+from core.datagen import GeneratorConfig
+from core import db_snapshots
+from core.jobs import job_queue
+from core.retention import retention_status
+from core.search import search_index
+from core.profiling import profile_store
+from core.slow_queries import slow_query_log
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class DataGenerationRequest(BaseModel):
+    """
+    Pydantic model for synthetic data generation.
+    """
+    users: int = Field(10, ge=1)
+    companies_per_user: float = Field(20, ge=0)
+    contacts_per_company: float = Field(10, ge=0)
+    campaigns_per_user: float = Field(3, ge=0)
+    emails_per_contact: float = Field(1, ge=0)
+    skew: float = Field(1.5, gt=0)
+    days: int = Field(180, ge=1)
+    seed: int = 42
+    drop: bool = False
+    batch_size: int = Field(5000, ge=1, le=100000)
+
+class BulkDeleteRequest(BaseModel):
+    """
+    Pydantic model for a cascading bulk delete or archive.
+    """
+    collection: Literal[tuple(DEPENDENTS)]
+    ids: List[str] = Field(..., min_length=1, max_length=10000)
+    mode: Literal[CASCADE_MODES] = "delete"
+
+class OrphanScanRequest(BaseModel):
+    """
+    Pydantic model for an orphan scan.
+    """
+    mode: Literal[CASCADE_MODES] = "delete"
+    dry_run: bool = False
+
+class SnapshotRequest(BaseModel):
+    """
+    Pydantic model for creating a named database snapshot.
+    """
+    name: str = Field(..., pattern=r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+    overwrite: bool = False
+
+class DedupRunRequest(BaseModel):
+    """
+    Pydantic model for a contact deduplication run.
+    """
+    full: bool = True
+    auto_merge: bool = False
+
+@router.get("/db/pool", response_model=dict)
+async def read_pool_metrics():
+    """
+    Return MongoDB connection pool usage and check-out wait statistics.
+    """
+    return pool_metrics.snapshot()
+
+@router.get("/db/coalescing", response_model=dict)
+async def read_coalescing_stats():
+    """
+    Return how many identical concurrent reads shared one query, per read.
+    """
+    return single_flight.stats()
+
+@router.get("/admission", response_model=dict)
+async def read_admission_stats():
+    """
+    Return requests in flight and queued, per bulk route, and admission outcomes by request class.
+    """
+    return admission.stats()
+
+@router.get("/ai/routes", response_model=dict)
+async def read_ai_routes():
+    """
+    Return each AI route's health, latency, error rate and rate-limit budget, in routing order.
+    """
+    return ai_router.stats()
+
+@router.get("/db/indexes", response_model=List[dict])
+async def read_indexes():
+    """
+    Show declared indexes per collection and which of them are missing on the server.
+    """
+    return await run_in_threadpool(index_report)
+
+@router.post("/db/indexes", response_model=List[dict])
+async def create_indexes():
+    """
+    Build every declared index that is missing on the server.
+    """
+    logger.info("Creating missing indexes")
+    try:
+        return await run_in_threadpool(index_report, True)
+    except Exception as e:
+        logger.error(f"Error creating indexes: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.get("/profiles", response_model=List[dict])
+async def read_profiles():
+    """
+    List the most recent request profiles, newest first.
+    """
+    return [profile.summary() for profile in profile_store.list()]
+
+def _get_profile(profile_id: str):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        logger.warning(f"Profile not found: {profile_id}")
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@router.get("/profiles/{profile_id}", response_model=dict)
+async def read_profile(profile_id: str):
+    """
+    Return a profile's timing summary and MongoDB call breakdown by query shape.
+    """
+    return _get_profile(profile_id).summary()
+
+@router.get("/profiles/{profile_id}/speedscope")
+async def download_profile_speedscope(profile_id: str):
+    """
+    Download a profile in speedscope format (open it at https://www.speedscope.app).
+    """
+    profile = _get_profile(profile_id)
+    return JSONResponse(
+        content=profile.to_speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'}
+    )
+
+@router.get("/profiles/{profile_id}/flamegraph")
+async def download_profile_flamegraph(profile_id: str):
+    """
+    Download a profile as collapsed stacks for flamegraph.pl or inferno.
+    """
+    profile = _get_profile(profile_id)
+    return PlainTextResponse(
+        content=profile.to_collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
+
+@router.get("/slow-queries", response_model=dict)
+async def read_slow_queries():
+    """
+    Report MongoDB operations slower than SLOW_QUERY_THRESHOLD_MS, aggregated by query shape,
+    with the explain() plan of each shape and whether it scans the whole collection.
+    """
+    return slow_query_log.report()
+
+@router.delete("/slow-queries", response_model=dict)
+async def clear_slow_queries():
+    """
+    Reset the slow query log.
+    """
+    slow_query_log.clear()
+    logger.info("Slow query log cleared")
+    return {"message": "Slow query log cleared"}
+
+@router.post("/generate-data", response_model=JobResponse, status_code=202)
+async def generate_data(request: DataGenerationRequest):
+    """
+    Queue generation of a synthetic, referentially consistent data set straight into MongoDB.
+
+    Poll /jobs/{job_id} for progress; the result holds the inserted counts.
+    """
+    config = GeneratorConfig(**request.model_dump(exclude={"drop", "batch_size"}))
+    logger.info(f"Queueing synthetic data generation: {config.expected_counts()}")
+    try:
+        job = job_queue.enqueue("generate_data", request.model_dump())
+        return JobResponse.from_mongo(job)
+    except Exception as e:
+        logger.error(f"Failed to queue synthetic data generation: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to generate data: {str(e)}")
+
+@router.post("/emails/backfill-snapshots", response_model=JobResponse, status_code=202)
+async def backfill_email_snapshots():
+    """
+    Queue a job that links email snapshots created without source ids to their
+    company and contact, so later edits of those records propagate to them.
+    """
+    logger.info("Queueing email snapshot backfill")
+    try:
+        job = job_queue.enqueue("backfill_email_snapshots")
+        return JobResponse.from_mongo(job)
+    except Exception as e:
+        logger.error(f"Failed to queue email snapshot backfill: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue backfill: {str(e)}")
+
+@router.post("/bulk-delete", response_model=dict)
+async def bulk_delete(request: BulkDeleteRequest):
+    """
+    Delete or archive documents together with everything that references them.
+
+    Returns the number of documents removed per collection.
+    """
+    logger.info(f"Bulk {request.mode} of {len(request.ids)} {request.collection}")
+    try:
+        removed = await run_in_threadpool(cascade_remove, request.collection, request.ids, request.mode)
+        return {"removed": removed}
+    except ValidationError as e:
+        logger.error(f"Validation error in bulk delete: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk delete failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Bulk delete failed: {str(e)}")
+
+@router.post("/orphans/scan", response_model=JobResponse, status_code=202)
+async def scan_orphans(request: OrphanScanRequest):
+    """
+    Queue a job that finds contacts, campaigns and emails whose parent no longer
+    exists and deletes or archives them (or only counts them, with dry_run).
+    """
+    logger.info(f"Queueing orphan scan: {request.model_dump()}")
+    try:
+        job = job_queue.enqueue("scan_orphans", request.model_dump())
+        return JobResponse.from_mongo(job)
+    except Exception as e:
+        logger.error(f"Failed to queue orphan scan: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue orphan scan: {str(e)}")
+
+@router.post("/dedup/run", response_model=JobResponse, status_code=202)
+async def run_dedup(request: DedupRunRequest):
+    """
+    Queue a job that finds duplicate contacts and proposes them for merging (full
+    refreshes every contact's blocking keys first; auto_merge merges the surest matches).
+    """
+    logger.info(f"Queueing contact dedup: {request.model_dump()}")
+    try:
+        job = job_queue.enqueue("dedup_contacts", request.model_dump())
+        return JobResponse.from_mongo(job)
+    except Exception as e:
+        logger.error(f"Failed to queue contact dedup: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue dedup: {str(e)}")
+
+@router.post("/contacts/backfill-companies", response_model=JobResponse, status_code=202)
+async def backfill_contact_companies():
+    """
+    Queue a job that sets Company.domain from each website and gives contacts whose
+    company is missing or deleted the company matching their email domain.
+    """
+    logger.info("Queueing contact company backfill")
+    try:
+        job = job_queue.enqueue("backfill_contact_companies")
+        return JobResponse.from_mongo(job)
+    except Exception as e:
+        logger.error(f"Failed to queue contact company backfill: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue backfill: {str(e)}")
+
+@router.get("/snapshots", response_model=List[dict])
+async def read_snapshots():
+    """
+    List the named database snapshots, newest first.
+    """
+    return await run_in_threadpool(db_snapshots.list_snapshots)
+
+@router.post("/snapshots", response_model=JobResponse, status_code=202)
+async def create_snapshot(request: SnapshotRequest):
+    """
+    Queue a job that dumps the application collections and their indexes to a named snapshot.
+    """
+    logger.info(f"Queueing snapshot: {request.model_dump()}")
+    if db_snapshots.snapshot_path(request.name).exists() and not request.overwrite:
+        raise HTTPException(status_code=409, detail=f"Snapshot '{request.name}' already exists")
+    try:
+        job = job_queue.enqueue("create_snapshot", request.model_dump())
+        return JobResponse.from_mongo(job)
+    except Exception as e:
+        logger.error(f"Failed to queue snapshot: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue snapshot: {str(e)}")
+
+@router.post("/snapshots/{name}/restore", response_model=JobResponse, status_code=202)
+async def restore_snapshot(name: str):
+    """
+    Queue a job that replaces the application collections with a snapshot's contents.
+    """
+    logger.info(f"Queueing restore of snapshot '{name}'")
+    return enqueue_restore(name)
+
+@router.delete("/snapshots/{name}", response_model=dict)
+async def delete_snapshot(name: str):
+    logger.info(f"Deleting snapshot '{name}'")
+    try:
+        await run_in_threadpool(db_snapshots.delete_snapshot, name)
+        return {"message": f"Snapshot '{name}' deleted"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except db_snapshots.SnapshotNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def enqueue_restore(name: str) -> JobResponse:
+    """
+    Queue a restore_snapshot job after checking the snapshot exists.
+    """
+    try:
+        db_snapshots.read_manifest(name)
+        return JobResponse.from_mongo(job_queue.enqueue("restore_snapshot", {"name": name}))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except db_snapshots.SnapshotNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to queue snapshot restore: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue restore: {str(e)}")
+
+@router.get("/emails/retention", response_model=dict)
+async def read_email_retention():
+    """
+    Return the email retention settings and the size of the hot and archive collections.
+    """
+    return await run_in_threadpool(retention_status)
+
+@router.post("/emails/archive", response_model=JobResponse, status_code=202)
+async def archive_emails(days: int | None = Query(None, ge=0, description="Defaults to EMAIL_RETENTION_DAYS")):
+    """
+    Queue a job that moves emails older than `days` into the monthly archive collections now.
+    """
+    logger.info(f"Queueing email archiving (days={days})")
+    try:
+        job = job_queue.enqueue("archive_emails", {"days": days})
+        return JobResponse.from_mongo(job)
+    except Exception as e:
+        logger.error(f"Failed to queue email archiving: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue archiving: {str(e)}")
+
+@router.get("/search/index", response_model=dict)
+async def read_search_index_stats():
+    """
+    Return the size and build state of the in-process search index.
+    """
+    return search_index.stats()
+
+@router.post("/search/rebuild", response_model=dict)
+async def rebuild_search_index():
+    """
+    Rebuild the search index from MongoDB, e.g. after bulk loads that bypass the API.
+    """
+    try:
+        return await run_in_threadpool(search_index.rebuild)
+    except Exception as e:
+        logger.error(f"Failed to rebuild search index: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild search index: {str(e)}")
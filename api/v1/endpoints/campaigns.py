@@ -1,20 +1,53 @@
 import logging
-from fastapi import APIRouter, HTTPException, Query
-from models.campaign import Campaign, CampaignCreate, CampaignResponse, CampaignUpdate
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from models.campaign import Campaign, CampaignCreate, CampaignGenerateRequest, CampaignResponse, CampaignUpdate
 from pydantic import TypeAdapter
-from typing import List
+from typing import List, Literal
 from mongoengine.errors import ValidationError, DoesNotExist
+from core.cascade import CASCADE_MODES, cascade_remove
+from core.changes import change_feed
+from core.delivery import queue_campaign_emails
+from core.jobs import job_queue
+from models.job import JobResponse
+from core.coalesce import single_flight
+from core.counts import count_cache, set_total_headers
+from core.query_guard import UnindexedQueryError, filtered
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _fetch_campaigns(filters: dict, sort: str | None, skip: int, limit: int) -> List[CampaignResponse]:
+    return [CampaignResponse.from_mongo(campaign) for campaign in filtered(Campaign, filters, sort).skip(skip).limit(limit)]
+
+def _fetch_campaign(campaign_id: str) -> CampaignResponse:
+    return CampaignResponse.from_mongo(Campaign.objects.get(campaign_id=campaign_id))
+
 @router.get("/", response_model=List[CampaignResponse])
-async def read_campaigns(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    logger.info(f"Fetching campaigns with skip={skip} and limit={limit}")
+async def read_campaigns(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    user: str | None = Query(None, description="User id"),
+    sort: Literal["created_at", "-created_at"] | None = None,
+    include_total: bool = Query(False, description="Report the total in X-Total-Count"),
+):
+    filters = {"user": user}
+    logger.info(f"Fetching campaigns with skip={skip}, limit={limit}, filters={filters} and sort={sort}")
     try:
-        campaigns = Campaign.objects.skip(skip).limit(limit)
+        campaigns = await single_flight.run("campaigns.list", (tuple(filters.items()), sort, skip, limit),
+                                            _fetch_campaigns, filters, sort, skip, limit)
+        if include_total:
+            set_total_headers(response, await single_flight.run("campaigns.count", tuple(filters.items()),
+                                                                count_cache.count, Campaign, filters))
         logger.info(f"Successfully fetched {len(campaigns)} campaigns")
-        return [CampaignResponse.from_mongo(campaign) for campaign in campaigns]
+        return campaigns
+    except UnindexedQueryError as e:
+        logger.warning(f"Rejected unindexed campaign query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        logger.error(f"Validation error while fetching campaigns: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching campaigns: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An error occurred while fetching campaigns")
@@ -25,6 +58,7 @@ async def create_campaign(campaign: CampaignCreate):
     try:
         new_campaign = Campaign(**campaign.model_dump())
         new_campaign.save()
+        change_feed.publish("campaigns", new_campaign.campaign_id, "insert")
         logger.info(f"Successfully created campaign: {new_campaign.campaign_id}")
         return CampaignResponse.from_mongo(new_campaign)
     except ValidationError as e:
@@ -38,9 +72,9 @@ async def create_campaign(campaign: CampaignCreate):
 async def read_campaign(campaign_id: str):
     logger.info(f"Fetching campaign with id: {campaign_id}")
     try:
-        campaign = Campaign.objects.get(campaign_id=campaign_id)
+        campaign = await single_flight.run("campaigns.get", campaign_id, _fetch_campaign, campaign_id)
         logger.info(f"Successfully fetched campaign: {campaign_id}")
-        return CampaignResponse.from_mongo(campaign)
+        return campaign
     except DoesNotExist:
         logger.warning(f"Campaign not found: {campaign_id}")
         raise HTTPException(status_code=404, detail="Campaign not found")
@@ -48,6 +82,44 @@ async def read_campaign(campaign_id: str):
         logger.error(f"Error fetching campaign {campaign_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@router.post("/{campaign_id}/send", response_model=JobResponse, status_code=202)
+async def send_campaign(campaign_id: str, retry_failed: bool = Query(False, description="Also resend emails that failed")):
+    """
+    Queue the campaign's unsent emails and start a delivery job; poll /jobs/{job_id} for progress.
+    """
+    logger.info(f"Sending campaign: {campaign_id}")
+    try:
+        Campaign.objects.get(campaign_id=campaign_id)
+        queued = queue_campaign_emails(campaign_id, retry_failed)
+        job = job_queue.enqueue("deliver_campaign", {"campaign_id": campaign_id, "queued": queued})
+        logger.info(f"Queued {queued} emails of campaign {campaign_id} for delivery in job {job.job_id}")
+        return JobResponse.from_mongo(job)
+    except DoesNotExist:
+        logger.warning(f"Campaign not found for send: {campaign_id}")
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    except Exception as e:
+        logger.error(f"Error sending campaign {campaign_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.post("/{campaign_id}/generate", response_model=JobResponse, status_code=202)
+async def generate_campaign(campaign_id: str, request: CampaignGenerateRequest):
+    """
+    Start a job generating an email for every contact that has none for the campaign,
+    several contacts per model call; poll /jobs/{job_id} for progress.
+    """
+    logger.info(f"Generating emails for campaign: {campaign_id}")
+    try:
+        Campaign.objects.get(campaign_id=campaign_id)
+        job = job_queue.enqueue("generate_campaign_emails", {"campaign_id": campaign_id, **request.model_dump()})
+        logger.info(f"Queued email generation for campaign {campaign_id} in job {job.job_id}")
+        return JobResponse.from_mongo(job)
+    except DoesNotExist:
+        logger.warning(f"Campaign not found for generation: {campaign_id}")
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    except Exception as e:
+        logger.error(f"Error generating emails for campaign {campaign_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
 @router.put("/{campaign_id}", response_model=CampaignResponse)
 async def update_campaign(campaign_id: str, campaign_update: CampaignUpdate):
     logger.info(f"Updating campaign: {campaign_id}")
@@ -56,6 +128,7 @@ async def update_campaign(campaign_id: str, campaign_update: CampaignUpdate):
         for key, value in campaign_update.model_dump(exclude_unset=True).items():
             setattr(campaign, key, value)
         campaign.save()
+        change_feed.publish("campaigns", campaign_id, "update")
         logger.info(f"Successfully updated campaign: {campaign_id}")
         return CampaignResponse.from_mongo(campaign)
     except DoesNotExist:
@@ -69,13 +142,13 @@ async def update_campaign(campaign_id: str, campaign_update: CampaignUpdate):
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @router.delete("/{campaign_id}", response_model=dict)
-async def delete_campaign(campaign_id: str):
-    logger.info(f"Deleting campaign: {campaign_id}")
+async def delete_campaign(campaign_id: str, mode: Literal[CASCADE_MODES] = Query("delete", description="Delete or archive the campaign with its emails")):
+    logger.info(f"Deleting campaign: {campaign_id} (mode={mode})")
     try:
-        campaign = Campaign.objects.get(campaign_id=campaign_id)
-        campaign.delete()
+        Campaign.objects.get(campaign_id=campaign_id)
+        removed = await run_in_threadpool(cascade_remove, "campaigns", [campaign_id], mode)
         logger.info(f"Successfully deleted campaign: {campaign_id}")
-        return {"message": "Campaign deleted successfully"}
+        return {"message": "Campaign deleted successfully", "removed": removed}
     except DoesNotExist:
         logger.warning(f"Campaign not found for deletion: {campaign_id}")
         raise HTTPException(status_code=404, detail="Campaign not found")
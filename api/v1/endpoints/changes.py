@@ -0,0 +1,47 @@
+import logging
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from core.changes import RESOURCES, change_feed, stream_changes
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _resources(resources: str | None) -> set[str]:
+    if not resources:
+        return set(RESOURCES)
+    requested = {resource.strip() for resource in resources.split(",") if resource.strip()}
+    unknown = requested - set(RESOURCES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown resources: {', '.join(sorted(unknown))}")
+    return requested
+
+@router.get("/", response_model=dict)
+async def read_changes(
+    since: int = Query(..., ge=0, description="Version of the last change seen"),
+    resources: str | None = Query(None, description=f"Comma separated: {', '.join(RESOURCES)}; all by default"),
+):
+    """
+    Return the changes after a version, for clients that poll instead of streaming.
+    A reset event means the history no longer reaches back that far: refetch the resource.
+    """
+    changes = change_feed.since(since, _resources(resources))
+    return {"version": change_feed.stats()["version"], "changes": [change.to_dict() for change in changes]}
+
+@router.get("/stream")
+async def stream_change_events(
+    resources: str | None = Query(None, description=f"Comma separated: {', '.join(RESOURCES)}; all by default"),
+    last_event_id: int | None = Header(None, ge=0, description="Sent by EventSource when it reconnects"),
+):
+    """
+    Stream change events ({resource, id, op, version}) as server-sent events.
+    Each event id is its version; reconnecting with Last-Event-ID replays what was missed.
+    """
+    requested = _resources(resources)
+    try:
+        subscription = change_feed.subscribe(requested)
+    except OverflowError as e:
+        logger.warning(f"Refused change stream subscription: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    logger.info(f"Streaming changes to {sorted(requested)} from version {last_event_id}")
+    return StreamingResponse(stream_changes(subscription, last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
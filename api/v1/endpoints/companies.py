@@ -1,19 +1,55 @@
 import logging
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from models.company import Company, CompanyCreate, CompanyResponse, CompanyUpdate
-from typing import List
+from typing import List, Literal
 from mongoengine.errors import ValidationError, DoesNotExist
+from core.cascade import CASCADE_MODES, cascade_remove
+from core.changes import change_feed
+from core.search import search_index
+from core.domains import domain_index
+from core.snapshots import resync_company
+from models.email import CompanySnapshot
+from core.coalesce import single_flight
+from core.counts import count_cache, set_total_headers
+from core.query_guard import UnindexedQueryError, filtered
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _fetch_companies(filters: dict, sort: str | None, skip: int, limit: int) -> List[CompanyResponse]:
+    return [CompanyResponse.from_mongo(company) for company in filtered(Company, filters, sort).skip(skip).limit(limit)]
+
+def _fetch_company(company_id: str) -> CompanyResponse:
+    return CompanyResponse.from_mongo(Company.objects.get(id=company_id))
+
 @router.get("/", response_model=List[CompanyResponse])
-async def read_companies(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    logger.info(f"Fetching companies with skip={skip} and limit={limit}")
+async def read_companies(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    industry: str | None = None,
+    sub_industry: str | None = None,
+    user: str | None = Query(None, description="User id"),
+    sort: Literal["name", "-name"] | None = None,
+    include_total: bool = Query(False, description="Report the total in X-Total-Count"),
+):
+    filters = {"primary_industry": industry, "primary_sub_industry": sub_industry, "user": user}
+    logger.info(f"Fetching companies with skip={skip}, limit={limit}, filters={filters} and sort={sort}")
     try:
-        companies = Company.objects.skip(skip).limit(limit)
+        companies = await single_flight.run("companies.list", (tuple(filters.items()), sort, skip, limit),
+                                            _fetch_companies, filters, sort, skip, limit)
+        if include_total:
+            set_total_headers(response, await single_flight.run("companies.count", tuple(filters.items()),
+                                                                count_cache.count, Company, filters))
         logger.info(f"Successfully fetched {len(companies)} companies")
-        return [CompanyResponse.from_mongo(company) for company in companies]
+        return companies
+    except UnindexedQueryError as e:
+        logger.warning(f"Rejected unindexed company query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        logger.error(f"Validation error while fetching companies: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching companies: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An error occurred while fetching companies")
@@ -24,6 +60,9 @@ async def create_company(company: CompanyCreate):
     try:
         new_company = Company(**company.model_dump())
         new_company.save()
+        search_index.index_company(new_company)
+        domain_index.index_company(new_company)
+        change_feed.publish("companies", new_company.id, "insert")
         logger.info(f"Successfully created company: {new_company.id}")
         return CompanyResponse.from_mongo(new_company)
     except ValidationError as e:
@@ -37,9 +76,9 @@ async def create_company(company: CompanyCreate):
 async def read_company(company_id: str):
     logger.info(f"Fetching company with id: {company_id}")
     try:
-        company = Company.objects.get(id=company_id)
+        company = await single_flight.run("companies.get", company_id, _fetch_company, company_id)
         logger.info(f"Successfully fetched company: {company_id}")
-        return CompanyResponse.from_mongo(company)
+        return company
     except DoesNotExist:
         logger.warning(f"Company not found: {company_id}")
         raise HTTPException(status_code=404, detail="Company not found")
@@ -52,9 +91,15 @@ async def update_company(company_id: str, company_update: CompanyUpdate):
     logger.info(f"Updating company: {company_id}")
     try:
         company = Company.objects.get(id=company_id)
+        snapshot = CompanySnapshot.of(company)
         for key, value in company_update.model_dump(exclude_unset=True).items():
             setattr(company, key, value)
         company.save()
+        search_index.index_company(company)
+        domain_index.index_company(company)
+        change_feed.publish("companies", company_id, "update")
+        if CompanySnapshot.of(company) != snapshot:
+            await run_in_threadpool(resync_company, company)
         logger.info(f"Successfully updated company: {company_id}")
         return CompanyResponse.from_mongo(company)
     except DoesNotExist:
@@ -68,13 +113,13 @@ async def update_company(company_id: str, company_update: CompanyUpdate):
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @router.delete("/{company_id}", response_model=dict)
-async def delete_company(company_id: str):
-    logger.info(f"Deleting company: {company_id}")
+async def delete_company(company_id: str, mode: Literal[CASCADE_MODES] = Query("delete", description="Delete or archive the company with its contacts and emails")):
+    logger.info(f"Deleting company: {company_id} (mode={mode})")
     try:
-        company = Company.objects.get(id=company_id)
-        company.delete()
+        Company.objects.get(id=company_id)
+        removed = await run_in_threadpool(cascade_remove, "companies", [company_id], mode)
         logger.info(f"Successfully deleted company: {company_id}")
-        return {"message": "Company deleted successfully"}
+        return {"message": "Company deleted successfully", "removed": removed}
     except DoesNotExist:
         logger.warning(f"Company not found for deletion: {company_id}")
         raise HTTPException(status_code=404, detail="Company not found")
@@ -1,19 +1,71 @@
 import logging
-from fastapi import APIRouter, HTTPException, Query
-from models.contact import Contact, ContactCreate, ContactResponse, ContactUpdate
-from typing import List
-from mongoengine.errors import ValidationError, DoesNotExist
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from models.contact import Contact, ContactBatch, ContactCreate, ContactResponse, ContactUpdate
+from typing import List, Literal
+from mongoengine.errors import ValidationError, DoesNotExist, NotUniqueError
+from core.domains import CompanyNotFound, assign_companies
+from core.cascade import CASCADE_MODES, cascade_remove
+from core.changes import change_feed
+from core.dedup import merge_groups
+from models.dedup import DUPLICATE_STATUSES, DuplicateGroup, DuplicateGroupResponse, MergeRequest
+from core.search import search_index
+from core.snapshots import resync_contact
+from models.email import ContactSnapshot
+from core.coalesce import single_flight
+from core.counts import count_cache, set_total_headers
+from core.query_guard import UnindexedQueryError, filtered
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _fetch_contacts(filters: dict, sort: str | None, skip: int, limit: int) -> List[ContactResponse]:
+    return [ContactResponse.from_mongo(contact) for contact in filtered(Contact, filters, sort).skip(skip).limit(limit)]
+
+def _fetch_contact(contact_id: str) -> ContactResponse:
+    return ContactResponse.from_mongo(Contact.objects.get(id=contact_id))
+
+def _merge_duplicate_groups(group_ids: List[str] | None, min_score: float | None, limit: int) -> dict:
+    if group_ids is not None:
+        # Served by the _id index; merge_groups skips groups that are no longer proposed.
+        groups = [group for group in filtered(DuplicateGroup, {"id__in": group_ids})
+                  if min_score is None or group.score >= min_score]
+    else:
+        groups = list(filtered(DuplicateGroup, {"status": "proposed", "score__gte": min_score}, "-score").limit(limit))
+    return merge_groups(groups)
+
+def _fetch_duplicate_groups(status: str, min_score: float | None, skip: int, limit: int) -> List[DuplicateGroupResponse]:
+    groups = filtered(DuplicateGroup, {"status": status, "score__gte": min_score}, "-score").skip(skip).limit(limit)
+    return [DuplicateGroupResponse.from_mongo(group) for group in groups]
+
 @router.get("/", response_model=List[ContactResponse])
-async def read_contacts(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    logger.info(f"Fetching contacts with skip={skip} and limit={limit}")
+async def read_contacts(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    company: str | None = Query(None, description="Company id"),
+    user: str | None = Query(None, description="User id"),
+    title: str | None = None,
+    sort: Literal["last_name", "-last_name"] | None = None,
+    include_total: bool = Query(False, description="Report the total in X-Total-Count"),
+):
+    filters = {"company": company, "user": user, "title": title}
+    logger.info(f"Fetching contacts with skip={skip}, limit={limit}, filters={filters} and sort={sort}")
     try:
-        contacts = Contact.objects.skip(skip).limit(limit)
+        contacts = await single_flight.run("contacts.list", (tuple(filters.items()), sort, skip, limit),
+                                           _fetch_contacts, filters, sort, skip, limit)
+        if include_total:
+            set_total_headers(response, await single_flight.run("contacts.count", tuple(filters.items()),
+                                                                count_cache.count, Contact, filters))
         logger.info(f"Successfully fetched {len(contacts)} contacts")
-        return [ContactResponse.from_mongo(contact) for contact in contacts]
+        return contacts
+    except UnindexedQueryError as e:
+        logger.warning(f"Rejected unindexed contact query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        logger.error(f"Validation error while fetching contacts: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching contacts: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An error occurred while fetching contacts")
@@ -22,10 +74,16 @@ async def read_contacts(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1,
 async def create_contact(contact: ContactCreate):
     logger.info(f"Creating new contact: {contact.email}")
     try:
-        new_contact = Contact(**contact.model_dump())
+        fields = (await run_in_threadpool(assign_companies, [contact.model_dump()]))[0]
+        new_contact = Contact(**fields)
         new_contact.save()
+        search_index.index_contact(new_contact)
+        change_feed.publish("contacts", new_contact.id, "insert")
         logger.info(f"Successfully created contact: {new_contact.id}")
         return ContactResponse.from_mongo(new_contact)
+    except CompanyNotFound as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=400, detail=str(e))
     except ValidationError as e:
         logger.error(f"Validation error while creating contact: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -33,13 +91,115 @@ async def create_contact(contact: ContactCreate):
         logger.error(f"Error creating contact: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An error occurred while creating the contact")
 
+def _insert_contacts(rows: List[dict]) -> List[ContactResponse]:
+    assign_companies(rows)
+    zoom_ids = [row["zoom_id"] for row in rows]
+    taken = set(zoom_ids) & set(Contact.objects(zoom_id__in=zoom_ids).distinct("zoom_id"))
+    if taken or len(set(zoom_ids)) < len(zoom_ids):
+        raise NotUniqueError(f"Duplicate zoom_id in batch or database: {sorted(taken) or 'within the batch'}")
+    contacts = [Contact(**row) for row in rows]
+    for contact in contacts:
+        contact.validate()
+    ids = Contact.objects.insert(contacts, load_bulk=False)
+    for contact, contact_id in zip(contacts, ids):
+        contact.id = contact_id
+        search_index.index_contact(contact)
+    change_feed.publish_many("contacts", ids, "insert")
+    return [ContactResponse(id=str(contact_id), **row) for row, contact_id in zip(rows, ids)]
+
+@router.post("/batch", response_model=List[ContactResponse])
+async def create_contacts(batch: ContactBatch):
+    """
+    Create up to 1000 contacts in one insert, all or none. Contacts without a
+    company get the company of their email domain.
+    """
+    logger.info(f"Creating {len(batch.contacts)} contacts")
+    try:
+        contacts = await run_in_threadpool(_insert_contacts, [contact.model_dump() for contact in batch.contacts])
+        logger.info(f"Successfully created {len(contacts)} contacts")
+        return contacts
+    except CompanyNotFound as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotUniqueError as e:
+        logger.warning(f"Rejected contact batch: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValidationError as e:
+        logger.error(f"Validation error while creating contacts: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating contacts: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while creating the contacts")
+
+@router.get("/duplicates", response_model=List[DuplicateGroupResponse])
+async def read_duplicate_groups(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    status: Literal[DUPLICATE_STATUSES] = "proposed",
+    min_score: float | None = Query(None, ge=0, le=1),
+):
+    logger.info(f"Fetching {status} duplicate groups with skip={skip}, limit={limit} and min_score={min_score}")
+    try:
+        return await run_in_threadpool(_fetch_duplicate_groups, status, min_score, skip, limit)
+    except UnindexedQueryError as e:
+        logger.warning(f"Rejected unindexed duplicate group query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching duplicate groups: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while fetching duplicate groups")
+
+@router.post("/duplicates/merge", response_model=dict)
+async def merge_duplicate_groups(request: MergeRequest):
+    """
+    Merge proposed duplicate groups, chosen by id or by minimum score (up to `limit`
+    per request, highest score first).
+    """
+    if request.group_ids is None and request.min_score is None:
+        raise HTTPException(status_code=400, detail="Provide group_ids or min_score")
+    logger.info(f"Merging duplicate groups: {request.model_dump()}")
+    try:
+        merged = await run_in_threadpool(_merge_duplicate_groups, request.group_ids, request.min_score, request.limit)
+        logger.info(f"Successfully merged {merged['groups']} duplicate groups")
+        return merged
+    except UnindexedQueryError as e:
+        logger.warning(f"Rejected unindexed duplicate group query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        logger.error(f"Validation error while merging duplicate groups: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error merging duplicate groups: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.post("/duplicates/{group_id}/reject", response_model=DuplicateGroupResponse)
+async def reject_duplicate_group(group_id: str):
+    """
+    Mark a proposed group as not duplicates; the same members are never proposed again.
+    """
+    logger.info(f"Rejecting duplicate group: {group_id}")
+    try:
+        group = DuplicateGroup.objects.get(id=group_id, status="proposed")
+        group.status = "rejected"
+        group.resolved_at = datetime.now(timezone.utc)
+        group.save()
+        return DuplicateGroupResponse.from_mongo(group)
+    except DoesNotExist:
+        logger.warning(f"Proposed duplicate group not found: {group_id}")
+        raise HTTPException(status_code=404, detail="Duplicate group not found")
+    except ValidationError as e:
+        logger.error(f"Validation error while rejecting duplicate group {group_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error rejecting duplicate group {group_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def read_contact(contact_id: str):
     logger.info(f"Fetching contact with id: {contact_id}")
     try:
-        contact = Contact.objects.get(id=contact_id)
+        contact = await single_flight.run("contacts.get", contact_id, _fetch_contact, contact_id)
         logger.info(f"Successfully fetched contact: {contact_id}")
-        return ContactResponse.from_mongo(contact)
+        return contact
     except DoesNotExist:
         logger.warning(f"Contact not found: {contact_id}")
         raise HTTPException(status_code=404, detail="Contact not found")
@@ -52,9 +212,14 @@ async def update_contact(contact_id: str, contact_update: ContactUpdate):
     logger.info(f"Updating contact: {contact_id}")
     try:
         contact = Contact.objects.get(id=contact_id)
+        snapshot = ContactSnapshot.of(contact)
         for key, value in contact_update.model_dump(exclude_unset=True).items():
             setattr(contact, key, value)
         contact.save()
+        search_index.index_contact(contact)
+        change_feed.publish("contacts", contact_id, "update")
+        if ContactSnapshot.of(contact) != snapshot:
+            await run_in_threadpool(resync_contact, contact)
         logger.info(f"Successfully updated contact: {contact_id}")
         return ContactResponse.from_mongo(contact)
     except DoesNotExist:
@@ -68,13 +233,13 @@ async def update_contact(contact_id: str, contact_update: ContactUpdate):
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @router.delete("/{contact_id}", response_model=dict)
-async def delete_contact(contact_id: str):
-    logger.info(f"Deleting contact: {contact_id}")
+async def delete_contact(contact_id: str, mode: Literal[CASCADE_MODES] = Query("delete", description="Delete or archive the contact with its emails")):
+    logger.info(f"Deleting contact: {contact_id} (mode={mode})")
     try:
-        contact = Contact.objects.get(id=contact_id)
-        contact.delete()
+        Contact.objects.get(id=contact_id)
+        removed = await run_in_threadpool(cascade_remove, "contacts", [contact_id], mode)
         logger.info(f"Successfully deleted contact: {contact_id}")
-        return {"message": "Contact deleted successfully"}
+        return {"message": "Contact deleted successfully", "removed": removed}
     except DoesNotExist:
         logger.warning(f"Contact not found for deletion: {contact_id}")
         raise HTTPException(status_code=404, detail="Contact not found")
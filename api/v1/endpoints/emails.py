@@ -1,31 +1,124 @@
 import logging
-from fastapi import APIRouter, HTTPException, Query
-from models.email import Email, EmailCreate, EmailResponse, EmailUpdate
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from models.email import Email, EmailCreate, EmailGenerateRequest, EmailResponse, EmailUpdate, DELIVERY_STATUSES
+from models.campaign import Campaign
+from models.contact import Contact
+from typing import List, Literal
+from datetime import datetime
+from bson.errors import InvalidId
 from mongoengine.errors import ValidationError, DoesNotExist
+from core.metrics import record_ai_generation
+from core.changes import change_feed
+from core.coalesce import single_flight
+from core.counts import count_cache, set_total_headers
+from core.query_guard import UnindexedQueryError, filtered
+from core.snapshots import fill_from_sources
+from core.retention import find_archived, find_archived_email
+from core.ai import AIUnavailable
+from core.generation import GenerationError, generate_email
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _fetch_emails(filters: dict, sort: str | None, skip: int, limit: int) -> List[EmailResponse]:
+    return [EmailResponse.from_mongo(email) for email in filtered(Email, filters, sort).skip(skip).limit(limit)]
+
+def _fetch_email(email_id: str) -> EmailResponse:
+    return EmailResponse.from_mongo(Email.objects.get(id=email_id))
+
 @router.get("/", response_model=List[EmailResponse])
-async def read_emails(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    logger.info(f"Fetching emails with skip={skip} and limit={limit}")
+async def read_emails(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    campaign_id: str | None = None,
+    ai_model: str | None = None,
+    contact_email: str | None = None,
+    delivery_status: Literal[DELIVERY_STATUSES] | None = None,
+    created_after: datetime | None = Query(None, description="Inclusive lower bound on created_at"),
+    created_before: datetime | None = Query(None, description="Exclusive upper bound on created_at"),
+    sort: Literal["created_at", "-created_at"] | None = None,
+    include_total: bool = Query(False, description="Report the total in X-Total-Count"),
+):
+    filters = {
+        "campaign_id": campaign_id,
+        "ai_model": ai_model,
+        "contact__email": contact_email,
+        "delivery_status": delivery_status,
+        "created_at__gte": created_after,
+        "created_at__lt": created_before,
+    }
+    logger.info(f"Fetching emails with skip={skip}, limit={limit}, filters={filters} and sort={sort}")
     try:
-        emails = Email.objects.skip(skip).limit(limit)
+        emails = await single_flight.run("emails.list", (tuple(filters.items()), sort, skip, limit),
+                                         _fetch_emails, filters, sort, skip, limit)
+        if include_total:
+            set_total_headers(response, await single_flight.run("emails.count", tuple(filters.items()),
+                                                                count_cache.count, Email, filters))
         logger.info(f"Successfully fetched {len(emails)} emails")
-        return [EmailResponse.from_mongo(email) for email in emails]
+        return emails
+    except UnindexedQueryError as e:
+        logger.warning(f"Rejected unindexed email query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        logger.error(f"Validation error while fetching emails: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching emails: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An error occurred while fetching emails")
 
+@router.get("/archived", response_model=List[EmailResponse])
+async def read_archived_emails(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    campaign_id: str | None = None,
+    ai_model: str | None = None,
+    contact_email: str | None = None,
+    created_after: datetime | None = Query(None, description="Inclusive lower bound on created_at"),
+    created_before: datetime | None = Query(None, description="Exclusive upper bound on created_at"),
+    sort: Literal["created_at", "-created_at"] = "-created_at",
+):
+    """
+    Read emails moved out of the hot collection by archive retention. Pass a
+    created_at range to limit the monthly archives that are queried.
+    """
+    filters = {"campaign_id": campaign_id, "ai_model": ai_model, "contact.email": contact_email}
+    logger.info(f"Fetching archived emails with skip={skip}, limit={limit}, filters={filters}, "
+                f"created_after={created_after}, created_before={created_before} and sort={sort}")
+    try:
+        documents = find_archived(filters, created_after, created_before, skip, limit, sort == "-created_at")
+        logger.info(f"Successfully fetched {len(documents)} archived emails")
+        return [EmailResponse.from_mongo(Email._from_son(document)) for document in documents]
+    except Exception as e:
+        logger.error(f"Error fetching archived emails: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while fetching archived emails")
+
+@router.get("/archived/{email_id}", response_model=EmailResponse)
+async def read_archived_email(email_id: str):
+    logger.info(f"Fetching archived email with id: {email_id}")
+    try:
+        document = find_archived_email(email_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid email id")
+    if document is None:
+        logger.warning(f"Archived email not found: {email_id}")
+        raise HTTPException(status_code=404, detail="Email not found")
+    return EmailResponse.from_mongo(Email._from_son(document))
+
 @router.post("/", response_model=EmailResponse)
 async def create_email(email: EmailCreate):
     logger.info(f"Creating new email: {email.subject}")
     try:
-        new_email = Email(**email.model_dump())
+        new_email = fill_from_sources(Email(**email.model_dump()))
         new_email.save()
+        change_feed.publish("emails", new_email.id, "insert")
+        record_ai_generation(new_email.ai_model, new_email.tokens_sent, new_email.tokens_returned, new_email.generation_time)
         logger.info(f"Successfully created email: {new_email.id}")
         return EmailResponse.from_mongo(new_email)
+    except DoesNotExist:
+        logger.warning(f"Company or contact not found for new email: {email.subject}")
+        raise HTTPException(status_code=400, detail="The email's company or contact does not exist")
     except ValidationError as e:
         logger.error(f"Validation error while creating email: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -33,13 +126,45 @@ async def create_email(email: EmailCreate):
         logger.error(f"Error creating email: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An error occurred while creating the email")
 
+def _generation_sources(request: EmailGenerateRequest):
+    contact = Contact.objects.get(id=request.contact_id)
+    return Campaign.objects.get(campaign_id=request.campaign_id), contact.company, contact
+
+@router.post("/generate", response_model=EmailResponse)
+async def generate_campaign_email(request: EmailGenerateRequest):
+    """
+    Generate and store a campaign email for a contact with the fastest healthy AI
+    route; ai_model on the result is the route that answered.
+    """
+    logger.info(f"Generating email for contact {request.contact_id} in campaign {request.campaign_id}")
+    try:
+        campaign, company, contact = await run_in_threadpool(_generation_sources, request)
+        email = await generate_email(campaign, company, contact, request.ai_model)
+        await run_in_threadpool(email.save)
+        change_feed.publish("emails", email.id, "insert")
+        record_ai_generation(email.ai_model, email.tokens_sent, email.tokens_returned, email.generation_time)
+        logger.info(f"Successfully generated email {email.id} with {email.ai_model}")
+        return EmailResponse.from_mongo(email)
+    except DoesNotExist:
+        logger.warning(f"Campaign or contact not found for generation: {request.model_dump()}")
+        raise HTTPException(status_code=404, detail="Campaign or contact not found")
+    except ValidationError as e:
+        logger.error(f"Validation error while generating email: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except (AIUnavailable, GenerationError) as e:
+        logger.error(f"Email generation failed: {str(e)}")
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating email: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while generating the email")
+
 @router.get("/{email_id}", response_model=EmailResponse)
 async def read_email(email_id: str):
     logger.info(f"Fetching email with id: {email_id}")
     try:
-        email = Email.objects.get(id=email_id)
+        email = await single_flight.run("emails.get", email_id, _fetch_email, email_id)
         logger.info(f"Successfully fetched email: {email_id}")
-        return EmailResponse.from_mongo(email)
+        return email
     except DoesNotExist:
         logger.warning(f"Email not found: {email_id}")
         raise HTTPException(status_code=404, detail="Email not found")
@@ -55,6 +180,7 @@ async def update_email(email_id: str, email_update: EmailUpdate):
         for key, value in email_update.model_dump(exclude_unset=True).items():
             setattr(email, key, value)
         email.save()
+        change_feed.publish("emails", email_id, "update")
         logger.info(f"Successfully updated email: {email_id}")
         return EmailResponse.from_mongo(email)
     except DoesNotExist:
@@ -73,6 +199,7 @@ async def delete_email(email_id: str):
     try:
         email = Email.objects.get(id=email_id)
         email.delete()
+        change_feed.publish("emails", email_id, "delete")
         logger.info(f"Successfully deleted email: {email_id}")
         return {"message": "Email deleted successfully"}
     except DoesNotExist:
@@ -0,0 +1,63 @@
+import logging
+from fastapi import APIRouter, HTTPException, Query
+from models.job import Job, JobResponse, JOB_STATUSES
+from typing import List, Literal
+from core.jobs import job_queue
+from core.query_guard import UnindexedQueryError, filtered
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/", response_model=List[JobResponse])
+async def read_jobs(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    status: Literal[JOB_STATUSES] | None = None,
+    kind: str | None = None,
+):
+    filters = {"status": status, "kind": kind}
+    logger.info(f"Fetching jobs with skip={skip}, limit={limit} and filters={filters}")
+    try:
+        sort = "created_at" if status else "-created_at"
+        jobs = filtered(Job, filters, sort).skip(skip).limit(limit)
+        return [JobResponse.from_mongo(job) for job in jobs]
+    except UnindexedQueryError as e:
+        logger.warning(f"Rejected unindexed job query: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching jobs: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An error occurred while fetching jobs")
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def read_job(job_id: str):
+    job = Job.objects(job_id=job_id).first()
+    if job is None:
+        logger.warning(f"Job not found: {job_id}")
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse.from_mongo(job)
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued job, or ask a running job to stop at its next progress update.
+    """
+    logger.info(f"Cancelling job: {job_id}")
+    job = job_queue.cancel(job_id)
+    if job is None:
+        logger.warning(f"Job not found for cancel: {job_id}")
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse.from_mongo(job)
+
+@router.post("/{job_id}/resume", response_model=JobResponse)
+async def resume_job(job_id: str):
+    """
+    Requeue a failed or cancelled job; it continues from its last checkpoint.
+    """
+    logger.info(f"Resuming job: {job_id}")
+    job = job_queue.resume(job_id)
+    if job is None:
+        logger.warning(f"Job not found for resume: {job_id}")
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "queued":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; only failed or cancelled jobs can be resumed")
+    return JobResponse.from_mongo(job)
@@ -0,0 +1,24 @@
+import logging
+from fastapi import APIRouter, HTTPException, Query
+from models.search import SearchResult
+from typing import List
+from core.search import COMPANY, CONTACT, search_index
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/", response_model=List[SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text; every word is matched as a prefix"),
+    types: str | None = Query(None, description="Comma separated: contact, company"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    kinds = None
+    if types:
+        kinds = {kind.strip() for kind in types.split(",") if kind.strip()}
+        unknown = kinds - {CONTACT, COMPANY}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+    results = search_index.search(q, kinds=kinds, limit=limit)
+    logger.info(f"Search '{q}' returned {len(results)} results")
+    return results
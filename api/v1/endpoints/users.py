@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from models.user import User
-from typing import List
+from typing import List, Literal
+from core.cascade import CASCADE_MODES, cascade_remove
+from core.changes import change_feed
 from bson import ObjectId
 from pydantic import BaseModel, EmailStr
 
@@ -41,6 +44,7 @@ async def create_user(user: UserCreate):
     )
     new_user.set_password(user.password)
     new_user.save()
+    change_feed.publish("users", new_user.user_id, "insert")
     return UserResponse.from_mongo(new_user)
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -66,12 +70,13 @@ async def update_user(user_id: str, user: UserUpdate):
         setattr(db_user, key, value)
     
     db_user.save()
+    change_feed.publish("users", user_id, "update")
     return UserResponse.from_mongo(db_user)
 
 @router.delete("/{user_id}", response_model=dict)
-async def delete_user(user_id: str):
+async def delete_user(user_id: str, mode: Literal[CASCADE_MODES] = Query("delete", description="Delete or archive the user with everything they own")):
     user = User.objects(user_id=user_id).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    user.delete()
-    return {"message": "User deleted successfully"}
+    removed = await run_in_threadpool(cascade_remove, "users", [user_id], mode)
+    return {"message": "User deleted successfully", "removed": removed}
@@ -0,0 +1,93 @@
+"""
+Compare batched and one-contact-per-call email generation (tokens per email, emails per minute).
+
+    python -m benchmarks.generation --emails 200 --batch-sizes 1,5,10
+    python -m benchmarks.generation --emails 500 --latency-ms 800 --token-latency-ms 10 --concurrency 8
+
+Calls go to a StubProvider that charges --latency-ms per call plus
+--token-latency-ms per returned token, roughly how hosted models behave; no
+database or API keys are needed.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from bson import ObjectId
+from core.ai import AIRouter, StubProvider
+from core.generation import generate_batch
+from models.campaign import Campaign
+from models.company import Company
+from models.contact import Contact
+from models.email import Email
+
+
+def _recipients(emails: int, companies: int) -> list[tuple[Company, Contact]]:
+    owners = [Company(id=ObjectId(), name=f"Company {n}", zoom_id=f"company-{n}", website=f"https://company{n}.example")
+              for n in range(companies)]
+    return [
+        (owners[n % companies], Contact(id=ObjectId(), first_name="Contact", last_name=str(n), title="Head of Sales",
+                                        email=f"contact{n}@company{n % companies}.example", zoom_id=f"contact-{n}"))
+        for n in range(emails)
+    ]
+
+
+async def run_benchmark(emails: int = 200, batch_size: int = 5, concurrency: int = 4, latency_ms: float = 300.0,
+                        token_latency_ms: float = 2.0, companies: int = 20) -> dict:
+    """
+    Generate `emails` emails through a stub route, batch_size contacts per call.
+
+    Returns:
+        dict: Settings, model calls, tokens per email and emails per minute.
+    """
+    provider = StubProvider("bench", latency=latency_ms / 1000, token_latency=token_latency_ms / 1000)
+    router = AIRouter(["bench/model"], {"bench": provider})
+    campaign = Campaign(campaign_id="bench", campaign_name="Benchmark",
+                        campaign_context="We help sales teams book more meetings with less manual work. " * 8,
+                        campaign_template_title="Booking more meetings",
+                        campaign_template_body="Hi {first_name},\n\nI noticed {company} is growing its sales team. " * 6)
+    recipients = _recipients(emails, companies)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(batch):
+        async with semaphore:
+            return await generate_batch(campaign, batch, router=router)
+
+    started = time.perf_counter()
+    batches = await asyncio.gather(*(run(recipients[i:i + batch_size]) for i in range(0, emails, batch_size)))
+    elapsed = time.perf_counter() - started
+    generated = [result for results in batches for result in results if isinstance(result, Email)]
+    tokens = sum(email.tokens_sent + email.tokens_returned for email in generated)
+    return {
+        "emails": emails,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "generated": len(generated),
+        "calls": provider.calls,
+        "tokens_per_email": round(tokens / len(generated), 1) if generated else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "emails_per_minute": round(len(generated) * 60 / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark batched AI email generation against a stub model.")
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--batch-sizes", default="1,5", help="Comma-separated contacts per call; 1 is single mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Stub latency per call")
+    parser.add_argument("--token-latency-ms", type=float, default=2.0, help="Stub latency per returned token")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        result = asyncio.run(run_benchmark(args.emails, batch_size, args.concurrency, args.latency_ms,
+                                           args.token_latency_ms))
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
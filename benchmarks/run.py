@@ -0,0 +1,189 @@
+"""
+Load-test the API and compare the results with a saved baseline.
+
+Run against a server started with a local mongod, for example:
+
+    python -m benchmarks.run --seed --scale 1000 --save-baseline local
+    python -m benchmarks.run --compare local
+
+See benchmarks/README.md for details.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+import httpx
+from core.stats import percentile
+from benchmarks.workloads import WORKLOADS, WorkloadContext, discover
+
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+
+async def run_workload(client, name: str, ctx: WorkloadContext, concurrency: int, duration: float,
+                       seed: int) -> dict:
+    """
+    Run one workload with `concurrency` virtual users for `duration` seconds.
+
+    Returns:
+        dict: The summary produced by summarize().
+    """
+    workload = WORKLOADS[name]
+    latencies, errors, requests = [], 0, 0
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(index: int):
+        nonlocal errors, requests
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                requests += await workload(client, ctx, rng)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors += 1
+                logger.debug(f"{name} operation failed: {str(e)}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+    return summarize(name, latencies, requests, errors, time.perf_counter() - started)
+
+
+def summarize(name: str, latencies: list, requests: int, errors: int, elapsed: float) -> dict:
+    """
+    Summarize operation latencies (seconds) into throughput and percentiles (milliseconds).
+    """
+    samples = sorted(latencies)
+    return {
+        "workload": name,
+        "operations": len(samples),
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Compare results with a baseline run.
+
+    A workload regresses when its p95 latency grows, or its throughput drops, by more
+    than `tolerance` (a fraction), or when it starts returning errors.
+
+    Returns:
+        list[str]: One message per regression; empty when there are none.
+    """
+    regressions = []
+    baseline_by_name = {entry["workload"]: entry for entry in baseline}
+    for result in results:
+        base = baseline_by_name.get(result["workload"])
+        if base is None:
+            continue
+        name = result["workload"]
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if base["rps"] and result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']} rps vs baseline {base['rps']} rps")
+        if result["errors"] and not base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors (baseline had none)")
+    return regressions
+
+
+def print_table(results: list) -> None:
+    header = f"{'workload':<10} {'rps':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['workload']:<10} {r['rps']:>10} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['p99_ms']:>10} {r['errors']:>8}")
+
+
+def _write_json(path: str, payload: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(payload, file, indent=2)
+
+
+async def main_async(args) -> int:
+    if args.seed:
+        from core.database import connect_db, drop_database
+        from benchmarks.seed import seed_scaled_sample_data
+        connect_db()
+        if args.drop:
+            drop_database()
+        print(f"Seeded: {seed_scaled_sample_data(args.scale, args.emails_per_contact, seed=args.random_seed)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        ctx = await discover(client, WorkloadContext(batch_size=args.batch_size, export_pages=args.export_pages))
+        ctx.email_count_hint = len(ctx.contact_ids) * args.emails_per_contact
+        results = []
+        for name in args.workloads.split(","):
+            print(f"Running '{name}' for {args.duration}s with {args.concurrency} virtual users...")
+            results.append(await run_workload(client, name, ctx, args.concurrency, args.duration, args.random_seed))
+
+    print()
+    print_table(results)
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "python": platform.python_version(),
+        "results": results,
+    }
+    _write_json(os.path.join(RESULTS_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"), report)
+
+    if args.save_baseline:
+        _write_json(os.path.join(BASELINES_DIR, f"{args.save_baseline}.json"), report)
+        print(f"Saved baseline '{args.save_baseline}'")
+
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, f"{args.compare}.json")) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("\nPerformance regressions:")
+            for message in regressions:
+                print(f"  - {message}")
+            return 1
+        print(f"\nNo regressions against baseline '{args.compare}' (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Sales Manager API.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="Comma separated: " + ", ".join(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per workload")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--export-pages", type=int, default=20)
+    parser.add_argument("--seed", action="store_true", help="Load scaled sample data before running")
+    parser.add_argument("--drop", action="store_true", help="Drop the database before seeding")
+    parser.add_argument("--scale", type=int, default=100, help="Copies of sample_data.json to load")
+    parser.add_argument("--emails-per-contact", type=int, default=5)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--save-baseline", help="Save the results as this baseline name")
+    parser.add_argument("--compare", help="Compare the results with this baseline name")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main_async(parse_args())))
@@ -0,0 +1,124 @@
+import json
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from werkzeug.security import generate_password_hash
+from config import settings
+from core.database import get_db
+from core.datagen import MongoSink
+from models import User, Company, Contact, Campaign, Email
+from models.email import CompanySnapshot, ContactSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def seed_scaled_sample_data(scale: int, emails_per_contact: int = 1, seed: int = 42,
+                            sample_file: str | None = None, batch_size: int = 1000) -> dict:
+    """
+    Load sample_data.json replicated `scale` times into the connected database.
+
+    Every copy gets unique emails, usernames, names and zoom ids, and keeps the
+    references of the original file (contacts point to the copy of their company
+    and user), so the data set grows while staying referentially consistent.
+    Documents are streamed to the database in unordered insert_many batches
+    as they are built, so memory stays flat however large the scale.
+
+    Args:
+        scale (int): Number of copies of the sample data to create.
+        emails_per_contact (int): Emails generated for every contact.
+        seed (int): Random seed, so runs are reproducible.
+        sample_file (str | None): Sample data file, defaults to SAMPLE_DATA_FILE.
+        batch_size (int): Documents per insert_many call.
+
+    Returns:
+        dict: Number of documents inserted per collection.
+    """
+    rng = random.Random(seed)
+    with open(sample_file or settings.SAMPLE_DATA_FILE, 'r') as file:
+        data = json.load(file)
+
+    # Hashing is deliberately slow; every seeded user shares one hash per password.
+    password_hashes = {u['password']: generate_password_hash(u['password']) for u in data['users']}
+    sink = MongoSink(get_db(), batch_size=batch_size)
+    try:
+        for collection, document in _scaled_documents(data, scale, emails_per_contact, password_hashes, rng):
+            sink.write(collection, document.to_mongo().to_dict())
+    finally:
+        sink.close()
+    counts = dict(sink.counts)
+    logger.info(f"Seeded scaled sample data (x{scale}): {counts}")
+    return counts
+
+
+def _scaled_documents(data: dict, scale: int, emails_per_contact: int, password_hashes: dict, rng: random.Random):
+    """
+    Yield (collection, document) for every copy of the sample data, one copy at a time.
+    """
+    now = datetime.now(timezone.utc)
+    for copy in range(scale):
+        users_by_email, companies_by_name = {}, {}
+        for user_data in data['users']:
+            local, domain = user_data['email'].split('@')
+            user = User(
+                email=f"{local}+{copy}@{domain}",
+                username=f"{local}{copy}",
+                first_name=user_data['first_name'],
+                last_name=user_data['last_name'],
+                password_hash=password_hashes[user_data['password']],
+                is_active=user_data['is_active'],
+            )
+            yield 'users', user
+            users_by_email[user_data['email']] = user
+        for company_data in data['companies']:
+            company = Company(
+                name=f"{company_data['name']} #{copy}",
+                website=company_data.get('website'),
+                primary_industry=company_data.get('primary_industry'),
+                primary_sub_industry=company_data.get('primary_sub_industry'),
+                zoom_id=f"{company_data['zoom_id']}-{copy}",
+                user=users_by_email[company_data['user_email']],
+            )
+            company.id = ObjectId()
+            yield 'companies', company
+            companies_by_name[company_data['name']] = company
+        copy_campaigns = []
+        for campaign_data in data['campaigns']:
+            campaign = Campaign(
+                campaign_name=f"{campaign_data['campaign_name']} #{copy}",
+                campaign_context=campaign_data['campaign_context'],
+                campaign_template_body=campaign_data['campaign_template_body'],
+                campaign_template_title=campaign_data['campaign_template_title'],
+                user=users_by_email[campaign_data['user_email']],
+            )
+            yield 'campaigns', campaign
+            copy_campaigns.append(campaign)
+        for contact_data in data['contacts']:
+            local, domain = contact_data['email'].split('@')
+            company = companies_by_name[contact_data['company_name']]
+            contact = Contact(
+                first_name=contact_data['first_name'],
+                last_name=f"{contact_data['last_name']}{copy}",
+                email=f"{local}.{copy}@{domain}",
+                title=contact_data.get('title'),
+                zoom_id=f"{contact_data['zoom_id']}-{copy}",
+                user=users_by_email[contact_data['user_email']],
+                company=company,
+            )
+            contact.id = ObjectId()
+            yield 'contacts', contact
+            for _ in range(emails_per_contact):
+                campaign = rng.choice(copy_campaigns)
+                yield 'emails', Email(
+                    company=CompanySnapshot.of(company),
+                    contact=ContactSnapshot.of(contact),
+                    subject=f"{campaign.campaign_template_title} for {contact.first_name}",
+                    body=f"Hello {contact.first_name}, {campaign.campaign_context}",
+                    ai_model=settings.DEFAULT_AI_MODEL,
+                    tokens_sent=rng.randint(200, 1200),
+                    tokens_returned=rng.randint(100, 600),
+                    generation_time=round(rng.uniform(0.5, 6.0), 3),
+                    full_prompt=f"{campaign.campaign_context}\n\n{campaign.campaign_template_body}",
+                    created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                    campaign_id=campaign.campaign_id,
+                )
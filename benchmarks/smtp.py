@@ -0,0 +1,139 @@
+"""
+Measure outbound delivery throughput (messages/sec) against the local SMTP stand-in.
+
+    python -m benchmarks.smtp --messages 5000 --pool-size 8
+    python -m benchmarks.smtp --messages 2000 --rtt-ms 20 --compare-pipelining
+
+--rtt-ms puts a proxy in front of the server that delays traffic in both
+directions, to see what pipelining and pooling buy on a real network.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from core.smtp import DeliveryPipeline, DomainLimiter, OutgoingMessage, SMTPPool
+from core.smtp_standin import LocalSMTPServer, RecordingHandler
+
+
+class LatencyProxy:
+    """
+    TCP proxy that delays every chunk by rtt/2 in each direction, preserving order.
+    """
+
+    def __init__(self, target_host: str, target_port: int, rtt: float):
+        self.target_host = target_host
+        self.target_port = target_port
+        self.delay = rtt / 2
+        self.port = None
+        self._server = None
+
+    async def start(self) -> "LatencyProxy":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def _pipe(self, reader, writer):
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def forward():
+            while True:
+                due, chunk = await queue.get()
+                if chunk is None:
+                    writer.close()
+                    return
+                await asyncio.sleep(max(due - time.monotonic(), 0))
+                writer.write(chunk)
+                await writer.drain()
+
+        sender = asyncio.create_task(forward())
+        try:
+            while chunk := await reader.read(65536):
+                queue.put_nowait((time.monotonic() + self.delay, chunk))
+        except OSError:
+            pass
+        queue.put_nowait((0, None))
+        await sender
+
+    async def _handle(self, client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(self.target_host, self.target_port)
+        await asyncio.gather(
+            self._pipe(client_reader, server_writer),
+            self._pipe(server_reader, client_writer),
+            return_exceptions=True,
+        )
+
+    async def close(self) -> None:
+        self._server.close()
+
+
+async def run_benchmark(messages: int = 2000, pool_size: int = 4, domains: int = 50, rtt_ms: float = 0.0,
+                        pipelining: bool = True, max_messages_per_connection: int = 1000,
+                        server_latency_ms: float = 0.0) -> dict:
+    """
+    Send `messages` messages through a DeliveryPipeline to a fresh stand-in server.
+
+    Returns:
+        dict: Settings, messages/sec, failures and sessions opened.
+    """
+    handler = RecordingHandler(latency=server_latency_ms / 1000, keep_messages=False)
+    with LocalSMTPServer(handler) as server:
+        port, proxy = server.port, None
+        if rtt_ms:
+            proxy = await LatencyProxy(server.host, server.port, rtt_ms / 1000).start()
+            port = proxy.port
+        pool = SMTPPool(server.host, port, size=pool_size, max_messages_per_connection=max_messages_per_connection,
+                        pipelining=pipelining)
+        pipeline = DeliveryPipeline(pool, DomainLimiter(concurrency=pool_size, rate_per_second=0))
+        batch = [
+            OutgoingMessage(str(n), "bench@sender.example", f"user{n}@domain{n % domains}.example",
+                            f"Benchmark message {n}", "Hi,\n\nThis is a benchmark message.\n", f"<{n}@sender.example>")
+            for n in range(messages)
+        ]
+        try:
+            started = time.perf_counter()
+            results = await pipeline.send_all(batch)
+            elapsed = time.perf_counter() - started
+        finally:
+            await pool.close()
+            if proxy:
+                await proxy.close()
+    sent = sum(1 for result in results if result.status == "sent")
+    return {
+        "messages": messages,
+        "pool_size": pool_size,
+        "rtt_ms": rtt_ms,
+        "pipelining": pipelining,
+        "sent": sent,
+        "failed": messages - sent,
+        "delivered": handler.delivered,
+        "sessions": handler.connections,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_sec": round(sent / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SMTP delivery against a local stand-in server.")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--domains", type=int, default=50, help="Distinct recipient domains")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Simulated network round-trip time")
+    parser.add_argument("--server-latency-ms", type=float, default=0.0, help="Server delay before accepting a body")
+    parser.add_argument("--no-pipelining", action="store_true")
+    parser.add_argument("--compare-pipelining", action="store_true", help="Run with and without pipelining")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    modes = [True, False] if args.compare_pipelining else [not args.no_pipelining]
+    for pipelining in modes:
+        result = asyncio.run(run_benchmark(args.messages, args.pool_size, args.domains, args.rtt_ms, pipelining,
+                                           server_latency_ms=args.server_latency_ms))
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import asyncio
+import random
+import uuid
+from dataclasses import dataclass, field
+
+API = "/api/v1"
+
+
+@dataclass
+class WorkloadContext:
+    """
+    Ids discovered from the API before a run, shared by all virtual users.
+    """
+    contact_ids: list = field(default_factory=list)
+    company_ids: list = field(default_factory=list)
+    campaign_ids: list = field(default_factory=list)
+    user_ids: list = field(default_factory=list)
+    email_count_hint: int = 0
+    batch_size: int = 10
+    export_pages: int = 20
+
+
+class WorkloadError(Exception):
+    """
+    Raised when a workload request returns an unexpected status code.
+    """
+
+
+def _check(response, expected: int = 200) -> None:
+    if response.status_code != expected:
+        raise WorkloadError(f"{response.request.method} {response.request.url.path} returned {response.status_code}")
+
+
+async def list_workload(client, ctx: WorkloadContext, rng: random.Random) -> int:
+    """
+    Fetch a random page of a random resource list.
+    """
+    resource = rng.choice(["contacts", "companies", "campaigns", "emails"])
+    response = await client.get(f"{API}/{resource}/", params={"skip": rng.randint(0, 1000), "limit": 50})
+    _check(response)
+    return 1
+
+
+async def detail_workload(client, ctx: WorkloadContext, rng: random.Random) -> int:
+    """
+    Fetch a random contact, company or campaign by id.
+    """
+    resource, ids = rng.choice([
+        ("contacts", ctx.contact_ids), ("companies", ctx.company_ids), ("campaigns", ctx.campaign_ids)
+    ])
+    response = await client.get(f"{API}/{resource}/{rng.choice(ids)}")
+    _check(response)
+    return 1
+
+
+def _contact_payload(ctx: WorkloadContext, rng: random.Random) -> dict:
+    suffix = uuid.uuid4().hex[:12]
+    return {
+        "first_name": "Bench",
+        "last_name": f"Contact{suffix}",
+        "email": f"bench.{suffix}@example.com",
+        "title": rng.choice(["CEO", "CTO", "VP Sales", "Engineer"]),
+        "zoom_id": f"bench-{suffix}",
+        "user": rng.choice(ctx.user_ids),
+        "company": rng.choice(ctx.company_ids),
+    }
+
+
+async def create_workload(client, ctx: WorkloadContext, rng: random.Random) -> int:
+    """
+    Create one contact.
+    """
+    response = await client.post(f"{API}/contacts/", json=_contact_payload(ctx, rng))
+    _check(response)
+    return 1
+
+
+async def batch_workload(client, ctx: WorkloadContext, rng: random.Random) -> int:
+    """
+    Create `batch_size` contacts concurrently, as an importer would.
+    """
+    responses = await asyncio.gather(*(
+        client.post(f"{API}/contacts/", json=_contact_payload(ctx, rng)) for _ in range(ctx.batch_size)
+    ))
+    for response in responses:
+        _check(response)
+    return len(responses)
+
+
+async def export_workload(client, ctx: WorkloadContext, rng: random.Random) -> int:
+    """
+    Page through up to `export_pages` pages of emails, as an export would.
+    """
+    skip = rng.randint(0, max(ctx.email_count_hint - ctx.export_pages * 100, 0))
+    requests = 0
+    for _ in range(ctx.export_pages):
+        response = await client.get(f"{API}/emails/", params={"skip": skip, "limit": 100})
+        _check(response)
+        requests += 1
+        page = response.json()
+        if len(page) < 100:
+            break
+        skip += 100
+    return requests
+
+
+WORKLOADS = {
+    "list": list_workload,
+    "detail": detail_workload,
+    "create": create_workload,
+    "batch": batch_workload,
+    "export": export_workload,
+}
+
+
+async def discover(client, ctx: WorkloadContext, pages: int = 10) -> WorkloadContext:
+    """
+    Collect ids of existing documents through the list endpoints.
+    """
+    for resource, ids in (("contacts", ctx.contact_ids), ("companies", ctx.company_ids),
+                          ("campaigns", ctx.campaign_ids)):
+        for page in range(pages):
+            response = await client.get(f"{API}/{resource}/", params={"skip": page * 100, "limit": 100})
+            _check(response)
+            items = response.json()
+            for item in items:
+                ids.append(item.get("id") or item.get("campaign_id"))
+                if resource == "contacts" and item["user"] not in ctx.user_ids:
+                    ctx.user_ids.append(item["user"])
+            if len(items) < 100:
+                break
+    if not ctx.contact_ids or not ctx.company_ids or not ctx.campaign_ids:
+        raise WorkloadError("The database has no contacts, companies or campaigns; seed it first (--seed)")
+    return ctx
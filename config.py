@@ -16,14 +16,148 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # werkzeug hash method, e.g. "pbkdf2:sha256:600000"; the test suite uses a single iteration
+    PASSWORD_HASH_METHOD: str = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2")
+    ADMIN_API_KEY: str | None = os.getenv("ADMIN_API_KEY")
     ALLOWED_HOSTS: list = ["*"]
     SAMPLE_DATA_FILE: str = os.getenv("SAMPLE_DATA_FILE", "sample_data.json")
+
+    # MongoDB connection pool settings
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+    MONGODB_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "20000"))
+    MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "0"))
+    MONGODB_COMPRESSORS: str = os.getenv("MONGODB_COMPRESSORS", "zstd,snappy,zlib")
+    MONGODB_READ_PREFERENCE: str = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+    MONGODB_ANALYTICS_READ_PREFERENCE: str = os.getenv("MONGODB_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+
+    # Health monitor settings
+    HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "5"))
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+    HEALTH_FAILURE_THRESHOLD: int = int(os.getenv("HEALTH_FAILURE_THRESHOLD", "3"))
+    HEALTH_DEGRADED_LATENCY_MS: float = float(os.getenv("HEALTH_DEGRADED_LATENCY_MS", "100"))
+    HEALTH_LOG_BACKLOG_THRESHOLD: int = int(os.getenv("HEALTH_LOG_BACKLOG_THRESHOLD", "1000"))
+
+    # Metrics settings
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+    # Request profiling settings
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    PROFILING_MAX_STORED: int = int(os.getenv("PROFILING_MAX_STORED", "50"))
+
+    # Slow query log settings
+    SLOW_QUERY_LOG_ENABLED: bool = os.getenv("SLOW_QUERY_LOG_ENABLED", "True").lower() == "true"
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+    SLOW_QUERY_MAX_SHAPES: int = int(os.getenv("SLOW_QUERY_MAX_SHAPES", "500"))
+
+    # Search settings
+    SEARCH_INDEX_ENABLED: bool = os.getenv("SEARCH_INDEX_ENABLED", "True").lower() == "true"
+
+    # List query settings
+    QUERY_GUARD_ENABLED: bool = os.getenv("QUERY_GUARD_ENABLED", "True").lower() == "true"
+    COALESCE_READS_ENABLED: bool = os.getenv("COALESCE_READS_ENABLED", "True").lower() == "true"
+    COUNT_CACHE_SECONDS: float = float(os.getenv("COUNT_CACHE_SECONDS", "10"))
+    COUNT_CACHE_SIZE: int = int(os.getenv("COUNT_CACHE_SIZE", "1000"))
+    COUNT_MAX_EXACT: int = int(os.getenv("COUNT_MAX_EXACT", "100000"))
+
+    # Background job settings
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    # How often API processes check for data resets run by separate job workers (0 disables)
+    DATA_RESET_POLL_SECONDS: float = float(os.getenv("DATA_RESET_POLL_SECONDS", "5"))
     
+    # Outbound email delivery settings
+    SMTP_HOST: str = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "25"))
+    SMTP_USER: str | None = os.getenv("SMTP_USER")
+    SMTP_PASSWORD: str | None = os.getenv("SMTP_PASSWORD")
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "False").lower() == "true"
+    SMTP_FROM: str = os.getenv("SMTP_FROM", "sales@localhost")
+    SMTP_TIMEOUT_SECONDS: float = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+    SMTP_POOL_SIZE: int = int(os.getenv("SMTP_POOL_SIZE", "4"))
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+    SMTP_DOMAIN_CONCURRENCY: int = int(os.getenv("SMTP_DOMAIN_CONCURRENCY", "2"))
+    SMTP_DOMAIN_RATE_PER_SECOND: float = float(os.getenv("SMTP_DOMAIN_RATE_PER_SECOND", "10"))
+    SMTP_MAX_ATTEMPTS: int = int(os.getenv("SMTP_MAX_ATTEMPTS", "4"))
+    SMTP_RETRY_BACKOFF_SECONDS: float = float(os.getenv("SMTP_RETRY_BACKOFF_SECONDS", "2"))
+    SMTP_BATCH_SIZE: int = int(os.getenv("SMTP_BATCH_SIZE", "500"))
+
+    # Email retention settings (off, ttl or archive)
+    EMAIL_RETENTION_MODE: str = os.getenv("EMAIL_RETENTION_MODE", "off").lower()
+    EMAIL_RETENTION_DAYS: int = int(os.getenv("EMAIL_RETENTION_DAYS", "365"))
+    EMAIL_RETENTION_INTERVAL_HOURS: float = float(os.getenv("EMAIL_RETENTION_INTERVAL_HOURS", "24"))
+    EMAIL_ARCHIVE_COMPRESSOR: str = os.getenv("EMAIL_ARCHIVE_COMPRESSOR", "zstd")
+
+    # Contact deduplication settings
+    DEDUP_MATCH_THRESHOLD: float = float(os.getenv("DEDUP_MATCH_THRESHOLD", "0.5"))
+    DEDUP_AUTO_MERGE_THRESHOLD: float = float(os.getenv("DEDUP_AUTO_MERGE_THRESHOLD", "0.95"))
+    DEDUP_ACROSS_USERS: bool = os.getenv("DEDUP_ACROSS_USERS", "False").lower() == "true"
+    DEDUP_MAX_BUCKET_SIZE: int = int(os.getenv("DEDUP_MAX_BUCKET_SIZE", "50"))
+    DEDUP_INTERVAL_SECONDS: float = float(os.getenv("DEDUP_INTERVAL_SECONDS", "60"))
+
+    # Company domain index settings
+    DOMAIN_INDEX_REFRESH_SECONDS: float = float(os.getenv("DOMAIN_INDEX_REFRESH_SECONDS", "300"))
+
+    # Database snapshot settings
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", "snapshots")
+    SNAPSHOT_COMPRESSION_LEVEL: int = int(os.getenv("SNAPSHOT_COMPRESSION_LEVEL", "1"))
+    SNAPSHOT_RESTORE_WORKERS: int = int(os.getenv("SNAPSHOT_RESTORE_WORKERS", "4"))
+    SNAPSHOT_BATCH_SIZE: int = int(os.getenv("SNAPSHOT_BATCH_SIZE", "5000"))
+
+    # Idempotency-Key settings
+    IDEMPOTENCY_ENABLED: bool = os.getenv("IDEMPOTENCY_ENABLED", "True").lower() == "true"
+    IDEMPOTENCY_TTL_HOURS: float = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+    IDEMPOTENCY_LOCK_SECONDS: float = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1000"))
+
+    # Admission control settings (per client and process; see core.admission)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+    ADMISSION_BULK_CONCURRENCY: int = int(os.getenv("ADMISSION_BULK_CONCURRENCY", "2"))
+    ADMISSION_USER_RATE: float = float(os.getenv("ADMISSION_USER_RATE", "50"))
+    ADMISSION_USER_BURST: float = float(os.getenv("ADMISSION_USER_BURST", "100"))
+    ADMISSION_BULK_RATE: float = float(os.getenv("ADMISSION_BULK_RATE", "0.5"))
+    ADMISSION_BULK_BURST: float = float(os.getenv("ADMISSION_BULK_BURST", "5"))
+    ADMISSION_QUEUE_TARGET_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TARGET_SECONDS", "2"))
+    ADMISSION_BULK_QUEUE_TARGET_SECONDS: float = float(os.getenv("ADMISSION_BULK_QUEUE_TARGET_SECONDS", "0.5"))
+    # List reads of at least this many items count as bulk (export) work
+    ADMISSION_EXPORT_LIMIT: int = int(os.getenv("ADMISSION_EXPORT_LIMIT", "100"))
+
+    # Change notification settings (see core.changes)
+    CHANGE_STREAMS_ENABLED: bool = os.getenv("CHANGE_STREAMS_ENABLED", "True").lower() == "true"
+    CHANGE_FEED_HISTORY: int = int(os.getenv("CHANGE_FEED_HISTORY", "1000"))
+    CHANGE_FEED_QUEUE_SIZE: int = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "1000"))
+    CHANGE_FEED_MAX_SUBSCRIBERS: int = int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", "1000"))
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))
+
     # AI model settings
     DEFAULT_AI_MODEL: str = os.getenv("DEFAULT_AI_MODEL", "openrouter/anthropic/claude-3.5-sonnet")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY")
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY")
+    # Fallback routes ("<provider>/<model>", comma-separated) after DEFAULT_AI_MODEL; see core.ai
+    AI_MODEL_ROUTES: str = os.getenv("AI_MODEL_ROUTES", "")
+    AI_REQUEST_TIMEOUT_SECONDS: float = float(os.getenv("AI_REQUEST_TIMEOUT_SECONDS", "60"))
+    AI_MAX_ATTEMPTS: int = int(os.getenv("AI_MAX_ATTEMPTS", "3"))
+    AI_HEDGING_ENABLED: bool = os.getenv("AI_HEDGING_ENABLED", "True").lower() == "true"
+    AI_HEDGE_MIN_SECONDS: float = float(os.getenv("AI_HEDGE_MIN_SECONDS", "2"))
+    AI_HEDGE_MAX_SECONDS: float = float(os.getenv("AI_HEDGE_MAX_SECONDS", "20"))
+    AI_ERROR_WINDOW: int = int(os.getenv("AI_ERROR_WINDOW", "20"))
+    AI_MAX_ERROR_RATE: float = float(os.getenv("AI_MAX_ERROR_RATE", "0.5"))
+    AI_COOLDOWN_SECONDS: float = float(os.getenv("AI_COOLDOWN_SECONDS", "30"))
+    AI_STUB_LATENCY_SECONDS: float = float(os.getenv("AI_STUB_LATENCY_SECONDS", "0"))
+    AI_STUB_ERROR_RATE: float = float(os.getenv("AI_STUB_ERROR_RATE", "0"))
+    # Contacts per model call when generating a campaign's emails (1 = one call each), and batches in flight
+    AI_BATCH_SIZE: int = int(os.getenv("AI_BATCH_SIZE", "5"))
+    AI_GENERATION_CONCURRENCY: int = int(os.getenv("AI_GENERATION_CONCURRENCY", "4"))
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,321 @@
+"""
+Admission control: per-client rate limits, concurrency caps and priority queueing
+in front of the API, so one heavy client cannot saturate the worker.
+
+Every request under API_V1_STR is classified by classify():
+
+- interactive: reads (GET/HEAD);
+- write: other creates, updates and deletes;
+- bulk: routes that do heavy work or start it (BULK_ROUTES), and list reads of
+  ADMISSION_EXPORT_LIMIT or more items, the way exports page through a collection.
+
+and then admitted in three steps:
+
+1. Token buckets. Each client has one bucket for all of its requests
+   (ADMISSION_USER_RATE per second, bursts of ADMISSION_USER_BURST) and one per
+   bulk route (ADMISSION_BULK_RATE, ADMISSION_BULK_BURST). An empty bucket gets a
+   429 whose Retry-After is when its next token arrives.
+2. Route concurrency. Each bulk route runs at most ADMISSION_BULK_CONCURRENCY
+   requests at once; the rest queue.
+3. Worker slots. At most ADMISSION_MAX_CONCURRENCY requests run at once. Free
+   slots go to queued requests by class (interactive, then write, then bulk),
+   oldest first.
+
+A request still queued after its class's target (ADMISSION_QUEUE_TARGET_SECONDS,
+or ADMISSION_BULK_QUEUE_TARGET_SECONDS for bulk work) is shed with a 429 and
+Retry-After. Under overload bulk work is refused first, and interactive requests
+wait a bounded time instead of queueing behind it.
+
+Streaming responses (STREAMING_ROUTES) are only rate limited: they stay open
+for as long as the client listens and would otherwise hold a slot throughout.
+
+Clients are identified by the X-User-Id header, else the `user` query
+parameter, else the client address. Limits are per process.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter
+from urllib.parse import parse_qs
+from config import settings
+from core.metrics import record_admission
+
+logger = logging.getLogger(__name__)
+
+USER_ID_HEADER = "X-User-Id"
+
+# Request classes, in the order queued requests are served.
+PRIORITIES = {"interactive": 0, "write": 1, "bulk": 2}
+
+# Routes (relative to API_V1_STR) that do heavy work inline or queue a large job.
+BULK_ROUTES = tuple((name, method, re.compile(f"^{pattern}/?$")) for name, method, pattern in (
+    ("contacts.batch", "POST", r"/contacts/batch"),
+    ("emails.generate", "POST", r"/emails/generate"),
+    ("campaigns.generate", "POST", r"/campaigns/[^/]+/generate"),
+    ("campaigns.send", "POST", r"/campaigns/[^/]+/send"),
+    ("initialize", "POST", r"/(initialize-db|reset-project)"),
+    ("admin.generate-data", "POST", r"/admin/generate-data"),
+    ("admin.bulk-delete", "POST", r"/admin/bulk-delete"),
+    ("admin.snapshots", "POST", r"/admin/snapshots(/[^/]+/restore)?"),
+))
+
+# Long-lived responses: rate limited, but they hold no worker slot.
+STREAMING_ROUTES = (re.compile(r"^/changes/stream/?$"),)
+
+# Idle buckets are dropped once there are this many.
+_MAX_BUCKETS = 10000
+
+
+def classify(method: str, path: str, query_string: bytes = b"") -> tuple[str, str | None]:
+    """
+    Return a request's class and, for bulk work, the name of its route.
+
+    Args:
+        path (str): The path below API_V1_STR.
+    """
+    for name, route_method, pattern in BULK_ROUTES:
+        if method == route_method and pattern.match(path):
+            return "bulk", name
+    if method in ("GET", "HEAD"):
+        limit = parse_qs(query_string.decode("latin-1")).get("limit", ["0"])[-1]
+        if limit.isdigit() and int(limit) >= settings.ADMISSION_EXPORT_LIMIT:
+            return "bulk", "export"
+        return "interactive", None
+    return "write", None
+
+
+def client_key(scope) -> str:
+    headers = dict(scope.get("headers") or [])
+    user = headers.get(USER_ID_HEADER.lower().encode())
+    if user:
+        return user.decode("latin-1")
+    user = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("user")
+    if user:
+        return user[-1]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Take a token. Returns 0 on success, else the seconds until one is available.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class PriorityLimiter:
+    """
+    Semaphore whose waiters are served by priority (lowest first), then in arrival order.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int, timeout: float) -> bool:
+        """
+        Take a slot, waiting up to `timeout` seconds behind higher-priority and older waiters.
+
+        Returns:
+            bool: False if the wait timed out.
+        """
+        if self.in_use < self.capacity and not self.queued:
+            self.in_use += 1
+            return True
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await asyncio.wait({future}, timeout=max(timeout, 0))
+        except asyncio.CancelledError:
+            if future.done():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        if future.done():
+            return True
+        future.cancel()
+        return False
+
+    def release(self) -> None:
+        """
+        Hand the slot to the first live waiter, or free it.
+        """
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.in_use -= 1
+
+
+class AdmissionController:
+    """
+    Rate limits and slots shared by every request in this process.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Drop all buckets and queues, and pick up the current concurrency settings.
+        """
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._slots = PriorityLimiter(settings.ADMISSION_MAX_CONCURRENCY)
+        self._routes: dict[str, PriorityLimiter] = {}
+        self._outcomes = Counter()
+
+    def _bucket(self, client: str, scope: str, rate: float, burst: float, now: float) -> TokenBucket:
+        bucket = self._buckets.get((client, scope))
+        if bucket is None:
+            if len(self._buckets) >= _MAX_BUCKETS:
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.full(now)}
+            bucket = self._buckets[(client, scope)] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def take_tokens(self, client: str, route: str | None) -> float:
+        """
+        Charge a request to the client's buckets.
+
+        Returns:
+            float: 0 if the request may proceed, else the seconds until it may be retried.
+        """
+        now = time.monotonic()
+        wait = self._bucket(client, "*", settings.ADMISSION_USER_RATE, settings.ADMISSION_USER_BURST, now).take(now)
+        if not wait and route:
+            wait = self._bucket(client, route, settings.ADMISSION_BULK_RATE, settings.ADMISSION_BULK_BURST, now).take(now)
+        return wait
+
+    async def acquire(self, request_class: str, route: str | None) -> bool:
+        """
+        Wait for the route's concurrency slot (bulk routes only), then a worker slot.
+
+        Returns:
+            bool: False if the request queued past its target and should be shed.
+        """
+        target = (settings.ADMISSION_BULK_QUEUE_TARGET_SECONDS if request_class == "bulk"
+                  else settings.ADMISSION_QUEUE_TARGET_SECONDS)
+        deadline = time.monotonic() + target
+        priority = PRIORITIES[request_class]
+        if route:
+            limiter = self._routes.get(route)
+            if limiter is None:
+                limiter = self._routes[route] = PriorityLimiter(settings.ADMISSION_BULK_CONCURRENCY)
+            if not await limiter.acquire(priority, target):
+                return False
+        admitted = False
+        try:
+            admitted = await self._slots.acquire(priority, deadline - time.monotonic())
+        finally:
+            if route and not admitted:
+                self._routes[route].release()
+        return admitted
+
+    def release(self, route: str | None) -> None:
+        self._slots.release()
+        if route:
+            self._routes[route].release()
+
+    def record(self, request_class: str, outcome: str, wait: float | None = None) -> None:
+        self._outcomes[(request_class, outcome)] += 1
+        record_admission(request_class, outcome, wait)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._slots.in_use,
+            "capacity": self._slots.capacity,
+            "queued": self._slots.queued,
+            "routes": {route: {"in_flight": limiter.in_use, "queued": limiter.queued}
+                       for route, limiter in sorted(self._routes.items())},
+            "clients": len({client for client, _ in self._buckets}),
+            "outcomes": {f"{request_class}.{outcome}": count
+                         for (request_class, outcome), count in sorted(self._outcomes.items())},
+        }
+
+
+admission = AdmissionController()
+
+
+async def _reject(send, retry_after: float, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": 429, "headers": [
+        (b"content-length", str(len(body)).encode()),
+        (b"content-type", b"application/json"),
+        (b"retry-after", str(max(1, math.ceil(min(retry_after, 3600)))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying core.admission's limits to API requests.
+
+    Other paths (health checks, metrics, docs) and CORS preflights pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        prefix = settings.API_V1_STR
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not scope["path"].startswith(prefix):
+            await self.app(scope, receive, send)
+            return
+        request_class, route = classify(scope["method"], scope["path"][len(prefix):], scope.get("query_string", b""))
+        client = client_key(scope)
+        retry_after = admission.take_tokens(client, route)
+        if retry_after:
+            admission.record(request_class, "rate_limited")
+            logger.warning(f"Rate limited {client}: {scope['method']} {scope['path']}")
+            await _reject(send, retry_after, "Rate limit exceeded")
+            return
+        if any(pattern.match(scope["path"][len(prefix):]) for pattern in STREAMING_ROUTES):
+            admission.record(request_class, "admitted")
+            await self.app(scope, receive, send)
+            return
+        started = time.monotonic()
+        if not await admission.acquire(request_class, route):
+            admission.record(request_class, "shed", time.monotonic() - started)
+            logger.warning(f"Shed {request_class} request from {client}: {scope['method']} {scope['path']}")
+            target = (settings.ADMISSION_BULK_QUEUE_TARGET_SECONDS if request_class == "bulk"
+                      else settings.ADMISSION_QUEUE_TARGET_SECONDS)
+            await _reject(send, target * 2, "Server is busy; retry later")
+            return
+        admission.record(request_class, "admitted", time.monotonic() - started)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(route)
@@ -0,0 +1,446 @@
+"""
+AI providers and the latency-aware router that chooses between them.
+
+A route is "<provider>/<model>", e.g. "openai/gpt-4o" or
+"openrouter/anthropic/claude-3.5-sonnet"; Email.ai_model records the route that
+actually answered. The router's routes are DEFAULT_AI_MODEL followed by
+AI_MODEL_ROUTES, limited to providers with an API key (the "stub" provider needs
+none and answers locally, for development and tests).
+
+Per route the router tracks an exponentially weighted latency, the error rate
+over the last AI_ERROR_WINDOW calls and the rate-limit budget the provider
+reports in its response headers. Each request goes to the fastest healthy route
+(a route is unhealthy while its budget is spent, after a 429 until its
+Retry-After, or while its error rate is above AI_MAX_ERROR_RATE within
+AI_COOLDOWN_SECONDS of its last failure). When the answer takes longer than
+three times that route's usual latency (clamped to AI_HEDGE_MIN_SECONDS ..
+AI_HEDGE_MAX_SECONDS) the next route is started as a hedge and whichever answers
+first wins; a failed attempt fails over to the next route straight away. At most
+AI_MAX_ATTEMPTS routes are tried per request.
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import httpx
+from config import settings
+from core.metrics import record_ai_request
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the latency average.
+_LATENCY_ALPHA = 0.3
+_HEDGE_LATENCY_FACTOR = 3.0
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+_NUMBERED_LINE = re.compile(r"^(\d+)\. (.+)$", re.MULTILINE)
+
+
+@dataclass
+class RateLimit:
+    """
+    Request budget a provider reported: calls left and seconds until it resets.
+    """
+    remaining: int | None = None
+    reset_seconds: float | None = None
+
+
+@dataclass
+class Completion:
+    text: str
+    model: str
+    tokens_sent: int
+    tokens_returned: int
+    latency: float = 0.0
+    rate_limit: RateLimit | None = None
+
+
+class ProviderError(Exception):
+    """
+    A provider call failed; retry_after is set when the provider asked to back off.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AIUnavailable(Exception):
+    pass
+
+
+def _parse_reset(value: str | None) -> float | None:
+    """
+    Seconds until a rate limit resets, from "1.5", "6m0s", "250ms" or an ISO timestamp.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(number + unit for number, unit in parts) == value:
+        return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class Provider:
+    """
+    An LLM API. complete() sends one prompt and raises ProviderError on any failure.
+    """
+    name = ""
+
+    async def complete(self, model: str, prompt: str, max_tokens: int) -> Completion:
+        raise NotImplementedError
+
+
+class HTTPProvider(Provider):
+    """
+    Base for providers reached over HTTPS, with one pooled client per event loop.
+    """
+    url = ""
+    remaining_header = ""
+    reset_header = ""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = httpx.AsyncClient(timeout=settings.AI_REQUEST_TIMEOUT_SECONDS)
+        return client
+
+    def headers(self) -> dict:
+        raise NotImplementedError
+
+    def payload(self, model: str, prompt: str, max_tokens: int) -> dict:
+        return {"model": model, "max_tokens": max_tokens, "messages": [{"role": "user", "content": prompt}]}
+
+    def parse(self, body: dict) -> tuple[str, int, int]:
+        raise NotImplementedError
+
+    async def complete(self, model: str, prompt: str, max_tokens: int) -> Completion:
+        try:
+            response = await self._client().post(self.url, headers=self.headers(),
+                                                 json=self.payload(model, prompt, max_tokens))
+        except httpx.HTTPError as e:
+            raise ProviderError(f"{type(e).__name__}: {e}") from e
+        headers = response.headers
+        if response.status_code == 429 or response.status_code >= 500 or response.status_code in (401, 403, 408):
+            retry_after = _parse_reset(headers.get("retry-after")) if response.status_code == 429 else None
+            raise ProviderError(f"HTTP {response.status_code}: {response.text[:200]}", retry_after)
+        if response.status_code >= 400:
+            raise ProviderError(f"HTTP {response.status_code}: {response.text[:200]}")
+        try:
+            text, tokens_sent, tokens_returned = self.parse(response.json())
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ProviderError(f"Unexpected response: {e}") from e
+        remaining = headers.get(self.remaining_header)
+        rate_limit = RateLimit(int(remaining) if remaining and remaining.isdigit() else None,
+                               _parse_reset(headers.get(self.reset_header)))
+        return Completion(text, f"{self.name}/{model}", tokens_sent, tokens_returned, rate_limit=rate_limit)
+
+
+class OpenAIProvider(HTTPProvider):
+    name = "openai"
+    url = "https://api.openai.com/v1/chat/completions"
+    remaining_header = "x-ratelimit-remaining-requests"
+    reset_header = "x-ratelimit-reset-requests"
+
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def parse(self, body: dict) -> tuple[str, int, int]:
+        usage = body.get("usage") or {}
+        return (body["choices"][0]["message"]["content"], usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0))
+
+
+class OpenRouterProvider(OpenAIProvider):
+    name = "openrouter"
+    url = "https://openrouter.ai/api/v1/chat/completions"
+    remaining_header = "x-ratelimit-remaining"
+    reset_header = "x-ratelimit-reset"
+
+
+class AnthropicProvider(HTTPProvider):
+    name = "anthropic"
+    url = "https://api.anthropic.com/v1/messages"
+    remaining_header = "anthropic-ratelimit-requests-remaining"
+    reset_header = "anthropic-ratelimit-requests-reset"
+
+    def headers(self) -> dict:
+        return {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"}
+
+    def parse(self, body: dict) -> tuple[str, int, int]:
+        usage = body.get("usage") or {}
+        text = "".join(block.get("text", "") for block in body["content"] if block.get("type") == "text")
+        return text, usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+class StubProvider(Provider):
+    """
+    Local stand-in for an LLM API, with injected latency and errors.
+
+    It answers like a model following core.generation's prompts: a JSON email for
+    a single contact, or for a batch prompt a JSON array with one email per
+    numbered line ("3. Ada Lovelace at ...") under "Contacts:". Tokens are counted
+    as words; latency is `latency` per call plus `token_latency` per returned
+    token. Pass `respond` to produce other output.
+    """
+
+    def __init__(self, name: str = "stub", latency: float = 0.0, error_rate: float = 0.0, respond=None,
+                 seed: int | None = None, token_latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.respond = respond or self.answer
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    @staticmethod
+    def answer(prompt: str) -> str:
+        _, batch, listing = prompt.partition("\nContacts:\n")
+        recipients = _NUMBERED_LINE.findall(listing)
+        if not batch or not recipients:
+            return json.dumps({"subject": "Quick question", "body": f"Hi,\n\n{prompt.splitlines()[0][:200]}"})
+        return json.dumps([{"contact": int(number), "subject": "Quick question",
+                            "body": f"Hi,\n\nA note written for {recipient}."} for number, recipient in recipients])
+
+    async def complete(self, model: str, prompt: str, max_tokens: int) -> Completion:
+        self.calls += 1
+        if self._rng.random() < self.error_rate:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            raise ProviderError(f"{self.name} failed (injected)")
+        text = self.respond(prompt)
+        tokens_returned = len(text.split())
+        delay = self.latency + self.token_latency * tokens_returned
+        if delay:
+            await asyncio.sleep(delay)
+        return Completion(text, f"{self.name}/{model}", len(prompt.split()), tokens_returned)
+
+
+def split_route(route: str) -> tuple[str, str]:
+    provider, _, model = route.partition("/")
+    return provider, model
+
+
+class RouteStats:
+    """
+    Rolling health of one route.
+    """
+
+    def __init__(self, window: int):
+        self.latency: float | None = None
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.remaining: int | None = None
+        self.blocked_until = 0.0
+        self.last_failure = 0.0
+        self.in_flight = 0
+        self.calls = 0
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self, now: float) -> bool:
+        if now < self.blocked_until:
+            return False
+        return not (self.error_rate > settings.AI_MAX_ERROR_RATE
+                    and now - self.last_failure < settings.AI_COOLDOWN_SECONDS)
+
+
+class AIRouter:
+    """
+    Sends prompts to the fastest healthy route, hedging slow calls and failing over on errors.
+    """
+
+    def __init__(self, routes: list[str], providers: dict[str, Provider]):
+        self.providers = providers
+        self.routes = [route for route in dict.fromkeys(routes) if split_route(route)[0] in providers]
+        self._stats = {route: RouteStats(settings.AI_ERROR_WINDOW) for route in self.routes}
+        self._lock = threading.Lock()
+
+    def _route_stats(self, route: str) -> RouteStats:
+        with self._lock:
+            stats = self._stats.get(route)
+            if stats is None:
+                stats = self._stats[route] = RouteStats(settings.AI_ERROR_WINDOW)
+            return stats
+
+    def ranked(self, preferred: str | None = None) -> list[str]:
+        """
+        Return the routes in the order they would be tried: healthy ones fastest first
+        (unmeasured ones first of all, so they get measured), then the rest.
+
+        Args:
+            preferred (str | None): A route to try first while it is healthy.
+        """
+        now = time.monotonic()
+        routes = list(self.routes)
+        if preferred and preferred not in routes and split_route(preferred)[0] in self.providers:
+            routes.append(preferred)
+        with self._lock:
+            stats = {route: self._stats.get(route) or RouteStats(settings.AI_ERROR_WINDOW) for route in routes}
+        healthy = sorted((route for route in routes if stats[route].healthy(now)),
+                         key=lambda route: stats[route].latency or 0.0)
+        unhealthy = sorted((route for route in routes if not stats[route].healthy(now)),
+                           key=lambda route: (stats[route].blocked_until, stats[route].error_rate))
+        if preferred in healthy:
+            healthy.remove(preferred)
+            healthy.insert(0, preferred)
+        return healthy + unhealthy
+
+    def hedge_delay(self, route: str) -> float:
+        latency = self._route_stats(route).latency
+        if latency is None:
+            return settings.AI_HEDGE_MAX_SECONDS
+        return min(max(_HEDGE_LATENCY_FACTOR * latency, settings.AI_HEDGE_MIN_SECONDS), settings.AI_HEDGE_MAX_SECONDS)
+
+    async def _attempt(self, route: str, prompt: str, max_tokens: int) -> Completion:
+        provider, model = split_route(route)
+        stats = self._route_stats(route)
+        with self._lock:
+            stats.in_flight += 1
+            stats.calls += 1
+        started = time.perf_counter()
+        try:
+            completion = await self.providers[provider].complete(model, prompt, max_tokens)
+        except ProviderError as e:
+            now = time.monotonic()
+            with self._lock:
+                stats.outcomes.append(False)
+                stats.last_failure = now
+                if e.retry_after is not None:
+                    stats.blocked_until = now + e.retry_after
+            record_ai_request(route, "rate_limited" if e.retry_after is not None else "error")
+            logger.warning(f"AI route {route} failed: {str(e)}")
+            raise
+        except asyncio.CancelledError:
+            record_ai_request(route, "cancelled")
+            raise
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+        completion.latency = time.perf_counter() - started
+        with self._lock:
+            stats.outcomes.append(True)
+            stats.latency = completion.latency if stats.latency is None else (
+                _LATENCY_ALPHA * completion.latency + (1 - _LATENCY_ALPHA) * stats.latency)
+            if completion.rate_limit and completion.rate_limit.remaining is not None:
+                stats.remaining = completion.rate_limit.remaining
+                if stats.remaining <= 0:
+                    stats.blocked_until = time.monotonic() + (completion.rate_limit.reset_seconds or 1.0)
+        record_ai_request(route, "success")
+        return completion
+
+    async def complete(self, prompt: str, max_tokens: int = 1024, model: str | None = None) -> Completion:
+        """
+        Get a completion from the best available route.
+
+        Args:
+            prompt (str): The prompt.
+            max_tokens (int): Completion token limit.
+            model (str | None): A route to prefer while it is healthy.
+
+        Returns:
+            Completion: The first successful answer; its model is the route that gave it.
+
+        Raises:
+            AIUnavailable: If no route is configured or every attempt failed.
+        """
+        order = self.ranked(model)[:settings.AI_MAX_ATTEMPTS]
+        if not order:
+            raise AIUnavailable("No AI provider is configured")
+        pending: dict[asyncio.Task, str] = {}
+        errors = []
+
+        def launch() -> None:
+            route = order[len(pending) + len(errors)]
+            pending[asyncio.create_task(self._attempt(route, prompt, max_tokens))] = route
+
+        launch()
+        try:
+            while pending:
+                more = len(pending) + len(errors) < len(order)
+                timeout = None
+                if more and settings.AI_HEDGING_ENABLED:
+                    timeout = self.hedge_delay(list(pending.values())[-1])
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    record_ai_request(order[len(pending) + len(errors)], "hedge")
+                    launch()
+                    continue
+                result = None
+                for task in done:
+                    route = pending.pop(task)
+                    try:
+                        result = result or task.result()
+                    except ProviderError as e:
+                        errors.append(f"{route}: {e}")
+                if result is not None:
+                    return result
+                if len(pending) + len(errors) < len(order):
+                    launch()
+            raise AIUnavailable(f"Every AI route failed: {'; '.join(errors)}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """
+        Return each route's health, latency and rate-limit budget, in routing order.
+        """
+        now = time.monotonic()
+        order = self.ranked()
+        with self._lock:
+            return {"routes": [{
+                "route": route,
+                "healthy": stats.healthy(now),
+                "latency_s": round(stats.latency, 3) if stats.latency is not None else None,
+                "error_rate": round(stats.error_rate, 3),
+                "rate_limit_remaining": stats.remaining,
+                "blocked_for_s": round(max(stats.blocked_until - now, 0.0), 1),
+                "in_flight": stats.in_flight,
+                "calls": stats.calls,
+            } for route, stats in ((route, self._stats.get(route) or RouteStats(1)) for route in order)]}
+
+
+def build_router() -> AIRouter:
+    """
+    Create the router for the configured routes and the providers that have API keys.
+    """
+    providers: dict[str, Provider] = {"stub": StubProvider(latency=settings.AI_STUB_LATENCY_SECONDS,
+                                                           error_rate=settings.AI_STUB_ERROR_RATE)}
+    for provider_cls, api_key in ((OpenAIProvider, settings.OPENAI_API_KEY),
+                                  (AnthropicProvider, settings.ANTHROPIC_API_KEY),
+                                  (OpenRouterProvider, settings.OPENROUTER_API_KEY)):
+        if api_key:
+            providers[provider_cls.name] = provider_cls(api_key)
+    routes = [settings.DEFAULT_AI_MODEL] + [route.strip() for route in settings.AI_MODEL_ROUTES.split(",")
+                                           if route.strip()]
+    router = AIRouter(routes, providers)
+    skipped = [route for route in routes if route not in router.routes]
+    if skipped:
+        logger.warning(f"AI routes without a configured provider: {', '.join(skipped)}")
+    return router
+
+
+ai_router = build_router()
@@ -0,0 +1,240 @@
+"""
+Cascading deletes and archives, and the orphan scanner.
+
+Removing a user, company, contact or campaign also removes every document that
+references it (see DEPENDENTS). Dependents go first, in batches of ids with one
+delete_many per batch, so an interrupted cascade leaves fewer children rather
+than orphans, and a 100k-contact company takes a few hundred round trips instead
+of one per document. Duplicate groups naming a removed contact are dropped with
+it: a proposal can no longer be merged and a decision no longer applies.
+
+Archiving moves documents into archived_<collection> (with an archived_at stamp)
+instead of deleting them; emails go to the monthly archives of core.retention
+instead, so /emails/archived reads them. Each batch is copied and deleted inside
+a transaction when the deployment supports them (replica sets and sharded clusters).
+"""
+import logging
+from datetime import datetime, timezone
+from pymongo import ReplaceOne
+from mongoengine.connection import get_db
+from core.changes import change_feed
+from core.database import transaction
+from core.jobs import JobContext, job_handler
+from core.retention import copy_to_archives, ensure_archives
+from core.domains import domain_index
+from core.search import COMPANY, CONTACT, search_index
+from models import Campaign, Company, Contact, DuplicateGroup, Email, User
+
+logger = logging.getLogger(__name__)
+
+CASCADE_MODES = ("delete", "archive")
+ARCHIVE_PREFIX = "archived_"
+
+# Ids per delete_many/update batch.
+BATCH_SIZE = 1000
+
+# Parent collection -> [(child collection, field holding the parent's _id)]
+DEPENDENTS = {
+    "users": [("companies", "user"), ("contacts", "user"), ("campaigns", "user")],
+    "companies": [("contacts", "company"), ("emails", "company.company_id")],
+    "contacts": [("emails", "contact.contact_id")],
+    "campaigns": [("emails", "campaign_id")],
+    "emails": [],
+}
+
+COLLECTION_MODELS = {"users": User, "companies": Company, "contacts": Contact, "campaigns": Campaign, "emails": Email}
+
+_SEARCH_KINDS = {"companies": COMPANY, "contacts": CONTACT}
+
+
+def _chunks(values: list, size: int):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def document_ids(collection: str, ids: list) -> list:
+    """
+    Convert API ids to the stored _id type of a collection.
+
+    Raises:
+        ValidationError: If an id is not valid for the collection.
+    """
+    document_cls = COLLECTION_MODELS[collection]
+    id_field = document_cls._fields[document_cls._meta["id_field"]]
+    return [id_field.to_mongo(value) for value in ids]
+
+
+class Cascade:
+    """
+    One cascading removal; accumulates the number of documents removed per collection.
+    """
+
+    def __init__(self, mode: str = "delete", db=None, batch_size: int = BATCH_SIZE):
+        if mode not in CASCADE_MODES:
+            raise ValueError(f"Unknown cascade mode: {mode}")
+        self.mode = mode
+        self.db = db if db is not None else get_db()
+        self.batch_size = batch_size
+        self.archived_at = datetime.now(timezone.utc)
+        self.counts = {}
+
+    def _remove_batch(self, collection: str, ids: list) -> None:
+        pruned = 0
+        if self.mode == "archive" and collection == "emails":
+            ensure_archives(self.db, {"_id": {"$in": ids}})
+        with transaction(self.db.client) as session:
+            if self.mode == "archive":
+                documents = list(self.db[collection].find({"_id": {"$in": ids}}, session=session))
+                if documents and collection == "emails":
+                    copy_to_archives(self.db, documents, session)
+                elif documents:
+                    # Upserts keep a retried batch idempotent when it ran without a transaction.
+                    self.db[ARCHIVE_PREFIX + collection].bulk_write(
+                        [ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": self.archived_at}, upsert=True)
+                         for doc in documents],
+                        ordered=False, session=session,
+                    )
+            result = self.db[collection].delete_many({"_id": {"$in": ids}}, session=session)
+            if collection == "contacts":
+                pruned = self.db[DuplicateGroup._get_collection_name()].delete_many(
+                    {"$or": [{"survivor": {"$in": ids}}, {"duplicates": {"$in": ids}}]}, session=session
+                ).deleted_count
+        self.counts[collection] = self.counts.get(collection, 0) + result.deleted_count
+        if pruned:
+            self.counts["contact_duplicates"] = self.counts.get("contact_duplicates", 0) + pruned
+        change_feed.publish_many(collection, ids, "delete")
+        kind = _SEARCH_KINDS.get(collection)
+        if kind:
+            for doc_id in ids:
+                search_index.remove(kind, str(doc_id))
+        if collection == "companies":
+            for doc_id in ids:
+                domain_index.remove(doc_id)
+
+    def remove(self, collection: str, ids: list) -> dict:
+        """
+        Remove documents by _id together with everything that references them.
+
+        Returns:
+            dict: Documents removed so far per collection.
+        """
+        for batch in _chunks(list(ids), self.batch_size):
+            for child, field in DEPENDENTS[collection]:
+                self.remove_matching(child, {field: {"$in": batch}})
+            self._remove_batch(collection, batch)
+        return self.counts
+
+    def remove_matching(self, collection: str, query: dict) -> dict:
+        """
+        Remove every document matching `query` together with everything that references it.
+
+        Returns:
+            dict: Documents removed so far per collection.
+        """
+        if self.mode == "delete" and not DEPENDENTS[collection]:
+            # Nothing references these documents: one delete_many does it.
+            result = self.db[collection].delete_many(query)
+            self.counts[collection] = self.counts.get(collection, 0) + result.deleted_count
+            if result.deleted_count:
+                change_feed.reset(collection)
+            return self.counts
+        while True:
+            ids = [doc["_id"] for doc in self.db[collection].find(query, {"_id": 1}, limit=self.batch_size)]
+            if not ids:
+                return self.counts
+            self.remove(collection, ids)
+
+
+def cascade_remove(collection: str, ids: list, mode: str = "delete") -> dict:
+    """
+    Delete or archive documents and all their dependents.
+
+    Args:
+        collection (str): One of DEPENDENTS' keys.
+        ids (list): API ids (strings) of the documents to remove.
+        mode (str): "delete" or "archive".
+
+    Returns:
+        dict: Documents removed per collection; the requested documents are counted too.
+
+    Raises:
+        ValidationError: If an id is not valid for the collection.
+    """
+    cascade = Cascade(mode)
+    counts = cascade.remove(collection, document_ids(collection, ids))
+    logger.info(f"Cascade {mode} of {len(ids)} {collection}: {counts}")
+    return counts
+
+
+def _references():
+    # Parents first, so children orphaned by an earlier step are removed with it.
+    for parent, dependents in DEPENDENTS.items():
+        for child, field in dependents:
+            yield child, field, parent
+
+
+def missing_parents(db, child: str, field: str, parent: str, batch_size: int = BATCH_SIZE) -> list:
+    """
+    Return the values of `child.field` that no longer exist as `parent` _ids.
+    """
+    values = db[child].aggregate([
+        {"$match": {field: {"$ne": None}}},
+        {"$group": {"_id": f"${field}"}},
+    ], allowDiskUse=True)
+    missing, batch = [], []
+
+    def check():
+        existing = {doc["_id"] for doc in db[parent].find({"_id": {"$in": batch}}, {"_id": 1})}
+        missing.extend(value for value in batch if value not in existing)
+        batch.clear()
+
+    for doc in values:
+        batch.append(doc["_id"])
+        if len(batch) >= batch_size:
+            check()
+    if batch:
+        check()
+    return missing
+
+
+def scan_orphans(mode: str = "delete", dry_run: bool = False, ctx: JobContext | None = None) -> dict:
+    """
+    Find documents whose parent no longer exists and remove them with their dependents.
+
+    Args:
+        mode (str): "delete" or "archive" for the orphans found.
+        dry_run (bool): Only count orphans.
+        ctx (JobContext | None): Job context for progress and checkpoints.
+
+    Returns:
+        dict: "orphans", one {collection, field, parent, count} entry per reference
+        (field names contain dots, so they cannot be keys of the stored result),
+        and "removed", documents removed per collection.
+    """
+    db = get_db()
+    cascade = Cascade(mode, db)
+    checkpoint = ctx.checkpoint if ctx else {}
+    orphans = list(checkpoint.get("orphans") or [])
+    cascade.counts = dict(checkpoint.get("removed") or {})
+    references = list(_references())
+    for index, (child, field, parent) in enumerate(references[len(orphans):], start=len(orphans)):
+        found = 0
+        for batch in _chunks(missing_parents(db, child, field, parent), BATCH_SIZE):
+            query = {field: {"$in": batch}}
+            if dry_run:
+                found += db[child].count_documents(query)
+            else:
+                before = cascade.counts.get(child, 0)
+                cascade.remove_matching(child, query)
+                found += cascade.counts.get(child, 0) - before
+        orphans.append({"collection": child, "field": field, "parent": parent, "count": found})
+        if ctx:
+            ctx.progress(index + 1, len(references), f"Checked {child}.{field}")
+            ctx.save_checkpoint(orphans=orphans, removed=cascade.counts)
+    logger.info(f"Orphan scan ({mode}, dry_run={dry_run}) found {orphans}, removed {cascade.counts}")
+    return {"orphans": orphans, "removed": cascade.counts}
+
+
+@job_handler("scan_orphans")
+def run_scan_orphans(ctx: JobContext) -> dict:
+    return scan_orphans(ctx.params.get("mode", "delete"), ctx.params.get("dry_run", False), ctx)
@@ -0,0 +1,271 @@
+"""
+Change notifications, so clients refetch what changed instead of polling whole lists.
+
+Every change to a document of RESOURCES becomes a compact event
+{"resource", "id", "op", "version"}: op is insert, update or delete, or reset
+(with no id) when a bulk operation rewrote more of the collection than is worth
+listing, in which case clients refetch it. version is a process-wide sequence
+number; GET /changes/stream (server-sent events) sends it as the event id, so a
+reconnecting EventSource resumes from its Last-Event-ID. The last
+CHANGE_FEED_HISTORY events are kept for that; older resume points get resets,
+as do ids ahead of the feed (from before a restart, or from another worker).
+
+Events come from one of two sources:
+
+- the API write paths and jobs, which call change_feed.publish()/reset();
+- a MongoDB change stream on the application collections, when the deployment
+  is a replica set or sharded cluster (CHANGE_STREAMS_ENABLED). It also sees
+  writes made by other processes and tools. While it runs, document events
+  from the write paths are dropped so each change is reported once; resets
+  still go out.
+
+Each subscriber has a queue of CHANGE_FEED_QUEUE_SIZE events. A subscriber that
+falls that far behind has its queue replaced by resets.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pymongo.errors import PyMongoError
+from config import settings
+from core.database import supports_transactions
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ("users", "companies", "contacts", "campaigns", "emails")
+OPS = ("insert", "update", "delete", "reset")
+
+# Bulk writes touching more documents than this publish one reset instead.
+MAX_EVENTS_PER_WRITE = 100
+
+_STREAM_OPS = {"insert": "insert", "update": "update", "replace": "update", "delete": "delete"}
+
+
+@dataclass(frozen=True)
+class Change:
+    resource: str
+    id: str | None
+    op: str
+    version: int
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+
+class Subscription:
+    """
+    One client's queue of changes to the resources it asked for.
+    """
+
+    def __init__(self, resources: set[str], loop: asyncio.AbstractEventLoop):
+        self.resources = resources
+        self.queue: asyncio.Queue[Change] = asyncio.Queue(maxsize=max(settings.CHANGE_FEED_QUEUE_SIZE, len(RESOURCES)))
+        self._loop = loop
+
+    def push(self, change: Change) -> None:
+        if change.resource in self.resources:
+            try:
+                self._loop.call_soon_threadsafe(self._put, change)
+            except RuntimeError:
+                # The subscriber's loop has closed; it is about to unsubscribe.
+                pass
+
+    def _put(self, change: Change) -> None:
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            for resource in sorted(self.resources):
+                self.queue.put_nowait(Change(resource, None, "reset", change.version))
+            return
+        self.queue.put_nowait(change)
+
+
+class ChangeFeed:
+    """
+    In-process fan-out of change events to subscribers, with a short history for resuming.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._history: deque[Change] = deque(maxlen=settings.CHANGE_FEED_HISTORY)
+        self._subscribers: set[Subscription] = set()
+        # "app" (write paths) or "change_stream".
+        self.source = "app"
+
+    def publish(self, resource: str, document_id, op: str, source: str = "app") -> Change | None:
+        """
+        Record a change and send it to subscribers.
+
+        Returns:
+            Change | None: The event, or None when it was left to the change stream.
+        """
+        if source != self.source and op != "reset":
+            return None
+        with self._lock:
+            self._version += 1
+            change = Change(resource, None if document_id is None else str(document_id), op, self._version)
+            self._history.append(change)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(change)
+        return change
+
+    def publish_many(self, resource: str, document_ids: list, op: str) -> None:
+        """
+        Publish one event per document, or a reset when there are more than MAX_EVENTS_PER_WRITE.
+        """
+        if len(document_ids) > MAX_EVENTS_PER_WRITE:
+            self.reset(resource)
+            return
+        for document_id in document_ids:
+            self.publish(resource, document_id, op)
+
+    def reset(self, *resources: str) -> None:
+        """
+        Tell subscribers to refetch these resources (all of them when none are given).
+        """
+        for resource in resources or RESOURCES:
+            self.publish(resource, None, "reset")
+
+    def subscribe(self, resources: set[str]) -> Subscription:
+        subscription = Subscription(resources, asyncio.get_running_loop())
+        with self._lock:
+            if len(self._subscribers) >= settings.CHANGE_FEED_MAX_SUBSCRIBERS:
+                raise OverflowError("Too many change feed subscribers")
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def since(self, version: int, resources: set[str]) -> list[Change]:
+        """
+        Return the changes after `version`, or resets when the history no longer reaches back that far
+        or `version` is ahead of this feed (it came from before a restart, or from another process).
+        """
+        with self._lock:
+            current = self._version
+            history = list(self._history)
+        if version == current:
+            return []
+        if version > current or not history or history[0].version > version + 1:
+            return [Change(resource, None, "reset", current) for resource in sorted(resources)]
+        return [change for change in history if change.version > version and change.resource in resources]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"version": self._version, "source": self.source, "subscribers": len(self._subscribers)}
+
+
+change_feed = ChangeFeed()
+
+
+class ChangeStreamWatcher:
+    """
+    Background thread feeding change_feed from a MongoDB change stream.
+    """
+
+    def __init__(self):
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self, db) -> bool:
+        """
+        Start watching `db` if the deployment supports change streams.
+
+        Returns:
+            bool: Whether the watcher started.
+        """
+        if not supports_transactions(db.client):
+            # Change streams need the same deployments transactions do.
+            logger.info("Change streams unavailable (standalone server); change events come from the write paths")
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(db,), name="change-stream", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        change_feed.source = "app"
+
+    def _run(self, db) -> None:
+        pipeline = [{"$match": {"$or": [{"ns.coll": {"$in": list(RESOURCES)}},
+                                         {"operationType": {"$in": ["dropDatabase", "invalidate"]}}]}}]
+        token = None
+        while not self._stop.is_set():
+            try:
+                with db.watch(pipeline, resume_after=token, max_await_time_ms=1000) as stream:
+                    if change_feed.source != "change_stream":
+                        change_feed.source = "change_stream"
+                        logger.info("Publishing change events from the MongoDB change stream")
+                    while not self._stop.is_set() and stream.alive:
+                        event = stream.try_next()
+                        if event is None:
+                            continue
+                        token = stream.resume_token
+                        self._publish(event)
+                        if event["operationType"] == "invalidate":
+                            token = None
+                            break
+            except PyMongoError as e:
+                logger.error(f"Change stream failed, falling back to write-path events: {str(e)}")
+                change_feed.source = "app"
+                # Changes made while the stream was down were not reported.
+                change_feed.reset()
+                token = None
+                self._stop.wait(5)
+
+    @staticmethod
+    def _publish(event: dict) -> None:
+        resource = (event.get("ns") or {}).get("coll")
+        op = _STREAM_OPS.get(event["operationType"])
+        if op:
+            change_feed.publish(resource, event["documentKey"]["_id"], op, source="change_stream")
+        elif resource in RESOURCES:
+            change_feed.publish(resource, None, "reset", source="change_stream")
+        else:
+            # Database-level events (dropDatabase, invalidate).
+            change_feed.reset()
+
+
+change_stream_watcher = ChangeStreamWatcher()
+
+
+async def stream_changes(subscription: Subscription, last_event_id: int | None = None):
+    """
+    Yield server-sent events for a subscription: first the changes after
+    last_event_id (if given), then live changes, with a comment every
+    CHANGE_FEED_HEARTBEAT_SECONDS to keep proxies from closing an idle connection.
+    Unsubscribes when the client goes away.
+    """
+    try:
+        current = change_feed.stats()["version"]
+        # An id ahead of the feed gets resets from since(); live events are then numbered from current.
+        sent = min(last_event_id, current) if last_event_id is not None else current
+        yield f"retry: 3000\nid: {sent}\n\n"
+        backlog = change_feed.since(last_event_id, subscription.resources) if last_event_id is not None else []
+        while True:
+            for change in backlog:
+                # Events replayed from the history may also be queued.
+                if change.version > sent or change.op == "reset":
+                    sent = max(sent, change.version)
+                    yield f"id: {change.version}\nevent: change\ndata: {change.to_json()}\n\n"
+            try:
+                backlog = [await asyncio.wait_for(subscription.queue.get(), settings.CHANGE_FEED_HEARTBEAT_SECONDS)]
+            except asyncio.TimeoutError:
+                backlog = []
+                yield f": keep-alive {int(time.time())}\n\n"
+    finally:
+        change_feed.unsubscribe(subscription)
@@ -0,0 +1,93 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+When many clients load the same page at once, each would issue the same MongoDB
+query. SingleFlight.run() lets the first caller for a key (the leader) run the
+query in the threadpool; callers arriving with the same key while it is in flight
+(followers) await the leader's result instead of querying themselves. Nothing is
+cached: once the leader finishes, the next caller queries again, so a read never
+returns data older than a query that was already running when it arrived.
+
+Results are shared between requests, so the functions passed in should return
+values nobody mutates (response models, not Documents).
+"""
+import asyncio
+import logging
+from collections import Counter
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from core.metrics import record_single_flight
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a flight name and key.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._in_flight: dict[tuple, asyncio.Future] = {}
+        self._counts = Counter()
+
+    async def run(self, flight: str, key, func, *args):
+        """
+        Run func(*args) in the threadpool, or join an identical call already in flight.
+
+        Args:
+            flight (str): Name of the read, e.g. "companies.get"; also the metrics label.
+            key: Hashable identity of the call within the flight (ids, filters, paging).
+            func: The blocking read.
+
+        Returns:
+            The result of the leader's call; its exception is raised to every caller.
+        """
+        if not self.enabled:
+            return await run_in_threadpool(func, *args)
+        flight_key = (flight, key)
+        while (future := self._in_flight.get(flight_key)) is not None:
+            self._record(flight, "follower")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader's client went away before it finished; start over.
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = future
+        self._record(flight, "leader")
+        try:
+            result = await run_in_threadpool(func, *args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved so a failure nobody else waited for is not logged twice.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[flight_key]
+
+    def _record(self, flight: str, role: str) -> None:
+        self._counts[(flight, role)] += 1
+        record_single_flight(flight, role)
+
+    def stats(self) -> dict:
+        """
+        Return leader and follower counts per flight, and the share of calls that were coalesced.
+        """
+        flights = {}
+        for (flight, role), count in self._counts.items():
+            flights.setdefault(flight, {"leader": 0, "follower": 0})[role] = count
+        for counts in flights.values():
+            counts["coalesced_ratio"] = round(counts["follower"] / (counts["leader"] + counts["follower"]), 3)
+        return {"enabled": self.enabled, "in_flight": len(self._in_flight), "flights": flights}
+
+
+single_flight = SingleFlight(settings.COALESCE_READS_ENABLED)
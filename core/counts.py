@@ -0,0 +1,89 @@
+"""
+Totals for paginated lists, reported in headers when a client asks for them.
+
+List endpoints take `include_total=true` and then answer with X-Total-Count;
+without it they skip counting altogether.
+
+- Unfiltered lists use estimated_document_count(), which reads collection
+  metadata instead of scanning, so even a huge collection costs nothing.
+- Filtered lists run count_documents() on the (indexed) filter, cached per
+  filter set for COUNT_CACHE_SECONDS and stopped at COUNT_MAX_EXACT.
+
+Whenever the number is not exact, X-Total-Count-Estimated: true is sent too.
+Past COUNT_MAX_EXACT the header reports that limit, meaning "at least this many".
+"""
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Response
+from config import settings
+from core.metrics import record_cache
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_ESTIMATED_HEADER = "X-Total-Count-Estimated"
+
+
+class CountCache:
+    """
+    Short-lived cache of filtered counts, keyed by collection and filter values.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, int, bool]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, document_cls, filters: dict) -> tuple[int, bool]:
+        """
+        Count the documents a list query matches.
+
+        Args:
+            document_cls: The Document class listed.
+            filters (dict): The list's mongoengine filters; None values are ignored.
+
+        Returns:
+            tuple[int, bool]: The total and whether it is estimated.
+        """
+        active = {key: value for key, value in filters.items() if value is not None}
+        collection = document_cls._get_collection()
+        if not active:
+            return collection.estimated_document_count(), True
+
+        key = (collection.name, tuple(sorted(active.items())))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                record_cache("counts", True)
+                return entry[1], entry[2]
+        record_cache("counts", False)
+
+        query = document_cls.objects(**active)._query
+        total = collection.count_documents(query, limit=settings.COUNT_MAX_EXACT + 1)
+        estimated = total > settings.COUNT_MAX_EXACT
+        total = min(total, settings.COUNT_MAX_EXACT)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, total, estimated)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total, estimated
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache(settings.COUNT_CACHE_SECONDS, settings.COUNT_CACHE_SIZE)
+
+
+def set_total_headers(response: Response, total: tuple[int, bool]) -> None:
+    """
+    Add X-Total-Count (and X-Total-Count-Estimated when approximate) to a list response.
+    """
+    count, estimated = total
+    response.headers[TOTAL_COUNT_HEADER] = str(count)
+    if estimated:
+        response.headers[TOTAL_ESTIMATED_HEADER] = "true"
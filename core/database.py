@@ -0,0 +1,304 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from importlib.util import find_spec
+from mongoengine import connect
+from mongoengine.connection import get_db
+from pymongo import MongoClient, ReadPreference, monitoring
+from config import settings
+from core.mongo_commands import command_tracker
+from core.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+# Collections that drop_database() keeps.
+PRESERVED_COLLECTIONS = ("jobs",)
+
+# Compressors that need an optional third-party module to be importable.
+_COMPRESSOR_MODULES = {
+    "zstd": "zstandard",
+    "snappy": "snappy",
+}
+
+_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener that keeps running counters of pool usage.
+
+    Check-out wait time is measured between the check-out started and checked-out
+    events, which pymongo always emits from the thread requesting the connection.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wait_samples = deque(maxlen=max_samples)
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts_total = 0
+        self.checkout_failures = 0
+        self.pools_cleared = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def snapshot(self) -> dict:
+        """
+        Return a point-in-time copy of the pool counters.
+
+        Returns:
+            dict: Current pool usage and check-out wait statistics (in milliseconds).
+        """
+        with self._lock:
+            samples = sorted(self._wait_samples)
+            checkouts = self.checkouts_total
+            return {
+                "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+                "min_pool_size": settings.MONGODB_MIN_POOL_SIZE,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "checkouts_total": checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pools_cleared": self.pools_cleared,
+                "wait_ms_avg": round(self.wait_time_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_ms_p95": round(percentile(samples, 95) * 1000, 3),
+                "wait_ms_max": round(self.wait_time_max * 1000, 3),
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        waited = time.perf_counter() - started if started is not None else 0.0
+        self._local.started = None
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts_total += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+            self._wait_samples.append(waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+
+pool_metrics = PoolMetricsListener()
+
+
+def available_compressors() -> list[str]:
+    """
+    Return the configured wire compressors whose support modules are installed.
+
+    Returns:
+        list[str]: Compressor names in the configured order of preference.
+    """
+    compressors = []
+    for name in (c.strip() for c in settings.MONGODB_COMPRESSORS.split(",")):
+        if not name:
+            continue
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and find_spec(module) is None:
+            logger.info(f"Skipping '{name}' wire compression: the '{module}' package is not installed")
+            continue
+        compressors.append(name)
+    return compressors
+
+
+def read_preference(name: str):
+    """
+    Resolve a read preference name from settings to a pymongo read preference.
+
+    Args:
+        name (str): One of primary, primaryPreferred, secondary, secondaryPreferred or nearest.
+
+    Returns:
+        The matching pymongo read preference.
+    """
+    try:
+        return _READ_PREFERENCES[name]
+    except KeyError:
+        raise ValueError(f"Unknown read preference '{name}'. Expected one of: {', '.join(_READ_PREFERENCES)}")
+
+
+def connection_options() -> dict:
+    """
+    Build the MongoClient keyword arguments from the pool settings.
+
+    Returns:
+        dict: Keyword arguments passed through mongoengine's connect() to MongoClient.
+    """
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGODB_SOCKET_TIMEOUT_MS,
+        "read_preference": read_preference(settings.MONGODB_READ_PREFERENCE),
+        "event_listeners": [pool_metrics, command_tracker],
+    }
+    compressors = available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def connect_db():
+    """
+    Register the default mongoengine connection using the configured pool settings.
+
+    Returns:
+        MongoClient: The pooled client shared by every request.
+    """
+    return connect(db=settings.DATABASE_NAME, host=settings.MONGODB_URI, **connection_options())
+
+
+def analytics(queryset):
+    """
+    Route a read-only queryset to the analytics read preference.
+
+    Use this for reports, exports and scans that tolerate replication lag, so that
+    they are served by secondaries while writes and interactive reads stay on the primary.
+
+    Args:
+        queryset (QuerySet): The mongoengine queryset to route.
+
+    Returns:
+        QuerySet: A clone of the queryset with the analytics read preference applied.
+    """
+    return queryset.read_preference(read_preference(settings.MONGODB_ANALYTICS_READ_PREFERENCE))
+
+
+def analytics_collection(document_cls):
+    """
+    Return the raw pymongo collection of a document class, routed like analytics().
+
+    Args:
+        document_cls: The mongoengine Document class.
+
+    Returns:
+        Collection: The collection with the analytics read preference applied.
+    """
+    return document_cls._get_collection().with_options(
+        read_preference=read_preference(settings.MONGODB_ANALYTICS_READ_PREFERENCE)
+    )
+
+
+def supports_transactions(client) -> bool:
+    """
+    Return whether the deployment behind `client` supports multi-document transactions.
+    """
+    return isinstance(client, MongoClient) and \
+        client.topology_description.topology_type_name in ("ReplicaSetWithPrimary", "Sharded")
+
+
+@contextmanager
+def transaction(client=None):
+    """
+    Yield a session inside an open transaction, or None when the deployment
+    (a standalone server) does not support transactions.
+
+    Pass the yielded value as `session=` to every operation that belongs to it.
+    """
+    client = client if client is not None else get_db().client
+    if not supports_transactions(client):
+        yield None
+        return
+    with client.start_session() as session:
+        with session.start_transaction():
+            yield session
+
+
+def document_models() -> list:
+    """
+    Return the Document classes backing the application collections.
+
+    Returns:
+        list: The User, Company, Contact, Campaign and Email document classes.
+    """
+    from models import User, Company, Contact, Campaign, Email
+    return [User, Company, Contact, Campaign, Email]
+
+
+def drop_database() -> None:
+    """
+    Drop the application data on the existing pooled client and recreate indexes.
+
+    The global connection is kept open, so requests in flight keep their pool
+    instead of racing a disconnect/reconnect. Collections in PRESERVED_COLLECTIONS
+    survive, so a reset running as a background job can still record its result.
+    """
+    db = get_db()
+    for name in db.list_collection_names():
+        if name not in PRESERVED_COLLECTIONS and not name.startswith("system."):
+            db.drop_collection(name)
+    for model in document_models():
+        model._disconnect()
+        model.ensure_indexes()
+    logger.info(f"Dropped the collections of database '{db.name}' and recreated indexes")
+
+
+def index_report(create_missing: bool = False) -> list[dict]:
+    """
+    Compare the indexes declared in each model's meta with those on the server.
+
+    Args:
+        create_missing (bool): Build any declared index the server does not have.
+
+    Returns:
+        list[dict]: Per collection, the declared, existing and missing key patterns.
+    """
+    report = []
+    for model in document_models():
+        if create_missing:
+            model.ensure_indexes()
+        existing = [list(info["key"]) for info in model._get_collection().index_information().values()]
+        declared = [list(spec["fields"]) for spec in model._meta.get("index_specs") or []]
+        report.append({
+            "collection": model._meta["collection"],
+            "declared": declared,
+            "existing": existing,
+            "missing": [fields for fields in declared if fields not in existing],
+        })
+    return report
@@ -0,0 +1,480 @@
+"""
+Synthetic data generator for scale and capacity testing.
+
+    python -m core.datagen --users 200 --companies-per-user 100 --contacts-per-company 50 --out data.ndjson
+    python -m core.datagen --users 200 --companies-per-user 100 --contacts-per-company 50 --mongo --drop
+    python -m core.datagen --load data.ndjson
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+from werkzeug.security import generate_password_hash
+from core.identity import blocking_keys
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ("users", "companies", "contacts", "campaigns", "emails")
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Karen",
+    "Wei", "Priya", "Ahmed", "Fatima", "Hiroshi", "Yuki", "Olga", "Ivan", "Lucas", "Sofia", "Mateo", "Amara",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Chen", "Patel", "Khan", "Tanaka", "Sato", "Ivanova", "Novak", "Silva", "Rossi", "Okafor", "Nguyen",
+]
+TITLES = [
+    "CEO", "CTO", "CFO", "COO", "VP Sales", "VP Marketing", "VP Engineering", "Head of Procurement",
+    "Director of Operations", "Sales Manager", "Account Executive", "Engineering Manager", "IT Director",
+    "Product Manager", "Marketing Manager", "Operations Analyst",
+]
+INDUSTRIES = {
+    "Technology": ["Software Development", "Cloud Services", "Cybersecurity", "Hardware"],
+    "Energy": ["Renewable Energy", "Oil & Gas", "Utilities"],
+    "Healthcare": ["Hospitals", "Medical Devices", "Pharmaceuticals"],
+    "Finance": ["Banking", "Insurance", "Asset Management"],
+    "Retail": ["E-commerce", "Grocery", "Apparel"],
+    "Manufacturing": ["Automotive", "Industrial Equipment", "Chemicals"],
+}
+NAME_PARTS = [
+    "North", "Blue", "Green", "Bright", "Summit", "River", "Apex", "Nova", "Silver", "Iron", "Pioneer",
+    "Quantum", "Cedar", "Harbor", "Vertex", "Atlas", "Crest", "Lumen", "Orbit", "Prime",
+]
+NAME_SUFFIXES = ["Labs", "Systems", "Solutions", "Group", "Partners", "Industries", "Works", "Dynamics"]
+COMPANY_FORMS = ["Inc.", "LLC", "Co.", "Ltd."]
+AI_MODELS = ["openrouter/anthropic/claude-3.5-sonnet", "gpt-4o-mini", "claude-3-haiku", "gpt-3.5-turbo"]
+
+
+@dataclass
+class GeneratorConfig:
+    """
+    Sizes and shape of a generated data set.
+
+    The per-parent counts are means: actual counts follow a Pareto distribution
+    (lower `skew` means a heavier tail), so a few users own most companies and a
+    few companies hold most contacts, as in real CRM data.
+    """
+    users: int = 10
+    companies_per_user: float = 20
+    contacts_per_company: float = 10
+    campaigns_per_user: float = 3
+    emails_per_contact: float = 1
+    skew: float = 1.5
+    days: int = 180
+    seed: int = 42
+
+    def expected_counts(self) -> dict:
+        companies = round(self.users * self.companies_per_user)
+        contacts = round(companies * self.contacts_per_company)
+        campaigns = round(self.users * self.campaigns_per_user)
+        return {
+            "users": self.users,
+            "companies": companies,
+            "contacts": contacts,
+            "campaigns": campaigns,
+            # Emails need a campaign to belong to.
+            "emails": round(contacts * self.emails_per_contact) if campaigns else 0,
+        }
+
+
+def skewed_counts(rng: random.Random, items: int, total: int, skew: float) -> list[int]:
+    """
+    Split `total` into `items` non-negative integers following a Pareto distribution.
+
+    Args:
+        rng (random.Random): Random source.
+        items (int): Number of buckets.
+        total (int): Sum of all buckets.
+        skew (float): Pareto shape; values near 1 are very skewed, large values are nearly uniform.
+
+    Returns:
+        list[int]: Bucket sizes summing to `total`.
+    """
+    if items <= 0:
+        return []
+    weights = [rng.paretovariate(skew) for _ in range(items)]
+    scale = total / sum(weights)
+    exact = [weight * scale for weight in weights]
+    counts = [int(value) for value in exact]
+    # Largest remainder rounding keeps the sum exact.
+    remainders = sorted(range(items), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in remainders[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _apportion(total: int, weights: list[int]) -> list[int]:
+    """
+    Split `total` in proportion to integer weights; the parts sum to `total` exactly.
+    """
+    weight_sum = sum(weights)
+    if not weight_sum:
+        return [0] * len(weights)
+    parts, done, cumulative = [], 0, 0
+    for weight in weights:
+        cumulative += weight
+        upto = total * cumulative // weight_sum
+        parts.append(upto - done)
+        done = upto
+    return parts
+
+
+class DataGenerator:
+    """
+    Streams referentially consistent documents in insertion order: each user is
+    followed by its companies, their contacts, the user's campaigns and the emails
+    sent to its contacts, so memory use does not grow with the data set.
+
+    Documents are produced in their stored MongoDB form (the same shape MongoEngine
+    writes for the models), ready for insert_many.
+    """
+
+    def __init__(self, config: GeneratorConfig, now: datetime | None = None):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.now = now or datetime.now(timezone.utc)
+        self.password_hash = generate_password_hash("password123")
+        self._run = f"{config.seed:x}"
+
+    def _created_at(self) -> datetime:
+        # Recent activity is denser than old activity.
+        age = min(self.rng.expovariate(3 / self.config.days), self.config.days)
+        return self.now - timedelta(days=age)
+
+    def _object_id(self) -> ObjectId:
+        # Drawn from the seeded generator, so a run with the same seed and `now`
+        # reproduces the same ids and a resumed load can skip what it already wrote.
+        return ObjectId(int(self.now.timestamp()).to_bytes(4, "big") + self.rng.getrandbits(64).to_bytes(8, "big"))
+
+    def _user(self, n: int) -> dict:
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        username = f"{first.lower()}.{last.lower()}.{self._run}.{n}"
+        return {
+            "_id": str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+            "email": f"{username}@salesmanager.example",
+            "username": username,
+            "first_name": first,
+            "last_name": last,
+            "password_hash": self.password_hash,
+            "is_active": self.rng.random() > 0.05,
+        }
+
+    def _company(self, n: int, user_id: str) -> dict:
+        name = f"{self.rng.choice(NAME_PARTS)} {self.rng.choice(NAME_PARTS)} {self.rng.choice(NAME_SUFFIXES)}"
+        domain = f"{name.lower().replace(' ', '')}{n}.example.com"
+        industry = self.rng.choice(list(INDUSTRIES))
+        return {
+            "_id": self._object_id(),
+            "name": f"{name} {self.rng.choice(COMPANY_FORMS)} {n}",
+            "website": f"https://{domain}",
+            "domain": domain,
+            "primary_industry": industry,
+            "primary_sub_industry": self.rng.choice(INDUSTRIES[industry]),
+            "zoom_id": f"cmp-{self._run}-{n}",
+            "user": user_id,
+        }
+
+    def _contact(self, n: int, user_id: str, company: dict) -> dict:
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        domain = company["website"].split("://", 1)[1]
+        email = f"{first.lower()}.{last.lower()}.{n}@{domain}"
+        return {
+            "_id": self._object_id(),
+            "first_name": first,
+            "last_name": last,
+            "email": email,
+            "title": self.rng.choice(TITLES),
+            "zoom_id": f"cnt-{self._run}-{n}",
+            "user": user_id,
+            "company": company["_id"],
+            "dedup_keys": blocking_keys(first, last, email, company["_id"], user_id),
+            "dedup_checked": False,
+        }
+
+    def _campaign(self, n: int, user_id: str) -> dict:
+        created_at = self._created_at()
+        product = f"{self.rng.choice(NAME_PARTS)} {self.rng.choice(['Cloud', 'Analytics', 'Platform', 'Suite'])}"
+        return {
+            "_id": str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+            "campaign_name": f"{product} outreach {n}",
+            "campaign_context": f"We are introducing {product} to companies that want to grow revenue. "
+                                f"Highlight faster onboarding, lower cost and proven results.",
+            "campaign_template_body": "Hi {first_name},\n\nI noticed {company_name} is growing quickly...",
+            "campaign_template_title": f"{product} for {{company_name}}",
+            "created_at": created_at,
+            "updated_at": created_at,
+            "user": user_id,
+        }
+
+    def _email(self, contact: dict, company: dict, campaign: dict) -> dict:
+        tokens_sent = self.rng.randint(300, 1500)
+        return {
+            "_id": self._object_id(),
+            "company": {"company_id": company["_id"], "name": company["name"], "zoom_id": company["zoom_id"],
+                        "website": company["website"]},
+            "contact": {"contact_id": contact["_id"], "first_name": contact["first_name"],
+                        "last_name": contact["last_name"], "email": contact["email"], "title": contact["title"]},
+            "subject": campaign["campaign_template_title"].replace("{company_name}", company["name"]),
+            "body": f"Hi {contact['first_name']},\n\n{campaign['campaign_context']}",
+            "ai_model": self.rng.choice(AI_MODELS),
+            "tokens_sent": tokens_sent,
+            "tokens_returned": self.rng.randint(150, 600),
+            "generation_time": round(self.rng.lognormvariate(0.5, 0.6), 3),
+            "full_prompt": f"{campaign['campaign_context']}\n\n{campaign['campaign_template_body']}",
+            "created_at": max(self._created_at(), campaign["created_at"]),
+            "campaign_id": campaign["_id"],
+        }
+
+    def generate(self) -> Iterator[tuple[str, dict]]:
+        """
+        Yield (collection name, document) pairs.
+        """
+        config, rng = self.config, self.rng
+        totals = config.expected_counts()
+        companies_per_user = skewed_counts(rng, config.users, totals["companies"], config.skew)
+        campaigns_per_user = skewed_counts(rng, config.users, totals["campaigns"], config.skew)
+        # Contacts and emails are split by each user's share of the parents, so the
+        # totals match expected_counts() however fractional the means are.
+        contacts_per_user = _apportion(totals["contacts"], companies_per_user)
+        if totals["emails"] and not any(c for c, n in zip(campaigns_per_user, contacts_per_user) if n):
+            # Emails only go out under their owner's campaigns: give one to the user with the most contacts.
+            campaigns_per_user[campaigns_per_user.index(max(campaigns_per_user))] -= 1
+            campaigns_per_user[contacts_per_user.index(max(contacts_per_user))] += 1
+        emails_per_user = _apportion(totals["emails"],
+                                     [n if c else 0 for c, n in zip(campaigns_per_user, contacts_per_user)])
+        company_n = contact_n = campaign_n = 0
+        for user_n in range(config.users):
+            user = self._user(user_n)
+            yield "users", user
+            campaigns = []
+            for _ in range(campaigns_per_user[user_n]):
+                campaign = self._campaign(campaign_n, user["_id"])
+                campaign_n += 1
+                campaigns.append(campaign)
+                yield "campaigns", campaign
+            companies = [self._company(company_n + i, user["_id"]) for i in range(companies_per_user[user_n])]
+            company_n += len(companies)
+            contacts_per_company = skewed_counts(rng, len(companies), contacts_per_user[user_n], config.skew)
+            emails_per_company = _apportion(emails_per_user[user_n], contacts_per_company)
+            for company, contact_count, email_total in zip(companies, contacts_per_company, emails_per_company):
+                yield "companies", company
+                contacts = [self._contact(contact_n + i, user["_id"], company) for i in range(contact_count)]
+                contact_n += len(contacts)
+                emails_per_contact = skewed_counts(rng, len(contacts), email_total, config.skew)
+                for contact, email_count in zip(contacts, emails_per_contact):
+                    yield "contacts", contact
+                    for _ in range(email_count):
+                        yield "emails", self._email(contact, company, rng.choice(campaigns))
+
+
+def _to_extended_json(value):
+    # Only the BSON types the generator produces; json.dumps with this hook is
+    # several times faster than bson.json_util.dumps.
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _from_extended_json(value: dict):
+    if len(value) == 1:
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+        if "$date" in value:
+            return json_util.object_hook(value)
+    return value
+
+
+class NdjsonSink:
+    """
+    Writes documents as NDJSON lines of {"collection": ..., "document": ...} in
+    MongoDB Extended JSON, so ObjectIds and dates survive a round trip.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.counts = {name: 0 for name in COLLECTIONS}
+
+    def write(self, collection: str, document: dict) -> None:
+        self.file.write(json.dumps({"collection": collection, "document": document}, default=_to_extended_json))
+        self.file.write("\n")
+        self.counts[collection] += 1
+
+    def close(self) -> None:
+        self.file.flush()
+
+
+class MongoSink:
+    """
+    Buffers documents per collection and writes them with unordered insert_many
+    batches on a small thread pool, so generation overlaps with database I/O.
+    """
+
+    def __init__(self, db, batch_size: int = 5000, workers: int = 4, ignore_duplicates: bool = False):
+        self.db = db
+        self.batch_size = batch_size
+        self.ignore_duplicates = ignore_duplicates
+        self.counts = {name: 0 for name in COLLECTIONS}
+        self._buffers = {name: [] for name in COLLECTIONS}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="datagen-insert")
+        self._pending = []
+        self._max_pending = workers * 2
+
+    def write(self, collection: str, document: dict) -> None:
+        buffer = self._buffers[collection]
+        buffer.append(document)
+        if len(buffer) >= self.batch_size:
+            self._flush(collection)
+
+    def _flush(self, collection: str) -> None:
+        batch = self._buffers[collection]
+        if not batch:
+            return
+        self._buffers[collection] = []
+        self._pending.append(self._executor.submit(self._insert, collection, batch))
+        self.counts[collection] += len(batch)
+        # Bound memory: wait for the oldest batches when too many are in flight.
+        while len(self._pending) > self._max_pending:
+            self._pending.pop(0).result()
+
+    def _insert(self, collection: str, batch: list) -> None:
+        try:
+            self.db[collection].insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Replaying a partially loaded run: documents that already exist are skipped.
+            if not self.ignore_duplicates or any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    def drain(self) -> None:
+        """
+        Write every buffered document and wait until all batches are stored.
+        """
+        for collection in COLLECTIONS:
+            self._flush(collection)
+        for future in self._pending:
+            future.result()
+        self._pending = []
+
+    def close(self) -> None:
+        self.drain()
+        self._executor.shutdown(wait=True)
+
+
+def generate_to(sink, config: GeneratorConfig) -> dict:
+    """
+    Stream a generated data set into a sink.
+
+    Args:
+        sink: An NdjsonSink or MongoSink.
+        config (GeneratorConfig): Data set sizes.
+
+    Returns:
+        dict: Documents written per collection, elapsed seconds and documents per second.
+    """
+    started = time.perf_counter()
+    try:
+        for collection, document in DataGenerator(config).generate():
+            sink.write(collection, document)
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - started
+    total = sum(sink.counts.values())
+    logger.info(f"Generated {total} documents in {elapsed:.1f}s: {sink.counts}")
+    return {
+        "counts": dict(sink.counts),
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_sec": round(total / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def load_ndjson(file, db, batch_size: int = 5000, workers: int = 4) -> dict:
+    """
+    Load an NDJSON file produced by NdjsonSink into the database.
+
+    Returns:
+        dict: Documents inserted per collection.
+    """
+    sink = MongoSink(db, batch_size=batch_size, workers=workers)
+    try:
+        for line in file:
+            if line.strip():
+                record = json.loads(line, object_hook=_from_extended_json)
+                sink.write(record["collection"], record["document"])
+    finally:
+        sink.close()
+    return dict(sink.counts)
+
+
+def parse_args(argv=None):
+    defaults = GeneratorConfig()
+    parser = argparse.ArgumentParser(description="Generate synthetic Sales Manager data.")
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--companies-per-user", type=float, default=defaults.companies_per_user)
+    parser.add_argument("--contacts-per-company", type=float, default=defaults.contacts_per_company)
+    parser.add_argument("--campaigns-per-user", type=float, default=defaults.campaigns_per_user)
+    parser.add_argument("--emails-per-contact", type=float, default=defaults.emails_per_contact)
+    parser.add_argument("--skew", type=float, default=defaults.skew)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="Write NDJSON to this file ('-' for stdout)")
+    target.add_argument("--mongo", action="store_true", help="Insert into the configured database")
+    target.add_argument("--load", help="Load an NDJSON file into the configured database")
+    parser.add_argument("--drop", action="store_true", help="Drop the database first (with --mongo/--load)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = GeneratorConfig(
+        users=args.users,
+        companies_per_user=args.companies_per_user,
+        contacts_per_company=args.contacts_per_company,
+        campaigns_per_user=args.campaigns_per_user,
+        emails_per_contact=args.emails_per_contact,
+        skew=args.skew,
+        days=args.days,
+        seed=args.seed,
+    )
+    if args.out:
+        print(f"Expected: {config.expected_counts()}", file=sys.stderr)
+        if args.out == "-":
+            result = generate_to(NdjsonSink(sys.stdout), config)
+        else:
+            with open(args.out, "w") as file:
+                result = generate_to(NdjsonSink(file), config)
+        print(json.dumps(result), file=sys.stderr)
+        return 0
+
+    from mongoengine.connection import get_db
+    from core.database import connect_db, drop_database
+    connect_db()
+    if args.drop:
+        drop_database()
+    if args.load:
+        with open(args.load) as file:
+            print(json.dumps(load_ndjson(file, get_db(), args.batch_size, args.workers)))
+    else:
+        print(f"Expected: {config.expected_counts()}")
+        print(json.dumps(generate_to(MongoSink(get_db(), args.batch_size, args.workers), config)))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Named database snapshots, for resetting demo and staging environments quickly.
+
+    python -m core.db_snapshots create demo
+    python -m core.db_snapshots restore demo
+    python -m core.db_snapshots list
+
+A snapshot is a directory under SNAPSHOT_DIR holding one gzip-compressed stream
+of BSON documents per collection (<collection>.bson.gz, the same layout as
+`mongodump --gzip`) and a manifest.json with document counts and the collection's
+index definitions. Documents are streamed in and out, so memory use does not
+depend on the snapshot size.
+
+Restoring drops the snapshot's collections, loads them with unordered insert_many
+batches on SNAPSHOT_RESTORE_WORKERS threads and only then builds the indexes, all
+collections' in parallel, which is far faster than maintaining them per insert.
+A snapshot taken while the application writes is not point-in-time consistent;
+take it from a quiet environment.
+"""
+import argparse
+import gzip
+import logging
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+import bson
+from bson import json_util
+from mongoengine.connection import get_db
+from pymongo import IndexModel
+from config import settings
+from core.database import document_models
+from core.datagen import COLLECTIONS, MongoSink
+from core.jobs import JobContext, job_handler
+from core.seeding import reset_derived_state
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# index_information() entries that are not IndexModel options.
+_INDEX_INFO_KEYS = ("key", "v", "ns")
+
+
+class SnapshotNotFound(LookupError):
+    pass
+
+
+def snapshot_path(name: str) -> Path:
+    """
+    Return the directory of a named snapshot.
+
+    Raises:
+        ValueError: If the name is not 1-64 letters, digits, '.', '_' or '-'.
+    """
+    if not _NAME_PATTERN.match(name or ""):
+        raise ValueError(f"Invalid snapshot name '{name}'")
+    return Path(settings.SNAPSHOT_DIR) / name
+
+
+def _data_file(directory: Path, collection: str) -> Path:
+    return directory / f"{collection}.bson.gz"
+
+
+def _indexes(collection) -> list[dict]:
+    return [
+        {"name": name, "key": [list(part) for part in info["key"]],
+         "options": {key: value for key, value in info.items() if key not in _INDEX_INFO_KEYS}}
+        for name, info in collection.index_information().items() if name != "_id_"
+    ]
+
+
+def read_manifest(name: str) -> dict:
+    path = snapshot_path(name) / MANIFEST_FILE
+    if not path.is_file():
+        raise SnapshotNotFound(f"Snapshot '{name}' not found")
+    return json_util.loads(path.read_text())
+
+
+def list_snapshots() -> list[dict]:
+    """
+    Return the manifests of all snapshots (without index details), newest first.
+    """
+    root = Path(settings.SNAPSHOT_DIR)
+    snapshots = []
+    for directory in root.iterdir() if root.is_dir() else []:
+        if (directory / MANIFEST_FILE).is_file():
+            manifest = read_manifest(directory.name)
+            snapshots.append({
+                "name": manifest["name"],
+                "created_at": manifest["created_at"],
+                "documents": {name: entry["documents"] for name, entry in manifest["collections"].items()},
+                "bytes": sum(entry["bytes"] for entry in manifest["collections"].values()),
+            })
+    return sorted(snapshots, key=lambda snapshot: snapshot["created_at"], reverse=True)
+
+
+def create_snapshot(name: str, overwrite: bool = False, ctx: JobContext | None = None) -> dict:
+    """
+    Dump the application collections and their indexes to a named snapshot.
+
+    The snapshot is written to a temporary directory and renamed into place, so a
+    failed dump never replaces a good snapshot.
+
+    Args:
+        name (str): Snapshot name.
+        overwrite (bool): Replace an existing snapshot of that name.
+        ctx (JobContext | None): Job context for progress.
+
+    Returns:
+        dict: The manifest.
+
+    Raises:
+        FileExistsError: If the snapshot exists and overwrite is not set.
+    """
+    target = snapshot_path(name)
+    if target.exists() and not overwrite:
+        raise FileExistsError(f"Snapshot '{name}' already exists")
+    db = get_db()
+    partial = target.with_name(f".{name}.partial")
+    shutil.rmtree(partial, ignore_errors=True)
+    partial.mkdir(parents=True)
+    started = time.perf_counter()
+    total = sum(db[collection].estimated_document_count() for collection in COLLECTIONS)
+    done = 0
+    manifest = {"name": name, "created_at": datetime.now(timezone.utc), "database": db.name, "collections": {}}
+    try:
+        for collection in COLLECTIONS:
+            count = 0
+            path = _data_file(partial, collection)
+            with gzip.open(path, "wb", compresslevel=settings.SNAPSHOT_COMPRESSION_LEVEL) as file:
+                for document in db[collection].find(batch_size=settings.SNAPSHOT_BATCH_SIZE):
+                    file.write(bson.encode(document))
+                    count += 1
+                    if ctx and count % settings.SNAPSHOT_BATCH_SIZE == 0:
+                        ctx.progress(done + count, total, f"Dumped {done + count} of ~{total} documents")
+            done += count
+            manifest["collections"][collection] = {"documents": count, "bytes": path.stat().st_size,
+                                                   "indexes": _indexes(db[collection])}
+            logger.info(f"Dumped {count} {collection} into snapshot '{name}'")
+        (partial / MANIFEST_FILE).write_text(json_util.dumps(manifest, indent=2))
+        if target.exists():
+            shutil.rmtree(target)
+        partial.rename(target)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    logger.info(f"Created snapshot '{name}' ({done} documents) in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def restore_snapshot(name: str, ctx: JobContext | None = None) -> dict:
+    """
+    Replace the application collections with a snapshot's contents.
+
+    Args:
+        name (str): Snapshot name.
+        ctx (JobContext | None): Job context for progress.
+
+    Returns:
+        dict: Documents restored per collection and the load and index build times.
+
+    Raises:
+        SnapshotNotFound: If there is no such snapshot.
+    """
+    manifest = read_manifest(name)
+    directory = snapshot_path(name)
+    db = get_db()
+    started = time.perf_counter()
+    collections = list(manifest["collections"])
+    total = sum(entry["documents"] for entry in manifest["collections"].values())
+    for collection in collections:
+        db.drop_collection(collection)
+
+    # Load with no secondary indexes in place; they are built once at the end.
+    sink = MongoSink(db, batch_size=settings.SNAPSHOT_BATCH_SIZE, workers=settings.SNAPSHOT_RESTORE_WORKERS)
+    done = 0
+    try:
+        for collection in collections:
+            with gzip.open(_data_file(directory, collection), "rb") as file:
+                for document in bson.decode_file_iter(file):
+                    sink.write(collection, document)
+                    done += 1
+                    if ctx and done % settings.SNAPSHOT_BATCH_SIZE == 0:
+                        ctx.progress(0.9 * done / max(total, 1), message=f"Restored {done} of {total} documents")
+    finally:
+        sink.close()
+    loaded = time.perf_counter()
+    if ctx:
+        ctx.progress(0.9, message="Building indexes")
+
+    models = {model._get_collection_name(): model for model in document_models()}
+
+    def build_indexes(collection: str) -> None:
+        # The indexes the model declares today first, then any others the snapshot had
+        # (such as the email TTL index).
+        model = models.get(collection)
+        if model is not None:
+            model._disconnect()
+            model.ensure_indexes()
+        existing = db[collection].index_information()
+        indexes = [IndexModel([tuple(part) for part in index["key"]], name=index["name"], **index["options"])
+                   for index in manifest["collections"][collection]["indexes"] if index["name"] not in existing]
+        if indexes:
+            db[collection].create_indexes(indexes)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(collections)), thread_name_prefix="snapshot-index") as executor:
+        list(executor.map(build_indexes, collections))
+    finished = time.perf_counter()
+
+    reset_derived_state()
+    logger.info(f"Restored snapshot '{name}' ({done} documents) in {finished - started:.1f}s")
+    return {
+        "snapshot": name,
+        "restored": dict(sink.counts),
+        "load_s": round(loaded - started, 3),
+        "index_s": round(finished - loaded, 3),
+        "elapsed_s": round(finished - started, 3),
+    }
+
+
+def delete_snapshot(name: str) -> None:
+    read_manifest(name)
+    shutil.rmtree(snapshot_path(name))
+    logger.info(f"Deleted snapshot '{name}'")
+
+
+@job_handler("create_snapshot")
+def run_create_snapshot(ctx: JobContext) -> dict:
+    manifest = create_snapshot(ctx.params["name"], ctx.params.get("overwrite", False), ctx)
+    return {"snapshot": manifest["name"],
+            "documents": {name: entry["documents"] for name, entry in manifest["collections"].items()}}
+
+
+@job_handler("restore_snapshot")
+def run_restore_snapshot(ctx: JobContext) -> dict:
+    return restore_snapshot(ctx.params["name"], ctx)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Create and restore named database snapshots.")
+    parser.add_argument("command", choices=("create", "restore", "list", "delete"))
+    parser.add_argument("name", nargs="?")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing snapshot (create)")
+    args = parser.parse_args(argv)
+    if args.command != "list" and not args.name:
+        parser.error(f"{args.command} needs a snapshot name")
+
+    from core.database import connect_db
+    connect_db()
+    if args.command == "create":
+        manifest = create_snapshot(args.name, args.overwrite)
+        result = {name: entry["documents"] for name, entry in manifest["collections"].items()}
+    elif args.command == "restore":
+        result = restore_snapshot(args.name)
+    elif args.command == "delete":
+        delete_snapshot(args.name)
+        result = {"deleted": args.name}
+    else:
+        result = list_snapshots()
+    print(json_util.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    sys.exit(main())
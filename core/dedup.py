@@ -0,0 +1,326 @@
+"""
+Contact deduplication.
+
+Candidates only ever come from blocking-key buckets (core.identity): contacts
+sharing a key are scored pairwise inside their bucket, matches above
+DEDUP_MATCH_THRESHOLD are clustered with union-find, and each cluster becomes a
+DuplicateGroup proposal. Clusters scoring at least DEDUP_AUTO_MERGE_THRESHOLD are
+merged straight away when auto-merge is on.
+
+A full run refreshes every contact's keys and groups the whole collection by key
+on the server. The incremental run, queued every DEDUP_INTERVAL_SECONDS while
+contacts are pending, only looks at contacts with dedup_checked=False, through
+the multikey index on dedup_keys.
+
+Merging keeps the group's survivor (its oldest member), copies missing fields onto it, repoints the
+duplicates' email snapshots (one update_many per group) and deletes the duplicates.
+"""
+import logging
+from datetime import datetime, timezone
+from difflib import SequenceMatcher
+from pymongo import UpdateMany, UpdateOne
+from config import settings
+from core.changes import change_feed
+from core.database import transaction
+from core.identity import FREE_MAIL_DOMAINS, blocking_keys, normalize_email, normalize_name
+from core.jobs import JobContext, PeriodicTask, job_handler, job_queue
+from core.search import CONTACT, search_index
+from models.contact import Contact
+from models.dedup import DuplicateGroup
+from models.email import CONTACT_SNAPSHOT_FIELDS, ContactSnapshot, Email
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+# Fields a survivor inherits from its duplicates when it has none.
+_FILLABLE_FIELDS = ("title",)
+
+_PROJECTION = {"first_name": 1, "last_name": 1, "email": 1, "title": 1, "company": 1, "user": 1, "dedup_keys": 1}
+
+
+def score(a: dict, b: dict) -> float:
+    """
+    Score how likely two contacts are the same person, from 0 to 1.
+
+    Weights: same normalized email 0.5, name similarity 0.3, same company 0.15,
+    same (non-free-mail) email domain 0.05.
+    """
+    email_a, email_b = normalize_email(a.get("email")), normalize_email(b.get("email"))
+    same_email = bool(email_a) and email_a == email_b
+    first = SequenceMatcher(None, normalize_name(a.get("first_name")), normalize_name(b.get("first_name"))).ratio()
+    last = SequenceMatcher(None, normalize_name(a.get("last_name")), normalize_name(b.get("last_name"))).ratio()
+    same_company = a.get("company") is not None and a.get("company") == b.get("company")
+    domain = email_a.rpartition("@")[2]
+    same_domain = bool(domain) and domain not in FREE_MAIL_DOMAINS and domain == email_b.rpartition("@")[2]
+    return round(0.5 * same_email + 0.3 * (first + last) / 2 + 0.15 * same_company + 0.05 * same_domain, 3)
+
+
+class _Clusters:
+    """
+    Union-find over contact ids; a cluster's score is its weakest joining match.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.scores = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b, match_score: float) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        self.parent[root_b] = root_a
+        self.scores[root_a] = min(self.scores.get(root_a, 1.0), self.scores.pop(root_b, 1.0), match_score)
+
+    def groups(self) -> list[tuple[list, float]]:
+        members = {}
+        for item in self.parent:
+            members.setdefault(self.find(item), []).append(item)
+        return [(sorted(ids), self.scores.get(root, 1.0)) for root, ids in members.items() if len(ids) > 1]
+
+
+class _Run:
+    """
+    State of one deduplication run.
+    """
+
+    def __init__(self, ctx: JobContext | None = None):
+        self.contacts = Contact._get_collection()
+        self.ctx = ctx
+        self.clusters = _Clusters()
+        self.scored = set()
+        self.stats = {"checked": 0, "keys_refreshed": 0, "buckets": 0, "oversized_buckets": 0, "pairs_scored": 0}
+
+    def score_buckets(self, buckets: list[list], docs: dict) -> None:
+        for ids in buckets:
+            if len(ids) > settings.DEDUP_MAX_BUCKET_SIZE:
+                # A key shared by this many contacts (a common name at a big company) says little.
+                self.stats["oversized_buckets"] += 1
+                continue
+            self.stats["buckets"] += 1
+            for i, a in enumerate(ids):
+                for b in ids[i + 1:]:
+                    pair = (a, b) if a < b else (b, a)
+                    if pair in self.scored or a not in docs or b not in docs:
+                        continue
+                    self.scored.add(pair)
+                    match = score(docs[a], docs[b])
+                    if match >= settings.DEDUP_MATCH_THRESHOLD:
+                        self.clusters.union(a, b, match)
+        self.stats["pairs_scored"] = len(self.scored)
+
+    def _load(self, ids) -> dict:
+        docs = {}
+        ids = list(ids)
+        for start in range(0, len(ids), BATCH_SIZE):
+            for doc in self.contacts.find({"_id": {"$in": ids[start:start + BATCH_SIZE]}}, _PROJECTION):
+                docs[doc["_id"]] = doc
+        return docs
+
+    # -- full run --------------------------------------------------------
+
+    def refresh_keys(self) -> None:
+        query = {}
+        while True:
+            batch = list(self.contacts.find(query, _PROJECTION, sort=[("_id", 1)], limit=BATCH_SIZE))
+            if not batch:
+                return
+            updates = []
+            for doc in batch:
+                keys = blocking_keys(doc.get("first_name"), doc.get("last_name"), doc.get("email"),
+                                     doc.get("company"), doc.get("user"))
+                if keys != doc.get("dedup_keys"):
+                    updates.append(UpdateOne({"_id": doc["_id"]},
+                                             {"$set": {"dedup_keys": keys, "dedup_checked": False}}))
+            if updates:
+                self.contacts.bulk_write(updates, ordered=False)
+            self.stats["keys_refreshed"] += len(updates)
+            self.stats["checked"] += len(batch)
+            query = {"_id": {"$gt": batch[-1]["_id"]}}
+            if self.ctx:
+                self.ctx.progress(0.5 * min(self.stats["checked"] / max(self._total, 1), 1.0),
+                                  message=f"Refreshed keys of {self.stats['checked']} contacts")
+
+    def full(self) -> None:
+        self._total = self.contacts.estimated_document_count()
+        self.refresh_keys()
+        cursor = self.contacts.aggregate([
+            {"$unwind": "$dedup_keys"},
+            {"$group": {"_id": "$dedup_keys", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+            {"$match": {"n": {"$gt": 1}}},
+        ], allowDiskUse=True)
+        chunk, size = [], 0
+        for bucket in cursor:
+            chunk.append(bucket["ids"])
+            size += len(bucket["ids"])
+            if size >= BATCH_SIZE * 5:
+                self._score_chunk(chunk)
+                chunk, size = [], 0
+        if chunk:
+            self._score_chunk(chunk)
+        self.contacts.update_many({"dedup_checked": False}, {"$set": {"dedup_checked": True}})
+
+    def _score_chunk(self, buckets: list[list]) -> None:
+        wanted = {contact_id for ids in buckets if len(ids) <= settings.DEDUP_MAX_BUCKET_SIZE for contact_id in ids}
+        self.score_buckets(buckets, self._load(wanted))
+        if self.ctx:
+            self.ctx.progress(0.75, message=f"Scored {self.stats['pairs_scored']} candidate pairs")
+
+    # -- incremental run -------------------------------------------------
+
+    def incremental(self) -> None:
+        while True:
+            pending = list(self.contacts.find({"dedup_checked": False}, _PROJECTION, limit=BATCH_SIZE))
+            if not pending:
+                return
+            keys = {key for doc in pending for key in doc.get("dedup_keys") or []}
+            docs, buckets = {}, {}
+            if keys:
+                for doc in self.contacts.find({"dedup_keys": {"$in": list(keys)}}, _PROJECTION):
+                    docs[doc["_id"]] = doc
+                    for key in doc.get("dedup_keys") or []:
+                        if key in keys:
+                            buckets.setdefault(key, []).append(doc["_id"])
+            self.score_buckets([ids for ids in buckets.values() if len(ids) > 1], docs)
+            # Only contacts whose keys are unchanged since they were read count as checked.
+            self.contacts.bulk_write([
+                UpdateOne({"_id": doc["_id"], "dedup_keys": doc.get("dedup_keys") or []},
+                          {"$set": {"dedup_checked": True}})
+                for doc in pending
+            ], ordered=False)
+            self.stats["checked"] += len(pending)
+            if self.ctx:
+                self.ctx.progress(0.5, message=f"Checked {self.stats['checked']} new contacts")
+
+    # -- results ---------------------------------------------------------
+
+    def record(self, auto_merge: bool) -> dict:
+        groups = self.clusters.groups()
+        docs = self._load({contact_id for members, _ in groups for contact_id in members})
+        proposed, to_merge = 0, []
+        for members, match in groups:
+            members = [contact_id for contact_id in members if contact_id in docs]
+            if len(members) < 2:
+                continue
+            members_key = ",".join(str(contact_id) for contact_id in members)
+            if DuplicateGroup.objects(members_key=members_key).first():
+                continue  # Already proposed, merged or rejected
+            survivor = members[0]  # The oldest contact, the one other records have referenced longest
+            # A larger cluster supersedes earlier proposals for any of its members.
+            DuplicateGroup.objects(status="proposed", duplicates__in=members).delete()
+            DuplicateGroup.objects(status="proposed", survivor__in=members).delete()
+            group = DuplicateGroup(survivor=survivor, duplicates=[c for c in members if c != survivor],
+                                   members_key=members_key, score=match).save()
+            proposed += 1
+            if auto_merge and match >= settings.DEDUP_AUTO_MERGE_THRESHOLD:
+                to_merge.append(group)
+        merged = merge_groups(to_merge) if to_merge else {"groups": 0, "contacts_removed": 0, "emails_updated": 0}
+        return {**self.stats, "groups_proposed": proposed, "merged": merged}
+
+
+def run_dedup(full: bool = False, auto_merge: bool = True, ctx: JobContext | None = None) -> dict:
+    """
+    Find duplicate contacts and propose (or merge) them.
+
+    Args:
+        full (bool): Refresh all keys and scan every bucket instead of only unchecked contacts.
+        auto_merge (bool): Merge groups scoring at least DEDUP_AUTO_MERGE_THRESHOLD.
+        ctx (JobContext | None): Job context for progress.
+
+    Returns:
+        dict: Contacts checked, buckets and pairs scored, groups proposed and merge counts.
+    """
+    run = _Run(ctx)
+    run.full() if full else run.incremental()
+    result = run.record(auto_merge)
+    logger.info(f"Contact dedup ({'full' if full else 'incremental'}) finished: {result}")
+    return result
+
+
+def merge_groups(groups: list[DuplicateGroup]) -> dict:
+    """
+    Merge proposed duplicate groups in bulk.
+
+    Per batch of groups: fill missing survivor fields, repoint the duplicates' email
+    snapshots to the survivor (one update_many per group), delete the duplicates and
+    mark the groups merged, inside a transaction where the deployment supports one.
+
+    Returns:
+        dict: Groups merged, contacts removed and emails updated.
+    """
+    contacts, emails, duplicate_groups = (Contact._get_collection(), Email._get_collection(),
+                                          DuplicateGroup._get_collection())
+    counts = {"groups": 0, "contacts_removed": 0, "emails_updated": 0}
+    groups = [group for group in groups if group.status == "proposed"]
+    for start in range(0, len(groups), BATCH_SIZE // 10):
+        batch = groups[start:start + BATCH_SIZE // 10]
+        ids = {group.survivor for group in batch} | {dup for group in batch for dup in group.duplicates}
+        docs = {doc["_id"]: doc for doc in contacts.find({"_id": {"$in": list(ids)}})}
+        contact_updates, email_updates, removed, merged = [], [], [], []
+        for group in batch:
+            survivor = docs.get(group.survivor)
+            duplicates = [docs[dup] for dup in group.duplicates if dup in docs]
+            if survivor is None or not duplicates:
+                continue
+            fill = {}
+            for field in _FILLABLE_FIELDS:
+                value = next((dup.get(field) for dup in duplicates if dup.get(field)), None)
+                if not survivor.get(field) and value:
+                    fill[field] = survivor[field] = value
+            if fill:
+                contact_updates.append(UpdateOne({"_id": survivor["_id"]}, {"$set": fill}))
+            snapshot = ContactSnapshot(contact_id=survivor["_id"],
+                                       **{field: survivor.get(field) for field in CONTACT_SNAPSHOT_FIELDS})
+            dup_ids = [dup["_id"] for dup in duplicates]
+            # The survivor's own emails need the new snapshot too when it gained fields.
+            snapshot_ids = dup_ids + [survivor["_id"]] if fill else dup_ids
+            email_updates.append(UpdateMany({"contact.contact_id": {"$in": snapshot_ids}},
+                                            {"$set": {"contact": snapshot.to_mongo().to_dict()}}))
+            removed.extend(dup_ids)
+            merged.append(group.id)
+        if not merged:
+            continue
+        with transaction() as session:
+            if contact_updates:
+                contacts.bulk_write(contact_updates, ordered=False, session=session)
+            result = emails.bulk_write(email_updates, ordered=False, session=session)
+            deleted = contacts.delete_many({"_id": {"$in": removed}}, session=session)
+            duplicate_groups.update_many({"_id": {"$in": merged}},
+                                         {"$set": {"status": "merged", "resolved_at": datetime.now(timezone.utc)}},
+                                         session=session)
+        # Other proposals naming a removed contact are stale now.
+        duplicate_groups.delete_many({"status": "proposed",
+                                      "$or": [{"duplicates": {"$in": removed}}, {"survivor": {"$in": removed}}]})
+        for contact_id in removed:
+            search_index.remove(CONTACT, str(contact_id))
+        change_feed.publish_many("contacts", removed, "delete")
+        if result.modified_count:
+            change_feed.reset("emails")
+        counts["groups"] += len(merged)
+        counts["contacts_removed"] += deleted.deleted_count
+        counts["emails_updated"] += result.modified_count
+    logger.info(f"Merged duplicate contacts: {counts}")
+    return counts
+
+
+@job_handler("dedup_contacts")
+def run_dedup_contacts(ctx: JobContext) -> dict:
+    return run_dedup(ctx.params.get("full", False), ctx.params.get("auto_merge", True), ctx)
+
+
+def schedule_incremental() -> None:
+    """
+    Queue an incremental dedup job when contacts are waiting to be checked.
+    """
+    if Contact.objects(dedup_checked=False).only("id").first():
+        job_queue.enqueue_once("dedup_contacts", {"full": False})
+
+
+dedup_scheduler = PeriodicTask("contact-dedup", settings.DEDUP_INTERVAL_SECONDS, schedule_incremental)
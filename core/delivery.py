@@ -0,0 +1,131 @@
+"""
+Campaign email delivery: queues a campaign's unsent emails and sends them in
+batches through the pooled SMTP pipeline (core.smtp) as a background job.
+"""
+import asyncio
+import logging
+import time
+from pymongo import UpdateOne
+from config import settings
+from core.changes import change_feed
+from core.jobs import JobContext, job_handler
+from core.smtp import DeliveryPipeline, DeliveryResult, DomainLimiter, OutgoingMessage, SMTPPool
+from models.email import Email
+
+logger = logging.getLogger(__name__)
+
+
+def pipeline_from_settings() -> DeliveryPipeline:
+    """
+    Build a DeliveryPipeline for the configured relay. Call from inside the event loop that will use it.
+    """
+    pool = SMTPPool(
+        settings.SMTP_HOST,
+        settings.SMTP_PORT,
+        size=settings.SMTP_POOL_SIZE,
+        max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        timeout=settings.SMTP_TIMEOUT_SECONDS,
+        starttls=settings.SMTP_STARTTLS,
+        username=settings.SMTP_USER,
+        password=settings.SMTP_PASSWORD,
+    )
+    limiter = DomainLimiter(settings.SMTP_DOMAIN_CONCURRENCY, settings.SMTP_DOMAIN_RATE_PER_SECOND)
+    return DeliveryPipeline(pool, limiter, settings.SMTP_MAX_ATTEMPTS, settings.SMTP_RETRY_BACKOFF_SECONDS)
+
+
+def queue_campaign_emails(campaign_id: str, retry_failed: bool = False) -> int:
+    """
+    Mark a campaign's unsent emails (and optionally its failed ones) as queued.
+
+    Returns:
+        int: The number of emails queued.
+    """
+    statuses = [None, "failed"] if retry_failed else [None]
+    result = Email._get_collection().update_many(
+        {"campaign_id": campaign_id, "delivery_status": {"$in": statuses}},
+        {"$set": {"delivery_status": "queued"}, "$unset": {"delivery_error": ""}},
+    )
+    return result.modified_count
+
+
+def _message_id(email_id) -> str:
+    # Stable per Email, so a message resent after a crash can be recognised downstream.
+    return f"<{email_id}@{settings.SMTP_FROM.rpartition('@')[2] or 'localhost'}>"
+
+
+def _record_results(collection, results: list[DeliveryResult], previous_attempts: dict) -> None:
+    collection.bulk_write([
+        UpdateOne({"_id": result.key}, {
+            "$set": {
+                "delivery_status": result.status,
+                "delivery_attempts": previous_attempts.get(result.key, 0) + result.attempts,
+                "delivery_error": result.error,
+                "sent_at": result.sent_at,
+            }
+        })
+        for result in results
+    ], ordered=False)
+
+
+async def deliver_campaign(campaign_id: str, ctx: JobContext | None = None) -> dict:
+    """
+    Send every queued email of a campaign.
+
+    Emails are read and their statuses written in batches of SMTP_BATCH_SIZE (one
+    bulk_write per batch). Delivery is at-least-once: a batch interrupted before its
+    statuses are written is sent again, with the same Message-ID.
+
+    Returns:
+        dict: Sent and failed counts and the achieved messages per second.
+    """
+    collection = Email._get_collection()
+    query = {"campaign_id": campaign_id, "delivery_status": "queued"}
+    total = await asyncio.to_thread(collection.count_documents, query)
+    pipeline = pipeline_from_settings()
+    counts = {"sent": 0, "failed": 0}
+    started = time.perf_counter()
+    logger.info(f"Delivering {total} emails for campaign {campaign_id}")
+    try:
+        while True:
+            batch = await asyncio.to_thread(lambda: list(collection.find(
+                query, {"contact.email": 1, "subject": 1, "body": 1, "delivery_attempts": 1},
+                limit=settings.SMTP_BATCH_SIZE,
+            )))
+            if not batch:
+                break
+            messages = [
+                OutgoingMessage(
+                    key=document["_id"],
+                    sender=settings.SMTP_FROM,
+                    recipient=(document.get("contact") or {}).get("email") or "",
+                    subject=document["subject"],
+                    body=document["body"],
+                    message_id=_message_id(document["_id"]),
+                )
+                for document in batch
+            ]
+            results = await pipeline.send_all(messages)
+            previous_attempts = {document["_id"]: document.get("delivery_attempts") or 0 for document in batch}
+            await asyncio.to_thread(_record_results, collection, results, previous_attempts)
+            change_feed.publish_many("emails", [result.key for result in results], "update")
+            for result in results:
+                counts[result.status] += 1
+            if ctx:
+                done = counts["sent"] + counts["failed"]
+                await asyncio.to_thread(ctx.progress, done, total, f"Sent {counts['sent']}, failed {counts['failed']}")
+    finally:
+        await pipeline.pool.close()
+    elapsed = time.perf_counter() - started
+    sent = counts["sent"]
+    logger.info(f"Campaign {campaign_id} delivery finished in {elapsed:.1f}s: {counts}")
+    return {
+        **counts,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_sec": round(sent / elapsed, 1) if elapsed else 0.0,
+        "connections_opened": pipeline.pool.connections_opened,
+    }
+
+
+@job_handler("deliver_campaign")
+def run_deliver_campaign(ctx: JobContext) -> dict:
+    return asyncio.run(deliver_campaign(ctx.params["campaign_id"], ctx))
@@ -0,0 +1,309 @@
+"""
+Company lookup by email domain, so contacts can be created without a company id.
+
+Company.domain holds the normalized host of the company's website (maintained by
+Company.clean() and indexed with the owning user). DomainIndex keeps every
+company in a (user, domain) -> company id map, loaded in the background on first
+use and again every DOMAIN_INDEX_REFRESH_SECONDS, and kept current by the company
+write paths (index_company, remove). Resolving a contact is then a dict lookup
+per candidate domain: "ada@eu.acme.com" tries eu.acme.com, then acme.com.
+
+Keys the map misses (a company another process wrote since the last load, or a
+map still loading) are looked up in one indexed query per resolve_many() call.
+Free-mail domains never resolve; when a user has several companies on a domain
+the oldest wins.
+"""
+import logging
+import threading
+import time
+from bson import ObjectId
+from pymongo import UpdateOne
+from config import settings
+from core.changes import change_feed
+from core.identity import FREE_MAIL_DOMAINS, blocking_keys, email_domain, website_domain
+from core.jobs import JobContext, job_handler
+from models.company import Company
+from models.contact import Contact
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+class CompanyNotFound(LookupError):
+    pass
+
+
+def candidate_domains(email: str | None) -> list[str]:
+    """
+    Return the domains an address may belong to, most specific first
+    ("ada@eu.acme.com" -> ["eu.acme.com", "acme.com"]); none for free-mail addresses.
+    """
+    domain = email_domain(email)
+    if "." not in domain or domain in FREE_MAIL_DOMAINS:
+        return []
+    labels = domain.split(".")
+    return [".".join(labels[i:]) for i in range(len(labels) - 1)]
+
+
+def _older(company_id: str, other_id: str) -> bool:
+    if ObjectId.is_valid(company_id) and ObjectId.is_valid(other_id):
+        return ObjectId(company_id) < ObjectId(other_id)
+    return company_id < other_id
+
+
+class DomainIndex:
+    """
+    In-process (user id, domain) -> company id map.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._companies: dict[tuple[str, str], str] = {}
+        self._keys: dict[str, tuple[str, str]] = {}
+        self._generation = 0
+        self._loading = False
+        self._refreshing = False
+        # Writes made while a load runs, replayed onto the loaded map.
+        self._pending: list[tuple[str, str | None, str | None]] = []
+        self.loaded_at: float | None = None
+
+    # -- writes ----------------------------------------------------------
+
+    def _set(self, companies: dict, keys: dict, company_id: str, user: str | None, domain: str | None) -> None:
+        previous = keys.pop(company_id, None)
+        if previous is not None and companies.get(previous) == company_id:
+            del companies[previous]
+        if not user or not domain:
+            return
+        key = (user, domain)
+        current = companies.get(key)
+        if current is None or _older(company_id, current):
+            if current is not None:
+                keys.pop(current, None)
+            companies[key] = company_id
+            keys[company_id] = key
+
+    def _write(self, company_id: str, user: str | None, domain: str | None) -> None:
+        with self._lock:
+            if self._loading:
+                self._pending.append((company_id, user, domain))
+            self._set(self._companies, self._keys, company_id, user, domain)
+
+    def index_company(self, company) -> None:
+        """
+        Add or refresh a company (a Company document or its raw MongoDB dict).
+        """
+        raw = company if isinstance(company, dict) else company.to_mongo()
+        self._write(str(raw["_id"]), raw.get("user") and str(raw["user"]), raw.get("domain"))
+
+    def remove(self, company_id: str) -> None:
+        self._write(str(company_id), None, None)
+
+    def clear(self) -> None:
+        """
+        Empty the map; it reloads on the next lookup.
+        """
+        with self._lock:
+            self._companies.clear()
+            self._keys.clear()
+            self._generation += 1
+            self.loaded_at = None
+
+    # -- reads -----------------------------------------------------------
+
+    def resolve_many(self, contacts: list[tuple[str, str]]) -> list[str | None]:
+        """
+        Find the company of each (user id, email) pair.
+
+        Returns:
+            list[str | None]: Company ids in the order given; None where no company matches.
+        """
+        self._refresh_if_stale()
+        candidates = [[(str(user), domain) for domain in candidate_domains(email)] for user, email in contacts]
+        with self._lock:
+            missing = {key for keys in candidates for key in keys if key not in self._companies}
+        if missing:
+            self._fetch(missing)
+        with self._lock:
+            return [next((self._companies[key] for key in keys if key in self._companies), None)
+                    for keys in candidates]
+
+    def resolve(self, user: str, email: str) -> str | None:
+        return self.resolve_many([(user, email)])[0]
+
+    def _fetch(self, keys: set[tuple[str, str]]) -> None:
+        domains_by_user = {}
+        for user, domain in keys:
+            domains_by_user.setdefault(user, []).append(domain)
+        query = {"$or": [{"user": user, "domain": {"$in": domains}} for user, domains in domains_by_user.items()]}
+        companies = list(Company._get_collection().find(query, {"user": 1, "domain": 1}))
+        for company in companies:
+            self._write(str(company["_id"]), str(company["user"]), company["domain"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"domains": len(self._companies), "loading": self._loading, "loaded_at": self.loaded_at}
+
+    # -- load ------------------------------------------------------------
+
+    def load(self, batch_size: int = 5000) -> dict:
+        """
+        Replace the map with every company that has a domain.
+
+        Returns:
+            dict: Map statistics after the load.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            generation = self._generation
+            self._loading = True
+            self._pending = []
+        companies, keys = {}, {}
+        try:
+            cursor = Company._get_collection().find({"domain": {"$ne": None}}, {"user": 1, "domain": 1},
+                                                    batch_size=batch_size)
+            for company in cursor:
+                self._set(companies, keys, str(company["_id"]), str(company["user"]), company["domain"])
+            with self._lock:
+                # A clear() while loading means the data read may already be gone.
+                if generation == self._generation:
+                    for write in self._pending:
+                        self._set(companies, keys, *write)
+                    self._companies, self._keys = companies, keys
+                    self.loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+        stats = self.stats()
+        logger.info(f"Domain index loaded in {time.perf_counter() - started:.1f}s: {stats}")
+        return stats
+
+    def _refresh_if_stale(self) -> None:
+        with self._lock:
+            fresh = self.loaded_at is not None and time.monotonic() - self.loaded_at < settings.DOMAIN_INDEX_REFRESH_SECONDS
+            if fresh or self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.load()
+            except Exception as e:
+                logger.error(f"Domain index load failed: {str(e)}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="domain-index-load", daemon=True).start()
+
+
+domain_index = DomainIndex()
+
+
+def assign_companies(contacts: list[dict]) -> list[dict]:
+    """
+    Fill in the company of contacts that have none from their email domain, in place.
+
+    Args:
+        contacts (list[dict]): ContactCreate fields; "company" is None where unknown.
+
+    Returns:
+        list[dict]: The same contacts.
+
+    Raises:
+        CompanyNotFound: If no company of the contact's user matches its email domain.
+    """
+    unassigned = [contact for contact in contacts if not contact.get("company")]
+    if unassigned:
+        company_ids = domain_index.resolve_many([(contact["user"], contact["email"]) for contact in unassigned])
+        for contact, company_id in zip(unassigned, company_ids):
+            if company_id is None:
+                raise CompanyNotFound(f"No company matches the email domain of {contact['email']}; pass a company id")
+            contact["company"] = company_id
+    return contacts
+
+
+def backfill_company_domains(ctx: JobContext | None = None) -> int:
+    """
+    Set Company.domain on companies written before it existed or by raw inserts.
+
+    Returns:
+        int: Companies updated.
+    """
+    collection = Company._get_collection()
+    updated = 0
+    updates = []
+    for company in collection.find({}, {"website": 1, "domain": 1}, batch_size=BATCH_SIZE):
+        domain = website_domain(company.get("website")) or None
+        if domain != company.get("domain"):
+            updates.append(UpdateOne({"_id": company["_id"]}, {"$set": {"domain": domain}}))
+        if len(updates) >= BATCH_SIZE:
+            updated += collection.bulk_write(updates, ordered=False).modified_count
+            updates = []
+            if ctx:
+                ctx.progress(0, message=f"Updated {updated} company domains")
+    if updates:
+        updated += collection.bulk_write(updates, ordered=False).modified_count
+    return updated
+
+
+def backfill_contact_companies(ctx: JobContext | None = None) -> dict:
+    """
+    Give contacts whose company is missing or deleted the company matching their email domain.
+
+    Company domains are backfilled first. Contacts are read in batches; each batch
+    checks its companies' existence with one query and resolves its orphans with one
+    more. Reassigned contacts get fresh blocking keys and are rechecked for duplicates.
+
+    Returns:
+        dict: Companies given a domain, contacts examined and reassigned, and orphans left unmatched.
+    """
+    domains_updated = backfill_company_domains(ctx)
+    domain_index.load()
+    contacts = Contact._get_collection()
+    total = contacts.estimated_document_count()
+    result = {"companies_updated": domains_updated, "contacts_checked": 0, "contacts_reassigned": 0,
+              "contacts_unmatched": 0}
+
+    def flush(batch: list[dict]) -> None:
+        company_ids = {contact.get("company") for contact in batch} - {None}
+        existing = {company["_id"] for company in
+                    Company._get_collection().find({"_id": {"$in": list(company_ids)}}, {"_id": 1})}
+        orphans = [contact for contact in batch if contact.get("company") not in existing]
+        resolved = domain_index.resolve_many([(contact.get("user"), contact.get("email")) for contact in orphans])
+        updates, reassigned = [], []
+        for contact, company_id in zip(orphans, resolved):
+            if company_id is None:
+                result["contacts_unmatched"] += 1
+                continue
+            keys = blocking_keys(contact.get("first_name"), contact.get("last_name"), contact.get("email"),
+                                 company_id, contact.get("user"))
+            updates.append(UpdateOne({"_id": contact["_id"]}, {"$set": {
+                "company": ObjectId(company_id), "dedup_keys": keys, "dedup_checked": False}}))
+            reassigned.append(contact["_id"])
+        if updates:
+            result["contacts_reassigned"] += contacts.bulk_write(updates, ordered=False).modified_count
+            change_feed.publish_many("contacts", reassigned, "update")
+        result["contacts_checked"] += len(batch)
+        if ctx:
+            ctx.progress(result["contacts_checked"], total,
+                         f"Checked {result['contacts_checked']} of ~{total} contacts")
+
+    batch = []
+    projection = {"first_name": 1, "last_name": 1, "email": 1, "user": 1, "company": 1}
+    for contact in contacts.find({}, projection, batch_size=BATCH_SIZE):
+        batch.append(contact)
+        if len(batch) >= BATCH_SIZE:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    logger.info(f"Backfilled contact companies: {result}")
+    return result
+
+
+@job_handler("backfill_contact_companies")
+def run_backfill_contact_companies(ctx: JobContext) -> dict:
+    return backfill_contact_companies(ctx)
@@ -0,0 +1,314 @@
+"""
+AI email generation: a prompt per campaign and contact, answered through core.ai.
+
+The model is asked for a JSON object with "subject" and "body". Emails are
+returned unsaved, with the route that answered in ai_model and the prompt,
+token counts and generation time of the call that produced them.
+
+Whole campaigns are generated in batches (generate_batch): one prompt carries the
+campaign context and template once and a numbered list of up to AI_BATCH_SIZE
+contacts, and the model answers with a JSON array of emails. The batch's tokens
+and time are split across the emails it produced: the shared part of the prompt
+evenly, each contact's own line and output by size. Contacts the answer misses or
+gets wrong, and whole batches whose answer is not a JSON array, fall back to one
+call per contact.
+"""
+import asyncio
+import json
+import logging
+import time
+from bson import ObjectId
+from config import settings
+from core.ai import AIRouter, AIUnavailable, ai_router
+from core.changes import change_feed
+from core.jobs import JobContext, job_handler
+from core.metrics import record_ai_generation
+from models.campaign import Campaign
+from models.company import Company
+from models.contact import Contact
+from models.email import CompanySnapshot, ContactSnapshot, Email
+
+logger = logging.getLogger(__name__)
+
+MAX_TOKENS = 1024
+
+
+class GenerationError(ValueError):
+    """
+    The model answered with something that is not a usable email.
+    """
+
+
+def describe_contact(contact: Contact, company: Company) -> str:
+    name = f"{contact.first_name} {contact.last_name}" + (f", {contact.title}" if contact.title else "")
+    return f"{name} at {company.name}" + (f" ({company.website})" if company.website else "")
+
+
+def build_prompt(campaign: Campaign, company: Company, contact: Contact) -> str:
+    return (
+        f"Write a personalized sales email to {describe_contact(contact, company)}.\n\n"
+        f"Campaign context:\n{campaign.campaign_context}\n\n"
+        f"Template subject: {campaign.campaign_template_title}\n"
+        f"Template body:\n{campaign.campaign_template_body}\n\n"
+        'Answer with only a JSON object with the keys "subject" and "body".'
+    )
+
+
+def parse_json(text: str):
+    """
+    Decode the JSON value in a model's answer, ignoring Markdown fences and surrounding prose.
+
+    Raises:
+        GenerationError: If there is no valid JSON object or array in the text.
+    """
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        raise GenerationError("The answer contains no JSON")
+    start = min(starts)
+    end = text.rfind("]" if text[start] == "[" else "}")
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise GenerationError(f"The answer is not valid JSON: {e}") from e
+
+
+def parse_email(value) -> tuple[str, str]:
+    """
+    Return the subject and body of a decoded email object.
+
+    Raises:
+        GenerationError: If either is missing or empty.
+    """
+    if not isinstance(value, dict):
+        raise GenerationError("The email is not a JSON object")
+    subject, body = value.get("subject"), value.get("body")
+    if not isinstance(subject, str) or not subject.strip() or not isinstance(body, str) or not body.strip():
+        raise GenerationError("The email needs a non-empty subject and body")
+    return subject.strip(), body.strip()
+
+
+def build_batch_prompt(campaign: Campaign, recipients: list[tuple[Company, Contact]]) -> tuple[str, list[str]]:
+    """
+    Build one prompt asking for an email to each recipient.
+
+    Returns:
+        tuple[str, list[str]]: The prompt and each recipient's numbered line in it.
+    """
+    lines = [f"{number}. {describe_contact(contact, company)}"
+             for number, (company, contact) in enumerate(recipients, start=1)]
+    prompt = (
+        "Write a personalized sales email to each contact listed below.\n\n"
+        f"Campaign context:\n{campaign.campaign_context}\n\n"
+        f"Template subject: {campaign.campaign_template_title}\n"
+        f"Template body:\n{campaign.campaign_template_body}\n\n"
+        "Contacts:\n" + "\n".join(lines) + "\n\n"
+        'Answer with only a JSON array holding one object per contact, with the keys "contact" '
+        '(its number), "subject" and "body".'
+    )
+    return prompt, lines
+
+
+def _apportion(total: int, weights: list[float]) -> list[int]:
+    """
+    Split an integer total in proportion to weights, keeping the sum exact (largest remainder).
+    """
+    scale = sum(weights)
+    if not scale:
+        weights, scale = [1] * len(weights), len(weights)
+    shares = [total * weight / scale for weight in weights]
+    parts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: shares[i] - parts[i], reverse=True)
+    for i in by_remainder[:total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def _email(campaign: Campaign, company: Company, contact: Contact, subject: str, body: str, **usage) -> Email:
+    return Email(
+        company=CompanySnapshot.of(company),
+        contact=ContactSnapshot.of(contact),
+        subject=subject,
+        body=body,
+        campaign_id=campaign.campaign_id,
+        **usage,
+    )
+
+
+async def generate_email(campaign: Campaign, company: Company, contact: Contact, model: str | None = None,
+                         router: AIRouter | None = None) -> Email:
+    """
+    Generate one campaign email for a contact.
+
+    Args:
+        model (str | None): Route to prefer; the router may answer from another.
+        router (AIRouter | None): Router to use instead of the shared one.
+
+    Returns:
+        Email: The unsaved email.
+
+    Raises:
+        AIUnavailable: If no AI route answered.
+        GenerationError: If the answer is not a usable email.
+    """
+    prompt = build_prompt(campaign, company, contact)
+    started = time.perf_counter()
+    completion = await (router or ai_router).complete(prompt, MAX_TOKENS, model)
+    subject, body = parse_email(parse_json(completion.text))
+    return _email(campaign, company, contact, subject, body, ai_model=completion.model,
+                  tokens_sent=completion.tokens_sent, tokens_returned=completion.tokens_returned,
+                  generation_time=round(time.perf_counter() - started, 3), full_prompt=prompt)
+
+
+async def generate_batch(campaign: Campaign, recipients: list[tuple[Company, Contact]], model: str | None = None,
+                         router: AIRouter | None = None) -> list[Email | Exception]:
+    """
+    Generate campaign emails for several contacts with one model call.
+
+    Args:
+        recipients (list[tuple[Company, Contact]]): Contacts with their companies.
+        model (str | None): Route to prefer; the router may answer from another.
+        router (AIRouter | None): Router to use instead of the shared one.
+
+    Returns:
+        list[Email | Exception]: An unsaved email per recipient, in order, or the
+            AIUnavailable/GenerationError of its fallback call.
+
+    Raises:
+        AIUnavailable: If no AI route answered the batch and a single call could not be made either.
+    """
+    if len(recipients) == 1:
+        company, contact = recipients[0]
+        return list(await asyncio.gather(generate_email(campaign, company, contact, model, router),
+                                         return_exceptions=True))
+    prompt, lines = build_batch_prompt(campaign, recipients)
+    started = time.perf_counter()
+    completion = await (router or ai_router).complete(prompt, MAX_TOKENS * len(recipients), model)
+    elapsed = time.perf_counter() - started
+    answers = {}
+    try:
+        items = parse_json(completion.text)
+        if not isinstance(items, list):
+            raise GenerationError("The answer is not a JSON array")
+        for item in items:
+            number = item.get("contact") if isinstance(item, dict) else None
+            if isinstance(number, int) and 1 <= number <= len(recipients) and number not in answers:
+                try:
+                    answers[number] = parse_email(item)
+                except GenerationError:
+                    pass
+    except GenerationError as e:
+        logger.warning(f"Batch of {len(recipients)} for campaign {campaign.campaign_id} unusable, "
+                       f"generating one by one: {str(e)}")
+
+    numbers = sorted(answers)
+    shared = len(prompt) - sum(len(line) for line in lines)
+    sent = _apportion(completion.tokens_sent, [shared / len(numbers) + len(lines[n - 1]) for n in numbers])
+    returned = _apportion(completion.tokens_returned, [len(answers[n][0]) + len(answers[n][1]) for n in numbers])
+    results: list[Email | Exception | None] = [None] * len(recipients)
+    for number, tokens_sent, tokens_returned in zip(numbers, sent, returned):
+        company, contact = recipients[number - 1]
+        subject, body = answers[number]
+        results[number - 1] = _email(campaign, company, contact, subject, body, ai_model=completion.model,
+                                     tokens_sent=tokens_sent, tokens_returned=tokens_returned,
+                                     generation_time=round(elapsed / len(numbers), 3), full_prompt=prompt)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        if answers:
+            logger.warning(f"Batch answer for campaign {campaign.campaign_id} missed {len(missing)} of "
+                           f"{len(recipients)} contacts, generating them one by one")
+        retried = await asyncio.gather(*(generate_email(campaign, *recipients[i], model, router) for i in missing),
+                                       return_exceptions=True)
+        for i, result in zip(missing, retried):
+            results[i] = result
+    return results
+
+
+def _campaign_recipients(campaign: Campaign, contact_ids: list[str] | None) -> tuple[list, int]:
+    """
+    Load the contacts (with their companies) that have no email for the campaign yet.
+
+    Returns:
+        tuple[list, int]: (company, contact) pairs, and how many contacts were skipped.
+    """
+    contacts = Contact.objects(user=campaign.user.id)
+    if contact_ids is not None:
+        contacts = contacts.filter(id__in=[ObjectId(contact_id) for contact_id in contact_ids
+                                           if ObjectId.is_valid(contact_id)])
+    # Companies are loaded in one query below rather than dereferenced per contact.
+    contacts = list(contacts.no_dereference())
+    company_ids = {contact.id: getattr(contact.company, "id", contact.company) for contact in contacts}
+    done = set(Email._get_collection().distinct("contact.contact_id", {"campaign_id": campaign.campaign_id}))
+    companies = {company.id: company for company in Company.objects(id__in=list(set(company_ids.values())))}
+    recipients = [(companies[company_ids[contact.id]], contact) for contact in contacts
+                  if contact.id not in done and company_ids[contact.id] in companies]
+    return recipients, len(contacts) - len(recipients)
+
+
+async def generate_campaign_emails(campaign_id: str, contact_ids: list[str] | None = None,
+                                   batch_size: int | None = None, model: str | None = None,
+                                   ctx: JobContext | None = None, router: AIRouter | None = None) -> dict:
+    """
+    Generate and store an email for every contact of a campaign's user that has none yet.
+
+    Contacts are sent to the model in batches of batch_size (AI_BATCH_SIZE by
+    default; 1 means one call per contact), AI_GENERATION_CONCURRENCY batches at a
+    time. Each batch's emails are saved as soon as it completes.
+
+    Args:
+        contact_ids (list[str] | None): Limit generation to these contacts.
+
+    Returns:
+        dict: Generated, failed and skipped counts, model calls, tokens, and the
+            achieved emails per minute.
+    """
+    batch_size = batch_size or settings.AI_BATCH_SIZE
+    campaign = await asyncio.to_thread(Campaign.objects.get, campaign_id=campaign_id)
+    recipients, skipped = await asyncio.to_thread(_campaign_recipients, campaign, contact_ids)
+    batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+    counts = {"generated": 0, "failed": 0, "skipped": skipped, "tokens_sent": 0, "tokens_returned": 0}
+    semaphore = asyncio.Semaphore(settings.AI_GENERATION_CONCURRENCY)
+    started = time.perf_counter()
+    logger.info(f"Generating {len(recipients)} emails for campaign {campaign_id} in {len(batches)} batches")
+
+    async def run(batch):
+        async with semaphore:
+            try:
+                results = await generate_batch(campaign, batch, model, router)
+            except AIUnavailable as e:
+                results = [e] * len(batch)
+        emails = [result for result in results if isinstance(result, Email)]
+        if emails:
+            ids = await asyncio.to_thread(Email.objects.insert, emails, load_bulk=False)
+            change_feed.publish_many("emails", ids, "insert")
+        for email in emails:
+            record_ai_generation(email.ai_model, email.tokens_sent, email.tokens_returned, email.generation_time)
+            counts["tokens_sent"] += email.tokens_sent
+            counts["tokens_returned"] += email.tokens_returned
+        counts["generated"] += len(emails)
+        counts["failed"] += len(results) - len(emails)
+        for error in {str(result) for result in results if not isinstance(result, Email)}:
+            logger.error(f"Email generation failed for campaign {campaign_id}: {error}")
+        if ctx:
+            done = counts["generated"] + counts["failed"]
+            await asyncio.to_thread(ctx.progress, done, len(recipients),
+                                    f"Generated {counts['generated']}, failed {counts['failed']}")
+
+    await asyncio.gather(*(run(batch) for batch in batches))
+    elapsed = time.perf_counter() - started
+    generated = counts["generated"]
+    logger.info(f"Campaign {campaign_id} generation finished in {elapsed:.1f}s: {counts}")
+    return {
+        **counts,
+        "batches": len(batches),
+        "tokens_per_email": round((counts["tokens_sent"] + counts["tokens_returned"]) / generated, 1) if generated else 0.0,
+        "emails_per_minute": round(generated * 60 / elapsed, 1) if elapsed else 0.0,
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+@job_handler("generate_campaign_emails")
+def run_generate_campaign_emails(ctx: JobContext) -> dict:
+    params = ctx.params
+    return asyncio.run(generate_campaign_emails(params["campaign_id"], params.get("contact_ids"),
+                                                params.get("batch_size"), params.get("ai_model"), ctx))
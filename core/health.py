@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from mongoengine.connection import get_db
+from config import settings
+from core.database import pool_metrics
+from core.log_queue import log_queue_backlog
+from core.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+UNHEALTHY = "unhealthy"
+
+
+class HealthMonitor:
+    """
+    Background MongoDB health monitor.
+
+    Pings the database on an interval from a worker thread and caches the result,
+    so `/health` and `/ready` are answered without touching the database or
+    blocking the event loop.
+    """
+
+    def __init__(self, interval: float, timeout: float, max_samples: int = 120):
+        self.interval = interval
+        self.timeout = timeout
+        self._latencies = deque(maxlen=max_samples)
+        self._task: asyncio.Task | None = None
+        self._consecutive_failures = 0
+        self._last_success: float | None = None
+        self._last_error: str | None = None
+        self._last_check: float | None = None
+        self._state = self._render(STARTING, [], [])
+
+    async def start(self) -> None:
+        """
+        Run a first check and start the background loop.
+        """
+        if self._task is not None:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the background loop.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Health check loop error: {str(e)}", exc_info=True)
+
+    async def check(self) -> dict:
+        """
+        Ping MongoDB once and refresh the cached state.
+
+        Returns:
+            dict: The refreshed health state.
+        """
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self._ping), timeout=self.timeout)
+            self._latencies.append(time.perf_counter() - started)
+            self._consecutive_failures = 0
+            self._last_success = time.monotonic()
+            self._last_error = None
+        except Exception as e:
+            self._consecutive_failures += 1
+            self._last_error = str(e) or type(e).__name__
+            logger.warning(f"Health check ping failed ({self._consecutive_failures} in a row): {self._last_error}")
+        self._last_check = time.monotonic()
+        self._state = self._evaluate()
+        return self._state
+
+    @staticmethod
+    def _ping() -> None:
+        get_db().command("ping")
+
+    @property
+    def _stale_after(self) -> float:
+        return max(self.interval * 3, self.timeout * 2)
+
+    def _evaluate(self) -> dict:
+        reasons = []
+        stale_after = self._stale_after
+        if self._consecutive_failures >= settings.HEALTH_FAILURE_THRESHOLD:
+            reasons.append(f"database unreachable: {self._last_error}")
+        elif self._last_success is None or time.monotonic() - self._last_success > stale_after:
+            reasons.append("no successful database check recently")
+        if reasons:
+            return self._render(UNHEALTHY, reasons, [])
+
+        warnings = []
+        p95_ms = percentile(sorted(self._latencies), 95) * 1000
+        if p95_ms > settings.HEALTH_DEGRADED_LATENCY_MS:
+            warnings.append(f"high database latency: p95 {p95_ms:.1f}ms")
+        backlog = log_queue_backlog()
+        if backlog > settings.HEALTH_LOG_BACKLOG_THRESHOLD:
+            warnings.append(f"log queue backlog: {backlog} records")
+        pool = pool_metrics.snapshot()
+        if pool["checked_out"] >= pool["max_pool_size"] > 0:
+            warnings.append("connection pool exhausted")
+        if self._consecutive_failures:
+            warnings.append(f"last database check failed: {self._last_error}")
+        return self._render(DEGRADED if warnings else HEALTHY, [], warnings, pool, backlog)
+
+    def _render(self, status: str, reasons: list, warnings: list, pool: dict | None = None, backlog: int = 0) -> dict:
+        samples = sorted(self._latencies)
+        return {
+            "status": status,
+            "database": "connected" if status in (HEALTHY, DEGRADED) else "unavailable",
+            "ready": status in (HEALTHY, DEGRADED) and self._consecutive_failures == 0,
+            "reasons": reasons,
+            "warnings": warnings,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "consecutive_failures": self._consecutive_failures,
+            "latency_ms": {
+                "last": round(self._latencies[-1] * 1000, 3) if self._latencies else 0.0,
+                "p50": round(percentile(samples, 50) * 1000, 3),
+                "p95": round(percentile(samples, 95) * 1000, 3),
+                "p99": round(percentile(samples, 99) * 1000, 3),
+            },
+            "pool": pool or pool_metrics.snapshot(),
+            "log_queue_backlog": backlog,
+        }
+
+    @property
+    def state(self) -> dict:
+        """
+        Return the cached health state; never touches the database.
+        """
+        if self._last_check is not None and time.monotonic() - self._last_check > self._stale_after:
+            return {**self._state, "status": UNHEALTHY, "database": "unavailable", "ready": False,
+                    "reasons": ["health monitor has not run recently"]}
+        return self._state
+
+
+health_monitor = HealthMonitor(
+    interval=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+    timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+)
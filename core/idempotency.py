@@ -0,0 +1,299 @@
+"""
+Idempotency-Key support for create endpoints.
+
+A POST to one of IDEMPOTENT_ROUTES carrying an `Idempotency-Key` header runs at
+most once per key. Its response (anything below 500) is stored and replayed
+verbatim, with `Idempotent-Replayed: true`, to every retry sent in the next
+IDEMPOTENCY_TTL_HOURS. Reusing a key for a different request body gets a 422.
+
+The first request claims the key by inserting an in_progress IdempotencyRecord
+(idempotency_keys, TTL-indexed on created_at). Duplicates arriving while it
+runs wait for its response instead of racing it:
+
+- in this process, on the executor's future, without touching MongoDB;
+- in other processes, by polling the record, for up to IDEMPOTENCY_WAIT_SECONDS
+  (then 409, to be retried later).
+
+Completed responses are also kept in a small in-process LRU, so replays
+usually skip MongoDB as well. A failed execution (5xx or an exception)
+releases the key so a retry runs again; a claim whose process died is taken
+over after IDEMPOTENCY_LOCK_SECONDS.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from core.metrics import record_idempotency
+from models.idempotency import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# POST routes (below API_V1_STR) that honour Idempotency-Key.
+IDEMPOTENT_ROUTES = tuple(
+    re.compile(f"^{re.escape(settings.API_V1_STR)}{pattern}$")
+    for pattern in (r"/emails/?", r"/emails/generate", r"/contacts/?", r"/contacts/batch", r"/companies/?", r"/campaigns/?",
+                    r"/campaigns/[^/]+/send", r"/campaigns/[^/]+/generate", r"/admin/generate-data")
+)
+
+# How often a duplicate polls a key claimed by another process.
+_POLL_SECONDS = 0.05
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """
+    A completed response, as replayed to retries.
+    """
+    fingerprint: str
+    status_code: int
+    content_type: bytes | None
+    body: bytes
+
+
+class IdempotencyStore:
+    """
+    Claims, completes and looks up idempotency keys.
+
+    The MongoDB methods are blocking; the middleware runs them in the threadpool.
+    """
+
+    def __init__(self, cache_size: int):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.cache_size = cache_size
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self._completed: OrderedDict[str, tuple[float, StoredResponse]] = OrderedDict()
+
+    def cached(self, key: str) -> StoredResponse | None:
+        entry = self._completed.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._completed.pop(key, None)
+            return None
+        self._completed.move_to_end(key)
+        return entry[1]
+
+    def remember(self, key: str, response: StoredResponse) -> None:
+        self._completed[key] = (time.monotonic() + settings.IDEMPOTENCY_TTL_HOURS * 3600, response)
+        self._completed.move_to_end(key)
+        while len(self._completed) > self.cache_size:
+            self._completed.popitem(last=False)
+
+    def clear(self) -> None:
+        self._completed.clear()
+
+    def claim(self, key: str, fingerprint: str) -> dict | None:
+        """
+        Claim a key for execution.
+
+        Returns:
+            dict | None: None if this process now owns the key, else the existing record
+            (which may have vanished by the time the caller looks again).
+        """
+        collection = IdempotencyRecord._get_collection()
+        now = datetime.now(timezone.utc)
+        try:
+            collection.insert_one({"_id": key, "fingerprint": fingerprint, "status": "in_progress",
+                                   "owner": self.owner, "created_at": now})
+            return None
+        except DuplicateKeyError:
+            pass
+        # Take over a claim whose executor died before finishing.
+        abandoned = collection.find_one_and_update(
+            {"_id": key, "status": "in_progress", "fingerprint": fingerprint,
+             "created_at": {"$lt": now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)}},
+            {"$set": {"owner": self.owner, "created_at": now}},
+        )
+        if abandoned is not None:
+            logger.warning(f"Took over abandoned idempotency key {key} from {abandoned.get('owner')}")
+            return None
+        return collection.find_one({"_id": key}) or {"status": "released"}
+
+    def lookup(self, key: str) -> dict | None:
+        return IdempotencyRecord._get_collection().find_one({"_id": key})
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        IdempotencyRecord._get_collection().update_one(
+            {"_id": key, "owner": self.owner},
+            {"$set": {"status": "completed", "status_code": response.status_code,
+                      "content_type": response.content_type.decode() if response.content_type else None,
+                      "body": response.body, "completed_at": datetime.now(timezone.utc)}},
+        )
+
+    def release(self, key: str) -> None:
+        IdempotencyRecord._get_collection().delete_one({"_id": key, "owner": self.owner, "status": "in_progress"})
+
+
+idempotency_store = IdempotencyStore(settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+def _stored(record: dict) -> StoredResponse:
+    content_type = record.get("content_type")
+    return StoredResponse(record["fingerprint"], record["status_code"],
+                          content_type.encode() if content_type else None, bytes(record.get("body") or b""))
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _send_response(send, status: int, body: bytes, content_type: bytes | None, headers: list) -> None:
+    headers = [(b"content-length", str(len(body)).encode())] + headers
+    if content_type:
+        headers.append((b"content-type", content_type))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_error(send, status: int, detail: str, headers: list | None = None) -> None:
+    await _send_response(send, status, json.dumps({"detail": detail}).encode(), b"application/json", headers or [])
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware implementing Idempotency-Key for IDEMPOTENT_ROUTES.
+
+    Requests without the header, and all other routes, pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        key = self._idempotency_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_error(send, 400, f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        record_key = f"{scope['method']} {scope['path'].rstrip('/')} {key}"
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            stored = idempotency_store.cached(record_key)
+            if stored is None and record_key in idempotency_store.in_flight:
+                # Another request in this process has the key; share its outcome.
+                record_idempotency("waited")
+                stored = await asyncio.shield(idempotency_store.in_flight[record_key])
+            if stored is not None:
+                await self._replay(stored, fingerprint, send)
+                return
+            if time.monotonic() > deadline:
+                record_idempotency("conflict")
+                await _send_error(send, 409, "A request with this Idempotency-Key is still being processed",
+                                  [(b"retry-after", b"1")])
+                return
+            if record_key not in idempotency_store.in_flight:
+                done = await self._claim_and_run(scope, body, receive, send, record_key, fingerprint, deadline)
+                if done:
+                    return
+
+    async def _claim_and_run(self, scope, body, receive, send, record_key, fingerprint, deadline) -> bool:
+        """
+        Claim the key for this process, then execute the request or wait for the process
+        that holds it. Returns False when the caller should look again.
+        """
+        future = asyncio.get_running_loop().create_future()
+        idempotency_store.in_flight[record_key] = future
+        stored = None
+        try:
+            existing = await run_in_threadpool(idempotency_store.claim, record_key, fingerprint)
+            if existing is None:
+                stored = await self._execute(scope, body, receive, send, record_key, fingerprint)
+                return True
+            stored = await self._wait(record_key, existing, deadline)
+            return False
+        finally:
+            del idempotency_store.in_flight[record_key]
+            future.set_result(stored)
+
+    async def _execute(self, scope, body, receive, send, record_key, fingerprint) -> StoredResponse | None:
+        status, content_type, chunks = 500, None, []
+        body_sent = False
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_and_capture(message):
+            nonlocal status, content_type
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers") or []).get(b"content-type")
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        record_idempotency("executed")
+        try:
+            await self.app(scope, receive_body, send_and_capture)
+        except BaseException:
+            await run_in_threadpool(idempotency_store.release, record_key)
+            raise
+        if status >= 500:
+            # Failures are not remembered, so the client's retry runs again.
+            await run_in_threadpool(idempotency_store.release, record_key)
+            return None
+        stored = StoredResponse(fingerprint, status, content_type, b"".join(chunks))
+        await run_in_threadpool(idempotency_store.complete, record_key, stored)
+        idempotency_store.remember(record_key, stored)
+        return stored
+
+    @staticmethod
+    async def _wait(record_key: str, record: dict, deadline: float) -> StoredResponse | None:
+        # Another process holds the key: poll until it completes, releases it or we give up.
+        record_idempotency("waited")
+        while record is not None and record.get("status") == "in_progress" and time.monotonic() <= deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+            record = await run_in_threadpool(idempotency_store.lookup, record_key)
+        if record is None or record.get("status") != "completed":
+            return None
+        stored = _stored(record)
+        idempotency_store.remember(record_key, stored)
+        return stored
+
+    @staticmethod
+    async def _replay(stored: StoredResponse, fingerprint: str, send) -> None:
+        if stored.fingerprint != fingerprint:
+            record_idempotency("mismatch")
+            await _send_error(send, 422, f"{IDEMPOTENCY_HEADER} was already used for a different request")
+            return
+        record_idempotency("replayed")
+        await _send_response(send, stored.status_code, stored.body, stored.content_type,
+                             [(REPLAYED_HEADER.lower().encode(), b"true")])
+
+    @staticmethod
+    def _idempotency_key(scope) -> str | None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return None
+        if not any(route.match(scope["path"]) for route in IDEMPOTENT_ROUTES):
+            return None
+        key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER.lower().encode())
+        return key.decode("latin-1").strip() if key is not None else None
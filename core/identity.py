@@ -0,0 +1,91 @@
+"""
+Normalization and blocking keys for contact identity resolution.
+
+Every contact stores a few short hashed keys (Contact.dedup_keys, a multikey
+index). Contacts that share a key land in the same bucket and are the only ones
+core.dedup ever compares, so finding duplicates never needs pairwise comparison
+of the whole collection.
+"""
+import hashlib
+import re
+import unicodedata
+from config import settings
+
+# Shared mailbox providers: a common domain here says nothing about the employer.
+FREE_MAIL_DOMAINS = frozenset({
+    "gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "live.com", "icloud.com", "aol.com",
+    "proton.me", "protonmail.com", "gmx.com", "mail.com",
+})
+
+_GMAIL_DOMAINS = ("gmail.com", "googlemail.com")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(value: str | None) -> str:
+    """
+    Fold case and accents and drop everything but letters and digits ("José-Luis" -> "joseluis").
+    """
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    ascii_only = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub("", ascii_only.casefold())
+
+
+def normalize_email(value: str | None) -> str:
+    """
+    Lower-case an address and drop +tags; Gmail addresses also lose their dots.
+    """
+    email = (value or "").strip().lower()
+    local, sep, domain = email.rpartition("@")
+    if not sep:
+        return email
+    local = local.split("+", 1)[0]
+    if domain in _GMAIL_DOMAINS:
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}"
+
+
+def email_domain(value: str | None) -> str:
+    return normalize_email(value).rpartition("@")[2]
+
+
+def website_domain(value: str | None) -> str:
+    """
+    Reduce a website to its bare host ("https://www.Acme.com:443/about" -> "acme.com").
+    """
+    host = (value or "").strip().lower().split("://", 1)[-1]
+    host = re.split(r"[/?#]", host, maxsplit=1)[0].rpartition("@")[2].split(":", 1)[0].rstrip(".")
+    return host.removeprefix("www.")
+
+
+def _key(kind: str, *parts: str) -> str:
+    digest = hashlib.blake2b("|".join(parts).encode(), digest_size=8).hexdigest()
+    return f"{kind}:{digest}"
+
+
+def blocking_keys(first_name: str | None, last_name: str | None, email: str | None, company=None,
+                  user=None) -> list[str]:
+    """
+    Compute a contact's blocking keys.
+
+    - e: normalized email address
+    - n: last name, first initial and (non-free-mail) email domain
+    - c: last name, first initial and company
+
+    Keys are scoped to the owning user unless DEDUP_ACROSS_USERS is set.
+
+    Returns:
+        list[str]: Short hashed keys, e.g. "e:1f0c3a9d2b7e4c55".
+    """
+    scope = "" if settings.DEDUP_ACROSS_USERS else str(user or "")
+    first, last = normalize_name(first_name), normalize_name(last_name)
+    email = normalize_email(email)
+    keys = []
+    if "@" in email:
+        keys.append(_key("e", scope, email))
+    if first and last:
+        domain = email.rpartition("@")[2]
+        if domain and domain not in FREE_MAIL_DOMAINS:
+            keys.append(_key("n", scope, last, first[0], domain))
+        if company:
+            keys.append(_key("c", scope, last, first[0], str(company)))
+    return keys
@@ -0,0 +1,382 @@
+"""
+MongoDB-backed background job queue.
+
+Jobs are documents in the jobs collection. Workers claim them with an atomic
+find_one_and_update and hold a lease that every progress update renews; a job
+whose worker dies is picked up again when the lease expires and resumes from its
+last checkpoint.
+
+Workers run inside the API process (JOB_WORKERS) or as separate processes:
+
+    python -m core.jobs --workers 4
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from config import settings
+from models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# Modules that register handlers with @job_handler; imported before workers start.
+HANDLER_MODULES = ("core.seeding", "core.delivery", "core.snapshots", "core.cascade", "core.retention", "core.dedup",
+                   "core.db_snapshots", "core.domains", "core.generation")
+
+JOB_HANDLERS = {}
+
+# Minimum time between progress writes, so tight loops can report progress freely.
+_PROGRESS_FLUSH_SECONDS = 0.5
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a handler when cancellation of its job was requested.
+    """
+
+
+class JobInterrupted(Exception):
+    """
+    Raised inside a handler when its worker shuts down; the job is requeued.
+    """
+
+
+class JobLeaseLost(Exception):
+    """
+    Raised inside a handler when another worker has taken over its job.
+    """
+
+
+def job_handler(kind: str):
+    """
+    Register a function as the handler for a job kind.
+
+    Handlers are synchronous, run on a worker thread and receive a JobContext.
+    They return a dict that is stored as the job result.
+    """
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def load_handlers() -> None:
+    """
+    Import every module listed in HANDLER_MODULES so its handlers are registered.
+    """
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """
+    Handle passed to a job handler for reporting progress and saving checkpoints.
+
+    Every write renews the worker's lease and picks up cancellation requests, which
+    surface as JobCancelled from progress() or save_checkpoint().
+    """
+
+    def __init__(self, queue: "JobQueue", job: dict):
+        self.job_id = job["_id"]
+        self.kind = job["kind"]
+        self.params = job.get("params") or {}
+        self.checkpoint = dict(job.get("checkpoint") or {})
+        self.attempt = job.get("attempts", 1)
+        self._queue = queue
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def _write(self, fields: dict) -> None:
+        now = _now()
+        fields = {**fields, "updated_at": now, "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS)}
+        job = self._queue.collection().find_one_and_update(
+            {"_id": self.job_id, "status": "running", "worker_id": self._queue.worker_id},
+            {"$set": fields},
+            projection={"cancel_requested": 1},
+        )
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        if job is None:
+            raise JobLeaseLost(f"Job {self.job_id} is no longer held by worker {self._queue.worker_id}")
+        if job.get("cancel_requested"):
+            raise JobCancelled()
+        if self._queue.stopping:
+            raise JobInterrupted()
+
+    def progress(self, done: float, total: float | None = None, message: str | None = None) -> None:
+        """
+        Report progress as done/total (or a 0-1 fraction when total is None).
+
+        Writes are throttled to one every _PROGRESS_FLUSH_SECONDS.
+        """
+        fraction = done / total if total else done
+        self._pending["progress"] = max(0.0, min(float(fraction), 1.0))
+        if message is not None:
+            self._pending["message"] = message
+        if time.monotonic() - self._last_flush >= _PROGRESS_FLUSH_SECONDS:
+            self._write(self._pending)
+
+    def save_checkpoint(self, **state) -> None:
+        """
+        Persist resume state; a retried or resumed run finds it in ctx.checkpoint.
+        """
+        self.checkpoint.update(state)
+        self._write({**self._pending, "checkpoint": self.checkpoint})
+
+
+class JobQueue:
+    """
+    Enqueues jobs and runs a pool of asyncio workers that execute them on threads.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stopping = False
+        self._tasks = []
+        self._wake: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @staticmethod
+    def collection():
+        return Job._get_collection()
+
+    # -- producers -------------------------------------------------------
+
+    def enqueue(self, kind: str, params: dict | None = None) -> Job:
+        """
+        Queue a job and wake the local workers.
+
+        Raises:
+            ValueError: If no handler is registered for `kind`.
+        """
+        if kind not in JOB_HANDLERS:
+            load_handlers()
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind=kind, params=params or {})
+        job.save()
+        logger.info(f"Queued {kind} job {job.job_id}")
+        self.notify()
+        return job
+
+    def enqueue_once(self, kind: str, params: dict | None = None) -> Job | None:
+        """
+        Queue a job unless one of the same kind is already queued or running.
+
+        Returns:
+            Job | None: The new job, or None if one was pending.
+        """
+        if Job.objects(kind=kind, status__in=["queued", "running"]).first():
+            return None
+        return self.enqueue(kind, params)
+
+    def notify(self) -> None:
+        """
+        Wake idle workers in this process; safe to call from any thread.
+        """
+        if self._wake is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """
+        Cancel a queued job, or ask the worker running it to stop at its next progress update.
+        """
+        now = _now()
+        collection = self.collection()
+        collection.update_one(
+            {"_id": job_id, "status": "queued"},
+            {"$set": {"status": "cancelled", "cancel_requested": True, "finished_at": now, "updated_at": now}},
+        )
+        collection.update_one({"_id": job_id, "status": "running"},
+                              {"$set": {"cancel_requested": True, "updated_at": now}})
+        return Job.objects(job_id=job_id).first()
+
+    def resume(self, job_id: str) -> Job | None:
+        """
+        Requeue a failed or cancelled job; it continues from its last checkpoint.
+        """
+        self.collection().update_one(
+            {"_id": job_id, "status": {"$in": ["failed", "cancelled"]}},
+            {"$set": {"status": "queued", "cancel_requested": False, "attempts": 0, "updated_at": _now()},
+             "$unset": {"error": "", "finished_at": "", "worker_id": "", "lease_expires_at": ""}},
+        )
+        self.notify()
+        return Job.objects(job_id=job_id).first()
+
+    # -- workers ---------------------------------------------------------
+
+    def claim(self) -> dict | None:
+        """
+        Atomically take the oldest queued job, or a running job whose lease expired.
+
+        Jobs that lost their worker JOB_MAX_ATTEMPTS times are failed instead of retried.
+        """
+        now = _now()
+        collection = self.collection()
+        collection.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": settings.JOB_MAX_ATTEMPTS}},
+            {"$set": {"status": "failed", "error": "The job's worker stopped responding too many times",
+                      "finished_at": now, "updated_at": now}},
+        )
+        return collection.find_one_and_update(
+            {"$or": [{"status": "queued"}, {"status": "running", "lease_expires_at": {"$lt": now}}]},
+            {"$set": {"status": "running", "worker_id": self.worker_id, "updated_at": now,
+                      "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS)},
+             "$min": {"started_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _finish(self, ctx: JobContext, fields: dict) -> None:
+        now = _now()
+        self.collection().update_one(
+            {"_id": ctx.job_id, "worker_id": self.worker_id},
+            {"$set": {**fields, "checkpoint": ctx.checkpoint, "updated_at": now}},
+        )
+
+    def run_job(self, job: dict) -> None:
+        """
+        Execute a claimed job on the current thread and record its outcome.
+        """
+        ctx = JobContext(self, job)
+        handler = JOB_HANDLERS.get(job["kind"])
+        logger.info(f"Running {ctx.kind} job {ctx.job_id} (attempt {ctx.attempt})")
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{ctx.kind}'")
+            if job.get("cancel_requested"):
+                raise JobCancelled()
+            result = handler(ctx) or {}
+            self._finish(ctx, {"status": "succeeded", "progress": 1.0, "result": result, "finished_at": _now()})
+            logger.info(f"Job {ctx.job_id} succeeded")
+        except JobCancelled:
+            self._finish(ctx, {"status": "cancelled", "finished_at": _now()})
+            logger.info(f"Job {ctx.job_id} cancelled")
+        except JobInterrupted:
+            self.collection().update_one(
+                {"_id": ctx.job_id, "worker_id": self.worker_id},
+                {"$set": {"status": "queued", "checkpoint": ctx.checkpoint, "updated_at": _now()},
+                 "$inc": {"attempts": -1}, "$unset": {"worker_id": "", "lease_expires_at": ""}},
+            )
+            logger.info(f"Job {ctx.job_id} interrupted by shutdown and requeued")
+        except JobLeaseLost as e:
+            logger.warning(str(e))
+        except Exception as e:
+            logger.error(f"Job {ctx.job_id} failed: {str(e)}", exc_info=True)
+            self._finish(ctx, {"status": "failed", "error": str(e), "finished_at": _now()})
+
+    async def _worker(self, index: int) -> None:
+        while not self.stopping:
+            self._wake.clear()
+            try:
+                job = await asyncio.to_thread(self.claim)
+            except Exception as e:
+                logger.error(f"Job worker {index} failed to claim a job: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await asyncio.to_thread(self.run_job, job)
+
+    async def start(self, workers: int) -> None:
+        """
+        Start `workers` worker tasks on the running event loop.
+        """
+        if self._tasks or workers <= 0:
+            return
+        load_handlers()
+        self.stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i), name=f"job-worker-{i}") for i in range(workers)]
+        logger.info(f"Started {workers} job workers as {self.worker_id}")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop the workers. Running jobs are requeued at their next progress update.
+        """
+        if not self._tasks:
+            return
+        self.stopping = True
+        self._wake.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        self._tasks = []
+        self._wake = None
+        self._loop = None
+
+
+job_queue = JobQueue()
+
+
+class PeriodicTask:
+    """
+    Calls a synchronous function on a worker thread at start and then every
+    `interval` seconds, logging (not raising) its errors. Used to queue
+    recurring jobs such as email archiving and incremental deduplication.
+    """
+
+    def __init__(self, name: str, interval: float, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is not None or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.func)
+            except Exception as e:
+                logger.error(f"Periodic task {self.name} failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+async def _serve(workers: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await job_queue.start(workers)
+    await stop.wait()
+    await job_queue.stop()
+
+
+if __name__ == "__main__":
+    from core.database import connect_db
+    parser = argparse.ArgumentParser(description="Run background job workers without the API.")
+    parser.add_argument("--workers", type=int, default=max(settings.JOB_WORKERS, 1))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    connect_db()
+    asyncio.run(_serve(args.workers))
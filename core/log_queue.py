@@ -0,0 +1,53 @@
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+_log_queue: queue.Queue = queue.Queue(-1)
+_listener: QueueListener | None = None
+_handlers: list[logging.Handler] = []
+
+
+def install_log_queue() -> None:
+    """
+    Move the root logger's handlers behind a queue drained by a background thread.
+
+    Log calls made from the event loop then only enqueue the record, and file I/O
+    happens on the listener thread. Calling this more than once is a no-op.
+    """
+    global _listener, _handlers
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    _handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+    for handler in _handlers:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(_log_queue))
+    _listener = QueueListener(_log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_log_queue() -> None:
+    """
+    Flush queued records and restore the original handlers on the root logger.
+    """
+    global _listener, _handlers
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+        root.removeHandler(handler)
+    for handler in _handlers:
+        root.addHandler(handler)
+    _handlers = []
+
+
+def log_queue_backlog() -> int:
+    """
+    Return the number of log records waiting to be written.
+
+    Returns:
+        int: Approximate size of the log queue.
+    """
+    return _log_queue.qsize()
@@ -0,0 +1,241 @@
+import logging
+import time
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.exceptions import HTTPException
+from core.database import pool_metrics
+from core.mongo_commands import CommandSample, command_tracker
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests handled, by route template and status code.",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled, by route template.",
+    ["method", "route"],
+)
+
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency as reported by the driver.",
+    ["command", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error.",
+    ["command", "collection"],
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "mongodb_pool_checked_out_connections",
+    "Connections currently checked out of the MongoDB pool.",
+)
+MONGO_POOL_OPEN = Gauge(
+    "mongodb_pool_open_connections",
+    "Connections currently open in the MongoDB pool.",
+)
+MONGO_POOL_WAIT = Gauge(
+    "mongodb_pool_checkout_wait_seconds_total",
+    "Cumulative time spent waiting to check out a MongoDB connection.",
+)
+MONGO_POOL_CHECKED_OUT.set_function(lambda: pool_metrics.checked_out)
+MONGO_POOL_OPEN.set_function(lambda: pool_metrics.open_connections)
+MONGO_POOL_WAIT.set_function(lambda: pool_metrics.wait_time_total)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "In-process cache lookups, by cache name and result (hit or miss).",
+    ["cache", "result"],
+)
+
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Requests sent with an Idempotency-Key, by outcome (executed, replayed, waited, mismatch or conflict).",
+    ["outcome"],
+)
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Coalesced reads, by flight and role (a leader ran the query, a follower shared its result).",
+    ["flight", "role"],
+)
+
+ADMISSION_REQUESTS = Counter(
+    "admission_requests_total",
+    "API requests by admission class and outcome (admitted, rate_limited or shed).",
+    ["request_class", "outcome"],
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time API requests waited for a concurrency slot, by admission class.",
+    ["request_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+AI_GENERATIONS = Counter(
+    "ai_generations_total",
+    "AI generations recorded, by model.",
+    ["model"],
+)
+AI_TOKENS = Counter(
+    "ai_tokens_total",
+    "AI tokens consumed, by model and direction (sent or returned).",
+    ["model", "direction"],
+)
+AI_GENERATION_LATENCY = Histogram(
+    "ai_generation_duration_seconds",
+    "AI generation latency by model.",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+AI_REQUESTS = Counter(
+    "ai_requests_total",
+    "AI provider calls, by route and outcome (success, error, rate_limited, hedge or cancelled).",
+    ["route", "outcome"],
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """
+    Count a cache lookup.
+
+    Args:
+        cache (str): Name of the cache.
+        hit (bool): Whether the lookup was served from the cache.
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_idempotency(outcome: str) -> None:
+    """
+    Count an Idempotency-Key outcome.
+
+    Args:
+        outcome (str): executed, replayed, waited, mismatch or conflict.
+    """
+    IDEMPOTENT_REQUESTS.labels(outcome).inc()
+
+
+def record_single_flight(flight: str, role: str) -> None:
+    """
+    Count a coalesced read.
+
+    Args:
+        flight (str): Name of the read.
+        role (str): leader (ran the query) or follower (shared a query in flight).
+    """
+    SINGLE_FLIGHT_CALLS.labels(flight, role).inc()
+
+
+def record_admission(request_class: str, outcome: str, wait: float | None = None) -> None:
+    """
+    Count an admission decision.
+
+    Args:
+        request_class (str): interactive, write or bulk.
+        outcome (str): admitted, rate_limited or shed.
+        wait (float | None): Seconds spent queued for a slot, if the request queued at all.
+    """
+    ADMISSION_REQUESTS.labels(request_class, outcome).inc()
+    if wait is not None:
+        ADMISSION_QUEUE_WAIT.labels(request_class).observe(wait)
+
+
+def record_ai_generation(model: str, tokens_sent: int, tokens_returned: int, duration: float) -> None:
+    """
+    Count one AI generation and the tokens it used.
+
+    Args:
+        model (str): The model that produced the output.
+        tokens_sent (int): Prompt tokens.
+        tokens_returned (int): Completion tokens.
+        duration (float): Generation time in seconds.
+    """
+    AI_GENERATIONS.labels(model).inc()
+    AI_TOKENS.labels(model, "sent").inc(tokens_sent)
+    AI_TOKENS.labels(model, "returned").inc(tokens_returned)
+    AI_GENERATION_LATENCY.labels(model).observe(duration)
+
+
+def record_ai_request(route: str, outcome: str) -> None:
+    """
+    Count an AI provider call.
+
+    Args:
+        route (str): "<provider>/<model>".
+        outcome (str): success, error, rate_limited, hedge (a hedge was started on this route)
+            or cancelled (lost to a faster attempt).
+    """
+    AI_REQUESTS.labels(route, outcome).inc()
+
+
+def _record_mongo_command(sample: CommandSample) -> None:
+    collection = sample.collection or ""
+    MONGO_COMMAND_LATENCY.labels(sample.command_name, collection).observe(sample.duration)
+    if sample.failed:
+        MONGO_COMMAND_FAILURES.labels(sample.command_name, collection).inc()
+
+
+def _instrument_endpoint(asgi_app, path: str, methods: set[str]):
+    # Label children are resolved once per route so a request only pays for
+    # a dict lookup, a gauge inc/dec, a histogram observe and a counter inc.
+    in_flight = {method: HTTP_IN_FLIGHT.labels(method, path) for method in methods}
+    latency = {method: HTTP_LATENCY.labels(method, path) for method in methods}
+
+    async def instrumented(scope, receive, send):
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        gauge = in_flight.get(method) or HTTP_IN_FLIGHT.labels(method, path)
+        gauge.inc()
+        started = time.perf_counter()
+        try:
+            await asgi_app(scope, receive, send_with_status)
+        except HTTPException as e:
+            status = e.status_code
+            raise
+        except RequestValidationError:
+            status = 422
+            raise
+        finally:
+            (latency.get(method) or HTTP_LATENCY.labels(method, path)).observe(time.perf_counter() - started)
+            gauge.dec()
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
+
+    instrumented.__wrapped__ = asgi_app
+    return instrumented
+
+
+def instrument_app(app) -> None:
+    """
+    Instrument every API route of the app and start recording MongoDB command timings.
+
+    Each route's ASGI handler is wrapped once at startup, so the route template is
+    known without re-matching the path on every request. Calling this more than once
+    is a no-op.
+
+    Args:
+        app (FastAPI): The application whose routes should be instrumented.
+    """
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not hasattr(route.app, "__wrapped__"):
+            route.app = _instrument_endpoint(route.app, route.path, route.methods)
+    command_tracker.subscribe(_record_mongo_command)
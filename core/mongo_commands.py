@@ -0,0 +1,105 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Commands whose first value is the target collection name.
+_COLLECTION_COMMANDS = {
+    "find", "insert", "update", "delete", "aggregate", "count", "distinct",
+    "findAndModify", "createIndexes", "listIndexes", "drop", "create",
+}
+
+
+@dataclass
+class CommandSample:
+    """
+    A completed MongoDB command as seen by the CommandTracker.
+    """
+    command_name: str
+    database: str
+    collection: str | None
+    command: dict
+    duration: float
+    failed: bool
+
+
+def _collection_name(command_name: str, command: dict) -> str | None:
+    if command_name in _COLLECTION_COMMANDS:
+        value = command.get(command_name)
+        return value if isinstance(value, str) else None
+    if command_name == "getMore":
+        return command.get("collection")
+    return None
+
+
+class CommandTracker(monitoring.CommandListener):
+    """
+    Command listener that pairs started/finished events and fans the completed
+    command out to subscribers (metrics, profiling, slow-query logging).
+
+    Subscribers run synchronously on the thread that issued the command, so
+    they must be cheap and must not raise.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._subscribers: list[Callable[[CommandSample], None]] = []
+
+    def subscribe(self, callback: Callable[[CommandSample], None]) -> None:
+        """
+        Register a callback invoked with a CommandSample for every finished command.
+
+        Args:
+            callback: Function accepting a CommandSample.
+        """
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[CommandSample], None]) -> None:
+        """
+        Remove a previously registered callback.
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def started(self, event):
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.command_name,
+                event.database_name,
+                _collection_name(event.command_name, event.command),
+                event.command,
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool) -> None:
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        command_name, database, collection, command = pending
+        sample = CommandSample(
+            command_name=command_name,
+            database=database,
+            collection=collection,
+            command=command,
+            duration=event.duration_micros / 1_000_000,
+            failed=failed,
+        )
+        for callback in self._subscribers:
+            try:
+                callback(sample)
+            except Exception as e:
+                logger.error(f"Command subscriber {callback!r} failed: {str(e)}", exc_info=True)
+
+
+command_tracker = CommandTracker()
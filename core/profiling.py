@@ -0,0 +1,280 @@
+import contextvars
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from config import settings
+from core.mongo_commands import CommandSample, command_tracker
+from core.query_shape import query_shape, shape_key
+from core.security import ADMIN_KEY_HEADER, is_admin_key
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Leaf frames in these stdlib modules mean the thread is idle (waiting on a
+# queue, lock or selector) and is not working on a request.
+_IDLE_MODULES = tuple(
+    os.path.join(os.path.dirname(os.__file__), name)
+    for name in ("threading.py", "queue.py", "selectors.py", os.path.join("concurrent", "futures", "thread.py"))
+)
+
+_active_profile: contextvars.ContextVar["RequestProfile | None"] = contextvars.ContextVar("active_profile", default=None)
+
+
+@dataclass
+class RequestProfile:
+    """
+    Profile of a single request: stack samples plus the MongoDB calls it issued.
+    """
+    profile_id: str
+    method: str
+    path: str
+    trigger: str
+    interval: float
+    started_at: datetime
+    status: int | None = None
+    duration: float = 0.0
+    samples: Counter = field(default_factory=Counter)
+    mongo_calls: list = field(default_factory=list)
+
+    def summary(self) -> dict:
+        """
+        Return the profile metadata and its MongoDB breakdown.
+        """
+        breakdown = {}
+        for call in self.mongo_calls:
+            entry = breakdown.setdefault(call["shape_key"], {
+                "command": call["command"],
+                "collection": call["collection"],
+                "shape": call["shape"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+            })
+            entry["count"] += 1
+            entry["total_ms"] += call["duration_ms"]
+            entry["max_ms"] = max(entry["max_ms"], call["duration_ms"])
+        mongo_ms = sum(call["duration_ms"] for call in self.mongo_calls)
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "sample_count": sum(self.samples.values()),
+            "mongo": {
+                "calls": len(self.mongo_calls),
+                "total_ms": round(mongo_ms, 3),
+                "share_of_request": round(mongo_ms / (self.duration * 1000), 3) if self.duration else 0.0,
+                "by_shape": sorted(
+                    ({**entry, "total_ms": round(entry["total_ms"], 3), "max_ms": round(entry["max_ms"], 3)}
+                     for entry in breakdown.values()),
+                    key=lambda entry: entry["total_ms"],
+                    reverse=True,
+                ),
+            },
+        }
+
+    def to_speedscope(self) -> dict:
+        """
+        Render the samples in the speedscope "sampled" file format.
+        """
+        frames, frame_index, stacks, weights = [], {}, [], []
+        interval_ms = self.interval * 1000
+        for stack, count in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": filename, "line": line})
+                indexes.append(frame_index[frame])
+            stacks.append(indexes)
+            weights.append(count * interval_ms)
+        name = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": settings.PROJECT_NAME,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            }],
+        }
+
+    def to_collapsed(self) -> str:
+        """
+        Render the samples as collapsed stacks, the input format of flamegraph.pl and inferno.
+        """
+        lines = []
+        for stack, count in self.samples.items():
+            frames = ";".join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack)
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of busy threads on a fixed interval from a daemon thread.
+
+    The event loop thread is always sampled; other threads are sampled when they are
+    not idle, which covers work handed to the thread pool. Concurrent requests that
+    run on the same threads show up in the same profile.
+    """
+
+    def __init__(self, profile: RequestProfile, loop_thread_id: int):
+        self.profile = profile
+        self.loop_thread_id = loop_thread_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{profile.profile_id}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.profile.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id != self.loop_thread_id and frame.f_code.co_filename.startswith(_IDLE_MODULES):
+                    continue
+                self.profile.samples[self._stack(frame)] += 1
+
+    @staticmethod
+    def _stack(frame) -> tuple:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+
+class ProfileStore:
+    """
+    Bounded in-memory store of the most recent request profiles.
+    """
+
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self._profiles: OrderedDict[str, RequestProfile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.profile_id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> RequestProfile | None:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> list[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+profile_store = ProfileStore(settings.PROFILING_MAX_STORED)
+
+
+def _record_mongo_call(sample: CommandSample) -> None:
+    profile = _active_profile.get()
+    if profile is None:
+        return
+    shape = query_shape(sample.command_name, sample.command)
+    profile.mongo_calls.append({
+        "command": sample.command_name,
+        "collection": sample.collection,
+        "shape": shape,
+        "shape_key": shape_key(shape),
+        "duration_ms": sample.duration * 1000,
+        "failed": sample.failed,
+    })
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles admin requests sent with `X-Profile: 1`, and a random
+    PROFILING_SAMPLE_RATE fraction of all requests.
+
+    Only installed when PROFILING_ENABLED is set, so it costs nothing otherwise.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        command_tracker.subscribe(_record_mongo_call)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            profile_id=uuid.uuid4().hex,
+            method=scope["method"],
+            path=scope["path"],
+            trigger=trigger,
+            interval=settings.PROFILING_INTERVAL_MS / 1000,
+            started_at=datetime.now(timezone.utc),
+        )
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile.profile_id.encode())
+                ]
+            await send(message)
+
+        sampler = StackSampler(profile, threading.get_ident())
+        token = _active_profile.set(profile)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            profile.duration = time.perf_counter() - started
+            _active_profile.reset(token)
+            profile_store.add(profile)
+            logger.info(f"Profiled {profile.method} {profile.path} in {profile.duration * 1000:.1f}ms "
+                        f"({len(profile.mongo_calls)} Mongo calls): {profile.profile_id}")
+
+    @staticmethod
+    def _trigger(scope) -> str | None:
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER.lower().encode()) in (b"1", b"true"):
+            admin_key = headers.get(ADMIN_KEY_HEADER.lower().encode())
+            if is_admin_key(admin_key.decode() if admin_key else None):
+                return "header"
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sampled"
+        return None
@@ -0,0 +1,155 @@
+import logging
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Operators that bound a range of index keys rather than pinning one value.
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$in", "$ne", "$nin", "$exists"}
+
+
+class UnindexedQueryError(ValueError):
+    """
+    Raised when no declared index supports a list query's filters and sort.
+    """
+
+
+def declared_indexes(document_cls) -> list[list[tuple[str, int]]]:
+    """
+    Return the key patterns of the indexes declared on a document, including _id.
+
+    Text, hashed and geo indexes are left out; they cannot serve filtered sorts.
+
+    Args:
+        document_cls: A mongoengine Document class.
+
+    Returns:
+        list[list[tuple[str, int]]]: One [(db_field, direction), ...] list per index.
+    """
+    patterns = [[("_id", 1)]]
+    for spec in document_cls._meta.get("index_specs") or []:
+        fields = list(spec["fields"])
+        if all(direction in (1, -1) for _, direction in fields):
+            patterns.append(fields)
+    return patterns
+
+
+def _classify(query: dict) -> tuple[set[str], set[str]]:
+    equality, ranges = set(), set()
+    for field, condition in query.items():
+        if field.startswith("$"):
+            # $or/$and/$where and friends cannot be checked against a single index.
+            raise UnindexedQueryError(f"Top-level {field} queries are not supported on list endpoints")
+        if isinstance(condition, dict) and any(key in RANGE_OPERATORS for key in condition):
+            ranges.add(field)
+        else:
+            equality.add(field)
+    return equality, ranges
+
+
+def index_supports(pattern: list[tuple[str, int]], equality: set[str], ranges: set[str],
+                   ordering: list[tuple[str, int]]) -> bool:
+    """
+    Check a query against one index using the equality, sort, range rule.
+
+    The index must start with every equality field (in any order), continue with the
+    sort fields in order (all in the index direction or all reversed), and then
+    hold the remaining range fields. A range field that is also the sort field is
+    served by the sort part of the index.
+
+    Returns:
+        bool: True when the index bounds the scan and provides the sort order.
+    """
+    position = 0
+    pending = set(equality)
+    while pending and position < len(pattern) and pattern[position][0] in pending:
+        pending.discard(pattern[position][0])
+        position += 1
+    if pending:
+        return False
+
+    relative = None
+    sort_fields = set()
+    for field, direction in ordering:
+        if field in equality:
+            # A field pinned to one value does not affect the order.
+            continue
+        if position >= len(pattern) or pattern[position][0] != field:
+            return False
+        if relative is None:
+            relative = pattern[position][1] * direction
+        elif pattern[position][1] * direction != relative:
+            return False
+        sort_fields.add(field)
+        position += 1
+
+    remaining = ranges - equality - sort_fields
+    return remaining <= {field for field, _ in pattern[position:position + len(remaining)]}
+
+
+def supporting_index(document_cls, query: dict, ordering: list[tuple[str, int]]) -> list[tuple[str, int]] | None:
+    """
+    Find a declared index that serves a query and sort, if any.
+
+    Args:
+        document_cls: The Document class being queried.
+        query (dict): The MongoDB filter, keyed by database field names.
+        ordering (list[tuple[str, int]]): The sort as (db_field, direction) pairs.
+
+    Returns:
+        list[tuple[str, int]] | None: The index key pattern, or None when there is none.
+    """
+    equality, ranges = _classify(query)
+    if not equality and not ranges and not ordering:
+        return [("_id", 1)]
+    for pattern in declared_indexes(document_cls):
+        if index_supports(pattern, equality, ranges, ordering):
+            return pattern
+    return None
+
+
+def ensure_indexed(queryset):
+    """
+    Reject a queryset whose filters and sort no declared index can serve.
+
+    When QUERY_GUARD_ENABLED is false the query is only logged, so new filters can
+    be tried out locally before their index is declared.
+
+    Args:
+        queryset: A mongoengine QuerySet with its filters and order_by applied.
+
+    Returns:
+        The same queryset.
+
+    Raises:
+        UnindexedQueryError: If the query would need a collection scan or an in-memory sort.
+    """
+    document_cls = queryset._document
+    ordering = list(queryset._ordering or [])
+    if supporting_index(document_cls, queryset._query, ordering) is not None:
+        return queryset
+
+    fields = sorted(set(queryset._query) | {field for field, _ in ordering})
+    message = f"No index on {document_cls._meta['collection']} supports filtering/sorting by {', '.join(fields)}"
+    if settings.QUERY_GUARD_ENABLED:
+        raise UnindexedQueryError(message)
+    logger.warning(message)
+    return queryset
+
+
+def filtered(document_cls, filters: dict, sort: str | None = None):
+    """
+    Build a guarded queryset from optional filters and a sort key.
+
+    Args:
+        document_cls: The Document class to query.
+        filters (dict): mongoengine query keywords such as company=..., created_at__gte=...;
+            entries whose value is None are ignored.
+        sort (str | None): A field name, prefixed with "-" for descending order.
+
+    Returns:
+        QuerySet: The filtered and sorted queryset.
+    """
+    queryset = document_cls.objects(**{key: value for key, value in filters.items() if value is not None})
+    if sort:
+        queryset = queryset.order_by(sort)
+    return ensure_indexed(queryset)
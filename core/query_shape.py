@@ -0,0 +1,75 @@
+import json
+from collections.abc import Mapping
+
+# Command fields that describe the shape of a query; everything else
+# (lsid, $db, cursor options, documents to insert...) is ignored.
+_SHAPE_FIELDS = ("filter", "query", "q", "sort", "projection", "pipeline", "key", "updates", "deletes")
+
+_MAX_DEPTH = 8
+
+
+def _normalize(value, depth: int = 0):
+    if depth > _MAX_DEPTH:
+        return "?"
+    if isinstance(value, Mapping):
+        return {key: _normalize(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Lists of values ($in) collapse to a single placeholder; lists of
+        # sub-documents ($and, pipelines) keep their structure.
+        if value and all(isinstance(item, Mapping) for item in value):
+            return [_normalize(item, depth + 1) for item in value]
+        return ["?"]
+    return "?"
+
+
+def _normalize_sort(value):
+    if isinstance(value, Mapping):
+        return {key: direction for key, direction in value.items()}
+    return _normalize(value)
+
+
+def query_shape(command_name: str, command: Mapping) -> dict:
+    """
+    Reduce a MongoDB command to its query shape: field names and operators with
+    every literal value replaced by a "?" placeholder.
+
+    Two commands with the same shape differ only in their literal values, so they
+    are served by the same indexes and share the same plan.
+
+    Args:
+        command_name (str): The command name, e.g. find or aggregate.
+        command (Mapping): The command document as sent to the server.
+
+    Returns:
+        dict: The normalized shape, including the command name and collection.
+    """
+    shape = {"command": command_name}
+    collection = command.get(command_name)
+    if isinstance(collection, str):
+        shape["collection"] = collection
+    for field in _SHAPE_FIELDS:
+        if field not in command:
+            continue
+        value = command[field]
+        if field == "sort":
+            shape[field] = _normalize_sort(value)
+        elif field in ("updates", "deletes"):
+            # Write batches: the filters of the statements define the shape.
+            statements = value if isinstance(value, (list, tuple)) else []
+            shape[field] = [_normalize(statement.get("q", {})) for statement in statements[:1]]
+        else:
+            shape[field] = _normalize(value)
+    return shape
+
+
+def shape_key(shape: dict) -> str:
+    """
+    Return a stable string key for a query shape.
+
+    Args:
+        shape (dict): A shape returned by query_shape().
+
+    Returns:
+        str: The shape rendered with sorted keys.
+    """
+    return json.dumps(shape, sort_keys=True, default=str)
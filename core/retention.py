@@ -0,0 +1,291 @@
+"""
+Email retention.
+
+EMAIL_RETENTION_MODE selects what happens to emails older than EMAIL_RETENTION_DAYS:
+
+    off      nothing; the emails collection keeps everything
+    ttl      MongoDB deletes them (a TTL index on created_at)
+    archive  a periodic job moves them into one collection per month
+             (emails_archive_YYYY_MM, block-compressed with EMAIL_ARCHIVE_COMPRESSOR),
+             which find_archived() and /emails/archived still read on demand
+
+Either way the hot collection only holds recent emails, so its working set fits in memory.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from mongoengine.connection import get_db
+from pymongo import ReplaceOne
+from pymongo.errors import CollectionInvalid
+from config import settings
+from core.changes import change_feed
+from core.database import transaction
+from core.jobs import JobContext, PeriodicTask, job_handler, job_queue
+from models.email import Email
+from models.job import Job
+
+logger = logging.getLogger(__name__)
+
+RETENTION_MODES = ("off", "ttl", "archive")
+ARCHIVE_PREFIX = "emails_archive_"
+TTL_INDEX_NAME = "created_at_ttl"
+
+# Emails moved per insert/delete round.
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def _utc(value: datetime) -> datetime:
+    # pymongo returns naive UTC datetimes unless the client is tz_aware.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _month_start(value: datetime) -> datetime:
+    return _utc(value).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def archive_name(month: datetime) -> str:
+    return f"{ARCHIVE_PREFIX}{month:%Y_%m}"
+
+
+def _archive_month(name: str) -> datetime:
+    return datetime.strptime(name[len(ARCHIVE_PREFIX):], "%Y_%m").replace(tzinfo=timezone.utc)
+
+
+def archive_collections(db=None) -> list[str]:
+    """
+    Return the names of the monthly archive collections, newest first.
+    """
+    db = db if db is not None else get_db()
+    return sorted((name for name in db.list_collection_names() if name.startswith(ARCHIVE_PREFIX)), reverse=True)
+
+
+def ensure_ttl_index() -> int | None:
+    """
+    Create, update or drop the TTL index on emails.created_at to match the settings.
+
+    Returns:
+        int | None: The index's expireAfterSeconds, or None when TTL retention is off.
+    """
+    collection = Email._get_collection()
+    existing = collection.index_information().get(TTL_INDEX_NAME)
+    if settings.EMAIL_RETENTION_MODE != "ttl":
+        if existing:
+            collection.drop_index(TTL_INDEX_NAME)
+            logger.info("Dropped the email TTL index")
+        return None
+    seconds = int(settings.EMAIL_RETENTION_DAYS * 86400)
+    if existing is None:
+        collection.create_index([("created_at", 1)], name=TTL_INDEX_NAME, expireAfterSeconds=seconds)
+        logger.info(f"Created the email TTL index ({settings.EMAIL_RETENTION_DAYS} days)")
+    elif existing.get("expireAfterSeconds") != seconds:
+        collection.database.command("collMod", collection.name,
+                                    index={"name": TTL_INDEX_NAME, "expireAfterSeconds": seconds})
+        logger.info(f"Changed the email TTL to {settings.EMAIL_RETENTION_DAYS} days")
+    return seconds
+
+
+def _archive_collection(db, name: str):
+    if name in db.list_collection_names():
+        return db[name]
+    options = {}
+    if settings.EMAIL_ARCHIVE_COMPRESSOR:
+        options["storageEngine"] = {"wiredTiger": {"configString": f"block_compressor={settings.EMAIL_ARCHIVE_COMPRESSOR}"}}
+    try:
+        db.create_collection(name, **options)
+    except CollectionInvalid:
+        pass  # Created concurrently
+    # Same indexes as the hot collection, so archive reads take the same filters.
+    for spec in Email._meta.get("index_specs") or []:
+        db[name].create_index(list(spec["fields"]))
+    return db[name]
+
+
+def ensure_archives(db, query: dict) -> None:
+    """
+    Create the monthly archive collections the emails matching `query` belong in.
+
+    Call it before a transaction that copies them (see copy_to_archives): older
+    servers cannot create collections or indexes inside one.
+    """
+    months = {_month_start(doc["created_at"]) for doc in db[Email._get_collection_name()].find(query, {"created_at": 1})}
+    for month in months:
+        _archive_collection(db, archive_name(month))
+
+
+def copy_to_archives(db, documents: list[dict], session=None) -> None:
+    """
+    Upsert raw email documents into the monthly archives of their created_at,
+    so find_archived() reads them like emails moved by archive retention.
+    """
+    requests = {}
+    for doc in documents:
+        name = archive_name(_month_start(doc["created_at"]))
+        requests.setdefault(name, []).append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+    for name, batch in requests.items():
+        db[name].bulk_write(batch, ordered=False, session=session)
+
+
+def archive_emails(days: int | None = None, ctx: JobContext | None = None) -> dict:
+    """
+    Move emails created more than `days` ago into their monthly archive collections.
+
+    Each batch is copied (as idempotent upserts) and deleted from emails inside a
+    transaction where the deployment supports one, so an interrupted run is
+    simply run again.
+
+    Args:
+        days (int | None): Age in days; defaults to EMAIL_RETENTION_DAYS.
+        ctx (JobContext | None): Job context for progress and checkpoints.
+
+    Returns:
+        dict: The cutoff and the number of emails archived per collection.
+    """
+    days = settings.EMAIL_RETENTION_DAYS if days is None else days
+    db = get_db()
+    emails = Email._get_collection()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    archived = dict(ctx.checkpoint.get("archived") or {}) if ctx else {}
+    total = emails.count_documents({"created_at": {"$lt": cutoff}})
+    done = 0
+    while True:
+        oldest = emails.find_one({"created_at": {"$lt": cutoff}}, {"created_at": 1}, sort=[("created_at", 1)])
+        if oldest is None:
+            break
+        month = _month_start(oldest["created_at"])
+        name = archive_name(month)
+        archive = _archive_collection(db, name)
+        query = {"created_at": {"$gte": month, "$lt": min(_next_month(month), cutoff)}}
+        while True:
+            batch = list(emails.find(query, limit=ARCHIVE_BATCH_SIZE))
+            if not batch:
+                break
+            ids = [doc["_id"] for doc in batch]
+            with transaction(db.client) as session:
+                archive.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+                                   ordered=False, session=session)
+                emails.delete_many({"_id": {"$in": ids}}, session=session)
+            archived[name] = archived.get(name, 0) + len(batch)
+            change_feed.publish_many("emails", ids, "delete")
+            done += len(batch)
+            if ctx:
+                ctx.progress(done, total, f"Archived {done} of {total} emails")
+        logger.info(f"Archived {archived.get(name, 0)} emails into {name}")
+        if ctx:
+            ctx.save_checkpoint(archived=archived)
+    return {"cutoff": cutoff.isoformat(), "archived": archived}
+
+
+@job_handler("archive_emails")
+def run_archive_emails(ctx: JobContext) -> dict:
+    return archive_emails(ctx.params.get("days"), ctx)
+
+
+def _overlapping(names: list[str], created_after: datetime | None, created_before: datetime | None) -> list[str]:
+    selected = []
+    for name in names:
+        month = _archive_month(name)
+        if created_before is not None and month >= _utc(created_before):
+            continue
+        if created_after is not None and _next_month(month) <= _utc(created_after):
+            continue
+        selected.append(name)
+    return selected
+
+
+def find_archived(filters: dict, created_after: datetime | None = None, created_before: datetime | None = None,
+                  skip: int = 0, limit: int = 10, newest_first: bool = True) -> list[dict]:
+    """
+    Read archived emails, in created_at order across the monthly collections.
+
+    Only months overlapping [created_after, created_before) are queried, and
+    months wholly skipped are counted rather than read.
+
+    Args:
+        filters (dict): Equality filters on stored field names, e.g. {"campaign_id": ...}; None values are ignored.
+        created_after (datetime | None): Inclusive lower bound on created_at.
+        created_before (datetime | None): Exclusive upper bound on created_at.
+        skip (int): Documents to skip.
+        limit (int): Maximum documents to return.
+        newest_first (bool): Sort by created_at descending.
+
+    Returns:
+        list[dict]: Raw email documents.
+    """
+    db = get_db()
+    query = {field: value for field, value in filters.items() if value is not None}
+    created_at = {}
+    if created_after is not None:
+        created_at["$gte"] = created_after
+    if created_before is not None:
+        created_at["$lt"] = created_before
+    if created_at:
+        query["created_at"] = created_at
+    names = _overlapping(archive_collections(db), created_after, created_before)
+    if not newest_first:
+        names.reverse()
+    results = []
+    for name in names:
+        collection = db[name]
+        if skip:
+            count = collection.count_documents(query)
+            if count <= skip:
+                skip -= count
+                continue
+        results.extend(collection.find(query, sort=[("created_at", -1 if newest_first else 1)],
+                                       skip=skip, limit=limit - len(results)))
+        skip = 0
+        if len(results) >= limit:
+            break
+    return results
+
+
+def find_archived_email(email_id: str) -> dict | None:
+    """
+    Look up one archived email by id across the monthly collections.
+    """
+    db = get_db()
+    object_id = ObjectId(email_id)
+    for name in archive_collections(db):
+        document = db[name].find_one({"_id": object_id})
+        if document is not None:
+            return document
+    return None
+
+
+def retention_status() -> dict:
+    """
+    Return the retention settings, the hot collection size and the archive sizes.
+    """
+    db = get_db()
+    return {
+        "mode": settings.EMAIL_RETENTION_MODE,
+        "days": settings.EMAIL_RETENTION_DAYS,
+        "ttl_seconds": (Email._get_collection().index_information().get(TTL_INDEX_NAME) or {}).get("expireAfterSeconds"),
+        "hot_emails": Email._get_collection().estimated_document_count(),
+        "archives": {name: db[name].estimated_document_count() for name in archive_collections(db)},
+    }
+
+
+def apply_retention() -> Job | None:
+    """
+    Apply the retention settings once: keep the TTL index in line and, in archive
+    mode, queue an archive_emails job unless one is pending.
+
+    Returns:
+        Job | None: The archive job queued, if any.
+    """
+    if settings.EMAIL_RETENTION_MODE not in RETENTION_MODES:
+        logger.error(f"Unknown EMAIL_RETENTION_MODE '{settings.EMAIL_RETENTION_MODE}'; retention is off")
+        return None
+    ensure_ttl_index()
+    if settings.EMAIL_RETENTION_MODE != "archive":
+        return None
+    return job_queue.enqueue_once("archive_emails")
+
+
+# Applies the settings at startup and every EMAIL_RETENTION_INTERVAL_HOURS.
+retention_scheduler = PeriodicTask("email-retention", settings.EMAIL_RETENTION_INTERVAL_HOURS * 3600, apply_retention)
@@ -0,0 +1,277 @@
+import bisect
+import itertools
+import logging
+import re
+import threading
+import time
+from core.database import analytics_collection
+
+logger = logging.getLogger(__name__)
+
+CONTACT = "contact"
+COMPANY = "company"
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+_WEB_NOISE = {"http", "https", "www"}
+
+# Upper bound on documents examined per query, so a one-letter prefix over a
+# huge index still answers in bounded time.
+MAX_CANDIDATES = 5000
+
+
+def tokenize(*values) -> list[str]:
+    """
+    Split text into lowercase alphanumeric tokens.
+
+    "alice.j@techsolutions.com" becomes ["alice", "j", "techsolutions", "com"], so
+    email addresses and websites are searchable by any of their parts.
+
+    Returns:
+        list[str]: Unique tokens in order of first appearance.
+    """
+    tokens = []
+    for value in values:
+        if not value:
+            continue
+        for token in _TOKEN_RE.findall(value.lower()):
+            if token not in _WEB_NOISE and token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+class SearchIndex:
+    """
+    In-process inverted index for typeahead search over contacts and companies.
+
+    Tokens are kept in a sorted list next to a token -> kind -> documents postings
+    map, so a prefix query is a binary search plus a walk over the matching token
+    range, and a kind filter only visits postings of that kind. The query token
+    with the fewest postings drives the walk and the other tokens are checked
+    against each candidate's token list, so queries never intersect large sets.
+    At most MAX_CANDIDATES postings are visited per query.
+
+    The index is built from MongoDB in a background thread and kept current by the
+    write paths in the routers (index_contact, index_company, remove).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: dict[str, dict[str, set[tuple[str, str]]]] = {}
+        self._tokens: list[str] = []
+        self._docs: dict[tuple[str, str], tuple[tuple[str, ...], str]] = {}
+        self._building = False
+        self._dirty: set[tuple[str, str]] = set()
+        self.built_at: float | None = None
+
+    # -- writes ----------------------------------------------------------
+
+    def _upsert(self, kind: str, doc_id: str, tokens: list[str], label: str, from_build: bool = False) -> None:
+        key = (kind, doc_id)
+        with self._lock:
+            if from_build and key in self._dirty:
+                # A router wrote this document after the build read it.
+                return
+            if self._building and not from_build:
+                self._dirty.add(key)
+            self._remove_key(key)
+            self._docs[key] = (tuple(tokens), label)
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._tokens, token)
+                postings.setdefault(kind, set()).add(key)
+
+    def _remove_key(self, key: tuple[str, str]) -> None:
+        previous = self._docs.pop(key, None)
+        if previous is None:
+            return
+        for token in previous[0]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            documents = postings.get(key[0])
+            if documents is None:
+                continue
+            documents.discard(key)
+            if not documents:
+                del postings[key[0]]
+            if not postings:
+                del self._postings[token]
+                index = bisect.bisect_left(self._tokens, token)
+                if index < len(self._tokens) and self._tokens[index] == token:
+                    del self._tokens[index]
+
+    def index_contact(self, contact, from_build: bool = False) -> None:
+        """
+        Add or refresh a contact (a Contact document or its raw MongoDB dict).
+        """
+        get = contact.get if isinstance(contact, dict) else lambda name: getattr(contact, name, None)
+        doc_id = str(get("_id") if isinstance(contact, dict) else contact.id)
+        name = f"{get('first_name') or ''} {get('last_name') or ''}".strip()
+        label = f"{name} <{get('email')}>" + (f", {get('title')}" if get("title") else "")
+        self._upsert(CONTACT, doc_id, tokenize(get("first_name"), get("last_name"), get("email"), get("title")),
+                     label, from_build)
+
+    def index_company(self, company, from_build: bool = False) -> None:
+        """
+        Add or refresh a company (a Company document or its raw MongoDB dict).
+        """
+        get = company.get if isinstance(company, dict) else lambda name: getattr(company, name, None)
+        doc_id = str(get("_id") if isinstance(company, dict) else company.id)
+        label = get("name") + (f" ({get('website')})" if get("website") else "")
+        tokens = tokenize(get("name"), get("website"), get("primary_industry"), get("primary_sub_industry"))
+        self._upsert(COMPANY, doc_id, tokens, label, from_build)
+
+    def remove(self, kind: str, doc_id: str) -> None:
+        """
+        Drop a document from the index.
+        """
+        with self._lock:
+            if self._building:
+                self._dirty.add((kind, str(doc_id)))
+            self._remove_key((kind, str(doc_id)))
+
+    def clear(self) -> None:
+        """
+        Empty the index.
+        """
+        with self._lock:
+            self._postings.clear()
+            self._tokens.clear()
+            self._docs.clear()
+
+    # -- reads -----------------------------------------------------------
+
+    def _range(self, term: str) -> tuple[int, int]:
+        # Tokens only hold [0-9a-z], and "{" sorts right after "z".
+        return bisect.bisect_left(self._tokens, term), bisect.bisect_left(self._tokens, term + "{")
+
+    def _postings_in(self, start: int, end: int, kinds, cap: int) -> int:
+        """
+        Count the postings of the given kinds in a token range, stopping once past `cap`
+        (or after MAX_CANDIDATES tokens, which counts as past it).
+        """
+        count = 0
+        for index in range(start, min(end, start + MAX_CANDIDATES)):
+            postings = self._postings[self._tokens[index]]
+            count += sum(len(documents) for kind, documents in postings.items() if not kinds or kind in kinds)
+            if count > cap:
+                return count
+        return count if end - start <= MAX_CANDIDATES else cap + 1
+
+    def search(self, query: str, kinds: set[str] | None = None, limit: int = 10) -> list[dict]:
+        """
+        Return documents matching every query token as a prefix of one of their tokens.
+
+        Documents with a token equal to the driving query token rank first, then
+        prefix matches in token order.
+
+        Args:
+            query (str): Free text, e.g. "ali tech" or "cto".
+            kinds (set[str] | None): Restrict to "contact" and/or "company".
+            limit (int): Maximum number of results.
+
+        Returns:
+            list[dict]: Results with type, id and label.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            # Drive the walk with the term matching the fewest postings; a term matching none ends the query.
+            driver, best = None, None
+            for term in sorted(terms, key=len, reverse=True):
+                start, end = self._range(term)
+                cost = self._postings_in(start, end, kinds, MAX_CANDIDATES if best is None else best[2])
+                if cost == 0:
+                    return []
+                if best is None or cost < best[2]:
+                    driver, best = term, (start, end, cost)
+            others = [term for term in terms if term is not driver]
+            start, end, _ = best
+            exact = start if self._tokens[start] == driver else None
+            # The exact token first, then the longer tokens it prefixes.
+            order = itertools.chain([] if exact is None else [exact],
+                                    (index for index in range(start, end) if index != exact))
+            results, seen, examined = [], set(), 0
+            for index in order:
+                # Tokens count too, so a kind filter cannot make the walk unbounded.
+                examined += 1
+                for kind, documents in self._postings[self._tokens[index]].items():
+                    if kinds and kind not in kinds:
+                        continue
+                    for key in documents:
+                        examined += 1
+                        if examined > MAX_CANDIDATES:
+                            return results
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        doc_tokens, label = self._docs[key]
+                        if all(any(t.startswith(term) for t in doc_tokens) for term in others):
+                            results.append({"type": key[0], "id": key[1], "label": label})
+                            if len(results) >= limit:
+                                return results
+            return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "tokens": len(self._tokens),
+                "building": self._building,
+                "built_at": self.built_at,
+            }
+
+    # -- build -----------------------------------------------------------
+
+    def rebuild(self, batch_size: int = 5000) -> dict:
+        """
+        Rebuild the index from MongoDB. Reads are routed like other scans (see core.database.analytics).
+
+        Returns:
+            dict: Index statistics after the build.
+        """
+        from models import Company, Contact
+        started = time.perf_counter()
+        with self._lock:
+            self._building = True
+            self._dirty = set()
+            self.clear()
+        try:
+            companies = analytics_collection(Company).find(
+                {}, {"name": 1, "website": 1, "primary_industry": 1, "primary_sub_industry": 1}, batch_size=batch_size
+            )
+            for company in companies:
+                self.index_company(company, from_build=True)
+            contacts = analytics_collection(Contact).find(
+                {}, {"first_name": 1, "last_name": 1, "email": 1, "title": 1}, batch_size=batch_size
+            )
+            for contact in contacts:
+                self.index_contact(contact, from_build=True)
+        finally:
+            with self._lock:
+                self._building = False
+                self._dirty = set()
+                self.built_at = time.time()
+        stats = self.stats()
+        logger.info(f"Search index built in {time.perf_counter() - started:.1f}s: {stats}")
+        return stats
+
+    def rebuild_in_background(self) -> threading.Thread:
+        """
+        Start rebuild() on a daemon thread.
+        """
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.error(f"Search index build failed: {str(e)}", exc_info=True)
+
+        thread = threading.Thread(target=run, name="search-index-build", daemon=True)
+        thread.start()
+        return thread
+
+
+search_index = SearchIndex()
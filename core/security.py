@@ -0,0 +1,30 @@
+import hmac
+from fastapi import Header, HTTPException
+from config import settings
+
+ADMIN_KEY_HEADER = "X-Admin-Key"
+
+
+def is_admin_key(key: str | None) -> bool:
+    """
+    Check a key against the configured admin API key.
+
+    When ADMIN_API_KEY is not set (local development), every caller is treated as admin.
+
+    Args:
+        key (str | None): The key supplied by the client.
+
+    Returns:
+        bool: True if the caller may use admin features.
+    """
+    if not settings.ADMIN_API_KEY:
+        return True
+    return key is not None and hmac.compare_digest(key, settings.ADMIN_API_KEY)
+
+
+async def require_admin(x_admin_key: str | None = Header(None)):
+    """
+    Dependency that rejects requests without a valid X-Admin-Key header.
+    """
+    if not is_admin_key(x_admin_key):
+        raise HTTPException(status_code=403, detail="Admin access required")
@@ -0,0 +1,368 @@
+"""
+Database seeding and reset operations, run as background jobs (see core.jobs).
+"""
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from mongoengine.connection import get_db
+from config import settings
+from core.database import drop_database
+from core.datagen import DataGenerator, GeneratorConfig, MongoSink
+from core.counts import count_cache
+from core.jobs import JobContext, PeriodicTask, job_handler, job_queue
+from core.changes import change_feed
+from core.domains import domain_index
+from core.search import search_index
+from models.user import User
+from models.campaign import Campaign
+from models.company import Company
+from models.contact import Contact
+from models.email import CompanySnapshot, ContactSnapshot, Email
+from models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# Seconds between generate_data checkpoints; each one waits for pending inserts.
+GENERATE_CHECKPOINT_SECONDS = 5.0
+
+# Jobs that replace the data set, after which every API process must reset its
+# in-memory state (see reset_derived_state and data_reset_watcher).
+DATA_RESET_JOBS = ("initialize_db", "reset_project", "generate_data", "restore_snapshot")
+
+
+def _seed_users(data: dict) -> dict:
+    users = {}
+    for user_data in data['users']:
+        existing_user = User.objects(email=user_data['email']).first()
+        if existing_user:
+            logger.info(f"User with email {user_data['email']} already exists. Updating...")
+            existing_user.is_active = user_data['is_active']
+            existing_user.first_name = user_data['first_name']
+            existing_user.last_name = user_data['last_name']
+            existing_user.set_password(user_data['password'])
+            existing_user.save()
+            users[existing_user.email] = existing_user
+        else:
+            user = User(
+                email=user_data['email'],
+                is_active=user_data['is_active'],
+                username=user_data['email'].split('@')[0],  # Using email prefix as username
+                first_name=user_data['first_name'],
+                last_name=user_data['last_name']
+            )
+            user.set_password(user_data['password'])
+            user.save()
+            users[user.email] = user
+    logger.info(f"Created/Updated {len(users)} users")
+    return users
+
+
+def _seed_companies(data: dict, users: dict) -> dict:
+    if 'companies' not in data:
+        raise ValueError("The 'companies' key is missing in the initialization data.")
+    companies = {}
+    for company_data in data['companies']:
+        user = users.get(company_data['user_email'])
+        if not user:
+            raise ValueError(f"User with email {company_data['user_email']} not found")
+
+        existing_company = Company.objects(name=company_data['name']).first()
+        if existing_company:
+            logger.info(f"Company {company_data['name']} already exists. Updating...")
+            existing_company.website = company_data.get('website')
+            existing_company.primary_industry = company_data.get('primary_industry')
+            existing_company.primary_sub_industry = company_data.get('primary_sub_industry')
+            existing_company.zoom_id = company_data['zoom_id']
+            existing_company.user = user
+            existing_company.save()
+            companies[existing_company.name] = existing_company
+        else:
+            company = Company(
+                name=company_data['name'],
+                website=company_data.get('website'),
+                primary_industry=company_data.get('primary_industry'),
+                primary_sub_industry=company_data.get('primary_sub_industry'),
+                zoom_id=company_data['zoom_id'],
+                user=user
+            )
+            company.save()
+            companies[company.name] = company
+    logger.info(f"Created/Updated {len(companies)} companies")
+    return companies
+
+
+def _seed_contacts(data: dict, users: dict, companies: dict) -> int:
+    contacts_count = 0
+    # Contacts without a company_name belong to the company of their email domain.
+    unnamed = [contact_data for contact_data in data['contacts'] if not contact_data.get('company_name')]
+    by_domain = iter(domain_index.resolve_many([
+        (getattr(users.get(contact_data['user_email']), 'user_id', None), contact_data['email'])
+        for contact_data in unnamed
+    ]))
+    for contact_data in data['contacts']:
+        user = users.get(contact_data['user_email'])
+        if contact_data.get('company_name'):
+            company = companies.get(contact_data['company_name'])
+        else:
+            company = next(by_domain)
+        if not user or not company:
+            raise ValueError(f"User or Company not found for contact: {contact_data['email']}")
+
+        existing_contact = Contact.objects(email=contact_data['email']).first()
+        if existing_contact:
+            logger.info(f"Contact {contact_data['email']} already exists. Updating...")
+            existing_contact.first_name = contact_data['first_name']
+            existing_contact.last_name = contact_data['last_name']
+            existing_contact.title = contact_data.get('title')
+            existing_contact.zoom_id = contact_data['zoom_id']
+            existing_contact.user = user
+            existing_contact.company = company
+            existing_contact.save()
+        else:
+            Contact(
+                first_name=contact_data['first_name'],
+                last_name=contact_data['last_name'],
+                email=contact_data['email'],
+                title=contact_data.get('title'),
+                zoom_id=contact_data['zoom_id'],
+                user=user,
+                company=company
+            ).save()
+        contacts_count += 1
+    logger.info(f"Created/Updated {contacts_count} contacts")
+    return contacts_count
+
+
+def _seed_campaigns(data: dict, users: dict) -> int:
+    campaigns_count = 0
+    for campaign_data in data['campaigns']:
+        user = users.get(campaign_data['user_email'])
+        if not user:
+            raise ValueError(f"User with email {campaign_data['user_email']} not found")
+
+        existing_campaign = Campaign.objects(campaign_name=campaign_data['campaign_name'], user=user).first()
+        if existing_campaign:
+            logger.info(f"Campaign {campaign_data['campaign_name']} already exists. Updating...")
+            existing_campaign.campaign_context = campaign_data['campaign_context']
+            existing_campaign.campaign_template_body = campaign_data['campaign_template_body']
+            existing_campaign.campaign_template_title = campaign_data['campaign_template_title']
+            existing_campaign.save()
+        else:
+            Campaign(
+                campaign_name=campaign_data['campaign_name'],
+                campaign_context=campaign_data['campaign_context'],
+                campaign_template_body=campaign_data['campaign_template_body'],
+                campaign_template_title=campaign_data['campaign_template_title'],
+                user=user
+            ).save()
+        campaigns_count += 1
+    logger.info(f"Created/Updated {campaigns_count} campaigns")
+    return campaigns_count
+
+
+def _seed_emails(ctx: JobContext | None) -> int:
+    emails_count = 0
+    campaign = Campaign.objects.first()
+    contacts = Contact.objects.order_by('id')
+    last_contact_id = ctx.checkpoint.get('last_contact_id') if ctx else None
+    if last_contact_id:
+        # Resuming: contacts up to the checkpoint already have their sample email.
+        contacts = contacts.filter(id__gt=last_contact_id)
+    total = contacts.count()
+    for done, contact in enumerate(contacts, start=1):
+        if Email.objects(contact__email=contact.email).first():
+            logger.info(f"Email for contact {contact.email} already exists. Skipping...")
+        else:
+            Email(
+                company=CompanySnapshot.of(contact.company),
+                contact=ContactSnapshot.of(contact),
+                subject=f"Sample Email for {contact.first_name}",
+                body=f"This is a sample email body for {contact.first_name} {contact.last_name} from {contact.company.name}.",
+                ai_model="GPT-3.5",
+                tokens_sent=100,
+                tokens_returned=150,
+                generation_time=0.5,
+                campaign_id=campaign.id,
+                full_prompt="This is a sample full prompt for email generation."
+            ).save()
+        emails_count += 1
+        if ctx:
+            ctx.progress(0.8 + 0.2 * done / total, message=f"Creating emails ({done}/{total})")
+            if done % 500 == 0:
+                ctx.save_checkpoint(last_contact_id=str(contact.id))
+    logger.info(f"Created {emails_count} emails")
+    return emails_count
+
+
+def initialize_database(data: dict, ctx: JobContext | None = None) -> dict:
+    """
+    Create or update users, companies, contacts and campaigns from sample data and
+    give every contact a sample email.
+
+    Every step is an upsert, so a retried run repeats the cheap steps and continues
+    the email step from its checkpoint.
+
+    Args:
+        data (dict): Parsed sample data (see sample_data.json).
+        ctx (JobContext | None): Job context for progress and checkpoints.
+
+    Returns:
+        dict: Counts per collection.
+
+    Raises:
+        ValueError: If the sample data references unknown users or companies.
+    """
+    logger.info("Starting database initialization")
+    if ctx:
+        ctx.progress(0.0, message="Creating users")
+    users = _seed_users(data)
+    if ctx:
+        ctx.progress(0.2, message="Creating companies")
+    companies = _seed_companies(data, users)
+    if ctx:
+        ctx.progress(0.4, message="Creating contacts")
+    contacts_count = _seed_contacts(data, users, companies)
+    if ctx:
+        ctx.progress(0.6, message="Creating campaigns")
+    campaigns_count = _seed_campaigns(data, users)
+    emails_count = _seed_emails(ctx)
+    logger.info("Database initialization completed successfully")
+    return {
+        "message": "Database initialized with sample data",
+        "users_created": len(users),
+        "companies_created": len(companies),
+        "contacts_created": contacts_count,
+        "campaigns_created": campaigns_count,
+        "emails_created": emails_count
+    }
+
+
+def reset_derived_state(rebuild_search: bool = True) -> None:
+    """
+    Drop what this process derived from the data set (cached counts, search and
+    domain indexes) and tell change feed subscribers to refetch everything.
+    """
+    count_cache.clear()
+    if rebuild_search:
+        search_index.rebuild_in_background()
+    else:
+        search_index.clear()
+    domain_index.clear()
+    change_feed.reset()
+
+
+class DataResetWatcher:
+    """
+    Resets this process's derived state after a DATA_RESET_JOBS job finishes in
+    another process, such as a separate `python -m core.jobs` worker.
+
+    The jobs collection is the signal: each poll looks for reset jobs that
+    succeeded since the last one seen. Jobs run by this process's own workers
+    are skipped, since their handlers already reset it.
+    """
+
+    def __init__(self):
+        self._last_seen = None
+
+    def poll(self) -> bool:
+        """
+        Returns:
+            bool: Whether another process's reset job was followed.
+        """
+        collection = Job._get_collection()
+        query = {"kind": {"$in": list(DATA_RESET_JOBS)}, "status": "succeeded"}
+        if self._last_seen is None:
+            # First poll: the state built at startup already reflects earlier resets.
+            latest = collection.find_one(query, {"finished_at": 1}, sort=[("finished_at", -1)])
+            self._last_seen = latest["finished_at"] if latest else datetime.min
+            return False
+        jobs = list(collection.find({**query, "finished_at": {"$gt": self._last_seen}},
+                                    {"kind": 1, "worker_id": 1, "finished_at": 1}))
+        if not jobs:
+            return False
+        self._last_seen = max(job["finished_at"] for job in jobs)
+        foreign = [job for job in jobs if job.get("worker_id") != job_queue.worker_id]
+        if not foreign:
+            return False
+        latest = max(foreign, key=lambda job: job["finished_at"])
+        logger.info(f"Following {latest['kind']} job {latest['_id']} finished by worker {latest.get('worker_id')}")
+        reset_derived_state(rebuild_search=latest["kind"] != "reset_project")
+        return True
+
+
+data_reset_watcher = DataResetWatcher()
+
+# Runs in API processes every DATA_RESET_POLL_SECONDS.
+data_reset_scheduler = PeriodicTask("data-reset-watch", settings.DATA_RESET_POLL_SECONDS, data_reset_watcher.poll)
+
+
+@job_handler("initialize_db")
+def run_initialize_db(ctx: JobContext) -> dict:
+    with open(ctx.params.get("sample_data_file") or settings.SAMPLE_DATA_FILE, 'r') as file:
+        data = json.load(file)
+    result = initialize_database(data, ctx)
+    reset_derived_state()
+    return result
+
+
+@job_handler("reset_project")
+def run_reset_project(ctx: JobContext) -> dict:
+    # Drop on the shared pooled client; requests in flight keep their connections
+    drop_database()
+    reset_derived_state(rebuild_search=False)
+    return {
+        "message": "Project reset successfully",
+        "database_name": settings.DATABASE_NAME,
+        "status": "Database dropped and indexes recreated"
+    }
+
+
+@job_handler("generate_data")
+def run_generate_data(ctx: JobContext) -> dict:
+    """
+    Stream a synthetic data set into MongoDB (params: GeneratorConfig fields plus
+    drop and batch_size).
+
+    Generation is deterministic for a seed and start time, so a resumed run
+    regenerates the data set, skips users finished before the last checkpoint and
+    ignores duplicates of the documents it had already written.
+    """
+    params = dict(ctx.params)
+    drop = params.pop("drop", False)
+    batch_size = params.pop("batch_size", 5000)
+    config = GeneratorConfig(**params)
+    resuming = "now" in ctx.checkpoint
+    if not resuming:
+        if drop:
+            drop_database()
+        ctx.save_checkpoint(now=datetime.now(timezone.utc).isoformat(), users_done=0)
+    users_done = resumed_from = ctx.checkpoint["users_done"]
+    generator = DataGenerator(config, now=datetime.fromisoformat(ctx.checkpoint["now"]))
+    sink = MongoSink(get_db(), batch_size=batch_size, ignore_duplicates=resuming)
+    started = last_checkpoint = time.perf_counter()
+    user_n = -1
+    try:
+        for collection, document in generator.generate():
+            if collection == "users":
+                user_n += 1
+                if user_n > users_done and time.perf_counter() - last_checkpoint >= GENERATE_CHECKPOINT_SECONDS:
+                    sink.drain()
+                    users_done = user_n
+                    ctx.save_checkpoint(users_done=users_done)
+                    last_checkpoint = time.perf_counter()
+                ctx.progress(user_n, config.users, message=f"Generating user {user_n + 1}/{config.users}")
+            if user_n >= users_done:
+                sink.write(collection, document)
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - started
+    total = sum(sink.counts.values())
+    logger.info(f"Generated {total} documents in {elapsed:.1f}s: {sink.counts}")
+    reset_derived_state()
+    return {
+        "counts": dict(sink.counts),
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_sec": round(total / elapsed, 1) if elapsed else 0.0,
+        "resumed_from_user": resumed_from,
+    }
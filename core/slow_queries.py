@@ -0,0 +1,209 @@
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from mongoengine.connection import get_db
+from config import settings
+from core.mongo_commands import CommandSample, command_tracker
+from core.query_shape import query_shape, shape_key
+
+logger = logging.getLogger(__name__)
+
+# Read and write commands the server can explain.
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Driver/session fields that are not part of the query and are rejected inside explain.
+_SESSION_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "readConcern",
+                   "writeConcern", "autocommit", "startTransaction", "$query"}
+
+
+def plan_stages(explain: Mapping) -> list[str]:
+    """
+    Collect the stage names of every winning plan in an explain() result.
+
+    Handles find/count plans (queryPlanner.winningPlan), slot-based engine plans
+    (winningPlan.queryPlan) and aggregate plans ($cursor stages).
+
+    Args:
+        explain (Mapping): The explain command output.
+
+    Returns:
+        list[str]: Stage names such as COLLSCAN, IXSCAN or FETCH.
+    """
+    stages = []
+
+    def walk_plan(plan):
+        if isinstance(plan, Mapping):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for key, value in plan.items():
+                if key in ("inputStage", "inputStages", "queryPlan", "shards", "winningPlan"):
+                    walk_plan(value)
+        elif isinstance(plan, list):
+            for item in plan:
+                walk_plan(item)
+
+    def find_winning_plans(node):
+        if isinstance(node, Mapping):
+            for key, value in node.items():
+                if key == "winningPlan":
+                    walk_plan(value)
+                else:
+                    find_winning_plans(value)
+        elif isinstance(node, list):
+            for item in node:
+                find_winning_plans(item)
+
+    find_winning_plans(explain)
+    return stages
+
+
+def plan_index_names(explain: Mapping) -> list[str]:
+    """
+    Collect the index names used by the winning plans in an explain() result.
+    """
+    names = []
+
+    def walk(node):
+        if isinstance(node, Mapping):
+            if isinstance(node.get("indexName"), str) and node["indexName"] not in names:
+                names.append(node["indexName"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return names
+
+
+def _explain_command(command_name: str, command: Mapping) -> dict:
+    inner = {key: value for key, value in command.items() if key not in _SESSION_FIELDS}
+    if command_name in ("update", "delete"):
+        # Only the first statement of a write batch is explained.
+        statements_field = "updates" if command_name == "update" else "deletes"
+        inner[statements_field] = list(inner.get(statements_field) or [])[:1]
+    if command_name == "aggregate":
+        inner.setdefault("cursor", {})
+    return {"explain": inner, "verbosity": "queryPlanner"}
+
+
+class SlowQueryLog:
+    """
+    Aggregates MongoDB operations slower than SLOW_QUERY_THRESHOLD_MS by query shape,
+    and explains each new shape once on a background thread to find collection scans.
+    """
+
+    def __init__(self, max_shapes: int):
+        self.max_shapes = max_shapes
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def start(self) -> None:
+        """
+        Start listening to MongoDB commands.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        command_tracker.subscribe(self.observe)
+
+    def stop(self) -> None:
+        """
+        Stop listening and wait for pending explains.
+        """
+        command_tracker.unsubscribe(self.observe)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def observe(self, sample: CommandSample) -> None:
+        """
+        Record a finished command if it is explainable and slower than the threshold.
+        """
+        duration_ms = sample.duration * 1000
+        if duration_ms < settings.SLOW_QUERY_THRESHOLD_MS or sample.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        shape = query_shape(sample.command_name, sample.command)
+        key = shape_key(shape)
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            entry = self._entries.get(key)
+            is_new = entry is None
+            if is_new:
+                entry = {
+                    "shape": shape,
+                    "command": sample.command_name,
+                    "collection": sample.collection,
+                    "database": sample.database,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "first_seen": now,
+                    "plan": None,
+                    "collscan": None,
+                    "indexes_used": [],
+                    "explain_error": None,
+                }
+                self._entries[key] = entry
+                while len(self._entries) > self.max_shapes:
+                    self._entries.popitem(last=False)
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_seen"] = now
+            self._entries.move_to_end(key)
+        if is_new:
+            logger.warning(f"Slow {sample.command_name} on {sample.collection} ({duration_ms:.1f}ms): {key}")
+            if self._executor is not None:
+                self._executor.submit(self._explain, key, sample.database, sample.command_name, sample.command)
+
+    def _explain(self, key: str, database: str, command_name: str, command: Mapping) -> None:
+        try:
+            result = get_db().client[database].command(_explain_command(command_name, command))
+            stages = plan_stages(result)
+            update = {
+                "plan": stages,
+                "collscan": "COLLSCAN" in stages,
+                "indexes_used": plan_index_names(result),
+                "explain_error": None,
+            }
+            if update["collscan"]:
+                logger.warning(f"Slow query shape uses a COLLSCAN: {key}")
+        except Exception as e:
+            logger.error(f"Failed to explain slow query {key}: {str(e)}")
+            update = {"explain_error": str(e)}
+        with self._lock:
+            if key in self._entries:
+                self._entries[key].update(update)
+
+    def report(self) -> dict:
+        """
+        Return the slow query shapes, slowest in total first.
+        """
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        for entry in entries:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 3)
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return {
+            "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+            "shapes": len(entries),
+            "collscan_shapes": sum(1 for entry in entries if entry["collscan"]),
+            "queries": entries,
+        }
+
+    def clear(self) -> None:
+        """
+        Forget every recorded shape.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_MAX_SHAPES)
@@ -0,0 +1,447 @@
+"""
+Async SMTP client, connection pool and delivery pipeline.
+
+The client speaks just enough SMTP for bulk submission to a relay: EHLO,
+STARTTLS, AUTH PLAIN and MAIL/RCPT/DATA, with the envelope commands pipelined
+(RFC 2920) when the server advertises PIPELINING, so each message costs two
+round trips instead of four. Nothing here reads settings; see core.delivery.
+"""
+import asyncio
+import base64
+import logging
+import random
+import re
+import socket
+import ssl
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import formatdate
+
+logger = logging.getLogger(__name__)
+
+_LINE_START_DOT = re.compile(rb"(?m)^\.")
+
+
+class SMTPError(Exception):
+    """
+    An SMTP reply that rejected a command. 4xx codes are transient, 5xx permanent.
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+    @property
+    def transient(self) -> bool:
+        return 400 <= self.code < 500
+
+
+class SMTPConnectionError(SMTPError):
+    """
+    The connection failed or was closed; always transient.
+    """
+
+    def __init__(self, message: str):
+        super().__init__(421, message)
+
+
+def build_message(sender: str, recipient: str, subject: str, body: str, message_id: str) -> bytes:
+    """
+    Render a plain-text message with CRLF line endings, ready for DATA.
+
+    Short ASCII messages, which is almost all generated mail, are formatted
+    directly; anything that needs encoding or header folding goes through
+    email.message, which costs about a millisecond per message.
+    """
+    headers = (sender, recipient, subject, message_id)
+    if (body.isascii() and all(value.isascii() and "\r" not in value and "\n" not in value for value in headers)
+            and len(subject) <= 900 and all(len(line) <= 998 for line in body.splitlines())):
+        lines = body.splitlines()
+        return (
+            f"From: {sender}\r\nTo: {recipient}\r\nSubject: {subject}\r\n"
+            f"Date: {formatdate(localtime=False)}\r\nMessage-ID: {message_id}\r\n"
+            f"MIME-Version: 1.0\r\nContent-Type: text/plain; charset=\"us-ascii\"\r\n"
+            f"Content-Transfer-Encoding: 7bit\r\n\r\n" + "\r\n".join(lines) + "\r\n"
+        ).encode("ascii")
+    message = EmailMessage(policy=SMTP_POLICY)
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = subject
+    message["Date"] = formatdate(localtime=False)
+    message["Message-ID"] = message_id
+    message.set_content(body)
+    return message.as_bytes()
+
+
+class SMTPConnection:
+    """
+    One persistent SMTP session.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 30.0, local_hostname: str | None = None,
+                 allow_pipelining: bool = True):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.local_hostname = local_hostname or socket.getfqdn()
+        self.allow_pipelining = allow_pipelining
+        self.extensions: dict[str, str] = {}
+        self.messages_sent = 0
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    @property
+    def pipelining(self) -> bool:
+        return self.allow_pipelining and "pipelining" in self.extensions
+
+    async def connect(self, starttls: bool = False, username: str | None = None, password: str | None = None) -> None:
+        """
+        Open the session: greeting, EHLO, optional STARTTLS and AUTH PLAIN.
+        """
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise SMTPConnectionError(f"Could not connect to {self.host}:{self.port}: {e}")
+        try:
+            self._expect(await self._read_reply(), 220)
+            await self._ehlo()
+            if starttls:
+                await self._starttls()
+            if username:
+                token = base64.b64encode(f"\0{username}\0{password or ''}".encode()).decode()
+                self._expect(await self.command(f"AUTH PLAIN {token}"), 235)
+        except BaseException:
+            # A rejected greeting, handshake or login leaves nothing worth keeping open.
+            await self.close()
+            raise
+
+    async def _starttls(self) -> None:
+        if "starttls" not in self.extensions:
+            raise SMTPError(502, "The server does not support STARTTLS")
+        self._expect(await self.command("STARTTLS"), 220)
+        try:
+            await asyncio.wait_for(
+                self._writer.start_tls(ssl.create_default_context(), server_hostname=self.host), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            # ssl.SSLError (certificate verification included) is an OSError.
+            raise SMTPConnectionError(f"TLS handshake with {self.host}:{self.port} failed: {e!r}")
+        await self._ehlo()
+
+    async def _ehlo(self) -> None:
+        code, lines = await self.command(f"EHLO {self.local_hostname}")
+        self._expect((code, lines), 250)
+        self.extensions = {}
+        for line in lines[1:]:
+            keyword, _, params = line.partition(" ")
+            self.extensions[keyword.lower()] = params
+
+    async def _read_reply(self) -> tuple[int, list[str]]:
+        lines = []
+        while True:
+            try:
+                raw = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                raise SMTPConnectionError(f"Connection to {self.host}:{self.port} failed: {e!r}")
+            if not raw:
+                raise SMTPConnectionError(f"Connection to {self.host}:{self.port} closed")
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            lines.append(line[4:])
+            if len(line) < 4 or line[3] != "-":
+                try:
+                    return int(line[:3]), lines
+                except ValueError:
+                    raise SMTPConnectionError(f"Malformed reply: {line!r}")
+
+    @staticmethod
+    def _expect(reply: tuple[int, list[str]], *codes: int) -> None:
+        code, lines = reply
+        if code not in codes:
+            raise SMTPError(code, " ".join(lines))
+
+    async def _write(self, data: bytes) -> None:
+        try:
+            self._writer.write(data)
+            await asyncio.wait_for(self._writer.drain(), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise SMTPConnectionError(f"Write to {self.host}:{self.port} failed: {e!r}")
+
+    async def command(self, line: str) -> tuple[int, list[str]]:
+        await self._write(f"{line}\r\n".encode())
+        return await self._read_reply()
+
+    async def send_message(self, sender: str, recipients: list[str], data: bytes) -> str:
+        """
+        Send one message. With PIPELINING, MAIL, RCPT and DATA go out in a single write.
+
+        Returns:
+            str: The server's reply to the message body (usually a queue id).
+
+        Raises:
+            SMTPError: If the server rejected the message; the session is reset and stays usable.
+        """
+        envelope = [f"MAIL FROM:<{sender}>"] + [f"RCPT TO:<{recipient}>" for recipient in recipients] + ["DATA"]
+        if self.pipelining:
+            await self._write("".join(f"{line}\r\n" for line in envelope).encode())
+            replies = [await self._read_reply() for _ in envelope]
+        else:
+            replies = [await self.command(envelope[0])]
+            if replies[0][0] == 250:
+                replies += [await self.command(line) for line in envelope[1:-1]]
+                if any(code in (250, 251) for code, _ in replies[1:]):
+                    replies.append(await self.command("DATA"))
+        try:
+            self._expect(replies[0], 250)
+            rcpt_replies = replies[1:1 + len(recipients)]
+            if not any(code in (250, 251) for code, _ in rcpt_replies):
+                # Recipients the server refused are not delivered; fail only if none was accepted.
+                self._expect(rcpt_replies[0], 250, 251)
+            self._expect(replies[-1], 354)
+        except SMTPError:
+            await self.reset()
+            raise
+        payload = _LINE_START_DOT.sub(b"..", data)
+        if not payload.endswith(b"\r\n"):
+            payload += b"\r\n"
+        await self._write(payload + b".\r\n")
+        code, lines = await self._read_reply()
+        self._expect((code, lines), 250)
+        self.messages_sent += 1
+        return " ".join(lines)
+
+    async def reset(self) -> None:
+        self._expect(await self.command("RSET"), 250)
+
+    async def quit(self) -> None:
+        try:
+            await self.command("QUIT")
+        except SMTPError:
+            pass
+        await self.close()
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+
+
+class SMTPPool:
+    """
+    A bounded pool of persistent SMTP sessions to one relay.
+
+    Sessions are reused across messages and replaced after
+    `max_messages_per_connection` messages or any connection error.
+    """
+
+    def __init__(self, host: str, port: int, size: int = 4, max_messages_per_connection: int = 100,
+                 timeout: float = 30.0, starttls: bool = False, username: str | None = None,
+                 password: str | None = None, pipelining: bool = True):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.pipelining = pipelining
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self.starttls = starttls
+        self.username = username
+        self.password = password
+        self.connections_opened = 0
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[SMTPConnection] = []
+
+    async def _open(self) -> SMTPConnection:
+        connection = SMTPConnection(self.host, self.port, self.timeout, allow_pipelining=self.pipelining)
+        await connection.connect(self.starttls, self.username, self.password)
+        self.connections_opened += 1
+        return connection
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Borrow a session for the duration of the block.
+        """
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._open()
+            try:
+                yield connection
+            except SMTPError as e:
+                if isinstance(e, SMTPConnectionError):
+                    await connection.close()
+                else:
+                    self._idle.append(connection)
+                raise
+            except BaseException:
+                await connection.close()
+                raise
+            if connection.messages_sent >= self.max_messages_per_connection:
+                await connection.quit()
+            else:
+                self._idle.append(connection)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await connection.quit()
+
+
+class TokenBucket:
+    """
+    Rate limiter that hands out reservations; callers sleep for the returned delay.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Take one token, going into debt if necessary.
+
+        Returns:
+            float: Seconds to wait before the token may be used.
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class DomainLimiter:
+    """
+    Per recipient domain concurrency cap and send rate (0 disables the rate limit).
+    """
+
+    def __init__(self, concurrency: int, rate_per_second: float):
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self._domains: dict[str, tuple[asyncio.Semaphore, TokenBucket]] = {}
+
+    @asynccontextmanager
+    async def slot(self, domain: str):
+        limits = self._domains.get(domain)
+        if limits is None:
+            limits = self._domains[domain] = (asyncio.Semaphore(self.concurrency), TokenBucket(self.rate_per_second))
+        semaphore, bucket = limits
+        async with semaphore:
+            delay = bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            yield
+
+
+@dataclass
+class OutgoingMessage:
+    key: str
+    sender: str
+    recipient: str
+    subject: str
+    body: str
+    message_id: str
+    attempts: int = 0
+    _data: bytes | None = None
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = build_message(self.sender, self.recipient, self.subject, self.body, self.message_id)
+        return self._data
+
+
+@dataclass
+class DeliveryResult:
+    key: str
+    status: str
+    attempts: int
+    error: str | None = None
+    sent_at: datetime | None = None
+
+
+class DeliveryPipeline:
+    """
+    Sends messages through an SMTPPool with per-domain limits and retries.
+
+    Transient failures (4xx replies, connection errors) are retried up to
+    `max_attempts` times with jittered exponential backoff; the retry is scheduled
+    on the event loop, so a backing-off message does not hold a worker.
+    """
+
+    def __init__(self, pool: SMTPPool, limiter: DomainLimiter, max_attempts: int = 4,
+                 backoff_seconds: float = 2.0, workers: int | None = None):
+        self.pool = pool
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.workers = workers or pool.size * 4
+
+    async def _attempt(self, message: OutgoingMessage) -> DeliveryResult | None:
+        message.attempts += 1
+        domain = message.recipient.rpartition("@")[2].lower()
+        try:
+            if not domain:
+                raise SMTPError(553, f"Invalid recipient address: {message.recipient!r}")
+            async with self.limiter.slot(domain):
+                async with self.pool.connection() as connection:
+                    await connection.send_message(message.sender, [message.recipient], message.data)
+            return DeliveryResult(message.key, "sent", message.attempts, sent_at=datetime.now(timezone.utc))
+        except SMTPError as e:
+            if e.transient and message.attempts < self.max_attempts:
+                logger.info(f"Transient failure sending {message.key} (attempt {message.attempts}): {e}")
+                return None
+            logger.warning(f"Failed to send {message.key} after {message.attempts} attempts: {e}")
+            return DeliveryResult(message.key, "failed", message.attempts, error=str(e))
+
+    async def send_all(self, messages: list[OutgoingMessage]) -> list[DeliveryResult]:
+        """
+        Deliver a batch and wait until every message is sent or has failed for good.
+        """
+        if not messages:
+            return []
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        results: list[DeliveryResult] = []
+        finished = asyncio.Event()
+        for message in messages:
+            queue.put_nowait(message)
+
+        async def worker():
+            while True:
+                message = await queue.get()
+                try:
+                    result = await self._attempt(message)
+                except Exception as e:
+                    # Anything but an SMTP reply is a bug or a local failure; retrying will not help,
+                    # and a message that never gets a result would keep send_all waiting forever.
+                    logger.error(f"Unexpected error sending {message.key}: {str(e)}", exc_info=True)
+                    result = DeliveryResult(message.key, "failed", message.attempts, error=repr(e))
+                if result is None:
+                    delay = self.backoff_seconds * 2 ** (message.attempts - 1) * (0.5 + random.random())
+                    loop.call_later(delay, queue.put_nowait, message)
+                    continue
+                results.append(result)
+                if len(results) == len(messages):
+                    finished.set()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(min(self.workers, len(messages)))]
+        try:
+            await finished.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return results
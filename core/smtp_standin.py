@@ -0,0 +1,115 @@
+"""
+Local SMTP stand-in for tests, development and the delivery benchmark.
+
+    python -m core.smtp_standin --port 1025
+
+Accepts everything by default and keeps the received messages in memory. It
+advertises PIPELINING and can simulate slow servers and failing recipients.
+"""
+import argparse
+import asyncio
+import logging
+import socket
+import threading
+import time
+from aiosmtpd.controller import Controller
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingHandler:
+    """
+    aiosmtpd handler that records deliveries and injects failures.
+
+    Args:
+        latency (float): Seconds to wait before answering each message body.
+        reject_domains (set[str]): Recipient domains answered with a permanent 550.
+        defer (dict[str, int]): Recipient address -> number of 451 replies before accepting.
+        keep_messages (bool): Keep message bodies (disable for long benchmarks).
+    """
+
+    def __init__(self, latency: float = 0.0, reject_domains: set | None = None, defer: dict | None = None,
+                 keep_messages: bool = True):
+        self.latency = latency
+        self.reject_domains = set(reject_domains or ())
+        self.defer = dict(defer or {})
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.delivered = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        session.host_name = hostname
+        with self.lock:
+            self.connections += 1
+        return responses[:-1] + ["250-PIPELINING", responses[-1]]
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        domain = address.rpartition("@")[2].lower()
+        if domain in self.reject_domains:
+            return "550 5.1.1 Recipient domain rejected"
+        with self.lock:
+            if self.defer.get(address, 0) > 0:
+                self.defer[address] -= 1
+                return "451 4.7.1 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        with self.lock:
+            self.delivered += 1
+            if self.keep_messages:
+                self.messages.append((envelope.mail_from, list(envelope.rcpt_tos), envelope.content))
+        return "250 2.0.0 Message accepted"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalSMTPServer:
+    """
+    Runs a RecordingHandler on a background thread; usable as a context manager.
+    """
+
+    def __init__(self, handler: RecordingHandler | None = None, host: str = "127.0.0.1", port: int | None = None):
+        self.handler = handler or RecordingHandler()
+        self.host = host
+        self.port = port or free_port()
+        self._controller = Controller(self.handler, hostname=host, port=self.port)
+
+    def start(self) -> "LocalSMTPServer":
+        self._controller.start()
+        return self
+
+    def stop(self) -> None:
+        self._controller.stop()
+
+    def __enter__(self) -> "LocalSMTPServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local SMTP server that accepts and counts messages.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    handler = RecordingHandler(latency=args.latency_ms / 1000, keep_messages=False)
+    with LocalSMTPServer(handler, args.host, args.port):
+        print(f"Accepting mail on {args.host}:{args.port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"{handler.delivered} messages over {handler.connections} sessions")
+        except KeyboardInterrupt:
+            pass
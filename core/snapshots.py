@@ -0,0 +1,136 @@
+"""
+Company and contact snapshots embedded in emails.
+
+Emails keep a copy of the company and contact they were written for, so listing
+them needs no join. Each copy stores the source id; when a source changes, its
+emails are brought up to date with a single update_many on the indexed
+company.company_id / contact.contact_id.
+"""
+import logging
+from bson import ObjectId
+from pymongo import UpdateMany
+from core.changes import change_feed
+from core.jobs import JobContext, job_handler
+from models.company import Company
+from models.contact import Contact
+from models.email import CompanySnapshot, ContactSnapshot, Email
+
+logger = logging.getLogger(__name__)
+
+# Emails read per backfill batch.
+BACKFILL_BATCH_SIZE = 5000
+
+
+def fill_from_sources(email: Email) -> Email:
+    """
+    Replace the snapshots of an unsaved email with fresh copies of the company and
+    contact their ids point at; snapshots without an id are kept as given.
+
+    Raises:
+        DoesNotExist: If a referenced company or contact does not exist.
+    """
+    if email.company and email.company.company_id:
+        email.company = CompanySnapshot.of(Company.objects.get(id=email.company.company_id))
+    if email.contact and email.contact.contact_id:
+        email.contact = ContactSnapshot.of(Contact.objects.get(id=email.contact.contact_id))
+    return email
+
+
+def resync_company(company: Company) -> int:
+    """
+    Copy a company's current snapshot fields into every email that embeds it.
+
+    Returns:
+        int: The number of emails changed.
+    """
+    result = Email._get_collection().update_many(
+        {"company.company_id": company.id},
+        {"$set": {"company": CompanySnapshot.of(company).to_mongo().to_dict()}},
+    )
+    if result.modified_count:
+        change_feed.reset("emails")
+    logger.info(f"Resynced company {company.id} into {result.modified_count} emails")
+    return result.modified_count
+
+
+def resync_contact(contact: Contact) -> int:
+    """
+    Copy a contact's current snapshot fields into every email that embeds it.
+
+    Returns:
+        int: The number of emails changed.
+    """
+    result = Email._get_collection().update_many(
+        {"contact.contact_id": contact.id},
+        {"$set": {"contact": ContactSnapshot.of(contact).to_mongo().to_dict()}},
+    )
+    if result.modified_count:
+        change_feed.reset("emails")
+    logger.info(f"Resynced contact {contact.id} into {result.modified_count} emails")
+    return result.modified_count
+
+
+def _grouped_updates(field: str, email_ids: dict, snapshots: dict) -> list[UpdateMany]:
+    return [
+        UpdateMany({"_id": {"$in": ids}}, {"$set": {field: snapshots[key]}})
+        for key, ids in email_ids.items() if key in snapshots
+    ]
+
+
+def backfill_snapshot_ids(ctx: JobContext | None = None) -> dict:
+    """
+    Link snapshots created before they stored source ids: companies are matched by
+    zoom_id, contacts by email address (skipped when several contacts share it).
+
+    Emails are scanned in _id order and updated with one update_many per source
+    and batch; the last scanned id is checkpointed, so a resumed job continues.
+
+    Returns:
+        dict: Emails scanned and snapshots linked.
+    """
+    emails = Email._get_collection()
+    checkpoint = ctx.checkpoint if ctx else {}
+    counts = {"scanned": checkpoint.get("scanned", 0), "companies_linked": checkpoint.get("companies_linked", 0),
+              "contacts_linked": checkpoint.get("contacts_linked", 0)}
+    total = emails.estimated_document_count()
+    query = {"_id": {"$gt": ObjectId(checkpoint["last_email_id"])}} if checkpoint.get("last_email_id") else {}
+    projection = {"company.company_id": 1, "company.zoom_id": 1, "contact.contact_id": 1, "contact.email": 1}
+    while True:
+        batch = list(emails.find(query, projection, sort=[("_id", 1)], limit=BACKFILL_BATCH_SIZE))
+        if not batch:
+            break
+        by_zoom_id, by_address = {}, {}
+        for email in batch:
+            company, contact = email.get("company") or {}, email.get("contact") or {}
+            if not company.get("company_id") and company.get("zoom_id"):
+                by_zoom_id.setdefault(company["zoom_id"], []).append(email["_id"])
+            if not contact.get("contact_id") and contact.get("email"):
+                by_address.setdefault(contact["email"], []).append(email["_id"])
+        companies = {
+            company.zoom_id: CompanySnapshot.of(company).to_mongo().to_dict()
+            for company in Company.objects(zoom_id__in=list(by_zoom_id))
+        } if by_zoom_id else {}
+        contacts, seen = {}, set()
+        for contact in Contact.objects(email__in=list(by_address)) if by_address else []:
+            if contact.email in seen:
+                contacts.pop(contact.email, None)
+                continue
+            seen.add(contact.email)
+            contacts[contact.email] = ContactSnapshot.of(contact).to_mongo().to_dict()
+        updates = _grouped_updates("company", by_zoom_id, companies) + _grouped_updates("contact", by_address, contacts)
+        if updates:
+            emails.bulk_write(updates, ordered=False)
+        counts["scanned"] += len(batch)
+        counts["companies_linked"] += sum(len(by_zoom_id[key]) for key in companies)
+        counts["contacts_linked"] += sum(len(by_address[key]) for key in contacts)
+        query = {"_id": {"$gt": batch[-1]["_id"]}}
+        if ctx:
+            ctx.progress(counts["scanned"], total, f"Scanned {counts['scanned']} emails")
+            ctx.save_checkpoint(last_email_id=str(batch[-1]["_id"]), **counts)
+    logger.info(f"Snapshot backfill finished: {counts}")
+    return counts
+
+
+@job_handler("backfill_email_snapshots")
+def run_backfill_email_snapshots(ctx: JobContext) -> dict:
+    return backfill_snapshot_ids(ctx)
@@ -0,0 +1,18 @@
+import math
+
+
+def percentile(sorted_samples, q: float) -> float:
+    """
+    Return the q-th percentile of already sorted samples (nearest-rank method).
+
+    Args:
+        sorted_samples: Samples sorted in ascending order.
+        q (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The percentile value, or 0.0 when there are no samples.
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_samples)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
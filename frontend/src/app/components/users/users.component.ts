@@ -1,8 +1,10 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { MatTableModule } from '@angular/material/table';
 import { MatProgressSpinnerModule } from '@angular/material/progress-spinner';
+import { Subscription } from 'rxjs';
 import { UserService, User } from '../../services/user.service';
+import { ChangesService, ChangeEvent } from '../../services/changes.service';
 
 @Component({
   selector: 'app-users',
@@ -51,14 +53,24 @@ import { UserService, User } from '../../services/user.service';
     }
   `]
 })
-export class UsersComponent implements OnInit {
+export class UsersComponent implements OnInit, OnDestroy {
   users: User[] = [];
   displayedColumns: string[] = ['username', 'email', 'first_name', 'last_name', 'is_active'];
   loading = true;
+  private changes?: Subscription;
 
-  constructor(private userService: UserService) {}
+  constructor(private userService: UserService, private changesService: ChangesService) {}
 
   ngOnInit() {
+    this.loadUsers();
+    this.changes = this.changesService.changes('users').subscribe(change => this.applyChange(change));
+  }
+
+  ngOnDestroy() {
+    this.changes?.unsubscribe();
+  }
+
+  private loadUsers() {
     this.userService.getUsers().subscribe({
       next: (users) => {
         this.users = users;
@@ -76,4 +88,21 @@ export class UsersComponent implements OnInit {
       }
     });
   }
+
+  // Fetch only the user that changed instead of the whole list.
+  private applyChange(change: ChangeEvent) {
+    if (change.op === 'reset' || change.id === null) {
+      this.loadUsers();
+    } else if (change.op === 'delete') {
+      this.users = this.users.filter(user => user.user_id !== change.id);
+    } else {
+      this.userService.getUser(change.id).subscribe({
+        next: (changed) => {
+          const index = this.users.findIndex(user => user.user_id === changed.user_id);
+          this.users = index === -1 ? [...this.users, changed] : this.users.map((user, i) => i === index ? changed : user);
+        },
+        error: (error) => console.error('Error fetching changed user:', error)
+      });
+    }
+  }
 }
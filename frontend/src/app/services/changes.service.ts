@@ -0,0 +1,44 @@
+import { Injectable, NgZone } from '@angular/core';
+import { Observable, share } from 'rxjs';
+import { filter } from 'rxjs/operators';
+import { environment } from '../../environments/environment';
+
+export type ChangeResource = 'users' | 'companies' | 'contacts' | 'campaigns' | 'emails';
+
+export interface ChangeEvent {
+  resource: ChangeResource;
+  id: string | null;
+  op: 'insert' | 'update' | 'delete' | 'reset';
+  version: number;
+}
+
+/**
+ * Server-pushed change events from GET /changes/stream.
+ *
+ * Refetch only the document an event names; on a `reset` event refetch the
+ * whole list. The browser's EventSource reconnects by itself and resumes from
+ * the last event it received.
+ */
+@Injectable({
+  providedIn: 'root'
+})
+export class ChangesService {
+  private apiUrl = `${environment.apiUrl}/changes/stream`;
+  private events$: Observable<ChangeEvent>;
+
+  constructor(private zone: NgZone) {
+    // One connection for the whole app, opened by the first subscriber and closed after the last.
+    this.events$ = new Observable<ChangeEvent>(subscriber => {
+      const source = new EventSource(this.apiUrl);
+      source.addEventListener('change', (message: MessageEvent) => {
+        this.zone.run(() => subscriber.next(JSON.parse(message.data) as ChangeEvent));
+      });
+      source.onerror = () => console.warn('Change stream interrupted; reconnecting');
+      return () => source.close();
+    }).pipe(share());
+  }
+
+  changes(resource: ChangeResource): Observable<ChangeEvent> {
+    return this.events$.pipe(filter(event => event.resource === resource));
+  }
+}
@@ -38,4 +38,8 @@ export class UserService {
       map(response => response.body as User[])
     );
   }
+
+  getUser(userId: string): Observable<User> {
+    return this.http.get<User>(`${this.apiUrl}/${userId}`);
+  }
 }
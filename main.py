@@ -1,10 +1,27 @@
 import logging
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from mongoengine import connect, DoesNotExist
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from mongoengine import DoesNotExist
 from pymongo.errors import ConnectionFailure
 from api.v1.api import api_router
 from config import settings
+from core.admission import AdmissionMiddleware
+from core.changes import change_stream_watcher
+from core.counts import TOTAL_COUNT_HEADER, TOTAL_ESTIMATED_HEADER
+from core.database import connect_db
+from core.dedup import dedup_scheduler
+from core.health import health_monitor
+from core.idempotency import REPLAYED_HEADER, IdempotencyMiddleware
+from core.jobs import job_queue
+from core.log_queue import install_log_queue, stop_log_queue
+from core.metrics import instrument_app
+from core.profiling import ProfilingMiddleware
+from core.retention import retention_scheduler
+from core.search import search_index
+from core.seeding import data_reset_scheduler
+from core.slow_queries import slow_query_log
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +29,14 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
 
+# Idempotency-Key handling sits inside CORS, so replayed responses get CORS headers too
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware)
+
+# Admission control runs before idempotency handling and inside CORS, so 429s get CORS headers
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -19,15 +44,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TOTAL_COUNT_HEADER, TOTAL_ESTIMATED_HEADER, REPLAYED_HEADER, "Retry-After"],
 )
 
+# Request profiling is only wired in when enabled, so it adds no overhead otherwise
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # MongoDB connection and collection validation
 def validate_collections():
     required_collections = ['users', 'companies', 'contacts', 'campaigns', 'emails']
     missing_collections = []
 
     try:
-        connect(db=settings.DATABASE_NAME, host=settings.MONGODB_URI)
+        connect_db()
         logger.info("Successfully connected to MongoDB")
 
         from mongoengine.connection import get_db
@@ -60,21 +90,60 @@ missing_collections = validate_collections()
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+
+@app.on_event("startup")
+async def start_background_services():
+    install_log_queue()
+    if settings.METRICS_ENABLED:
+        instrument_app(app)
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        slow_query_log.start()
+    await health_monitor.start()
+    if settings.SEARCH_INDEX_ENABLED:
+        search_index.rebuild_in_background()
+    await job_queue.start(settings.JOB_WORKERS)
+    await retention_scheduler.start()
+    await dedup_scheduler.start()
+    await data_reset_scheduler.start()
+    if settings.CHANGE_STREAMS_ENABLED:
+        from mongoengine.connection import get_db
+        change_stream_watcher.start(get_db())
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    change_stream_watcher.stop()
+    await data_reset_scheduler.stop()
+    await dedup_scheduler.stop()
+    await retention_scheduler.stop()
+    await job_queue.stop()
+    await health_monitor.stop()
+    slow_query_log.stop()
+    stop_log_queue()
+
 @app.get("/")
 async def root():
     return {"message": f"Welcome to the {settings.PROJECT_NAME}"}
 
 @app.get("/health")
 async def health_check():
-    try:
-        # Attempt to make a simple query to check the database connection
-        from mongoengine.connection import get_db
-        db = get_db()
-        db.command('ping')
-        return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        raise HTTPException(status_code=503, detail="Database is not available")
+    # Served from the monitor's cached state; the database is pinged in the background
+    state = health_monitor.state
+    if state["status"] == "unhealthy":
+        return JSONResponse(status_code=503, content=state)
+    return state
+
+# Like the instrumentation, the scrape endpoint only exists when metrics are enabled
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/ready")
+async def readiness_check():
+    state = health_monitor.state
+    if not state["ready"]:
+        return JSONResponse(status_code=503, content={"ready": False, "status": state["status"], "reasons": state["reasons"]})
+    return {"ready": True, "status": state["status"]}
 
 if __name__ == "__main__":
     import uvicorn
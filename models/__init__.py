@@ -3,3 +3,6 @@ from .email import Email
 from .user import User
 from .company import Company
 from .contact import Contact
+from .job import Job
+from .dedup import DuplicateGroup
+from .idempotency import IdempotencyRecord
@@ -18,7 +18,13 @@ class Campaign(Document):
     updated_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
     user = ReferenceField(User, required=True)
 
-    meta = {'collection': 'campaigns'}
+    meta = {
+        'collection': 'campaigns',
+        'indexes': [
+            '-created_at',
+            ('user', '-created_at'),
+        ]
+    }
 
 class CampaignCreate(BaseModel):
     """
@@ -82,3 +88,11 @@ class CampaignUpdate(BaseModel):
     campaign_context: str | None = None
     campaign_template_body: str | None = None
     campaign_template_title: str | None = Field(None, max_length=200)
+
+class CampaignGenerateRequest(BaseModel):
+    """
+    Pydantic model for generating a campaign's emails.
+    """
+    contact_ids: list[str] | None = Field(None, description="Contacts to write to; defaults to all of the user's contacts")
+    batch_size: int | None = Field(None, ge=1, le=20, description="Contacts per model call; defaults to AI_BATCH_SIZE")
+    ai_model: str | None = Field(None, description="Route to prefer, e.g. openai/gpt-4o")
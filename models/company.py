@@ -1,4 +1,5 @@
 from mongoengine import Document, StringField, ReferenceField
+from core.identity import website_domain
 from .user import User
 from pydantic import BaseModel, Field
 from pydantic.config import ConfigDict
@@ -13,8 +14,22 @@ class Company(Document):
     primary_sub_industry = StringField()
     zoom_id = StringField(required=True, unique=True)
     user = ReferenceField(User, required=True)
+    # Normalized host of the website, maintained by clean(); see core.domains.
+    domain = StringField()
 
-    meta = {'collection': 'companies'}
+    meta = {
+        'collection': 'companies',
+        'indexes': [
+            'name',
+            ('user', 'name'),
+            ('user', 'domain'),
+            ('primary_industry', 'primary_sub_industry', 'name'),
+            ('primary_sub_industry', 'name'),
+        ]
+    }
+
+    def clean(self):
+        self.domain = website_domain(self.website) or None
 
 class CompanyCreate(BaseModel):
     """
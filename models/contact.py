@@ -1,6 +1,8 @@
-from mongoengine import Document, StringField, ReferenceField
+from mongoengine import Document, StringField, ReferenceField, ListField, BooleanField
+from core.identity import blocking_keys
 from .user import User
 from .company import Company
+from typing import List
 from pydantic import BaseModel, Field
 from pydantic.config import ConfigDict
 
@@ -12,8 +14,37 @@ class Contact(Document):
     zoom_id = StringField(required=True, unique=True)
     user = ReferenceField(User, required=True)
     company = ReferenceField(Company, required=True)
+    # Maintained by clean(); see core.identity and core.dedup.
+    dedup_keys = ListField(StringField())
+    dedup_checked = BooleanField(default=False)
 
-    meta = {'collection': 'contacts'}
+    meta = {
+        'collection': 'contacts',
+        'indexes': [
+            'last_name',
+            'email',
+            'dedup_keys',
+            'dedup_checked',
+            ('company', 'last_name'),
+            ('user', 'last_name'),
+            ('user', 'company', 'last_name'),
+            ('title', 'last_name'),
+        ]
+    }
+
+    def clean(self):
+        """
+        Refresh the blocking keys; a contact whose keys changed is checked for duplicates again.
+        """
+        keys = blocking_keys(self.first_name, self.last_name, self.email,
+                             _reference_id(self._data.get('company')), _reference_id(self._data.get('user')))
+        if keys != self.dedup_keys:
+            self.dedup_keys = keys
+            self.dedup_checked = False
+
+def _reference_id(value):
+    # The raw value of a ReferenceField: a Document, DBRef, ObjectId or id string.
+    return getattr(value, 'pk', None) or getattr(value, 'id', None) or value
 
 class ContactCreate(BaseModel):
     first_name: str
@@ -22,7 +53,10 @@ class ContactCreate(BaseModel):
     title: str | None = None
     zoom_id: str
     user: str  # This will be the user_id
-    company: str  # This will be the company_id
+    company: str | None = None  # This will be the company_id; looked up by email domain when omitted
+
+class ContactBatch(BaseModel):
+    contacts: List[ContactCreate] = Field(..., min_length=1, max_length=1000)
 
 class ContactResponse(BaseModel):
     id: str
@@ -0,0 +1,85 @@
+from mongoengine import Document, StringField, DateTimeField, FloatField, ListField, ObjectIdField
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field
+from pydantic.config import ConfigDict
+from typing import List
+
+DUPLICATE_STATUSES = ("proposed", "merged", "rejected")
+
+# Most groups one merge request may name or merge.
+MAX_MERGE_GROUPS = 1000
+
+class DuplicateGroup(Document):
+    """
+    Contacts core.dedup believes are the same person.
+
+    The survivor is kept when the group is merged; the duplicates are deleted and
+    their emails repointed to it. members_key (the sorted member ids) keeps a
+    rejected group from being proposed again.
+    """
+    survivor = ObjectIdField(required=True)
+    duplicates = ListField(ObjectIdField(), required=True)
+    members_key = StringField(required=True, unique=True)
+    score = FloatField(required=True)
+    status = StringField(required=True, choices=DUPLICATE_STATUSES, default="proposed")
+    created_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    resolved_at = DateTimeField()
+
+    meta = {
+        'collection': 'contact_duplicates',
+        'indexes': [
+            ('status', '-score'),
+            'duplicates',
+            'survivor',
+        ]
+    }
+
+class DuplicateGroupResponse(BaseModel):
+    """
+    Pydantic model for duplicate group response.
+    """
+    id: str
+    survivor: str
+    duplicates: List[str]
+    score: float
+    status: str
+    created_at: datetime
+    resolved_at: datetime | None = None
+
+    model_config = ConfigDict(
+        from_attributes=True,
+        populate_by_name=True,
+        arbitrary_types_allowed=True
+    )
+
+    @classmethod
+    def from_mongo(cls, group: DuplicateGroup) -> 'DuplicateGroupResponse':
+        """
+        Create a DuplicateGroupResponse instance from a DuplicateGroup document.
+
+        Args:
+            group (DuplicateGroup): The DuplicateGroup document to convert.
+
+        Returns:
+            DuplicateGroupResponse: The created DuplicateGroupResponse instance.
+        """
+        return cls(
+            id=str(group.id),
+            survivor=str(group.survivor),
+            duplicates=[str(duplicate) for duplicate in group.duplicates],
+            score=group.score,
+            status=group.status,
+            created_at=group.created_at,
+            resolved_at=group.resolved_at
+        )
+
+class MergeRequest(BaseModel):
+    """
+    Pydantic model for merging proposed duplicate groups, by id or by minimum score.
+
+    By score, at most `limit` groups are merged per request, highest score first;
+    repeat the request until it merges none to work through the rest.
+    """
+    group_ids: List[str] | None = Field(None, max_length=MAX_MERGE_GROUPS)
+    min_score: float | None = Field(None, ge=0, le=1)
+    limit: int = Field(100, ge=1, le=MAX_MERGE_GROUPS)
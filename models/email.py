@@ -1,12 +1,54 @@
-from mongoengine import Document, DictField, StringField, IntField, FloatField, DateTimeField
-from datetime import datetime
+from mongoengine import (Document, EmbeddedDocument, EmbeddedDocumentField, ObjectIdField, StringField, IntField,
+                         FloatField, DateTimeField)
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field
 from pydantic.config import ConfigDict
-from typing import Dict
+
+# Unsent emails have no delivery status; sending a campaign queues them.
+DELIVERY_STATUSES = ("queued", "sent", "failed")
+
+# Source fields copied into the snapshots (and resynced when they change).
+COMPANY_SNAPSHOT_FIELDS = ("name", "zoom_id", "website")
+CONTACT_SNAPSHOT_FIELDS = ("first_name", "last_name", "email", "title")
+
+class CompanySnapshot(EmbeddedDocument):
+    """
+    Copy of the company an email was written for, so reads need no join.
+
+    company_id points back at the source Company; core.snapshots propagates
+    changes to the copied fields.
+    """
+    company_id = ObjectIdField()
+    name = StringField()
+    zoom_id = StringField()
+    website = StringField()
+
+    # Legacy emails embedded more of the company; ignore the fields no longer copied.
+    meta = {'strict': False}
+
+    @classmethod
+    def of(cls, company) -> 'CompanySnapshot':
+        return cls(company_id=company.id, **{field: getattr(company, field) for field in COMPANY_SNAPSHOT_FIELDS})
+
+class ContactSnapshot(EmbeddedDocument):
+    """
+    Copy of the contact an email was written for; contact_id points back at the source Contact.
+    """
+    contact_id = ObjectIdField()
+    first_name = StringField()
+    last_name = StringField()
+    email = StringField()
+    title = StringField()
+
+    meta = {'strict': False}
+
+    @classmethod
+    def of(cls, contact) -> 'ContactSnapshot':
+        return cls(contact_id=contact.id, **{field: getattr(contact, field) for field in CONTACT_SNAPSHOT_FIELDS})
 
 class Email(Document):
-    company = DictField(required=True)
-    contact = DictField(required=True)
+    company = EmbeddedDocumentField(CompanySnapshot, required=True)
+    contact = EmbeddedDocumentField(ContactSnapshot, required=True)
     subject = StringField(required=True)
     body = StringField(required=True)
     ai_model = StringField(required=True)
@@ -14,14 +56,64 @@ class Email(Document):
     tokens_returned = IntField(required=True)
     generation_time = FloatField(required=True)
     full_prompt = StringField(required=True)
-    created_at = DateTimeField(default=datetime.utcnow)
+    created_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
     campaign_id = StringField(required=True)
+    delivery_status = StringField(choices=DELIVERY_STATUSES)
+    delivery_attempts = IntField(default=0)
+    delivery_error = StringField()
+    sent_at = DateTimeField()
+
+    meta = {
+        'collection': 'emails',
+        'indexes': [
+            '-created_at',
+            ('campaign_id', '-created_at'),
+            ('ai_model', '-created_at'),
+            ('contact.email', '-created_at'),
+            ('campaign_id', 'delivery_status'),
+            'company.company_id',
+            'contact.contact_id',
+        ]
+    }
 
-    meta = {'collection': 'emails'}
+class CompanySnapshotModel(BaseModel):
+    """
+    Pydantic model for an email's company snapshot. When company_id is given on
+    creation the other fields are copied from that company.
+    """
+    company_id: str | None = None
+    name: str | None = None
+    zoom_id: str | None = None
+    website: str | None = None
+
+    @classmethod
+    def from_mongo(cls, snapshot: CompanySnapshot) -> 'CompanySnapshotModel':
+        return cls(
+            company_id=str(snapshot.company_id) if snapshot.company_id else None,
+            **{field: getattr(snapshot, field) for field in COMPANY_SNAPSHOT_FIELDS}
+        )
+
+class ContactSnapshotModel(BaseModel):
+    """
+    Pydantic model for an email's contact snapshot. When contact_id is given on
+    creation the other fields are copied from that contact.
+    """
+    contact_id: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    email: str | None = None
+    title: str | None = None
+
+    @classmethod
+    def from_mongo(cls, snapshot: ContactSnapshot) -> 'ContactSnapshotModel':
+        return cls(
+            contact_id=str(snapshot.contact_id) if snapshot.contact_id else None,
+            **{field: getattr(snapshot, field) for field in CONTACT_SNAPSHOT_FIELDS}
+        )
 
 class EmailCreate(BaseModel):
-    company: Dict[str, str]
-    contact: Dict[str, str]
+    company: CompanySnapshotModel
+    contact: ContactSnapshotModel
     subject: str
     body: str
     ai_model: str
@@ -31,10 +123,18 @@ class EmailCreate(BaseModel):
     full_prompt: str
     campaign_id: str
 
+class EmailGenerateRequest(BaseModel):
+    """
+    Pydantic model for generating a campaign email for a contact.
+    """
+    campaign_id: str
+    contact_id: str
+    ai_model: str | None = Field(None, description="Route to prefer, e.g. openai/gpt-4o")
+
 class EmailResponse(BaseModel):
     id: str
-    company: Dict[str, str]
-    contact: Dict[str, str]
+    company: CompanySnapshotModel
+    contact: ContactSnapshotModel
     subject: str
     body: str
     ai_model: str
@@ -44,6 +144,10 @@ class EmailResponse(BaseModel):
     full_prompt: str
     created_at: datetime
     campaign_id: str
+    delivery_status: str | None = None
+    delivery_attempts: int = 0
+    delivery_error: str | None = None
+    sent_at: datetime | None = None
 
     model_config = ConfigDict(
         from_attributes=True,
@@ -58,8 +162,8 @@ class EmailResponse(BaseModel):
     def from_mongo(cls, email: Email):
         return cls(
             id=str(email.id),
-            company=email.company,
-            contact=email.contact,
+            company=CompanySnapshotModel.from_mongo(email.company),
+            contact=ContactSnapshotModel.from_mongo(email.contact),
             subject=email.subject,
             body=email.body,
             ai_model=email.ai_model,
@@ -68,7 +172,11 @@ class EmailResponse(BaseModel):
             generation_time=email.generation_time,
             full_prompt=email.full_prompt,
             created_at=email.created_at,
-            campaign_id=email.campaign_id
+            campaign_id=email.campaign_id,
+            delivery_status=email.delivery_status,
+            delivery_attempts=email.delivery_attempts or 0,
+            delivery_error=email.delivery_error,
+            sent_at=email.sent_at
         )
 
 class EmailUpdate(BaseModel):
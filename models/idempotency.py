@@ -0,0 +1,30 @@
+from mongoengine import Document, StringField, DateTimeField, IntField, BinaryField
+from datetime import datetime, timezone
+from config import settings
+
+IDEMPOTENCY_STATUSES = ("in_progress", "completed")
+
+class IdempotencyRecord(Document):
+    """
+    The outcome of a request sent with an Idempotency-Key header.
+
+    The id is the method, path and key; claiming it (an insert) is what makes one
+    request the executor and its duplicates waiters. MongoDB expires records
+    IDEMPOTENCY_TTL_HOURS after they were claimed.
+    """
+    key = StringField(primary_key=True)
+    fingerprint = StringField(required=True)
+    status = StringField(required=True, choices=IDEMPOTENCY_STATUSES, default="in_progress")
+    owner = StringField()
+    status_code = IntField()
+    content_type = StringField()
+    body = BinaryField()
+    created_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    completed_at = DateTimeField()
+
+    meta = {
+        'collection': 'idempotency_keys',
+        'indexes': [
+            {'fields': ['created_at'], 'expireAfterSeconds': int(settings.IDEMPOTENCY_TTL_HOURS * 3600)},
+        ]
+    }
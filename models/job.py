@@ -0,0 +1,103 @@
+from mongoengine import Document, StringField, DateTimeField, DictField, FloatField, IntField, BooleanField
+from datetime import datetime, timezone
+from pydantic import BaseModel
+from pydantic.config import ConfigDict
+from typing import Any, Dict
+import uuid
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+class Job(Document):
+    """
+    Background job document model for MongoDB.
+
+    The jobs collection is the queue: workers claim queued jobs (or running jobs
+    whose lease has expired) atomically, so no external broker is needed.
+    """
+    job_id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = StringField(required=True)
+    params = DictField()
+    status = StringField(required=True, choices=JOB_STATUSES, default="queued")
+    progress = FloatField(default=0.0)
+    message = StringField()
+    checkpoint = DictField()
+    result = DictField()
+    error = StringField()
+    attempts = IntField(default=0)
+    cancel_requested = BooleanField(default=False)
+    worker_id = StringField()
+    lease_expires_at = DateTimeField()
+    created_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    started_at = DateTimeField()
+    updated_at = DateTimeField(default=lambda: datetime.now(timezone.utc))
+    finished_at = DateTimeField()
+
+    meta = {
+        'collection': 'jobs',
+        'indexes': [
+            '-created_at',
+            ('status', 'created_at'),
+            ('status', 'lease_expires_at'),
+            ('kind', '-created_at'),
+            ('status', 'finished_at'),
+        ]
+    }
+
+class JobResponse(BaseModel):
+    """
+    Pydantic model for job response.
+    """
+    job_id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str
+    progress: float
+    message: str | None = None
+    checkpoint: Dict[str, Any]
+    result: Dict[str, Any]
+    error: str | None = None
+    attempts: int
+    cancel_requested: bool
+    created_at: datetime
+    started_at: datetime | None = None
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+    model_config = ConfigDict(
+        from_attributes=True,
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={
+            datetime: lambda v: v.isoformat()
+        }
+    )
+
+    @classmethod
+    def from_mongo(cls, job: Job) -> 'JobResponse':
+        """
+        Create a JobResponse instance from a Job document.
+
+        Args:
+            job (Job): The Job document to convert.
+
+        Returns:
+            JobResponse: The created JobResponse instance.
+        """
+        return cls(
+            job_id=job.job_id,
+            kind=job.kind,
+            params=job.params or {},
+            status=job.status,
+            progress=job.progress,
+            message=job.message,
+            checkpoint=job.checkpoint or {},
+            result=job.result or {},
+            error=job.error,
+            attempts=job.attempts,
+            cancel_requested=job.cancel_requested,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            updated_at=job.updated_at,
+            finished_at=job.finished_at
+        )
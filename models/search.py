@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+class SearchResult(BaseModel):
+    """
+    Pydantic model for a search result.
+    """
+    type: str  # "contact" or "company"
+    id: str
+    label: str
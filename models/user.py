@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from pydantic import BaseModel, EmailStr, Field
 from pydantic.config import ConfigDict
 from datetime import datetime
+from config import settings
 
 class User(Document):
     """
@@ -27,7 +28,7 @@ class User(Document):
         Args:
             password (str): The plain text password to hash and store.
         """
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=settings.PASSWORD_HASH_METHOD)
 
     def check_password(self, password: str) -> bool:
         """
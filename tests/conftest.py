@@ -1,26 +1,153 @@
+"""
+Shared test fixtures.
+
+The app starts once per session and every test reuses its TestClient; instead of
+reconnecting, each test's data is deleted when it finishes (indexes are kept).
+Passwords are hashed with a single PBKDF2 iteration.
+
+- `pytest -n auto` (with pytest-xdist) spreads the suite over all cores. Each
+  worker process has its own database, salesmanager_test_<worker>.
+- Tests that need an owner, a company and contacts take the `seeded` fixture,
+  which clones a template database built once per session.
+- TEST_MONGODB_URI=mongodb://localhost:27017 runs the suite against a real mongod
+  instead of mongomock, for performance tests. The worker's test and template
+  databases are dropped at the end of the session.
+"""
 import pytest
 import sys
 import os
+import time
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
-from httpx import ASGITransport
 from mongoengine import connect, disconnect
+from mongoengine.connection import get_connection, get_db
 import mongomock
 
+WORKER = os.getenv("PYTEST_XDIST_WORKER", "main")
+TEST_DB = f"salesmanager_test_{WORKER}"
+TEMPLATE_DB = f"{TEST_DB}_template"
+TEST_MONGODB_URI = os.getenv("TEST_MONGODB_URI")
+
+# Settings are read when the app is imported.
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1")
+os.environ["DATABASE_NAME"] = TEST_DB
+if TEST_MONGODB_URI:
+    os.environ["MONGODB_URI"] = TEST_MONGODB_URI
+
 # Add the project root directory to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 from main import app
+from core.admission import admission
+from core.counts import count_cache
+from core.domains import domain_index
+from core.idempotency import idempotency_store
+from core.retention import ARCHIVE_PREFIX
+from core.search import search_index
+from models import Campaign, Company, Contact, User
 
-@pytest.fixture(scope="function")
-def client():
-    # Set up
+
+def _connect():
     disconnect()
-    connect('mongoenginetest', mongo_client_class=mongomock.MongoClient)
-    
-    # Create a test client using the FastAPI app
+    if TEST_MONGODB_URI:
+        from core.database import connect_db
+        connect_db()
+    else:
+        connect(TEST_DB, mongo_client_class=mongomock.MongoClient)
+
+
+def _clear(db):
+    for name in db.list_collection_names():
+        if name.startswith(ARCHIVE_PREFIX):
+            # Monthly email archives are created on demand; keeping them empty would still list them.
+            db.drop_collection(name)
+        elif not name.startswith("system."):
+            db[name].delete_many({})
+    count_cache.clear()
+    idempotency_store.clear()
+    search_index.clear()
+    domain_index.clear()
+    admission.clear()
+
+
+def _build_template():
+    """
+    Create the seed data through the models, then move it into the template database.
+    """
+    owner = User(username="owner", email="owner@example.com", first_name="Own", last_name="Er")
+    owner.set_password("testpassword")
+    owner.save()
+    company = Company(name="Seed Co", zoom_id="seed-co", website="https://seed.example.com", user=owner).save()
+    for first_name, last_name in (("Ada", "Lovelace"), ("Alan", "Turing")):
+        Contact(first_name=first_name, last_name=last_name, email=f"{first_name.lower()}@seed.example.com",
+                title="Engineer", zoom_id=f"seed-{first_name.lower()}", user=owner, company=company).save()
+    Campaign(campaign_name="Seed Campaign", campaign_context="Context", campaign_template_body="Body",
+             campaign_template_title="Title", user=owner).save()
+
+    db = get_db()
+    template = get_connection()[TEMPLATE_DB]
+    for name in db.list_collection_names():
+        template.drop_collection(name)
+        documents = list(db[name].find())
+        if documents:
+            template[name].insert_many(documents)
+    return template
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    _connect()
     with TestClient(app) as test_client:
         yield test_client
-    
-    # Tear down
+    if TEST_MONGODB_URI:
+        get_connection().drop_database(TEST_DB)
+        get_connection().drop_database(TEMPLATE_DB)
     disconnect()
+
+
+@pytest.fixture(scope="session")
+def template_db(app_client):
+    template = _build_template()
+    _clear(get_db())
+    return template
+
+
+@pytest.fixture(scope="function")
+def client(app_client):
+    yield app_client
+    _clear(get_db())
+
+
+@pytest.fixture
+def seeded(client, template_db):
+    """
+    Clone the template database into the test database and return its documents.
+    """
+    db = get_db()
+    for name in template_db.list_collection_names():
+        documents = list(template_db[name].find())
+        if documents:
+            db[name].insert_many(documents)
+    search_index.rebuild()
+    return SimpleNamespace(
+        user=User.objects.get(email="owner@example.com"),
+        company=Company.objects.get(zoom_id="seed-co"),
+        contacts=list(Contact.objects.order_by("last_name")),
+        campaign=Campaign.objects.get(),
+    )
+
+
+@pytest.fixture
+def wait_for_job(client):
+    """
+    Poll /jobs/{job_id} until the job finishes and return it.
+    """
+    def wait(job_id, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = client.get(f"/api/v1/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed", "cancelled") or time.monotonic() > deadline:
+                return job
+            time.sleep(0.02)
+    return wait
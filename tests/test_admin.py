@@ -0,0 +1,33 @@
+import pytest
+from models.campaign import Campaign
+from models.user import User
+from core.database import analytics, pool_metrics
+
+def test_reset_project_keeps_connection(client, seeded, wait_for_job):
+    # Reset the project; it runs as a background job
+    response = client.post("/api/v1/reset-project")
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+
+    # Check the database was emptied on the same connection
+    assert job["status"] == "succeeded"
+    assert User.objects.count() == 0
+
+    # The connection stays usable for the next request
+    response = client.get("/api/v1/campaigns/")
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_read_pool_metrics(client):
+    response = client.get("/api/v1/admin/db/pool")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data == pool_metrics.snapshot()
+    assert "checked_out" in data
+    assert "wait_ms_p95" in data
+
+def test_analytics_queryset(client, seeded):
+    # Analytics reads return the same documents
+    assert analytics(Campaign.objects).count() == 1
+    assert analytics(Campaign.objects).get().campaign_id == seeded.campaign.campaign_id
@@ -0,0 +1,66 @@
+import asyncio
+from config import settings
+from core.admission import PriorityLimiter, admission, classify
+
+def test_requests_are_classified_by_route_and_page_size():
+    assert classify("GET", "/contacts/", b"skip=0&limit=10") == ("interactive", None)
+    assert classify("GET", "/emails/", b"limit=100") == ("bulk", "export")
+    assert classify("POST", "/contacts/") == ("write", None)
+    assert classify("POST", "/contacts/batch") == ("bulk", "contacts.batch")
+    assert classify("POST", "/campaigns/abc/generate") == ("bulk", "campaigns.generate")
+    assert classify("POST", "/admin/snapshots/large/restore") == ("bulk", "admin.snapshots")
+
+def test_each_client_has_its_own_rate_limit(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_USER_RATE", 0.01)
+    monkeypatch.setattr(settings, "ADMISSION_USER_BURST", 2)
+    heavy = {"X-User-Id": "heavy"}
+
+    assert [client.get("/api/v1/campaigns/", headers=heavy).status_code for _ in range(3)] == [200, 200, 429]
+    limited = client.get("/api/v1/campaigns/", headers=heavy)
+    assert limited.status_code == 429 and int(limited.headers["retry-after"]) > 60
+    assert client.get("/api/v1/campaigns/", headers={"X-User-Id": "light"}).status_code == 200
+    assert client.get("/health").status_code != 429
+
+def test_bulk_routes_have_a_tighter_per_route_limit(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_BULK_RATE", 0.01)
+    monkeypatch.setattr(settings, "ADMISSION_BULK_BURST", 1)
+
+    assert client.get("/api/v1/emails/?limit=100").status_code == 200
+    assert client.get("/api/v1/emails/?limit=100").status_code == 429
+    assert client.get("/api/v1/emails/?limit=10").status_code == 200
+    assert admission.stats()["outcomes"]["bulk.rate_limited"] == 1
+
+def test_queued_requests_are_served_by_priority_and_shed_after_the_target():
+    async def run():
+        limiter = PriorityLimiter(1)
+        assert await limiter.acquire(2, 1)
+        served = []
+
+        async def request(priority, name):
+            if await limiter.acquire(priority, 1):
+                served.append(name)
+                limiter.release()
+
+        waiting = [asyncio.create_task(request(2, "bulk")), asyncio.create_task(request(0, "read"))]
+        await asyncio.sleep(0.01)
+        assert limiter.queued == 2
+        limiter.release()
+        await asyncio.gather(*waiting)
+
+        assert await limiter.acquire(2, 1)
+        shed = await limiter.acquire(2, 0.01)
+        assert limiter.queued == 0
+        limiter.release()
+        return served, shed, limiter.in_use
+
+    assert asyncio.run(run()) == (["read", "bulk"], False, 0)
+
+def test_requests_queued_past_the_target_get_429(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_CONCURRENCY", 0)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TARGET_SECONDS", 0.01)
+    admission.clear()
+
+    response = client.get("/api/v1/contacts/")
+
+    assert response.status_code == 429 and response.headers["retry-after"] == "1"
+    assert admission.stats()["outcomes"] == {"interactive.shed": 1}
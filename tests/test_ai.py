@@ -0,0 +1,114 @@
+import asyncio
+import time
+import httpx
+import pytest
+from config import settings
+from core import generation
+from core.ai import AIRouter, AIUnavailable, OpenAIProvider, ProviderError, StubProvider, _parse_reset
+from models import Email
+
+def _router(**providers):
+    return AIRouter([f"{name}/m" for name in providers], providers)
+
+@pytest.fixture
+def fast_hedging(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_MIN_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "AI_HEDGE_MAX_SECONDS", 0.05)
+
+def test_requests_go_to_the_fastest_healthy_route():
+    router = _router(slow=StubProvider("slow", latency=0.05), fast=StubProvider("fast", latency=0.001))
+
+    async def run():
+        for _ in range(4):
+            await router.complete("Hi")
+        return await router.complete("Hi")
+
+    assert asyncio.run(run()).model == "fast/m"
+    assert router.ranked() == ["fast/m", "slow/m"]
+    # A preferred route is tried first while it is healthy.
+    assert asyncio.run(router.complete("Hi", model="slow/m")).model == "slow/m"
+
+def test_errors_fail_over_and_mark_the_route_unhealthy(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGING_ENABLED", False)
+    broken, backup = StubProvider("broken", error_rate=1.0), StubProvider("backup")
+    router = _router(broken=broken, backup=backup)
+
+    completion = asyncio.run(router.complete("Hi", model="broken/m"))
+
+    assert completion.model == "backup/m"
+    assert router.ranked() == ["backup/m", "broken/m"]
+    assert asyncio.run(router.complete("Hi")).model == "backup/m"
+    assert broken.calls == 1
+    routes = {route["route"]: route for route in router.stats()["routes"]}
+    assert routes["broken/m"]["healthy"] is False and routes["broken/m"]["error_rate"] == 1.0
+
+    with pytest.raises(AIUnavailable):
+        asyncio.run(_router(broken=StubProvider("broken", error_rate=1.0)).complete("Hi"))
+
+def test_slow_requests_are_hedged(fast_hedging):
+    router = _router(stalled=StubProvider("stalled", latency=2.0), quick=StubProvider("quick", latency=0.01))
+
+    started = time.perf_counter()
+    completion = asyncio.run(router.complete("Hi", model="stalled/m"))
+
+    assert completion.model == "quick/m"
+    assert time.perf_counter() - started < 1.0
+
+def test_rate_limited_routes_wait_for_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGING_ENABLED", False)
+
+    class Limited(StubProvider):
+        async def complete(self, model, prompt, max_tokens):
+            raise ProviderError("HTTP 429", retry_after=30)
+
+    router = _router(limited=Limited("limited"), other=StubProvider("other"))
+    assert asyncio.run(router.complete("Hi", model="limited/m")).model == "other/m"
+    limited = next(route for route in router.stats()["routes"] if route["route"] == "limited/m")
+    assert limited["healthy"] is False and limited["blocked_for_s"] > 25
+
+def test_http_provider_reads_usage_and_rate_limit_headers():
+    def handler(request):
+        if request.headers["Authorization"] != "Bearer key":
+            return httpx.Response(401)
+        if b"busy" in request.content:
+            return httpx.Response(429, headers={"retry-after": "7"})
+        return httpx.Response(200, headers={"x-ratelimit-remaining-requests": "0",
+                                            "x-ratelimit-reset-requests": "1m30s"},
+                              json={"choices": [{"message": {"content": "Hello"}}],
+                                    "usage": {"prompt_tokens": 12, "completion_tokens": 3}})
+
+    provider = OpenAIProvider("key")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    provider._client = lambda: client
+
+    completion = asyncio.run(provider.complete("gpt-4o", "Hi", 10))
+    assert (completion.text, completion.model, completion.tokens_sent, completion.tokens_returned) == \
+        ("Hello", "openai/gpt-4o", 12, 3)
+    assert completion.rate_limit.remaining == 0 and completion.rate_limit.reset_seconds == 90
+
+    with pytest.raises(ProviderError) as error:
+        asyncio.run(provider.complete("gpt-4o", "busy", 10))
+    assert error.value.retry_after == 7
+    assert _parse_reset("250ms") == 0.25
+
+def test_generate_endpoint_records_the_route_that_answered(client, seeded, monkeypatch):
+    router = _router(primary=StubProvider("primary", error_rate=1.0), fallback=StubProvider("fallback"))
+    monkeypatch.setattr(generation, "ai_router", router)
+    contact = seeded.contacts[0]
+
+    response = client.post("/api/v1/emails/generate", json={"campaign_id": seeded.campaign.campaign_id,
+                                                             "contact_id": str(contact.id), "ai_model": "primary/m"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ai_model"] == "fallback/m"
+    assert data["contact"]["email"] == contact.email and data["company"]["name"] == "Seed Co"
+    assert "Seed Co" in data["full_prompt"] and data["tokens_sent"] > 0
+    assert Email.objects.get(id=data["id"]).ai_model == "fallback/m"
+
+    missing = client.post("/api/v1/emails/generate", json={"campaign_id": "nope", "contact_id": str(contact.id)})
+    assert missing.status_code == 404
+    monkeypatch.setattr(generation, "ai_router", _router(broken=StubProvider("broken", error_rate=1.0)))
+    failed = client.post("/api/v1/emails/generate", json={"campaign_id": seeded.campaign.campaign_id,
+                                                           "contact_id": str(contact.id)})
+    assert failed.status_code == 502
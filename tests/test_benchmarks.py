@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+import httpx
+from httpx import ASGITransport
+from config import settings
+from main import app
+from models import User, Contact, Email
+from benchmarks.run import compare, run_workload, summarize
+from benchmarks.seed import seed_scaled_sample_data
+from benchmarks.workloads import WorkloadContext, discover
+
+def test_summarize_and_compare():
+    result = summarize("list", [0.010, 0.020, 0.030, 0.040], requests=4, errors=0, elapsed=2.0)
+
+    assert result["rps"] == 2.0
+    assert result["p50_ms"] == 20.0
+    assert result["p99_ms"] == 40.0
+
+    baseline = [{**result, "p95_ms": 20.0, "rps": 4.0}]
+    regressions = compare([result], baseline, tolerance=0.15)
+    assert len(regressions) == 2
+    assert compare([result], [result], tolerance=0.15) == []
+
+def test_seed_and_run_workloads(client, monkeypatch):
+    # Load tests come from one client; lift the per-client limits so they measure capacity.
+    for setting in ("ADMISSION_USER_RATE", "ADMISSION_USER_BURST", "ADMISSION_BULK_RATE", "ADMISSION_BULK_BURST"):
+        monkeypatch.setattr(settings, setting, 1e6)
+    counts = seed_scaled_sample_data(scale=3, emails_per_contact=2)
+
+    assert counts["contacts"] == Contact.objects.count() == 6
+    assert Email.objects.count() == 12
+    assert Contact.objects.first().company.user.user_id in [u.user_id for u in User.objects]
+
+    async def run():
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+            ctx = await discover(http, WorkloadContext(batch_size=2, export_pages=2))
+            return [await run_workload(http, name, ctx, concurrency=2, duration=0.1, seed=1)
+                    for name in ("list", "detail", "create", "batch", "export")]
+
+    for result in asyncio.run(run()):
+        assert result["errors"] == 0, result
+        assert result["requests"] > 0
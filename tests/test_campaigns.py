@@ -1,12 +1,8 @@
 import pytest
 from models.campaign import Campaign
-from models.user import User
 
-def test_create_campaign(client):
-    # Create a test user
-    user = User(username="testuser", email="test@example.com", first_name="Test", last_name="User")
-    user.set_password("testpassword")
-    user.save()
+def test_create_campaign(client, seeded):
+    user = seeded.user
 
     # Test data
     campaign_data = {
@@ -26,24 +22,15 @@ def test_create_campaign(client):
     assert data["campaign_name"] == campaign_data["campaign_name"]
     assert "campaign_id" in data
 
-    # Clean up
-    Campaign.objects.delete()
-    User.objects.delete()
-
-def test_get_campaigns(client):
-    # Create a test user
-    user = User(username="testuser", email="test@example.com", first_name="Test", last_name="User")
-    user.set_password("testpassword")
-    user.save()
-
-    # Create some test campaigns
-    for i in range(3):
+def test_get_campaigns(client, seeded):
+    # Add two campaigns to the seeded one
+    for i in range(2):
         Campaign(
             campaign_name=f"Test Campaign {i}",
             campaign_context="Test Context",
             campaign_template_body="Test Body",
             campaign_template_title="Test Title",
-            user=user
+            user=seeded.user
         ).save()
 
     # Make a GET request to fetch campaigns
@@ -54,24 +41,8 @@ def test_get_campaigns(client):
     data = response.json()
     assert len(data) == 3
 
-    # Clean up
-    Campaign.objects.delete()
-    User.objects.delete()
-
-def test_get_campaign(client):
-    # Create a test user
-    user = User(username="testuser", email="test@example.com", first_name="Test", last_name="User")
-    user.set_password("testpassword")
-    user.save()
-
-    # Create a test campaign
-    campaign = Campaign(
-        campaign_name="Test Campaign",
-        campaign_context="Test Context",
-        campaign_template_body="Test Body",
-        campaign_template_title="Test Title",
-        user=user
-    ).save()
+def test_get_campaign(client, seeded):
+    campaign = seeded.campaign
 
     # Make a GET request to fetch the campaign
     response = client.get(f"/api/v1/campaigns/{campaign.campaign_id}")
@@ -79,9 +50,5 @@ def test_get_campaign(client):
     # Check the response
     assert response.status_code == 200
     data = response.json()
-    assert data["campaign_name"] == "Test Campaign"
+    assert data["campaign_name"] == "Seed Campaign"
     assert data["campaign_id"] == str(campaign.campaign_id)
-
-    # Clean up
-    Campaign.objects.delete()
-    User.objects.delete()
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+import pytest
+from config import settings
+from mongoengine.connection import get_db
+from models import Campaign, Company, Contact, DuplicateGroup, Email, User
+from models.email import CompanySnapshot, ContactSnapshot
+from core.cascade import Cascade
+from core.search import search_index
+
+def _email(company, contact, campaign):
+    return Email(company=CompanySnapshot.of(company), contact=ContactSnapshot.of(contact), subject="S", body="B",
+                 ai_model="test", tokens_sent=1, tokens_returned=1, generation_time=0.1, full_prompt="p",
+                 campaign_id=campaign.campaign_id)
+
+@pytest.fixture
+def tree(seeded, monkeypatch):
+    """
+    The seeded owner and campaign with two more companies, six contacts and two emails
+    per contact, plus a company owned by another user.
+    """
+    # Archived emails go to the monthly archives, which mongomock cannot create compressed.
+    monkeypatch.setattr(settings, "EMAIL_ARCHIVE_COMPRESSOR", "")
+    other = User(username="other", email="other@example.com", first_name="Oth", last_name="Er")
+    other.set_password("testpassword")
+    other.save()
+    companies = [Company(name=f"Co {i}", zoom_id=f"co-{i}", user=seeded.user).save() for i in range(2)]
+    contacts = [Contact(first_name="F", last_name=f"L{i}", email=f"c{i}@example.com", zoom_id=f"ct-{i}",
+                        user=seeded.user, company=companies[i % 2]).save() for i in range(6)]
+    for contact in contacts:
+        for _ in range(2):
+            _email(contact.company, contact, seeded.campaign).save()
+    Company(name="Kept", zoom_id="kept", user=other).save()
+    return SimpleNamespace(user=seeded.user, campaign=seeded.campaign, companies=companies, contacts=contacts)
+
+def _orphans(result, collection, field):
+    return next(entry["count"] for entry in result["orphans"]
+                if entry["collection"] == collection and entry["field"] == field)
+
+def test_delete_company_cascades_to_contacts_and_emails(client, tree):
+    companies, contacts = tree.companies, tree.contacts
+    search_index.index_contact(contacts[0])
+
+    response = client.delete(f"/api/v1/companies/{companies[0].id}")
+
+    assert response.status_code == 200
+    assert response.json()["removed"] == {"companies": 1, "contacts": 3, "emails": 6}
+    assert Contact.objects.count() == 5
+    assert Email.objects.count() == 6
+    assert Contact.objects(company=companies[0].id).count() == 0
+    assert not search_index.search("L0")
+    assert client.delete(f"/api/v1/companies/{companies[0].id}").status_code == 404
+
+def test_archive_user_moves_everything_they_own(client, tree):
+    user = tree.user
+
+    response = client.delete(f"/api/v1/users/{user.user_id}", params={"mode": "archive"})
+
+    assert response.status_code == 200
+    assert response.json()["removed"] == {"users": 1, "companies": 3, "contacts": 8, "campaigns": 1, "emails": 12}
+    assert [company.name for company in Company.objects] == ["Kept"]
+    assert Email.objects.count() == 0
+    db = get_db()
+    assert db.archived_contacts.count_documents({}) == 8
+    archived = client.get("/api/v1/emails/archived", params={"campaign_id": tree.campaign.campaign_id, "limit": 100})
+    assert len(archived.json()) == 12
+    assert client.get(f"/api/v1/emails/archived/{archived.json()[0]['id']}").status_code == 200
+    assert db.archived_users.find_one()["_id"] == user.user_id
+
+def test_bulk_delete_and_small_batches(client, tree):
+    campaign, contacts = tree.campaign, tree.contacts
+
+    response = client.post("/api/v1/admin/bulk-delete",
+                           json={"collection": "contacts", "ids": [str(contact.id) for contact in contacts[:4]]})
+    assert response.status_code == 200
+    assert response.json()["removed"] == {"contacts": 4, "emails": 8}
+    assert client.post("/api/v1/admin/bulk-delete", json={"collection": "contacts", "ids": ["nope"]}).status_code == 400
+
+    counts = Cascade("archive", batch_size=1).remove("campaigns", [campaign.campaign_id])
+    assert counts == {"emails": 4, "campaigns": 1}
+
+def test_removing_contacts_drops_their_duplicate_groups(client, tree):
+    contacts = tree.contacts
+    for survivor, duplicate, status in [(0, 1, "proposed"), (2, 3, "rejected"), (4, 5, "proposed")]:
+        DuplicateGroup(survivor=contacts[survivor].id, duplicates=[contacts[duplicate].id], score=0.9, status=status,
+                       members_key=f"{contacts[survivor].id},{contacts[duplicate].id}").save()
+
+    response = client.post("/api/v1/admin/bulk-delete", json={"collection": "contacts", "ids": [str(contacts[1].id)]})
+    assert response.status_code == 200
+    assert response.json()["removed"] == {"contacts": 1, "emails": 2, "contact_duplicates": 1}
+
+    counts = Cascade("archive").remove("contacts", [contacts[2].id])
+    assert counts == {"emails": 2, "contacts": 1, "contact_duplicates": 1}
+    assert [group.survivor for group in DuplicateGroup.objects] == [contacts[4].id]
+
+def test_orphan_scan_removes_dangling_documents(client, tree, wait_for_job):
+    companies = tree.companies
+    # Single-document deletes that bypass the cascade leave orphans behind.
+    Company.objects(id=companies[1].id).delete()
+    Campaign.objects.delete()
+
+    response = client.post("/api/v1/admin/orphans/scan", json={"dry_run": True})
+    dry = wait_for_job(response.json()["job_id"])
+    assert dry["status"] == "succeeded"
+    assert _orphans(dry["result"], "contacts", "company") == 3
+    assert dry["result"]["removed"] == {}
+    assert Contact.objects.count() == 8
+
+    job = wait_for_job(client.post("/api/v1/admin/orphans/scan", json={}).json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert _orphans(job["result"], "contacts", "company") == 3
+    assert _orphans(job["result"], "emails", "campaign_id") == 6
+    assert job["result"]["removed"] == {"contacts": 3, "emails": 12}
+    assert Contact.objects.count() == 5
+    assert Email.objects.count() == 0
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from config import settings
+from core.changes import ChangeFeed, ChangeStreamWatcher, change_feed, stream_changes
+
+def _changes(client, since, resources):
+    return [(change["id"], change["op"]) for change in
+            client.get(f"/api/v1/changes/?since={since}&resources={resources}").json()["changes"]]
+
+def test_write_paths_publish_changes(client, seeded):
+    since = client.get("/api/v1/changes/?since=0").json()["version"]
+    company = client.post("/api/v1/companies/", json={"name": "Acme", "zoom_id": "acme", "user": seeded.user.user_id}).json()
+    client.put(f"/api/v1/companies/{company['id']}", json={"name": "Acme Inc"})
+    client.delete(f"/api/v1/companies/{seeded.company.id}")
+
+    assert _changes(client, since, "companies") == [(company["id"], "insert"), (company["id"], "update"),
+                                                     (str(seeded.company.id), "delete")]
+    # The cascade removed the seed company's contacts too.
+    assert sorted(_changes(client, since, "contacts")) == sorted((str(c.id), "delete") for c in seeded.contacts)
+    assert _changes(client, since, "users,campaigns") == []
+    assert client.get("/api/v1/changes/?since=0&resources=invoices").status_code == 400
+    assert client.get("/api/v1/changes/stream?resources=invoices").status_code == 400
+
+def test_stream_sends_live_changes_and_resumes_from_last_event_id():
+    async def run():
+        stream = stream_changes(change_feed.subscribe({"contacts"}))
+        assert (await anext(stream)).startswith("retry: 3000\nid: ")
+        # Published from another thread, as threadpool endpoints and jobs do.
+        thread = threading.Thread(target=lambda: [change_feed.publish("emails", "e1", "insert"),
+                                                  change_feed.publish("contacts", "c1", "update")])
+        thread.start()
+        event = await anext(stream)
+        thread.join()
+        await stream.aclose()
+
+        version = change_feed.publish("contacts", "c2", "delete").version
+        resumed = stream_changes(change_feed.subscribe({"contacts"}), last_event_id=version - 1)
+        await anext(resumed)
+        replayed = await anext(resumed)
+        await resumed.aclose()
+        return event, replayed, version
+
+    event, replayed, version = asyncio.run(run())
+    assert event.startswith("id: ") and '"resource": "contacts", "id": "c1", "op": "update"' in event
+    assert replayed == (f'id: {version}\nevent: change\ndata: {{"resource": "contacts", "id": "c2", '
+                        f'"op": "delete", "version": {version}}}\n\n')
+    assert change_feed.stats()["subscribers"] == 0
+
+def test_resume_ids_ahead_of_the_feed_reset_and_track_new_events():
+    async def run():
+        current = change_feed.stats()["version"]
+        # As after a restart: the client saw versions this process has not reached.
+        stream = stream_changes(change_feed.subscribe({"contacts", "emails"}), last_event_id=current + 50)
+        first = await anext(stream)
+        resets = [await anext(stream), await anext(stream)]
+        change_feed.publish("contacts", "c1", "insert")
+        live = await anext(stream)
+        await stream.aclose()
+        return current, first, resets, live
+
+    current, first, resets, live = asyncio.run(run())
+    assert first == f"retry: 3000\nid: {current}\n\n"
+    assert ['"op": "reset"' in event for event in resets] == [True, True]
+    assert f"id: {current + 1}\n" in live and '"id": "c1", "op": "insert"' in live
+    assert [change.op for change in change_feed.since(current + 50, {"users"})] == ["reset"]
+
+def test_lagging_clients_get_resets(monkeypatch):
+    monkeypatch.setattr(settings, "CHANGE_FEED_HISTORY", 2)
+    monkeypatch.setattr(settings, "CHANGE_FEED_QUEUE_SIZE", 5)
+    feed = ChangeFeed()
+
+    async def run():
+        subscription = feed.subscribe({"contacts"})
+        feed.publish_many("contacts", list(range(3)), "insert")
+        feed.publish_many("contacts", list(range(200)), "update")
+        for n in range(6):
+            feed.publish("contacts", n, "delete")
+        await asyncio.sleep(0)
+        return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+    queued = asyncio.run(run())
+    # The queue overflowed on the sixth event: its contents became a reset, later events queue again.
+    assert [(change.op, change.id) for change in queued] == [("reset", None)] + [("delete", str(n)) for n in range(2, 6)]
+    assert [change.op for change in feed.since(0, {"contacts"})] == ["reset"]
+    assert [change.id for change in feed.since(feed.stats()["version"] - 2, {"contacts"})] == ["4", "5"]
+
+def test_change_stream_events_replace_write_path_events(monkeypatch):
+    monkeypatch.setattr(change_feed, "source", "change_stream")
+    since = change_feed.stats()["version"]
+
+    assert change_feed.publish("contacts", "c1", "update") is None
+    ChangeStreamWatcher._publish({"operationType": "replace", "ns": {"db": "d", "coll": "contacts"},
+                                  "documentKey": {"_id": "c1"}})
+    ChangeStreamWatcher._publish({"operationType": "drop", "ns": {"db": "d", "coll": "emails"}})
+
+    assert [(c.resource, c.id, c.op) for c in change_feed.since(since, {"contacts", "emails"})] == \
+        [("contacts", "c1", "update"), ("emails", None, "reset")]
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+import httpx
+from httpx import ASGITransport
+from main import app
+from core.coalesce import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def slow_read(company_id):
+        calls.append(threading.get_ident())
+        time.sleep(0.1)
+        return {"id": company_id}
+
+    async def burst():
+        return await asyncio.gather(*[flight.run("companies.get", "c1", slow_read, "c1") for _ in range(5)],
+                                    flight.run("companies.get", "c2", slow_read, "c2"))
+
+    results = asyncio.run(burst())
+
+    assert results == [{"id": "c1"}] * 5 + [{"id": "c2"}]
+    assert len(calls) == 2
+    assert flight.stats()["flights"]["companies.get"] == {"leader": 2, "follower": 4, "coalesced_ratio": 0.667}
+    # Nothing is cached once the call has finished.
+    asyncio.run(flight.run("companies.get", "c1", slow_read, "c1"))
+    assert len(calls) == 3
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    def failing_read():
+        time.sleep(0.05)
+        raise LookupError("missing")
+
+    async def burst():
+        return await asyncio.gather(*[flight.run("companies.get", "gone", failing_read) for _ in range(3)],
+                                    return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(burst())] == [LookupError] * 3
+
+def test_item_and_list_endpoints_are_coalesced(client, seeded):
+    user, company = seeded.user, seeded.company
+    before = client.get("/api/v1/admin/db/coalescing").json()["flights"]
+
+    async def burst():
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+            return await asyncio.gather(*[http.get(f"/api/v1/companies/{company.id}") for _ in range(5)],
+                                        *[http.get("/api/v1/companies/", params={"user": user.user_id}) for _ in range(5)])
+
+    responses = asyncio.run(burst())
+
+    assert {response.json()["name"] for response in responses[:5]} == {"Seed Co"}
+    assert all(response.json()[0]["name"] == "Seed Co" for response in responses[5:10])
+    flights = client.get("/api/v1/admin/db/coalescing").json()["flights"]
+    for flight, calls in (("companies.get", 5), ("companies.list", 5)):
+        old = before.get(flight, {"leader": 0, "follower": 0})
+        assert flights[flight]["leader"] + flights[flight]["follower"] - old["leader"] - old["follower"] == calls
@@ -0,0 +1,49 @@
+import pytest
+from config import settings
+from models import Company
+from core.counts import count_cache
+
+@pytest.fixture
+def companies(seeded):
+    """
+    Five companies (two in Tech, three in Retail) next to the seeded one, which has no industry.
+    """
+    return [Company(name=f"Co {i}", zoom_id=f"co-{i}", primary_industry="Tech" if i % 2 else "Retail",
+                    user=seeded.user).save() for i in range(5)]
+
+def test_totals_are_opt_in(client, companies):
+
+    response = client.get("/api/v1/companies/")
+
+    assert len(response.json()) == 6
+    assert "X-Total-Count" not in response.headers
+
+def test_unfiltered_totals_are_estimated_and_filtered_ones_cached(client, companies):
+
+    unfiltered = client.get("/api/v1/companies/", params={"include_total": True, "limit": 2})
+    assert len(unfiltered.json()) == 2
+    assert unfiltered.headers["X-Total-Count"] == "6"
+    assert unfiltered.headers["X-Total-Count-Estimated"] == "true"
+
+    filtered = client.get("/api/v1/companies/", params={"include_total": True, "industry": "Tech"},
+                          headers={"Origin": "http://localhost:4200"})
+    assert filtered.headers["X-Total-Count"] == "2"
+    assert "X-Total-Count-Estimated" not in filtered.headers
+    # Browsers only let the frontend read the header if CORS exposes it.
+    assert "X-Total-Count" in filtered.headers["Access-Control-Expose-Headers"]
+
+    # Served from the cache until it expires.
+    Company.objects(primary_industry="Tech").first().delete()
+    cached = client.get("/api/v1/companies/", params={"include_total": True, "industry": "Tech"})
+    assert cached.headers["X-Total-Count"] == "2"
+    count_cache.clear()
+    fresh = client.get("/api/v1/companies/", params={"include_total": True, "industry": "Tech"})
+    assert fresh.headers["X-Total-Count"] == "1"
+
+def test_large_filtered_counts_stop_at_the_cap(client, companies, monkeypatch):
+    monkeypatch.setattr(settings, "COUNT_MAX_EXACT", 2)
+
+    response = client.get("/api/v1/companies/", params={"include_total": True, "industry": "Retail"})
+
+    assert response.headers["X-Total-Count"] == "2"
+    assert response.headers["X-Total-Count-Estimated"] == "true"
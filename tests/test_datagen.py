@@ -0,0 +1,73 @@
+import io
+import pytest
+from collections import Counter
+from mongoengine.connection import get_db
+from bson import json_util
+from models import Company, Contact, Campaign, Email
+from core.datagen import (COLLECTIONS, DataGenerator, GeneratorConfig, MongoSink, NdjsonSink, generate_to, load_ndjson,
+                          skewed_counts)
+import random
+
+def test_skewed_counts_sum_to_total():
+    counts = skewed_counts(random.Random(1), items=100, total=1000, skew=1.2)
+
+    assert sum(counts) == 1000
+    assert max(counts) > 10 * min(counts) or min(counts) == 0
+
+@pytest.mark.parametrize("means", [
+    {"campaigns_per_user": 3, "companies_per_user": 1, "contacts_per_company": 2, "emails_per_contact": 1},
+    {"campaigns_per_user": 0, "companies_per_user": 1, "contacts_per_company": 2, "emails_per_contact": 1},
+    {"campaigns_per_user": 0.2, "companies_per_user": 1.5, "contacts_per_company": 2.5, "emails_per_contact": 0.3},
+    {"campaigns_per_user": 1, "companies_per_user": 3, "contacts_per_company": 1.5, "emails_per_contact": 1.5},
+])
+def test_generated_counts_match_expected_counts(means):
+    config = GeneratorConfig(users=40, skew=1.1, **means)
+    counts, campaign_owners = Counter(), {}
+    for collection, document in DataGenerator(config).generate():
+        counts[collection] += 1
+        if collection == "campaigns":
+            campaign_owners[document["_id"]] = document["user"]
+        elif collection == "contacts":
+            owner = document["user"]
+        elif collection == "emails":
+            # Emails follow their contact, which was yielded just before them.
+            assert campaign_owners[document["campaign_id"]] == owner
+
+    assert {name: counts[name] for name in COLLECTIONS} == config.expected_counts()
+
+def test_generate_to_mongo_is_referentially_consistent(client):
+    config = GeneratorConfig(users=3, companies_per_user=4, contacts_per_company=5, campaigns_per_user=2)
+
+    result = generate_to(MongoSink(get_db(), batch_size=7, workers=1), config)
+
+    assert result["counts"]["companies"] == Company.objects.count() == 12
+    assert result["counts"]["contacts"] == Contact.objects.count() == 60
+    assert Email.objects.count() == 60
+    campaign_ids = set(Campaign.objects.scalar("campaign_id"))
+    assert set(Email.objects.distinct("campaign_id")) <= campaign_ids
+    for contact in Contact.objects:
+        assert contact.company.user.user_id == contact.user.user_id
+        assert contact.email.endswith(contact.company.website.split("://")[1])
+
+def test_ndjson_round_trip(client):
+    config = GeneratorConfig(users=2, companies_per_user=2, contacts_per_company=2, seed=7)
+    buffer = io.StringIO()
+
+    result = generate_to(NdjsonSink(buffer), config)
+    first = json_util.loads(buffer.getvalue().splitlines()[0])
+    assert first["collection"] == "users"
+
+    buffer.seek(0)
+    counts = load_ndjson(buffer, get_db(), workers=1)
+    assert counts == result["counts"]
+    assert Contact.objects.count() == counts["contacts"]
+
+def test_generate_data_endpoint(client, wait_for_job):
+    response = client.post("/api/v1/admin/generate-data", json={
+        "users": 2, "companies_per_user": 2, "contacts_per_company": 3, "campaigns_per_user": 1
+    })
+
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["counts"]["contacts"] == Contact.objects.count() == 12
@@ -0,0 +1,42 @@
+import gzip
+from config import settings
+from models import Company, Contact
+from models.job import Job
+
+def test_snapshot_and_restore_through_reset_project(client, seeded, wait_for_job, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SNAPSHOT_DIR", str(tmp_path))
+    user = seeded.user
+
+    job = wait_for_job(client.post("/api/v1/admin/snapshots", json={"name": "demo"}).json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["documents"]["contacts"] == 2
+    with gzip.open(tmp_path / "demo" / "contacts.bson.gz") as file:
+        assert file.read(4)  # BSON length prefix of the first document
+    assert client.post("/api/v1/admin/snapshots", json={"name": "demo"}).status_code == 409
+    listed = client.get("/api/v1/admin/snapshots").json()
+    assert [snapshot["name"] for snapshot in listed] == ["demo"]
+    assert listed[0]["documents"]["users"] == 1
+
+    Contact.objects(last_name="Lovelace").delete()
+    Company(name="Later", zoom_id="later", user=user).save()
+
+    response = client.post("/api/v1/reset-project", params={"snapshot": "demo"})
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["restored"] == {"users": 1, "companies": 1, "contacts": 2, "campaigns": 1, "emails": 0}
+    assert sorted(contact.last_name for contact in Contact.objects) == ["Lovelace", "Turing"]
+    assert [company.name for company in Company.objects] == ["Seed Co"]
+    assert "dedup_keys_1" in Contact._get_collection().index_information()
+    assert Company.objects.get(zoom_id="seed-co").user.user_id == user.user_id
+
+def test_snapshot_errors(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SNAPSHOT_DIR", str(tmp_path))
+
+    assert client.post("/api/v1/admin/snapshots/missing/restore").status_code == 404
+    assert client.post("/api/v1/initialize-db", params={"snapshot": "missing"}).status_code == 404
+    assert client.post("/api/v1/reset-project", params={"snapshot": "../etc"}).status_code == 400
+    assert client.post("/api/v1/admin/snapshots", json={"name": "../etc"}).status_code == 422
+    assert client.delete("/api/v1/admin/snapshots/missing").status_code == 404
+    assert Job.objects.count() == 0
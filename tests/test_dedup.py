@@ -0,0 +1,117 @@
+from models import Company, Contact, DuplicateGroup, Email
+from models.email import CompanySnapshot, ContactSnapshot
+from core.dedup import run_dedup, score
+from core.identity import blocking_keys, normalize_email, normalize_name
+
+def _contact(n, user, company, first, last, email, title=None):
+    return Contact(first_name=first, last_name=last, email=email, title=title, zoom_id=f"ct-{n}",
+                   user=user, company=company).save()
+
+def _email(contact):
+    return Email(company=CompanySnapshot.of(contact.company), contact=ContactSnapshot.of(contact), subject="S",
+                 body="B", ai_model="test", tokens_sent=1, tokens_returned=1, generation_time=0.1,
+                 full_prompt="p", campaign_id="c1").save()
+
+def test_normalization_and_blocking_keys():
+    assert normalize_email(" John.Smith+news@GoogleMail.com ") == "johnsmith@gmail.com"
+    assert normalize_email("john.smith+news@Acme.example") == "john.smith@acme.example"
+    assert normalize_name("José  O'Brien") == "joseobrien"
+    assert blocking_keys("Jose", "Obrien", "j.o@gmail.com", "co", "u") == \
+        blocking_keys("José", "O'Brien", "J.O+x@googlemail.com", "co", "u")
+    # Free-mail domains never form a name+domain key.
+    assert [key[0] for key in blocking_keys("Ann", "Lee", "ann@gmail.com", None, "u")] == ["e"]
+    assert blocking_keys("Ann", "Lee", "ann@acme.example", None, "u1") != \
+        blocking_keys("Ann", "Lee", "ann@acme.example", None, "u2")
+    assert score({"first_name": "Ann", "last_name": "Lee", "email": "ann@acme.example", "company": 1},
+                 {"first_name": "ANN", "last_name": "Lee", "email": "Ann+x@acme.example", "company": 1}) == 1.0
+
+def test_full_run_proposes_groups_and_merge_repoints_emails(client, seeded, wait_for_job):
+    user = seeded.user
+    acme = Company(name="Acme", zoom_id="acme", user=user).save()
+    jane = _contact(1, user, acme, "Jane", "Doe", "jane.doe@acme.example")
+    twin = _contact(2, user, acme, "jane", "DOE", "Jane.Doe+sales@acme.example", title="CTO")
+    _contact(3, user, acme, "Janet", "Doe", "janet@acme.example")
+    _contact(4, user, acme, "Bob", "Smith", "bob@acme.example")
+    emails = [_email(twin), _email(twin), _email(jane)]
+
+    job = wait_for_job(client.post("/api/v1/admin/dedup/run", json={}).json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["groups_proposed"] == 1
+    assert job["result"]["merged"]["groups"] == 0
+    groups = client.get("/api/v1/contacts/duplicates").json()
+    assert len(groups) == 1
+    assert groups[0]["survivor"] == str(jane.id)
+    assert groups[0]["duplicates"] == [str(twin.id)]
+    assert Contact.objects.count() == 6
+
+    # A second run finds the same group and does not propose it again.
+    rerun = wait_for_job(client.post("/api/v1/admin/dedup/run", json={}).json()["job_id"])
+    assert rerun["result"]["groups_proposed"] == 0
+
+    response = client.post("/api/v1/contacts/duplicates/merge", json={"group_ids": [groups[0]["id"]]})
+    assert response.status_code == 200
+    assert response.json() == {"groups": 1, "contacts_removed": 1, "emails_updated": 3}
+    assert not Contact.objects(id=twin.id).first()
+    assert Contact.objects.get(id=jane.id).title == "CTO"
+    for email in emails:
+        email.reload()
+        assert email.contact.contact_id == jane.id
+        assert email.contact.title == "CTO"
+    assert client.get("/api/v1/contacts/duplicates", params={"status": "merged"}).json()[0]["id"] == groups[0]["id"]
+    assert client.post("/api/v1/contacts/duplicates/merge", json={}).status_code == 400
+
+def test_incremental_run_auto_merges_sure_matches_and_honours_rejections(client, seeded):
+    user = seeded.user
+    acme = Company(name="Acme", zoom_id="acme", user=user).save()
+    first = _contact(1, user, acme, "Ann", "Lee", "ann.lee@acme.example", title="VP")
+    # The seeded contacts are checked on the first run too.
+    assert run_dedup()["checked"] == 3
+    assert Contact.objects.get(id=first.id).dedup_checked
+
+    # Only the new contacts are checked, against everything sharing their keys.
+    same = _contact(2, user, acme, "Ann", "Lee", "Ann.Lee@acme.example")
+    _contact(3, user, acme, "Anne", "Lee", "anne@acme.example")
+    result = run_dedup()
+    assert result["checked"] == 2
+    assert result["merged"] == {"groups": 1, "contacts_removed": 1, "emails_updated": 0}
+    assert not Contact.objects(id=same.id).first()
+    assert Contact.objects(dedup_checked=False).count() == 0
+
+    # A weaker match (same address, another company) is proposed, not merged.
+    globex = Company(name="Globex", zoom_id="globex", user=user).save()
+    _contact(4, user, globex, "Ann", "Lee", "ann.lee@acme.example")
+    result = run_dedup()
+    assert result["groups_proposed"] == 1
+    assert result["merged"]["groups"] == 0
+    group = DuplicateGroup.objects.get(status="proposed")
+    assert client.post(f"/api/v1/contacts/duplicates/{group.id}/reject").json()["status"] == "rejected"
+    assert client.post(f"/api/v1/contacts/duplicates/{group.id}/reject").status_code == 404
+    assert run_dedup(full=True)["groups_proposed"] == 0
+
+def test_unindexed_duplicate_group_queries_are_rejected(client, monkeypatch):
+    from api.v1.endpoints import contacts
+    from core.query_guard import UnindexedQueryError
+
+    def unindexed(model, filters, sort):
+        raise UnindexedQueryError("No index supports this query")
+
+    monkeypatch.setattr(contacts, "filtered", unindexed)
+    response = client.get("/api/v1/contacts/duplicates", params={"min_score": 0.5})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No index supports this query"
+
+def test_merging_by_score_is_paged(client, seeded):
+    for n, score in enumerate((0.9, 0.8, 0.7)):
+        survivor = _contact(2 * n, seeded.user, seeded.company, "Ann", f"Lee{n}", f"ann{n}@seed.example.com")
+        duplicate = _contact(2 * n + 1, seeded.user, seeded.company, "Ann", f"Lee{n}", f"ann{n}+x@seed.example.com")
+        DuplicateGroup(survivor=survivor.id, duplicates=[duplicate.id], members_key=f"{survivor.id},{duplicate.id}",
+                       score=score).save()
+
+    merge = {"min_score": 0.75, "limit": 1}
+    assert client.post("/api/v1/contacts/duplicates/merge", json=merge).json()["groups"] == 1
+    assert DuplicateGroup.objects(status="merged").get().score == 0.9
+    assert client.post("/api/v1/contacts/duplicates/merge", json=merge).json()["groups"] == 1
+    assert client.post("/api/v1/contacts/duplicates/merge", json=merge).json()["groups"] == 0
+    assert DuplicateGroup.objects(status="proposed").get().score == 0.7
+    assert client.post("/api/v1/contacts/duplicates/merge", json={"min_score": 0.5, "limit": 0}).status_code == 422
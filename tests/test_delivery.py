@@ -0,0 +1,103 @@
+import asyncio
+import ssl
+import pytest
+from config import settings
+from models import Email
+from core.smtp import DeliveryPipeline, DomainLimiter, OutgoingMessage, SMTPConnection, SMTPError, SMTPPool
+from core.smtp_standin import LocalSMTPServer, RecordingHandler
+from benchmarks.smtp import run_benchmark
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler(reject_domains={"bad.example"}, defer={"slow@ok.example": 2})
+    with LocalSMTPServer(handler) as server:
+        monkeypatch.setattr(settings, "SMTP_HOST", server.host)
+        monkeypatch.setattr(settings, "SMTP_PORT", server.port)
+        monkeypatch.setattr(settings, "SMTP_RETRY_BACKOFF_SECONDS", 0.01)
+        monkeypatch.setattr(settings, "SMTP_DOMAIN_RATE_PER_SECOND", 0)
+        yield server
+
+def _message(key, recipient, body="Hello"):
+    return OutgoingMessage(key, "sender@example.com", recipient, f"Subject {key}", body, f"<{key}@example.com>")
+
+def test_pipeline_retries_transient_and_fails_permanent(smtp_server):
+    async def send():
+        pool = SMTPPool(smtp_server.host, smtp_server.port, size=2)
+        pipeline = DeliveryPipeline(pool, DomainLimiter(2, 0), max_attempts=4, backoff_seconds=0.01)
+        try:
+            return await pipeline.send_all([
+                _message("a", "one@ok.example", "Line\n.starts with a dot\n"),
+                _message("b", "slow@ok.example"),
+                _message("c", "nobody@bad.example"),
+            ]), pool.connections_opened
+        finally:
+            await pool.close()
+
+    results, connections = asyncio.run(send())
+    by_key = {result.key: result for result in results}
+
+    assert by_key["a"].status == "sent" and by_key["a"].attempts == 1
+    assert by_key["b"].status == "sent" and by_key["b"].attempts == 3
+    assert by_key["c"].status == "failed" and by_key["c"].attempts == 1
+    assert by_key["c"].error.startswith("550")
+    assert connections <= 2
+    received = {rcpts[0]: content for _, rcpts, content in smtp_server.handler.messages}
+    assert b"\r\n.starts with a dot\r\n" in received["one@ok.example"]
+    assert b"Message-ID: <a@example.com>" in received["one@ok.example"]
+
+def test_unexpected_errors_fail_messages_instead_of_hanging(smtp_server, monkeypatch):
+    async def refuse_certificate(self):
+        raise ssl.SSLCertVerificationError("certificate verify failed")
+
+    async def send():
+        pool = SMTPPool(smtp_server.host, smtp_server.port, size=1)
+        pipeline = DeliveryPipeline(pool, DomainLimiter(2, 0), max_attempts=2, backoff_seconds=0.01)
+        return await asyncio.wait_for(pipeline.send_all([_message("a", "one@ok.example")]), 5)
+
+    monkeypatch.setattr(SMTPPool, "_open", refuse_certificate)
+    results = asyncio.run(send())
+
+    assert [(result.key, result.status) for result in results] == [("a", "failed")]
+    assert "certificate verify failed" in results[0].error
+
+def test_failed_login_closes_the_connection(smtp_server):
+    async def connect():
+        connection = SMTPConnection(smtp_server.host, smtp_server.port, timeout=5)
+        with pytest.raises(SMTPError):
+            await connection.connect(username="user", password="wrong")
+        return connection
+
+    assert asyncio.run(connect())._writer is None
+
+def test_send_campaign_delivers_queued_emails(client, seeded, wait_for_job, smtp_server):
+    campaign_id = str(seeded.campaign.campaign_id)
+    for address in ["a@ok.example", "b@ok.example", "c@bad.example"]:
+        Email(company={"name": "Acme"}, contact={"email": address}, subject="Hi", body="Body", ai_model="test",
+              tokens_sent=1, tokens_returned=1, generation_time=0.1, full_prompt="prompt",
+              campaign_id=campaign_id).save()
+
+    response = client.post(f"/api/v1/campaigns/{campaign_id}/send")
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["sent"] == 2
+    assert job["result"]["failed"] == 1
+    assert smtp_server.handler.delivered == 2
+    failed = client.get("/api/v1/emails/", params={"campaign_id": campaign_id, "delivery_status": "failed"}).json()
+    assert [email["contact"]["email"] for email in failed] == ["c@bad.example"]
+    assert failed[0]["delivery_error"].startswith("550")
+    # Sent emails are not queued again; failed ones only on request
+    again = wait_for_job(client.post(f"/api/v1/campaigns/{campaign_id}/send").json()["job_id"])
+    assert again["result"]["sent"] + again["result"]["failed"] == 0
+    retry = wait_for_job(client.post(f"/api/v1/campaigns/{campaign_id}/send?retry_failed=true").json()["job_id"])
+    assert retry["result"]["failed"] == 1
+    assert client.post("/api/v1/campaigns/missing/send").status_code == 404
+
+def test_smtp_benchmark_smoke():
+    result = asyncio.run(run_benchmark(messages=50, pool_size=2, domains=5))
+
+    assert result["sent"] == 50
+    assert result["delivered"] == 50
+    assert result["sessions"] == 2
+    assert result["messages_per_sec"] > 0
@@ -0,0 +1,80 @@
+from bson import ObjectId
+from core.domains import candidate_domains
+from core.identity import website_domain
+from models import Company, Contact
+
+def _contact(seeded, n, email, **fields):
+    return {"first_name": "Grace", "last_name": f"Hopper {n}", "email": email, "zoom_id": f"gh-{n}",
+            "user": seeded.user.user_id, **fields}
+
+def test_domain_normalization():
+    assert website_domain("https://www.Acme.com:443/about?x=1") == "acme.com"
+    assert website_domain("acme.co.uk/") == "acme.co.uk"
+    assert website_domain(None) == ""
+    assert candidate_domains("Ada@EU.Acme.com") == ["eu.acme.com", "acme.com"]
+    assert candidate_domains("ada@gmail.com") == []
+
+def test_contact_without_company_is_matched_by_email_domain(client, seeded):
+    assert seeded.company.domain == "seed.example.com"
+
+    response = client.post("/api/v1/contacts/", json=_contact(seeded, 1, "grace@eu.seed.example.com"))
+    assert response.status_code == 200
+    assert response.json()["company"] == str(seeded.company.id)
+
+    # A newer company on the same domain does not take over; one on its own domain does.
+    client.post("/api/v1/companies/", json={"name": "Seed Again", "zoom_id": "seed-again", "user": seeded.user.user_id,
+                                             "website": "seed.example.com"})
+    other = client.post("/api/v1/companies/", json={"name": "Other", "zoom_id": "other", "user": seeded.user.user_id,
+                                                     "website": "https://www.other.example.org"}).json()
+    assert client.post("/api/v1/contacts/", json=_contact(seeded, 2, "g@seed.example.com")).json()["company"] == str(seeded.company.id)
+    assert client.post("/api/v1/contacts/", json=_contact(seeded, 3, "g@other.example.org")).json()["company"] == other["id"]
+
+    response = client.post("/api/v1/contacts/", json=_contact(seeded, 4, "grace@gmail.com"))
+    assert response.status_code == 400
+    assert "email domain" in response.json()["detail"]
+
+    # Deleted companies stop matching.
+    assert client.delete(f"/api/v1/companies/{other['id']}").status_code == 200
+    assert client.post("/api/v1/contacts/", json=_contact(seeded, 5, "g@other.example.org")).status_code == 400
+
+def test_batch_create_resolves_companies_all_or_nothing(client, seeded):
+    other = Company(name="Other", zoom_id="other", website="other.example.org", user=seeded.user).save()
+    batch = [_contact(seeded, 1, "a@seed.example.com"), _contact(seeded, 2, "b@other.example.org"),
+             _contact(seeded, 3, "c@nowhere.example.net", company=str(seeded.company.id))]
+
+    response = client.post("/api/v1/contacts/batch", json={"contacts": batch})
+
+    assert response.status_code == 200
+    assert [contact["company"] for contact in response.json()] == [str(seeded.company.id), str(other.id),
+                                                                    str(seeded.company.id)]
+    created = Contact.objects.get(id=response.json()[1]["id"])
+    assert created.company.id == other.id and created.dedup_keys
+
+    before = Contact.objects.count()
+    duplicate = client.post("/api/v1/contacts/batch", json={"contacts": [_contact(seeded, 4, "d@seed.example.com"),
+                                                                           _contact(seeded, 1, "a@seed.example.com")]})
+    assert duplicate.status_code == 409
+    unmatched = client.post("/api/v1/contacts/batch", json={"contacts": [_contact(seeded, 5, "e@seed.example.com"),
+                                                                           _contact(seeded, 6, "f@gmail.com")]})
+    assert unmatched.status_code == 400
+    assert Contact.objects.count() == before
+
+def test_backfill_job_sets_domains_and_reassigns_orphans(client, wait_for_job, seeded):
+    companies, contacts = Company._get_collection(), Contact._get_collection()
+    legacy = companies.insert_one({"name": "Legacy", "zoom_id": "legacy", "website": "http://www.legacy.example.io",
+                                   "user": seeded.user.user_id}).inserted_id
+    orphan = contacts.insert_one({"first_name": "Orphan", "last_name": "Annie", "email": "annie@legacy.example.io",
+                                  "zoom_id": "annie", "user": seeded.user.user_id, "company": ObjectId()}).inserted_id
+    lost = contacts.insert_one({"first_name": "Lost", "last_name": "Cause", "email": "lost@unknown.example.io",
+                                "zoom_id": "lost", "user": seeded.user.user_id}).inserted_id
+
+    job = wait_for_job(client.post("/api/v1/admin/contacts/backfill-companies").json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"companies_updated": 1, "contacts_checked": 4, "contacts_reassigned": 1,
+                             "contacts_unmatched": 1}
+    assert companies.find_one({"_id": legacy})["domain"] == "legacy.example.io"
+    assert contacts.find_one({"_id": orphan})["company"] == legacy
+    assert contacts.find_one({"_id": orphan})["dedup_checked"] is False
+    assert "company" not in contacts.find_one({"_id": lost})
+    assert Contact.objects.get(email="ada@seed.example.com").company.id == seeded.company.id
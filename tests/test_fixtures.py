@@ -0,0 +1,23 @@
+from models import Campaign, Company, Contact, User
+
+def test_seeded_template_is_cloned(client, seeded):
+    assert seeded.user.check_password("testpassword")
+    assert seeded.user.password_hash.startswith("pbkdf2:sha256:1$")
+    assert [contact.last_name for contact in seeded.contacts] == ["Lovelace", "Turing"]
+    assert {contact.company.id for contact in seeded.contacts} == {seeded.company.id}
+
+    response = client.get(f"/api/v1/companies/{seeded.company.id}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Seed Co"
+    assert client.get("/api/v1/search/", params={"q": "lovelace"}).json()
+
+    # Changes stay in this test's copy.
+    Contact.objects.delete()
+
+def test_each_test_starts_empty(client, seeded):
+    assert Contact.objects.count() == 2
+    seeded.user.delete()
+
+def test_data_does_not_leak_between_tests(client):
+    for model in (Campaign, Company, Contact, User):
+        assert model.objects.count() == 0
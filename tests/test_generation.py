@@ -0,0 +1,64 @@
+import asyncio
+import json
+from benchmarks.generation import run_benchmark
+from core import generation
+from core.ai import AIRouter, StubProvider
+from core.generation import _apportion, generate_batch
+from models import Email
+
+def _router(provider):
+    return AIRouter([f"{provider.name}/m"], {provider.name: provider})
+
+def _recipients(seeded):
+    return [(seeded.company, contact) for contact in seeded.contacts]
+
+def test_batch_splits_tokens_across_the_emails(seeded):
+    provider = StubProvider("stub")
+    emails = asyncio.run(generate_batch(seeded.campaign, _recipients(seeded), router=_router(provider)))
+
+    assert provider.calls == 1
+    assert [email.contact.email for email in emails] == [contact.email for contact in seeded.contacts]
+    assert all("Contacts:\n1. Ada Lovelace, Engineer at Seed Co" in email.full_prompt for email in emails)
+    completion = asyncio.run(_router(StubProvider("stub")).complete(emails[0].full_prompt))
+    assert sum(email.tokens_sent for email in emails) == completion.tokens_sent
+    assert sum(email.tokens_returned for email in emails) == completion.tokens_returned
+    assert _apportion(10, [1, 1, 1]) == [4, 3, 3] and _apportion(5, [0, 0]) == [3, 2]
+
+def test_unusable_batch_answers_fall_back_to_single_calls(seeded):
+    def respond(prompt):
+        if "\nContacts:\n" not in prompt:
+            return json.dumps({"subject": "Single", "body": "One by one"})
+        # Contact 2 is missing and contact 1 has no body.
+        return "Here you go:\n```json\n" + json.dumps([{"contact": 1, "subject": "Batched"}]) + "\n```"
+
+    provider = StubProvider("stub", respond=respond)
+    emails = asyncio.run(generate_batch(seeded.campaign, _recipients(seeded), router=_router(provider)))
+    assert [email.subject for email in emails] == ["Single", "Single"]
+    assert provider.calls == 3
+
+    provider = StubProvider("stub", respond=lambda prompt: "Sorry, I can't help with that." if "\nContacts:\n" in prompt
+                            else json.dumps({"subject": "Single", "body": "One by one"}))
+    assert [email.subject for email in asyncio.run(generate_batch(seeded.campaign, _recipients(seeded),
+                                                                  router=_router(provider)))] == ["Single", "Single"]
+
+def test_generate_campaign_job_writes_each_contact_once(client, seeded, wait_for_job, monkeypatch):
+    provider = StubProvider("stub")
+    monkeypatch.setattr(generation, "ai_router", _router(provider))
+    path = f"/api/v1/campaigns/{seeded.campaign.campaign_id}/generate"
+
+    job = wait_for_job(client.post(path, json={"batch_size": 5}).json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["generated"] == 2 and job["result"]["batches"] == 1 and job["result"]["tokens_per_email"] > 0
+    assert provider.calls == 1
+    assert Email.objects(campaign_id=seeded.campaign.campaign_id, ai_model="stub/m").count() == 2
+    again = wait_for_job(client.post(path, json={}).json()["job_id"])
+    assert again["result"]["generated"] == 0 and again["result"]["skipped"] == 2
+    assert client.post("/api/v1/campaigns/nope/generate", json={}).status_code == 404
+
+def test_benchmark_batching_uses_fewer_calls_and_tokens():
+    single = asyncio.run(run_benchmark(emails=20, batch_size=1, latency_ms=0, token_latency_ms=0))
+    batched = asyncio.run(run_benchmark(emails=20, batch_size=5, latency_ms=0, token_latency_ms=0))
+    assert single["generated"] == batched["generated"] == 20
+    assert (single["calls"], batched["calls"]) == (20, 4)
+    assert batched["tokens_per_email"] < single["tokens_per_email"]
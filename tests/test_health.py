@@ -0,0 +1,42 @@
+import pytest
+from config import settings
+from core.health import health_monitor
+
+def test_health_check(client):
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "healthy"
+    assert data["database"] == "connected"
+    assert "p95" in data["latency_ms"]
+
+def test_readiness_check(client):
+    response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+def test_health_check_degraded_on_latency(client, monkeypatch):
+    # Any measured latency is above a negative threshold
+    monkeypatch.setattr(settings, "HEALTH_DEGRADED_LATENCY_MS", -1.0)
+    client.portal.call(health_monitor.check)
+
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "degraded"
+    assert any("latency" in warning for warning in data["warnings"])
+    assert client.get("/ready").status_code == 200
+
+def test_health_check_unhealthy_when_database_down(client, monkeypatch):
+    def failing_ping():
+        raise ConnectionError("ping failed")
+
+    monkeypatch.setattr(health_monitor, "_ping", failing_ping)
+    monkeypatch.setattr(settings, "HEALTH_FAILURE_THRESHOLD", 1)
+    client.portal.call(health_monitor.check)
+
+    assert client.get("/health").status_code == 503
+    assert client.get("/ready").status_code == 503
@@ -0,0 +1,64 @@
+import asyncio
+import httpx
+from httpx import ASGITransport
+from main import app
+from models import Company, IdempotencyRecord
+
+def _company(user, n=1):
+    return {"name": f"Acme {n}", "zoom_id": f"acme-{n}", "user": user.user_id}
+
+def _created():
+    # Companies made by the test, next to the seeded one
+    return Company.objects(zoom_id__startswith="acme-").count()
+
+def test_retried_create_is_replayed(client, seeded):
+    user = seeded.user
+    headers = {"Idempotency-Key": "create-acme-1"}
+
+    first = client.post("/api/v1/companies/", json=_company(user), headers=headers)
+    retry = client.post("/api/v1/companies/", json=_company(user), headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert _created() == 1
+    record = IdempotencyRecord.objects.get()
+    assert record.status == "completed" and record.status_code == 200
+
+    # The same key with another body is refused; requests without a key are untouched.
+    assert client.post("/api/v1/companies/", json=_company(user, 2), headers=headers).status_code == 422
+    assert client.post("/api/v1/companies/", json=_company(user, 2)).status_code == 200
+    assert _created() == 2
+    assert client.post("/api/v1/companies/", json=_company(user, 3), headers={"Idempotency-Key": "x" * 300}).status_code == 400
+
+def test_concurrent_duplicates_wait_for_the_first_execution(client, seeded):
+    user = seeded.user
+
+    async def send_all():
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+            return await asyncio.gather(*[
+                http.post("/api/v1/companies/", json=_company(user), headers={"Idempotency-Key": "burst"})
+                for _ in range(5)
+            ])
+
+    responses = asyncio.run(send_all())
+
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 4
+    assert _created() == 1
+
+def test_stored_response_survives_a_restart(client, seeded):
+    # Another process (or this one after a restart) finds the response in MongoDB.
+    from core.idempotency import idempotency_store
+    user = seeded.user
+    headers = {"Idempotency-Key": "restart"}
+    first = client.post("/api/v1/companies/", json=_company(user), headers=headers)
+    idempotency_store._completed.clear()
+
+    retry = client.post("/api/v1/companies/", json=_company(user), headers=headers)
+
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert _created() == 1
@@ -0,0 +1,120 @@
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from models import Contact, Email
+from models.job import Job
+from core.datagen import DataGenerator, GeneratorConfig
+from core.jobs import job_handler, job_queue
+
+FAIL_AT = {"n": None}
+
+@job_handler("test_count")
+def count_handler(ctx):
+    n = ctx.checkpoint.get("n", 0)
+    while n < ctx.params["to"]:
+        if FAIL_AT["n"] == n:
+            raise RuntimeError(f"failed at {n}")
+        time.sleep(ctx.params.get("delay", 0))
+        n += 1
+        ctx.progress(n, ctx.params["to"])
+        ctx.save_checkpoint(n=n)
+    return {"counted_to": n, "attempt": ctx.attempt}
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+def test_job_runs_and_reports_progress(client, wait_for_job):
+    job = job_queue.enqueue("test_count", {"to": 3})
+
+    result = wait_for_job(job.job_id)
+
+    assert result["status"] == "succeeded"
+    assert result["progress"] == 1.0
+    assert result["result"]["counted_to"] == 3
+    assert result["checkpoint"] == {"n": 3}
+    assert client.get("/api/v1/jobs/", params={"kind": "test_count"}).json()[0]["job_id"] == job.job_id
+    assert client.get("/api/v1/jobs/missing").status_code == 404
+
+def test_failed_job_resumes_from_checkpoint(client, wait_for_job):
+    FAIL_AT["n"] = 2
+    job = job_queue.enqueue("test_count", {"to": 4})
+    failed = wait_for_job(job.job_id)
+    assert failed["status"] == "failed"
+    assert failed["error"] == "failed at 2"
+    assert failed["checkpoint"] == {"n": 2}
+
+    FAIL_AT["n"] = None
+    response = client.post(f"/api/v1/jobs/{job.job_id}/resume")
+    assert response.status_code == 200
+    resumed = wait_for_job(job.job_id)
+    assert resumed["status"] == "succeeded"
+    assert resumed["result"]["counted_to"] == 4
+    # Only a finished job can be resumed
+    assert client.post(f"/api/v1/jobs/{job.job_id}/resume").status_code == 409
+
+def test_cancel_running_job(client, wait_for_job):
+    job = job_queue.enqueue("test_count", {"to": 1000, "delay": 0.01})
+    _wait_until(lambda: Job.objects(job_id=job.job_id, status="running").count() == 1)
+
+    response = client.post(f"/api/v1/jobs/{job.job_id}/cancel")
+    assert response.json()["cancel_requested"] is True
+
+    cancelled = wait_for_job(job.job_id)
+    assert cancelled["status"] == "cancelled"
+    assert 0 < cancelled["checkpoint"]["n"] < 1000
+
+def test_expired_lease_is_reclaimed(client, wait_for_job):
+    # A worker died while holding the job: it is picked up again from its checkpoint
+    job = Job(kind="test_count", params={"to": 5}, status="running", attempts=1, checkpoint={"n": 3},
+              worker_id="dead-worker", lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    job.save()
+    job_queue.notify()
+
+    result = wait_for_job(job.job_id)
+
+    assert result["status"] == "succeeded"
+    assert result["result"] == {"counted_to": 5, "attempt": 2}
+
+def test_initialize_db_job(client, wait_for_job):
+    response = client.post("/api/v1/initialize-db")
+
+    assert response.status_code == 202
+    assert response.headers["location"].endswith(response.json()["job_id"])
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["contacts_created"] == Contact.objects.count() == 2
+    assert Email.objects.count() == 2
+
+def test_generator_is_reproducible_for_a_start_time():
+    config = GeneratorConfig(users=2, companies_per_user=2, contacts_per_company=2)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    first = [document["_id"] for _, document in DataGenerator(config, now=now).generate()]
+    second = [document["_id"] for _, document in DataGenerator(config, now=now).generate()]
+
+    assert first == second
+
+def test_api_processes_follow_data_resets_from_other_workers(client, seeded):
+    from core.changes import change_feed
+    from core.seeding import DataResetWatcher
+    from core.search import search_index
+
+    def finished(kind, worker_id, minutes_ago):
+        Job(kind=kind, status="succeeded", worker_id=worker_id,
+            finished_at=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)).save()
+
+    finished("initialize_db", "other-host:1", 10)
+    watcher = DataResetWatcher()
+    assert watcher.poll() is False
+    finished("initialize_db", job_queue.worker_id, 5)
+    finished("dedup_contacts", "other-host:1", 4)
+    assert watcher.poll() is False
+
+    version = change_feed.stats()["version"]
+    finished("reset_project", "other-host:1", 1)
+    assert watcher.poll() is True
+    assert {change.op for change in change_feed.since(version, {"contacts"})} == {"reset"}
+    assert search_index.search("lovelace", limit=5) == []
+    assert watcher.poll() is False
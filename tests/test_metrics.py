@@ -0,0 +1,30 @@
+import pytest
+from core.mongo_commands import CommandSample
+from core.metrics import _record_mongo_command, record_cache
+
+def test_metrics_per_route(client):
+    client.get("/api/v1/campaigns/")
+    client.get("/api/v1/campaigns/missing-campaign")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/v1/campaigns/",status="200"}' in body
+    assert 'http_requests_total{method="GET",route="/api/v1/campaigns/{campaign_id}",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{le="0.001",method="GET",route="/api/v1/campaigns/"}' in body
+    assert 'http_requests_in_flight{method="GET",route="/api/v1/campaigns/"} 0.0' in body
+
+def test_metrics_mongo_commands_and_caches(client):
+    _record_mongo_command(CommandSample(
+        command_name="find", database="test", collection="emails",
+        command={"find": "emails"}, duration=0.002, failed=True
+    ))
+    record_cache("test-cache", hit=True)
+
+    body = client.get("/metrics").text
+
+    assert 'mongodb_command_duration_seconds_count{collection="emails",command="find"}' in body
+    assert 'mongodb_command_failures_total{collection="emails",command="find"}' in body
+    assert 'cache_requests_total{cache="test-cache",result="hit"}' in body
+    assert "mongodb_pool_checked_out_connections" in body
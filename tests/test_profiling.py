@@ -0,0 +1,72 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from config import settings
+from core.mongo_commands import CommandSample
+from core.profiling import ProfilingMiddleware, _record_mongo_call, profile_store
+from core.query_shape import query_shape
+
+def test_query_shape_replaces_literals():
+    shape = query_shape("find", {
+        "find": "emails",
+        "filter": {"contact.email": "alice@example.com", "tokens_sent": {"$gt": 10}, "ai_model": {"$in": ["a", "b"]}},
+        "sort": {"created_at": -1},
+        "lsid": {"id": "session"},
+    })
+
+    assert shape == {
+        "command": "find",
+        "collection": "emails",
+        "filter": {"contact.email": "?", "tokens_sent": {"$gt": "?"}, "ai_model": {"$in": ["?"]}},
+        "sort": {"created_at": -1},
+    }
+
+def _profiled_app():
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/work")
+    async def work():
+        _record_mongo_call(CommandSample(
+            command_name="find", database="test", collection="emails",
+            command={"find": "emails", "filter": {"campaign_id": "c1"}}, duration=0.004, failed=False
+        ))
+        return {"ok": True}
+
+    return app
+
+def test_profile_by_header(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+    client = TestClient(_profiled_app())
+
+    # Without the admin key the header is ignored
+    response = client.get("/work", headers={"X-Profile": "1"})
+    assert "X-Profile-Id" not in response.headers
+
+    response = client.get("/work", headers={"X-Profile": "1", "X-Admin-Key": "secret"})
+    profile_id = response.headers["X-Profile-Id"]
+    profile = profile_store.get(profile_id)
+
+    summary = profile.summary()
+    assert summary["trigger"] == "header"
+    assert summary["status"] == 200
+    assert summary["mongo"]["calls"] == 1
+    assert summary["mongo"]["by_shape"][0]["shape"]["filter"] == {"campaign_id": "?"}
+    assert profile.to_speedscope()["profiles"][0]["type"] == "sampled"
+
+def test_profile_admin_endpoints(client):
+    profiled = TestClient(_profiled_app())
+    profile_id = profiled.get("/work", headers={"X-Profile": "1"}).headers["X-Profile-Id"]
+
+    response = client.get(f"/api/v1/admin/profiles/{profile_id}")
+    assert response.status_code == 200
+    assert response.json()["profile_id"] == profile_id
+
+    response = client.get(f"/api/v1/admin/profiles/{profile_id}/speedscope")
+    assert response.status_code == 200
+    assert "speedscope" in response.headers["content-disposition"]
+
+    response = client.get(f"/api/v1/admin/profiles/{profile_id}/flamegraph")
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/admin/profiles/unknown").status_code == 404
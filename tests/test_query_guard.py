@@ -0,0 +1,61 @@
+import pytest
+from datetime import datetime, timedelta
+from models.campaign import Campaign
+from models.company import Company
+from models.contact import Contact
+from models.email import Email
+from core.query_guard import index_supports, supporting_index
+
+def test_index_supports_equality_sort_range():
+    pattern = [("campaign_id", 1), ("created_at", -1)]
+    assert index_supports(pattern, {"campaign_id"}, set(), [])
+    assert index_supports(pattern, {"campaign_id"}, {"created_at"}, [("created_at", 1)])
+    assert index_supports(pattern, {"campaign_id"}, set(), [("created_at", -1)])
+    assert not index_supports(pattern, set(), set(), [("campaign_id", 1), ("created_at", 1)])
+    assert not index_supports(pattern, {"created_at"}, set(), [])
+    assert not index_supports(pattern, {"campaign_id", "ai_model"}, set(), [])
+    # A range on the leading field cannot also provide a sort on a later field
+    assert not index_supports(pattern, set(), {"campaign_id"}, [("created_at", -1)])
+
+def test_declared_model_indexes():
+    assert supporting_index(Email, {"contact.email": "a@b.com"}, [("created_at", -1)])
+    assert supporting_index(Company, {"primary_sub_industry": "SaaS"}, [("name", 1)])
+    assert supporting_index(Contact, {"user": 1, "company": 2}, [("last_name", 1)])
+    assert supporting_index(Contact, {"company": 2, "title": "CTO"}, []) is None
+    assert supporting_index(Campaign, {}, [("campaign_name", 1)]) is None
+
+def test_filtered_lists(client, seeded):
+    user = seeded.user
+    companies = [
+        Company(name=name, primary_industry="Technology", primary_sub_industry=sub, zoom_id=name, user=user).save()
+        for name, sub in (("Beta", "SaaS"), ("Alpha", "SaaS"), ("Gamma", "Hardware"))
+    ]
+    for i, company in enumerate(companies):
+        Contact(first_name="C", last_name=f"L{i}", email=f"c{i}@x.com", zoom_id=f"c{i}", user=user, company=company).save()
+    now = datetime.utcnow()
+    for i in range(4):
+        Email(company={"name": "Alpha"}, contact={"email": f"c{i % 2}@x.com"}, subject=f"S{i}", body="B",
+              ai_model="gpt" if i % 2 else "claude", tokens_sent=1, tokens_returned=1, generation_time=0.1,
+              full_prompt="P", campaign_id="camp1" if i < 3 else "camp2", created_at=now - timedelta(days=i)).save()
+
+    response = client.get("/api/v1/companies/", params={"industry": "Technology", "sub_industry": "SaaS", "sort": "name"})
+    assert response.status_code == 200
+    assert [c["name"] for c in response.json()] == ["Alpha", "Beta"]
+
+    response = client.get("/api/v1/contacts/", params={"company": str(companies[2].id)})
+    assert [c["last_name"] for c in response.json()] == ["L2"]
+
+    response = client.get("/api/v1/emails/", params={
+        "campaign_id": "camp1", "created_after": (now - timedelta(days=1, hours=1)).isoformat(), "sort": "-created_at"
+    })
+    assert [e["subject"] for e in response.json()] == ["S0", "S1"]
+    response = client.get("/api/v1/emails/", params={"contact_email": "c1@x.com", "sort": "created_at"})
+    assert [e["subject"] for e in response.json()] == ["S3", "S1"]
+
+    # No declared index covers these combinations
+    response = client.get("/api/v1/contacts/", params={"company": str(companies[0].id), "title": "CTO"})
+    assert response.status_code == 400
+    response = client.get("/api/v1/emails/", params={"campaign_id": "camp1", "ai_model": "gpt"})
+    assert response.status_code == 400
+    assert client.get("/api/v1/contacts/", params={"sort": "email"}).status_code == 422
+    assert client.get("/api/v1/contacts/", params={"company": "not-an-id"}).status_code == 400
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from config import settings
+from models import Email
+from core.retention import TTL_INDEX_NAME, apply_retention, ensure_ttl_index
+
+def _email(created_at, campaign_id="c1"):
+    return Email(company={"name": "Acme"}, contact={"email": "a@acme.example"}, subject=f"{created_at:%Y-%m-%d}",
+                 body="B", ai_model="test", tokens_sent=1, tokens_returned=1, generation_time=0.1,
+                 full_prompt="p" * 1000, campaign_id=campaign_id, created_at=created_at).save()
+
+def test_ttl_index_follows_settings(client, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_RETENTION_MODE", "ttl")
+    monkeypatch.setattr(settings, "EMAIL_RETENTION_DAYS", 30)
+
+    assert ensure_ttl_index() == 30 * 86400
+    assert Email._get_collection().index_information()[TTL_INDEX_NAME]["expireAfterSeconds"] == 30 * 86400
+    assert client.get("/api/v1/admin/emails/retention").json()["ttl_seconds"] == 30 * 86400
+
+    monkeypatch.setattr(settings, "EMAIL_RETENTION_MODE", "off")
+    assert apply_retention() is None
+    assert TTL_INDEX_NAME not in Email._get_collection().index_information()
+
+def test_archive_moves_old_emails_into_monthly_collections(client, wait_for_job, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_ARCHIVE_COMPRESSOR", "")
+    january = _email(datetime(2020, 1, 15, tzinfo=timezone.utc))
+    _email(datetime(2020, 2, 10, tzinfo=timezone.utc))
+    _email(datetime(2020, 2, 20, tzinfo=timezone.utc), campaign_id="c2")
+    recent = _email(datetime.now(timezone.utc))
+
+    response = client.post("/api/v1/admin/emails/archive", params={"days": 365})
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["archived"] == {"emails_archive_2020_01": 1, "emails_archive_2020_02": 2}
+    assert [str(email.id) for email in Email.objects] == [str(recent.id)]
+    status = client.get("/api/v1/admin/emails/retention").json()
+    assert status["hot_emails"] == 1
+    assert status["archives"] == {"emails_archive_2020_02": 2, "emails_archive_2020_01": 1}
+
+    archived = client.get("/api/v1/emails/archived").json()
+    assert [email["subject"] for email in archived] == ["2020-02-20", "2020-02-10", "2020-01-15"]
+    oldest_first = client.get("/api/v1/emails/archived", params={"sort": "created_at", "skip": 1, "limit": 1}).json()
+    assert [email["subject"] for email in oldest_first] == ["2020-02-10"]
+    by_campaign = client.get("/api/v1/emails/archived", params={"campaign_id": "c2"}).json()
+    assert [email["subject"] for email in by_campaign] == ["2020-02-20"]
+    february = client.get("/api/v1/emails/archived", params={"created_after": "2020-02-01T00:00:00Z",
+                                                             "created_before": "2020-02-15T00:00:00Z"}).json()
+    assert [email["subject"] for email in february] == ["2020-02-10"]
+    assert client.get(f"/api/v1/emails/archived/{january.id}").json()["subject"] == "2020-01-15"
+    assert client.get(f"/api/v1/emails/archived/{recent.id}").status_code == 404
+    assert client.get("/api/v1/emails/archived/not-an-id").status_code == 400
@@ -0,0 +1,47 @@
+import pytest
+from core.search import SearchIndex, search_index, tokenize
+
+def test_tokenize():
+    assert tokenize("Alice.J@TechSolutions.com", "https://www.tech.io") == ["alice", "j", "techsolutions", "com", "tech", "io"]
+
+def test_prefix_search_ranks_exact_tokens_first():
+    index = SearchIndex()
+    index.index_contact({"_id": "1", "first_name": "Alicia", "last_name": "Keys", "email": "a@x.com"})
+    index.index_contact({"_id": "2", "first_name": "Ali", "last_name": "Baba", "email": "b@y.com", "title": "CEO"})
+    index.index_company({"_id": "3", "name": "Alibaba Group", "website": "https://alibaba.com"})
+
+    assert [r["id"] for r in index.search("ali")] == ["2", "3", "1"]
+    assert [r["id"] for r in index.search("ali ce")] == ["2"]
+    assert [r["id"] for r in index.search("ali", kinds={"company"})] == ["3"]
+
+    index.remove("contact", "2")
+    assert [r["id"] for r in index.search("ali")] == ["3", "1"]
+    assert index.stats()["documents"] == 2
+
+def test_common_tokens_and_kind_filters_stay_within_the_candidate_bound(monkeypatch):
+    monkeypatch.setattr("core.search.MAX_CANDIDATES", 20)
+    index = SearchIndex()
+    for n in range(100):
+        index.index_contact({"_id": str(n), "first_name": f"Person{n}", "last_name": "Smith", "email": f"p{n}@acme.com"})
+    index.index_company({"_id": "c", "name": "Acme", "website": "https://acme.com"})
+
+    assert index.search("acme zzz") == []
+    assert [r["id"] for r in index.search("acme", kinds={"company"})] == ["c"]
+    # The rarer term drives the walk, so a match beyond the bound of the common one is found.
+    assert [r["id"] for r in index.search("acme person99")] == ["99"]
+
+def test_search_endpoint_follows_writes(client, seeded):
+    contact, company = seeded.contacts[0], seeded.company
+
+    response = client.get("/api/v1/search/", params={"q": "ada seed"})
+    assert response.status_code == 200
+    assert response.json() == [{"type": "contact", "id": str(contact.id), "label": "Ada Lovelace <ada@seed.example.com>, Engineer"}]
+
+    # Updates and deletes go through the router and keep the index current
+    client.put(f"/api/v1/contacts/{contact.id}", json={"title": "Chief Architect"})
+    assert client.get("/api/v1/search/", params={"q": "chief"}).json()[0]["id"] == str(contact.id)
+    client.delete(f"/api/v1/contacts/{contact.id}")
+    assert client.get("/api/v1/search/", params={"q": "ada", "types": "contact"}).json() == []
+
+    assert client.get("/api/v1/search/", params={"q": "seed", "types": "company"}).json()[0]["id"] == str(company.id)
+    assert client.get("/api/v1/search/", params={"q": "seed", "types": "person"}).status_code == 400
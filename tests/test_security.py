@@ -0,0 +1,12 @@
+from config import settings
+
+def test_admin_endpoints_require_key(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+
+    assert client.get("/api/v1/admin/profiles").status_code == 403
+    assert client.get("/api/v1/admin/profiles", headers={"X-Admin-Key": "secret"}).status_code == 200
+    # The operator endpoints outside /admin are guarded the same way
+    for method, path in [("post", "/reset-project"), ("post", "/initialize-db"), ("get", "/logs"),
+                         ("post", "/reset-logs"), ("get", "/jobs/unknown")]:
+        assert getattr(client, method)(f"/api/v1{path}").status_code == 403
+    assert client.get("/api/v1/logs", headers={"X-Admin-Key": "secret"}).status_code == 200
@@ -0,0 +1,44 @@
+import pytest
+from config import settings
+from core.mongo_commands import CommandSample
+from core.slow_queries import plan_stages, slow_query_log
+
+def _sample(duration, email="alice@example.com"):
+    return CommandSample(
+        command_name="find", database="mongoenginetest", collection="emails",
+        command={"find": "emails", "filter": {"contact.email": email}}, duration=duration, failed=False
+    )
+
+def test_plan_stages_detects_collscan():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "name_1"}},
+            "rejectedPlans": [{"stage": "COLLSCAN"}],
+        }
+    }
+    assert plan_stages(explain) == ["FETCH", "IXSCAN"]
+
+    aggregate_explain = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}]}
+    assert plan_stages(aggregate_explain) == ["COLLSCAN"]
+
+def test_slow_queries_aggregated_by_shape(client, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 50)
+    slow_query_log.clear()
+
+    slow_query_log.observe(_sample(0.2, "alice@example.com"))
+    slow_query_log.observe(_sample(0.1, "bob@example.com"))
+    # Below the threshold: ignored
+    slow_query_log.observe(_sample(0.01))
+
+    response = client.get("/api/v1/admin/slow-queries")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["shapes"] == 1
+    query = data["queries"][0]
+    assert query["count"] == 2
+    assert query["max_ms"] == 200.0
+    assert query["shape"]["filter"] == {"contact.email": "?"}
+
+    assert client.delete("/api/v1/admin/slow-queries").status_code == 200
+    assert client.get("/api/v1/admin/slow-queries").json()["shapes"] == 0
@@ -0,0 +1,74 @@
+from models import Email
+
+def _email_data(company_id, contact_id):
+    return {
+        "company": {"company_id": company_id}, "contact": {"contact_id": contact_id},
+        "subject": "Hello", "body": "Body", "ai_model": "test", "tokens_sent": 1, "tokens_returned": 1,
+        "generation_time": 0.1, "full_prompt": "prompt", "campaign_id": "campaign-1",
+    }
+
+def test_email_snapshots_are_copied_from_sources(client, seeded):
+    company, contact = seeded.company, seeded.contacts[0]
+
+    response = client.post("/api/v1/emails/", json=_email_data(str(company.id), str(contact.id)))
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["company"] == {"company_id": str(company.id), "name": "Seed Co", "zoom_id": "seed-co",
+                               "website": "https://seed.example.com"}
+    assert data["contact"]["contact_id"] == str(contact.id)
+    assert data["contact"]["email"] == "ada@seed.example.com"
+    missing = _email_data("0" * 24, str(contact.id))
+    assert client.post("/api/v1/emails/", json=missing).status_code == 400
+
+def test_company_and_contact_updates_resync_emails(client, seeded):
+    company, contact = seeded.company, seeded.contacts[0]
+    for _ in range(3):
+        client.post("/api/v1/emails/", json=_email_data(str(company.id), str(contact.id)))
+    other = Email(company={"name": "Other"}, contact={"email": "x@other.example"}, subject="S", body="B",
+                  ai_model="test", tokens_sent=1, tokens_returned=1, generation_time=0.1, full_prompt="p",
+                  campaign_id="campaign-1").save()
+
+    assert client.put(f"/api/v1/companies/{company.id}", json={"name": "Acme Corp"}).status_code == 200
+    assert client.put(f"/api/v1/contacts/{contact.id}", json={"last_name": "King"}).status_code == 200
+
+    emails = client.get("/api/v1/emails/", params={"campaign_id": "campaign-1", "limit": 10}).json()
+    synced = [email for email in emails if email["id"] != str(other.id)]
+    assert len(synced) == 3
+    assert {email["company"]["name"] for email in synced} == {"Acme Corp"}
+    assert {email["contact"]["last_name"] for email in synced} == {"King"}
+    assert Email.objects.get(id=other.id).company.name == "Other"
+
+def test_backfill_links_legacy_snapshots(client, seeded, wait_for_job):
+    company, contact = seeded.company, seeded.contacts[0]
+    Email._get_collection().insert_one({
+        "company": {"name": "Old name", "zoom_id": "seed-co"},
+        "contact": {"first_name": "Ada", "last_name": "Lovelace", "email": "ada@seed.example.com"},
+        "subject": "S", "body": "B", "ai_model": "test", "tokens_sent": 1, "tokens_returned": 1,
+        "generation_time": 0.1, "full_prompt": "p", "campaign_id": "campaign-1",
+    })
+
+    response = client.post("/api/v1/admin/emails/backfill-snapshots")
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"scanned": 1, "companies_linked": 1, "contacts_linked": 1}
+    email = Email.objects.get()
+    assert email.company.company_id == company.id
+    assert email.company.name == "Seed Co"
+    assert email.contact.contact_id == contact.id
+
+def test_legacy_snapshots_with_extra_fields_load(client, seeded):
+    Email._get_collection().insert_one({
+        "company": {"name": "Acme", "industry": "x"},
+        "contact": {"first_name": "Ada", "email": "ada@acme.example", "phone": "555"},
+        "subject": "S", "body": "B", "ai_model": "test", "tokens_sent": 1, "tokens_returned": 1,
+        "generation_time": 0.1, "full_prompt": "p", "campaign_id": "campaign-1",
+    })
+
+    response = client.get("/api/v1/emails/", params={"campaign_id": "campaign-1"})
+
+    assert response.status_code == 200
+    assert [email["company"]["name"] for email in response.json()] == ["Acme"]
+    assert Email.objects.get().contact.email == "ada@acme.example"